@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        # Invalidar la caché IMEI -> dispositivo de la ingesta de ubicaciones
+        from django.db.models.signals import post_delete, post_save
+        from .models import DispositivoMovil
+        from .ubicaciones import olvidar_dispositivo
+        post_save.connect(olvidar_dispositivo, sender=DispositivoMovil, dispatch_uid='olvidar_dispositivo_guardado')
+        post_delete.connect(olvidar_dispositivo, sender=DispositivoMovil, dispatch_uid='olvidar_dispositivo_borrado')
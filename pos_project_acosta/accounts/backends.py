@@ -0,0 +1,124 @@
+"""
+Autenticación por usuario o email con una consulta y un solo hash de contraseña.
+
+UsuarioOEmailBackend busca el login como username o email en una consulta (los
+dos campos son únicos e indexados) y verifica la contraseña una vez. Cuando
+recibe credenciales su decisión es final: si fallan lanza PermissionDenied y
+authenticate() no prueba los backends siguientes (allauth volvería a buscar y a
+calcular el hash). Si el login no existe se calcula igual un hash, para que el
+tiempo de respuesta no revele qué usuarios existen.
+
+Los intentos fallidos se cuentan en la caché con la IP real del cliente
+(core/red.py):
+
+- por login e IP: al llegar a LOGIN_INTENTOS_MAXIMOS ese login queda bloqueado
+  desde esa IP durante LOGIN_BLOQUEO_SEGUNDOS, sin calcular hashes. Desde otra
+  IP el usuario puede seguir entrando: un atacante solo bloquea la suya;
+- por IP: al llegar a LOGIN_INTENTOS_POR_IP se bloquea la IP;
+- por login desde cualquier IP: pasado LOGIN_INTENTOS_POR_LOGIN se admite un
+  intento cada LOGIN_DEMORA_SEGUNDOS y los demás se rechazan al momento, sin
+  calcular hashes ni retener el hilo. Frena un ataque distribuido sin bloquear
+  al usuario, que puede entrar en el siguiente turno.
+
+espera_login() dice cuántos segundos debe esperar el cliente; las vistas de
+login lo usan para avisar (el token JWT responde 429 con Retry-After).
+Un login correcto reinicia los contadores del login.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+
+from core.red import ip_cliente
+
+
+def _claves(request, login):
+    """(login e IP, IP o None, login)"""
+    login = login.strip().lower()
+    ip = ip_cliente(request)
+    return (
+        f'login_fallido:{login}:{ip or "-"}',
+        f'login_fallido_ip:{ip}' if ip else None,
+        f'login_fallido_login:{login}',
+    )
+
+
+def login_bloqueado(request, login):
+    """True si el login desde esta IP, o la IP, superaron los intentos fallidos permitidos"""
+    por_login_ip, por_ip, _ = _claves(request, login)
+    intentos = cache.get_many([clave for clave in (por_login_ip, por_ip) if clave])
+    if intentos.get(por_login_ip, 0) >= settings.LOGIN_INTENTOS_MAXIMOS:
+        return True
+    return por_ip is not None and intentos.get(por_ip, 0) >= settings.LOGIN_INTENTOS_POR_IP
+
+
+def _clave_turno(login):
+    return f'login_turno:{login.strip().lower()}'
+
+
+def tomar_turno(request, login):
+    """
+    False si el login superó LOGIN_INTENTOS_POR_LOGIN desde cualquier IP y ya tuvo
+    un intento en los últimos LOGIN_DEMORA_SEGUNDOS; si no, reserva el turno.
+    """
+    if cache.get(_claves(request, login)[2], 0) < settings.LOGIN_INTENTOS_POR_LOGIN:
+        return True
+    # El valor es el vencimiento, para que espera_login no dependa del TTL de la caché
+    return cache.add(_clave_turno(login), time.time() + settings.LOGIN_DEMORA_SEGUNDOS, settings.LOGIN_DEMORA_SEGUNDOS)
+
+
+def espera_login(request, login):
+    """Segundos que debe esperar el cliente antes de volver a intentar (0 si puede)"""
+    if login_bloqueado(request, login):
+        return settings.LOGIN_BLOQUEO_SEGUNDOS
+    vence = cache.get(_clave_turno(login))
+    return max(0, math.ceil(vence - time.time())) if vence else 0
+
+
+def registrar_fallo(request, login):
+    for clave in _claves(request, login):
+        if clave is None:
+            continue
+        # add no renueva el vencimiento: la ventana empieza con el primer fallo
+        cache.add(clave, 0, settings.LOGIN_BLOQUEO_SEGUNDOS)
+        try:
+            cache.incr(clave)
+        except ValueError:  # venció entre add e incr
+            cache.set(clave, 1, settings.LOGIN_BLOQUEO_SEGUNDOS)
+
+
+def reiniciar_fallos(request, login):
+    por_login_ip, _, por_login = _claves(request, login)
+    cache.delete_many([por_login_ip, por_login, _clave_turno(login)])
+
+
+class UsuarioOEmailBackend(ModelBackend):
+    """
+    ModelBackend que acepta username o email (credenciales username= o email=).
+    """
+
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        UserModel = get_user_model()
+        login = username or email or kwargs.get(UserModel.USERNAME_FIELD)
+        if not login or password is None:
+            return None
+        if login_bloqueado(request, login) or not tomar_turno(request, login):
+            raise PermissionDenied('Demasiados intentos fallidos')
+
+        usuarios = list(UserModel._default_manager.filter(Q(username=login) | Q(email=login))[:2])
+        # Si el login es el username de uno y el email de otro, gana el username
+        usuario = next((u for u in usuarios if u.username == login), usuarios[0] if usuarios else None)
+
+        if usuario is None:
+            UserModel().set_password(password)
+        elif usuario.check_password(password) and self.user_can_authenticate(usuario):
+            reiniciar_fallos(request, login)
+            return usuario
+
+        registrar_fallo(request, login)
+        raise PermissionDenied('Credenciales inválidas')
@@ -0,0 +1,23 @@
+"""
+Cálculos geográficos sin PostGIS (esfera de radio medio terrestre).
+"""
+import math
+
+RADIO_TIERRA_M = 6371008.8
+
+
+def distancia_metros(latitud1, longitud1, latitud2, longitud2):
+    """Distancia por el círculo máximo (haversine) entre dos puntos en grados"""
+    fi1, fi2 = math.radians(latitud1), math.radians(latitud2)
+    delta_fi = fi2 - fi1
+    delta_lambda = math.radians(longitud2 - longitud1)
+    a = math.sin(delta_fi / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(delta_lambda / 2) ** 2
+    return 2 * RADIO_TIERRA_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def longitud_recorrido(puntos):
+    """Suma de distancias entre puntos consecutivos [(latitud, longitud), ...]"""
+    return sum(
+        distancia_metros(latitud1, longitud1, latitud2, longitud2)
+        for (latitud1, longitud1), (latitud2, longitud2) in zip(puntos, puntos[1:])
+    )
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import retencion
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea las particiones mensuales de ubicaciones (PostgreSQL), resume por dispositivo y hora "
+        "las ubicaciones más antiguas que la retención y elimina las ya resumidas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.UBICACIONES_RETENCION_DIAS,
+                            help="Días de ubicaciones crudas a conservar (default: UBICACIONES_RETENCION_DIAS)")
+        parser.add_argument('--meses-adelante', type=int, default=settings.UBICACIONES_PARTICIONES_ADELANTE,
+                            help="Meses futuros con partición creada (default: UBICACIONES_PARTICIONES_ADELANTE)")
+        parser.add_argument('--solo-particiones', action='store_true',
+                            help="Solo crear particiones, sin resumir ni eliminar")
+        parser.add_argument('--tamano-lote', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        creadas = retencion.crear_particiones(options['meses_adelante'])
+        for nombre in creadas:
+            self.stdout.write(f"Partición creada: {nombre}")
+        if options['solo_particiones']:
+            return
+
+        limite = timezone.now() - timedelta(days=options['dias'])
+        recorridos = retencion.resumir_ubicaciones(limite, options['tamano_lote'])
+        self.stdout.write(f"{recorridos} recorridos horarios creados o actualizados")
+
+        particiones, filas = retencion.eliminar_ubicaciones(limite, options['tamano_lote'])
+        for nombre in particiones:
+            self.stdout.write(f"Partición eliminada: {nombre}")
+        self.stdout.write(self.style.SUCCESS(f"{filas} ubicaciones anteriores a {limite:%Y-%m-%d %H:00} eliminadas"))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ubicaciondispositivo',
+            name='fecha_hora',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddConstraint(
+            model_name='ubicaciondispositivo',
+            constraint=models.UniqueConstraint(fields=('dispositivo', 'fecha_hora'), name='ubicacion_dispositivo_fecha_uniq'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_ubicacion_fecha_dispositivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecorridoHorario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField(help_text='Inicio de la hora')),
+                ('puntos', models.PositiveIntegerField(help_text='Fixes originales de la hora')),
+                ('recorrido', models.JSONField(default=list)),
+                ('distancia_metros', models.FloatField(default=0)),
+                ('velocidad_maxima', models.FloatField(blank=True, help_text='Velocidad en m/s', null=True)),
+                ('dispositivo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recorridos', to='accounts.dispositivomovil')),
+            ],
+            options={
+                'verbose_name': 'Recorrido Horario',
+                'verbose_name_plural': 'Recorridos Horarios',
+                'db_table': 'recorridos_horarios',
+                'ordering': ['-hora'],
+                'constraints': [models.UniqueConstraint(fields=('dispositivo', 'hora'), name='recorrido_dispositivo_hora_uniq')],
+            },
+        ),
+    ]
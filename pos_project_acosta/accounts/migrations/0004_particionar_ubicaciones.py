@@ -0,0 +1,85 @@
+"""
+Convertir ubicacion_dispositivos en una tabla particionada por mes (PostgreSQL).
+
+La clave primaria pasa a ser (id, fecha_hora) porque PostgreSQL exige que las
+restricciones únicas incluyan la columna de partición; la restricción
+(dispositivo, fecha_hora) ya la incluye y sirve de índice para las consultas de
+recorrido y de última posición. Se crean particiones desde el mes de la
+ubicación más antigua hasta tres meses adelante, y una partición por defecto
+para fechas fuera de rango; las siguientes las crea manage.py mantener_ubicaciones.
+
+En otras bases de datos (SQLite en desarrollo) no hace nada. No tiene reversa:
+revertirla lanza IrreversibleError en lugar de dejar la tabla particionada
+debajo de migraciones anteriores que no la esperan.
+"""
+from datetime import date
+
+from django.db import migrations
+
+TABLA = 'ubicacion_dispositivos'
+
+
+def _sumar_meses(mes, meses):
+    indice = mes.year * 12 + mes.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def particionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLA} RENAME TO {TABLA}_previa')
+        cursor.execute(
+            f'ALTER TABLE {TABLA}_previa RENAME CONSTRAINT ubicacion_dispositivo_fecha_uniq '
+            f'TO ubicacion_dispositivo_fecha_uniq_previa'
+        )
+        cursor.execute('CREATE SEQUENCE ubicaciones_id_seq')
+        cursor.execute(f"""
+            CREATE TABLE {TABLA} (
+                id bigint NOT NULL DEFAULT nextval('ubicaciones_id_seq'),
+                latitud numeric(9, 6) NOT NULL,
+                longitud numeric(9, 6) NOT NULL,
+                precision double precision NULL,
+                altitud double precision NULL,
+                velocidad double precision NULL,
+                fecha_hora timestamp with time zone NOT NULL,
+                dispositivo_id bigint NOT NULL
+                    REFERENCES dispositivos (id) DEFERRABLE INITIALLY DEFERRED,
+                PRIMARY KEY (id, fecha_hora),
+                CONSTRAINT ubicacion_dispositivo_fecha_uniq UNIQUE (dispositivo_id, fecha_hora)
+            ) PARTITION BY RANGE (fecha_hora)
+        """)
+        cursor.execute(f'ALTER SEQUENCE ubicaciones_id_seq OWNED BY {TABLA}.id')
+        cursor.execute(f'CREATE TABLE {TABLA}_pdefecto PARTITION OF {TABLA} DEFAULT')
+
+        cursor.execute(f'SELECT min(fecha_hora) FROM {TABLA}_previa')
+        minimo = cursor.fetchone()[0]
+        hoy = date.today()
+        mes = date(minimo.year, minimo.month, 1) if minimo else date(hoy.year, hoy.month, 1)
+        ultimo = _sumar_meses(date(hoy.year, hoy.month, 1), 3)
+        while mes <= ultimo:
+            siguiente = _sumar_meses(mes, 1)
+            cursor.execute(
+                f"CREATE TABLE {TABLA}_p{mes:%Y_%m} PARTITION OF {TABLA} "
+                f"FOR VALUES FROM ('{mes.isoformat()} 00:00:00+00') TO ('{siguiente.isoformat()} 00:00:00+00')"
+            )
+            mes = siguiente
+
+        columnas = 'id, latitud, longitud, precision, altitud, velocidad, fecha_hora, dispositivo_id'
+        cursor.execute(f'INSERT INTO {TABLA} ({columnas}) SELECT {columnas} FROM {TABLA}_previa')
+        cursor.execute(
+            f"SELECT setval('ubicaciones_id_seq', COALESCE((SELECT max(id) FROM {TABLA}), 0) + 1, false)"
+        )
+        cursor.execute(f'DROP TABLE {TABLA}_previa')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_recorridohorario'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar),
+    ]
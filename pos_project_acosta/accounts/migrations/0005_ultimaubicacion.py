@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_particionar_ubicaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UltimaUbicacion',
+            fields=[
+                ('dispositivo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ultima_ubicacion', serialize=False, to='accounts.dispositivomovil')),
+                ('latitud', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitud', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('precision', models.FloatField(blank=True, help_text='Precisión en metros', null=True)),
+                ('velocidad', models.FloatField(blank=True, help_text='Velocidad en m/s', null=True)),
+                ('fecha_hora', models.DateTimeField()),
+                ('actualizado_en', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Última Ubicación',
+                'verbose_name_plural': 'Últimas Ubicaciones',
+                'db_table': 'ultimas_ubicaciones',
+            },
+        ),
+        migrations.AddField(
+            model_name='dispositivomovil',
+            name='usuario',
+            field=models.ForeignKey(blank=True, help_text='Vendedor que usa el dispositivo', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dispositivos', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:20
+
+import django.contrib.auth.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_ultimaubicacion'),
+        ('core', '0007_indices_consultas_criticas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsuarioToken',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('accounts.usuario',),
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='empresa',
+            field=models.ForeignKey(blank=True, help_text='Empresa a la que opera el usuario (viaja en el token JWT)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usuarios', to='core.empresa'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='sucursal',
+            field=models.ForeignKey(blank=True, help_text='Sucursal a la que opera el usuario (viaja en el token JWT)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usuarios', to='core.sucursal'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, help_text='Se incrementa para revocar los tokens JWT emitidos (api/autenticacion.py)'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 #from easysales_api.helpers import photo_path_aws_instance
@@ -29,6 +30,26 @@ class Usuario(AbstractUser):
         on_delete=models.RESTRICT,
         related_name='perfiles_usuarios'
     )
+    empresa = models.ForeignKey(
+        'core.Empresa',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='usuarios',
+        help_text="Empresa a la que opera el usuario (viaja en el token JWT)"
+    )
+    sucursal = models.ForeignKey(
+        'core.Sucursal',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='usuarios',
+        help_text="Sucursal a la que opera el usuario (viaja en el token JWT)"
+    )
+    token_version = models.PositiveIntegerField(
+        default=0,
+        help_text="Se incrementa para revocar los tokens JWT emitidos (api/autenticacion.py)"
+    )
     #usuarios Models
 
     #override these two fields to fix the reverse accesso clashes
@@ -64,6 +85,19 @@ class Usuario(AbstractUser):
         return self.full_name
 
 
+class UsuarioToken(Usuario):
+    """
+    Usuario armado con los claims del token JWT, sin consultar la base de datos
+    (api/autenticacion.py). Sirve como request.user y en claves foráneas, pero
+    solo tiene los campos del token: no se guarda.
+    """
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise TypeError("UsuarioToken es de solo lectura; cargue el Usuario desde la base de datos")
+
+
 class DispositivoMovil(models.Model):
     imei = models.CharField(max_length=20, unique=True, verbose_name="IMEI")
     numero_celular = models.CharField(max_length=15, verbose_name="Número de celular")
@@ -73,9 +107,17 @@ class DispositivoMovil(models.Model):
     sistema_operativo = models.CharField(max_length=50, null=True, blank=True)
     version_so = models.CharField(max_length=20, null=True, blank=True)
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    usuario = models.ForeignKey(
+        'Usuario',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='dispositivos',
+        help_text="Vendedor que usa el dispositivo"
+    )
 
     def __str__(self):
-        return f"{self.numero_celular} - {self.operador}"
+        return f"{self.numero_celular} - {self.imei}"
 
     class Meta:
         db_table = "dispositivos"
@@ -90,7 +132,8 @@ class UbicacionDispositivo(models.Model):
     precision = models.FloatField(null=True, blank=True, help_text="Precisión en metros")
     altitud = models.FloatField(null=True, blank=True)
     velocidad = models.FloatField(null=True, blank=True, help_text="Velocidad en m/s")
-    fecha_hora = models.DateTimeField(auto_now_add=True)
+    # Momento del fix en el dispositivo (los lotes llegan con retraso)
+    fecha_hora = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"Ubicación de {self.dispositivo.numero_celular} - {self.fecha_hora.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -100,3 +143,57 @@ class UbicacionDispositivo(models.Model):
         verbose_name = "Ubicación de Dispositivo"
         verbose_name_plural = "Ubicaciones de Dispositivos"
         ordering = ['-fecha_hora']
+        constraints = [
+            # Un fix por dispositivo y momento: los reenvíos de un lote se descartan
+            models.UniqueConstraint(fields=['dispositivo', 'fecha_hora'], name='ubicacion_dispositivo_fecha_uniq'),
+        ]
+
+
+class UltimaUbicacion(models.Model):
+    """
+    Última posición conocida de cada dispositivo. La mantiene la ingesta
+    (accounts/ubicaciones.py) y la usa el índice de proximidad (accounts/proximidad.py).
+    """
+    dispositivo = models.OneToOneField(
+        'DispositivoMovil', on_delete=models.CASCADE, primary_key=True, related_name='ultima_ubicacion'
+    )
+    latitud = models.DecimalField(max_digits=9, decimal_places=6)
+    longitud = models.DecimalField(max_digits=9, decimal_places=6)
+    precision = models.FloatField(null=True, blank=True, help_text="Precisión en metros")
+    velocidad = models.FloatField(null=True, blank=True, help_text="Velocidad en m/s")
+    fecha_hora = models.DateTimeField()
+    actualizado_en = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Última ubicación de {self.dispositivo_id} - {self.fecha_hora.strftime('%Y-%m-%d %H:%M:%S')}"
+
+    class Meta:
+        db_table = "ultimas_ubicaciones"
+        verbose_name = "Última Ubicación"
+        verbose_name_plural = "Últimas Ubicaciones"
+
+
+class RecorridoHorario(models.Model):
+    """
+    Resumen por dispositivo y hora de las ubicaciones que ya salieron de la
+    retención (accounts/retencion.py): un punto por minuto y los totales de la hora.
+    """
+    dispositivo = models.ForeignKey('DispositivoMovil', on_delete=models.CASCADE, related_name='recorridos')
+    hora = models.DateTimeField(help_text="Inicio de la hora")
+    puntos = models.PositiveIntegerField(help_text="Fixes originales de la hora")
+    # [[latitud, longitud, segundos desde el inicio de la hora], ...]
+    recorrido = models.JSONField(default=list)
+    distancia_metros = models.FloatField(default=0)
+    velocidad_maxima = models.FloatField(null=True, blank=True, help_text="Velocidad en m/s")
+
+    def __str__(self):
+        return f"Recorrido de {self.dispositivo_id} - {self.hora.strftime('%Y-%m-%d %H:00')}"
+
+    class Meta:
+        db_table = "recorridos_horarios"
+        verbose_name = "Recorrido Horario"
+        verbose_name_plural = "Recorridos Horarios"
+        ordering = ['-hora']
+        constraints = [
+            models.UniqueConstraint(fields=['dispositivo', 'hora'], name='recorrido_dispositivo_hora_uniq'),
+        ]
@@ -0,0 +1,182 @@
+"""
+Índice en memoria de la última posición de cada dispositivo, para consultas de
+proximidad ("vendedores a menos de N km de este punto") y de área sin PostGIS.
+
+El índice es una grilla de celdas de CELDA_GRADOS de lado: cada celda guarda los
+dispositivos cuya última posición cae en ella. Una consulta por radio recorre
+solo las celdas del rectángulo que contiene el círculo y filtra con haversine,
+así que el costo depende de los dispositivos cercanos y no del total.
+
+El índice de cada proceso se carga desde UltimaUbicacion y se refresca de forma
+incremental (por actualizado_en) como mucho cada
+UBICACIONES_INDICE_REFRESCO_SEGUNDOS. actualizado_en se fija antes de confirmar
+la transacción de la ingesta, así que una fila puede hacerse visible con una
+fecha anterior a la última leída: cada refresco relee desde
+UBICACIONES_INDICE_MARGEN_SEGUNDOS antes (como SYNC_MARGEN_SEGUNDOS en la
+sincronización). No contempla áreas que crucen el antimeridiano (la fuerza de
+ventas opera dentro de un país).
+"""
+import heapq
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+
+from .geo import RADIO_TIERRA_M, distancia_metros
+from .models import UltimaUbicacion
+
+CELDA_GRADOS = 0.05         # ~5.5 km de latitud
+METROS_POR_GRADO = math.pi * RADIO_TIERRA_M / 180
+
+
+def _celda(latitud, longitud):
+    return int(math.floor(latitud / CELDA_GRADOS)), int(math.floor(longitud / CELDA_GRADOS))
+
+
+class IndiceEspacial:
+    """Grilla de posiciones {celda: {dispositivo_id: (latitud, longitud, fecha_hora)}}"""
+
+    def __init__(self):
+        self._celdas = {}
+        self._posiciones = {}       # dispositivo_id -> celda
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._posiciones)
+
+    def actualizar(self, dispositivo_id, latitud, longitud, fecha_hora):
+        latitud, longitud = float(latitud), float(longitud)
+        celda = _celda(latitud, longitud)
+        with self._lock:
+            anterior = self._posiciones.get(dispositivo_id)
+            if anterior is not None and anterior != celda:
+                grupo = self._celdas[anterior]
+                grupo.pop(dispositivo_id, None)
+                if not grupo:
+                    del self._celdas[anterior]
+            self._celdas.setdefault(celda, {})[dispositivo_id] = (latitud, longitud, fecha_hora)
+            self._posiciones[dispositivo_id] = celda
+
+    def _candidatos(self, sur, oeste, norte, este):
+        fila_min, columna_min = _celda(sur, oeste)
+        fila_max, columna_max = _celda(norte, este)
+        with self._lock:
+            if (fila_max - fila_min + 1) * (columna_max - columna_min + 1) > len(self._celdas):
+                # Área grande: menos trabajo recorrer las celdas ocupadas
+                celdas = [
+                    grupo for (fila, columna), grupo in self._celdas.items()
+                    if fila_min <= fila <= fila_max and columna_min <= columna <= columna_max
+                ]
+            else:
+                celdas = [
+                    self._celdas[(fila, columna)]
+                    for fila in range(fila_min, fila_max + 1)
+                    for columna in range(columna_min, columna_max + 1)
+                    if (fila, columna) in self._celdas
+                ]
+            return [(dispositivo_id, *posicion) for grupo in celdas for dispositivo_id, posicion in grupo.items()]
+
+    def en_radio(self, latitud, longitud, radio_m, limite=None, desde=None, dispositivos=None):
+        """
+        Dispositivos a menos de radio_m metros del punto, del más cercano al más lejano.
+
+        Args:
+            limite: cantidad máxima de resultados
+            desde: descartar posiciones anteriores a esta fecha
+            dispositivos: considerar solo estos ids (default: todos)
+
+        Returns:
+            [(distancia_metros, dispositivo_id, latitud, longitud, fecha_hora), ...]
+        """
+        delta_latitud = radio_m / METROS_POR_GRADO
+        coseno = math.cos(math.radians(min(89.9, abs(latitud) + delta_latitud)))
+        delta_longitud = min(180.0, delta_latitud / coseno)
+        candidatos = self._candidatos(
+            max(-90.0, latitud - delta_latitud), max(-180.0, longitud - delta_longitud),
+            min(90.0, latitud + delta_latitud), min(180.0, longitud + delta_longitud),
+        )
+
+        resultado = []
+        for dispositivo_id, latitud_d, longitud_d, fecha_hora in candidatos:
+            if desde is not None and fecha_hora < desde:
+                continue
+            if dispositivos is not None and dispositivo_id not in dispositivos:
+                continue
+            distancia = distancia_metros(latitud, longitud, latitud_d, longitud_d)
+            if distancia <= radio_m:
+                resultado.append((distancia, dispositivo_id, latitud_d, longitud_d, fecha_hora))
+        if limite is not None:
+            return heapq.nsmallest(limite, resultado)
+        return sorted(resultado)
+
+    def en_rectangulo(self, sur, oeste, norte, este, limite=None, desde=None, dispositivos=None):
+        """
+        Dispositivos dentro del rectángulo; con limite, las posiciones más recientes.
+
+        Args:
+            limite: cantidad máxima de resultados
+            desde: descartar posiciones anteriores a esta fecha
+            dispositivos: considerar solo estos ids (default: todos)
+
+        Returns:
+            [(dispositivo_id, latitud, longitud, fecha_hora), ...]
+        """
+        resultado = [
+            (dispositivo_id, latitud, longitud, fecha_hora)
+            for dispositivo_id, latitud, longitud, fecha_hora in self._candidatos(sur, oeste, norte, este)
+            if sur <= latitud <= norte and oeste <= longitud <= este
+            and (desde is None or fecha_hora >= desde)
+            and (dispositivos is None or dispositivo_id in dispositivos)
+        ]
+        if limite is not None and len(resultado) > limite:
+            return heapq.nlargest(limite, resultado, key=lambda encontrado: encontrado[3])
+        return resultado
+
+
+class IndiceUltimasUbicaciones(IndiceEspacial):
+    """Índice alimentado desde la tabla UltimaUbicacion"""
+
+    def __init__(self, refresco, margen=0):
+        super().__init__()
+        self.refresco = refresco
+        self.margen = timedelta(seconds=margen)
+        self._cargado_hasta = None
+        self._ultimo_refresco = 0.0
+        self._refrescando = threading.Lock()
+
+    def refrescar(self, forzar=False):
+        """Leer las posiciones actualizadas desde la última lectura (menos el margen)"""
+        if not forzar and time.monotonic() - self._ultimo_refresco < self.refresco:
+            return
+        with self._refrescando:
+            if not forzar and time.monotonic() - self._ultimo_refresco < self.refresco:
+                return
+            filas = UltimaUbicacion.objects.all()
+            if self._cargado_hasta is not None:
+                filas = filas.filter(actualizado_en__gte=self._cargado_hasta - self.margen)
+            for dispositivo_id, latitud, longitud, fecha_hora, actualizado_en in filas.values_list(
+                'dispositivo_id', 'latitud', 'longitud', 'fecha_hora', 'actualizado_en'
+            ).iterator(chunk_size=5000):
+                self.actualizar(dispositivo_id, latitud, longitud, fecha_hora)
+                if self._cargado_hasta is None or actualizado_en > self._cargado_hasta:
+                    self._cargado_hasta = actualizado_en
+            self._ultimo_refresco = time.monotonic()
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def indice_ubicaciones():
+    """Índice del proceso, refrescado según UBICACIONES_INDICE_REFRESCO_SEGUNDOS"""
+    global _indice
+    if _indice is None:
+        with _indice_lock:
+            if _indice is None:
+                _indice = IndiceUltimasUbicaciones(
+                    settings.UBICACIONES_INDICE_REFRESCO_SEGUNDOS, settings.UBICACIONES_INDICE_MARGEN_SEGUNDOS
+                )
+    _indice.refrescar()
+    return _indice
@@ -0,0 +1,144 @@
+"""
+Simplificación y codificación compacta de recorridos de dispositivos.
+
+- simplificar: Douglas–Peucker sobre los puntos proyectados a metros
+  (equirectangular alrededor del primer punto, suficiente para el recorrido de
+  un día). Se calcula una sola vez la importancia de cada punto (la distancia
+  con la que lo conserva el algoritmo, acotada por la de su segmento padre), y
+  con ella se resuelve tanto una tolerancia en metros como un máximo de puntos.
+  Con NumPy la distancia de los puntos de cada segmento largo se calcula
+  vectorizada; sin NumPy se usa el mismo algoritmo en Python.
+- codificar_polilinea / codificar_enteros: formato "encoded polyline" (deltas
+  enteros en base64 de 5 bits), el que decodifican Google Maps, Leaflet y
+  Mapbox. Los tiempos se envían con la misma codificación, en segundos.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:  # dependencia opcional
+    np = None
+
+from .geo import RADIO_TIERRA_M
+
+# Segmentos más cortos se recorren en Python: el costo fijo de NumPy no compensa
+MINIMO_NUMPY = 64
+
+
+def _proyectar(puntos):
+    """(latitud, longitud) en grados -> coordenadas x, y en metros"""
+    coseno = math.cos(math.radians(puntos[0][0]))
+    x = [math.radians(longitud) * coseno * RADIO_TIERRA_M for _, longitud in puntos]
+    y = [math.radians(latitud) * RADIO_TIERRA_M for latitud, _ in puntos]
+    return x, y
+
+
+def _mas_lejano_python(x, y, i, j):
+    """Punto entre i y j más alejado del segmento i-j: (índice, distancia)"""
+    xi, yi = x[i], y[i]
+    dx, dy = x[j] - xi, y[j] - yi
+    largo2 = dx * dx + dy * dy
+    indice, maxima = i + 1, -1.0
+    for k in range(i + 1, j):
+        px, py = x[k] - xi, y[k] - yi
+        if largo2:
+            t = min(1.0, max(0.0, (px * dx + py * dy) / largo2))
+            px, py = px - t * dx, py - t * dy
+        distancia = px * px + py * py
+        if distancia > maxima:
+            indice, maxima = k, distancia
+    return indice, math.sqrt(maxima)
+
+
+def _mas_lejano_numpy(x, y, i, j):
+    px, py = x[i + 1:j] - x[i], y[i + 1:j] - y[i]
+    dx, dy = x[j] - x[i], y[j] - y[i]
+    largo2 = dx * dx + dy * dy
+    if largo2:
+        t = np.clip((px * dx + py * dy) / largo2, 0.0, 1.0)
+        px, py = px - t * dx, py - t * dy
+    distancias = px * px + py * py
+    k = int(np.argmax(distancias))
+    return i + 1 + k, math.sqrt(float(distancias[k]))
+
+
+def importancias(puntos, minima=0.0):
+    """
+    Importancia de cada punto para Douglas–Peucker: el punto se conserva con
+    una tolerancia t si su importancia es mayor que t. Los extremos valen inf;
+    los segmentos cuyo punto más lejano no supera minima no se siguen dividiendo.
+    """
+    n = len(puntos)
+    resultado = [0.0] * n
+    if n == 0:
+        return resultado
+    resultado[0] = resultado[-1] = math.inf
+
+    x, y = _proyectar(puntos)
+    if np is not None:
+        x_np, y_np = np.asarray(x), np.asarray(y)
+
+    pila = [(0, n - 1, math.inf)]
+    while pila:
+        i, j, tope = pila.pop()
+        if j - i < 2:
+            continue
+        if np is not None and j - i > MINIMO_NUMPY:
+            k, distancia = _mas_lejano_numpy(x_np, y_np, i, j)
+        else:
+            k, distancia = _mas_lejano_python(x, y, i, j)
+        if distancia <= minima:
+            continue
+        resultado[k] = distancia = min(distancia, tope)
+        pila.append((i, k, distancia))
+        pila.append((k, j, distancia))
+    return resultado
+
+
+def simplificar(puntos, tolerancia=None, maximo=None):
+    """
+    Índices de los puntos que se conservan.
+
+    Args:
+        puntos: [(latitud, longitud), ...] en orden
+        tolerancia: distancia máxima en metros entre el recorrido original y el simplificado
+        maximo: cantidad máxima de puntos (se elige la menor tolerancia que la cumple)
+    """
+    if len(puntos) <= 2 or (tolerancia is None and maximo is None):
+        return list(range(len(puntos)))
+
+    tolerancia = tolerancia or 0.0
+    pesos = importancias(puntos, minima=tolerancia)
+    conservados = [indice for indice, peso in enumerate(pesos) if peso > tolerancia]
+    if maximo is not None and len(conservados) > maximo:
+        conservados = sorted(sorted(conservados, key=pesos.__getitem__, reverse=True)[:max(2, maximo)])
+    return conservados
+
+
+def _codificar_valor(valor, partes):
+    valor = ~(valor << 1) if valor < 0 else valor << 1
+    while valor >= 0x20:
+        partes.append(chr((0x20 | (valor & 0x1f)) + 63))
+        valor >>= 5
+    partes.append(chr(valor + 63))
+
+
+def codificar_enteros(valores):
+    """Enteros como deltas sucesivos en el formato de encoded polyline"""
+    partes, anterior = [], 0
+    for valor in valores:
+        _codificar_valor(valor - anterior, partes)
+        anterior = valor
+    return ''.join(partes)
+
+
+def codificar_polilinea(puntos, precision=5):
+    """[(latitud, longitud), ...] en formato encoded polyline (5 decimales: ~1 m)"""
+    factor = 10 ** precision
+    partes, latitud_previa, longitud_previa = [], 0, 0
+    for latitud, longitud in puntos:
+        latitud, longitud = round(latitud * factor), round(longitud * factor)
+        _codificar_valor(latitud - latitud_previa, partes)
+        _codificar_valor(longitud - longitud_previa, partes)
+        latitud_previa, longitud_previa = latitud, longitud
+    return ''.join(partes)
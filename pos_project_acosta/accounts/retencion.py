@@ -0,0 +1,201 @@
+"""
+Particiones y retención de ubicaciones (manage.py mantener_ubicaciones).
+
+- crear_particiones: en PostgreSQL crea las particiones mensuales de
+  ubicacion_dispositivos para los próximos meses (ver la migración
+  0004_particionar_ubicaciones). Si la partición por defecto ya recibió filas de
+  ese mes, se mueven a la partición nueva antes de adjuntarla.
+- resumir_ubicaciones: las ubicaciones anteriores al límite de retención se
+  resumen en RecorridoHorario (un punto por minuto, distancia y velocidad máxima
+  por dispositivo y hora). Un fix que llega tarde para una hora ya resumida se
+  combina con el resumen existente.
+- eliminar_ubicaciones: borra las ubicaciones ya resumidas; en PostgreSQL las
+  particiones que quedan enteras antes del límite se eliminan con DROP TABLE, sin
+  recorrer filas.
+
+En SQLite (desarrollo) no hay particiones y el resto funciona igual.
+"""
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .geo import longitud_recorrido
+from .models import RecorridoHorario, UbicacionDispositivo
+
+TABLA = UbicacionDispositivo._meta.db_table
+_PARTICION_MENSUAL = re.compile(rf'^{TABLA}_p(\d{{4}})_(\d{{2}})$')
+
+
+def _sumar_meses(mes, meses):
+    indice = mes.year * 12 + mes.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _limite_utc(mes):
+    return datetime(mes.year, mes.month, 1, tzinfo=dt_timezone.utc)
+
+
+def esta_particionada():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLA])
+        return cursor.fetchone() is not None
+
+
+def particiones():
+    """Particiones mensuales existentes: {mes (date): nombre de la tabla}"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT hija.relname FROM pg_inherits "
+            "JOIN pg_class hija ON hija.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass", [TABLA]
+        )
+        nombres = [fila[0] for fila in cursor.fetchall()]
+    resultado = {}
+    for nombre in nombres:
+        coincidencia = _PARTICION_MENSUAL.match(nombre)
+        if coincidencia:
+            resultado[date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1)] = nombre
+    return resultado
+
+
+def crear_particiones(meses_adelante=3, hoy=None):
+    """Crear las particiones desde el mes actual hasta meses_adelante; devuelve las creadas"""
+    if not esta_particionada():
+        return []
+
+    hoy = hoy or date.today()
+    existentes = particiones()
+    creadas = []
+    mes = date(hoy.year, hoy.month, 1)
+    for _ in range(meses_adelante + 1):
+        siguiente = _sumar_meses(mes, 1)
+        if mes not in existentes:
+            nombre = f'{TABLA}_p{mes:%Y_%m}'
+            desde, hasta = _limite_utc(mes), _limite_utc(siguiente)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS)')
+                cursor.execute(
+                    f'WITH movidas AS (DELETE FROM {TABLA}_pdefecto '
+                    f'WHERE fecha_hora >= %s AND fecha_hora < %s RETURNING *) '
+                    f'INSERT INTO {nombre} SELECT * FROM movidas', [desde, hasta]
+                )
+                cursor.execute(
+                    f'ALTER TABLE {TABLA} ATTACH PARTITION {nombre} FOR VALUES FROM (%s) TO (%s)',
+                    [desde, hasta]
+                )
+            creadas.append(nombre)
+        mes = siguiente
+    return creadas
+
+
+def _resumen(puntos_hora):
+    """Recorrido de un punto por minuto, distancia y velocidad máxima de una hora"""
+    recorrido, minuto_anterior = [], None
+    for latitud, longitud, segundos, _ in puntos_hora:
+        minuto = int(segundos // 60)
+        if minuto != minuto_anterior:
+            recorrido.append([latitud, longitud, segundos])
+            minuto_anterior = minuto
+    velocidades = [velocidad for *_, velocidad in puntos_hora if velocidad is not None]
+    distancia = longitud_recorrido([(latitud, longitud) for latitud, longitud, _, _ in puntos_hora])
+    return recorrido, distancia, max(velocidades) if velocidades else None
+
+
+def _guardar_resumenes(grupos):
+    """grupos: {(dispositivo_id, hora): [(latitud, longitud, segundos, velocidad), ...]}"""
+    existentes = {}
+    dispositivos = {dispositivo_id for dispositivo_id, _ in grupos}
+    horas = {hora for _, hora in grupos}
+    for resumen in RecorridoHorario.objects.filter(dispositivo_id__in=dispositivos, hora__in=horas):
+        if (resumen.dispositivo_id, resumen.hora) in grupos:
+            existentes[(resumen.dispositivo_id, resumen.hora)] = resumen
+
+    nuevos, actualizados = [], []
+    for (dispositivo_id, hora), puntos_hora in grupos.items():
+        previo = existentes.get((dispositivo_id, hora))
+        puntos = len(puntos_hora)
+        if previo is not None:
+            # Fixes tardíos: se combinan con el recorrido ya resumido
+            puntos_hora = sorted(
+                puntos_hora + [(latitud, longitud, segundos, None) for latitud, longitud, segundos in previo.recorrido],
+                key=lambda punto: punto[2]
+            )
+        recorrido, distancia, velocidad_maxima = _resumen(puntos_hora)
+        if previo is None:
+            nuevos.append(RecorridoHorario(
+                dispositivo_id=dispositivo_id, hora=hora, puntos=puntos, recorrido=recorrido,
+                distancia_metros=distancia, velocidad_maxima=velocidad_maxima,
+            ))
+        else:
+            previo.puntos += puntos
+            previo.recorrido = recorrido
+            previo.distancia_metros = distancia
+            if velocidad_maxima is not None:
+                previo.velocidad_maxima = max(previo.velocidad_maxima or 0, velocidad_maxima)
+            actualizados.append(previo)
+
+    RecorridoHorario.objects.bulk_create(nuevos, batch_size=1000)
+    RecorridoHorario.objects.bulk_update(
+        actualizados, ['puntos', 'recorrido', 'distancia_metros', 'velocidad_maxima'], batch_size=1000
+    )
+    return len(nuevos) + len(actualizados)
+
+
+def resumir_ubicaciones(limite, tamano_lote=10000):
+    """
+    Resumir en RecorridoHorario las ubicaciones anteriores a limite (se redondea a
+    la hora). Devuelve la cantidad de recorridos creados o actualizados.
+    """
+    limite = limite.replace(minute=0, second=0, microsecond=0)
+    filas = (
+        UbicacionDispositivo.objects.filter(fecha_hora__lt=limite)
+        .order_by('dispositivo_id', 'fecha_hora')
+        .values_list('dispositivo_id', 'fecha_hora', 'latitud', 'longitud', 'velocidad')
+        .iterator(chunk_size=tamano_lote)
+    )
+
+    total, grupos = 0, {}
+    for dispositivo_id, fecha_hora, latitud, longitud, velocidad in filas:
+        hora = fecha_hora.replace(minute=0, second=0, microsecond=0)
+        segundos = (fecha_hora - hora).total_seconds()
+        grupos.setdefault((dispositivo_id, hora), []).append((float(latitud), float(longitud), segundos, velocidad))
+        if len(grupos) >= tamano_lote:
+            # Filas ordenadas: solo el último grupo puede seguir recibiendo puntos
+            ultimo = (dispositivo_id, hora)
+            pendiente = grupos.pop(ultimo)
+            total += _guardar_resumenes(grupos)
+            grupos = {ultimo: pendiente}
+    if grupos:
+        total += _guardar_resumenes(grupos)
+    return total
+
+
+def eliminar_ubicaciones(limite, tamano_lote=10000):
+    """
+    Eliminar las ubicaciones anteriores a limite (ya resumidas).
+
+    Returns:
+        (particiones eliminadas, filas eliminadas fila a fila)
+    """
+    limite = limite.replace(minute=0, second=0, microsecond=0)
+    eliminadas = []
+    if esta_particionada():
+        for mes, nombre in sorted(particiones().items()):
+            if _limite_utc(_sumar_meses(mes, 1)) <= limite:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {nombre}')
+                eliminadas.append(nombre)
+
+    filas = 0
+    while True:
+        ids = list(
+            UbicacionDispositivo.objects.filter(fecha_hora__lt=limite)
+            .values_list('pk', flat=True)[:tamano_lote]
+        )
+        if not ids:
+            break
+        filas += UbicacionDispositivo.objects.filter(pk__in=ids, fecha_hora__lt=limite).delete()[0]
+    return eliminadas, filas
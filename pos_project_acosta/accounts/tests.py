@@ -1,3 +1,222 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.red import ip_cliente
+
+from .backends import espera_login
+from .proximidad import IndiceEspacial, IndiceUltimasUbicaciones
+from .models import DispositivoMovil, Perfil, UbicacionDispositivo, UltimaUbicacion, Usuario
+from .ubicaciones import BufferUbicaciones, dispositivo_por_imei, normalizar_fix
+
+
+def crear_dispositivo(imei, usuario=None):
+    return DispositivoMovil.objects.create(imei=imei, numero_celular='999888777', usuario=usuario)
+
+
+class DispositivoPorImeiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        perfil, _ = Perfil.objects.get_or_create(perfil_id=1, defaults={'perfil_nombre': 'Administrador'})
+        cls.usuario = Usuario.objects.create_user(
+            username='vendedor', email='vendedor@prueba.com', password='clave-segura-123',
+            full_name='Vendedor', perfil=perfil,
+        )
+
+    def test_devuelve_id_y_usuario(self):
+        dispositivo = crear_dispositivo('111', self.usuario)
+        self.assertEqual(dispositivo_por_imei('111'), (dispositivo.pk, self.usuario.pk))
+        self.assertIsNone(dispositivo_por_imei('no-registrado'))
+
+    def test_cambiar_el_imei_invalida_la_cache(self):
+        dispositivo = crear_dispositivo('222')
+        self.assertEqual(dispositivo_por_imei('222'), (dispositivo.pk, None))
+        dispositivo.imei = '333'
+        dispositivo.save()
+        self.assertIsNone(dispositivo_por_imei('222'))
+        self.assertEqual(dispositivo_por_imei('333'), (dispositivo.pk, None))
+
+    def test_reasignar_invalida_la_cache(self):
+        dispositivo = crear_dispositivo('444')
+        dispositivo_por_imei('444')
+        dispositivo.usuario = self.usuario
+        dispositivo.save()
+        self.assertEqual(dispositivo_por_imei('444'), (dispositivo.pk, self.usuario.pk))
+
+    def test_borrar_invalida_la_cache(self):
+        dispositivo = crear_dispositivo('555')
+        dispositivo_por_imei('555')
+        dispositivo.delete()
+        self.assertIsNone(dispositivo_por_imei('555'))
+
+
+class BufferUbicacionesTests(TestCase):
+
+    def setUp(self):
+        self.buffer = BufferUbicaciones(maximo=100, lote=10, intervalo=60)
+        # Sin hilo de escritura: la prueba vacía el buffer a mano
+        self.buffer.iniciar = lambda: None
+
+    def fixes(self, cantidad):
+        inicio = timezone.now() - timedelta(hours=1)
+        return [
+            normalizar_fix({'latitud': -6.77, 'longitud': -79.84, 'fecha_hora': (inicio + timedelta(seconds=i)).isoformat()})
+            for i in range(cantidad)
+        ]
+
+    def test_filas_de_dispositivos_eliminados_no_frenan_el_lote(self):
+        vigente, eliminado = crear_dispositivo('666'), crear_dispositivo('777')
+        self.buffer.agregar(vigente.pk, self.fixes(3))
+        self.buffer.agregar(eliminado.pk, self.fixes(2))
+        eliminado.delete()
+
+        with self.assertLogs('accounts.ubicaciones', 'WARNING'):
+            self.assertEqual(self.buffer.vaciar(), 3)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(UbicacionDispositivo.objects.filter(dispositivo=vigente).count(), 3)
+        self.assertEqual(self.buffer.estadisticas['descartados'], 2)
+        self.assertEqual(self.buffer.estadisticas['perdidos'], 0)
+
+
+class IndiceEspacialTests(SimpleTestCase):
+
+    def setUp(self):
+        self.indice = IndiceEspacial()
+        self.ahora = timezone.now()
+        for dispositivo_id in range(1, 6):
+            self.indice.actualizar(dispositivo_id, -6.77, -79.84, self.ahora - timedelta(minutes=dispositivo_id))
+
+    def test_rectangulo_con_limite_devuelve_las_mas_recientes(self):
+        encontrados = self.indice.en_rectangulo(-6.8, -79.9, -6.7, -79.8, limite=2)
+        self.assertEqual([encontrado[0] for encontrado in encontrados], [1, 2])
+
+    def test_filtra_por_dispositivos(self):
+        self.assertEqual(
+            {encontrado[0] for encontrado in self.indice.en_rectangulo(-6.8, -79.9, -6.7, -79.8, dispositivos={2, 4})},
+            {2, 4}
+        )
+        self.assertEqual(
+            [encontrado[1] for encontrado in self.indice.en_radio(-6.77, -79.84, 1000, dispositivos={3})],
+            [3]
+        )
+
+
+class IndiceUltimasUbicacionesTests(TestCase):
+
+    def setUp(self):
+        self.ahora = timezone.now()
+        self.primero, self.tardio = crear_dispositivo('888'), crear_dispositivo('999')
+
+    def ubicar(self, dispositivo, actualizado_en):
+        UltimaUbicacion.objects.create(
+            dispositivo=dispositivo, latitud=-6.77, longitud=-79.84, fecha_hora=actualizado_en,
+            actualizado_en=actualizado_en
+        )
+
+    def ids(self, indice):
+        return {encontrado[0] for encontrado in indice.en_rectangulo(-6.8, -79.9, -6.7, -79.8)}
+
+    def test_relee_filas_que_confirmaron_tarde(self):
+        indice = IndiceUltimasUbicaciones(refresco=60, margen=30)
+        self.ubicar(self.primero, self.ahora)
+        indice.refrescar(forzar=True)
+        self.assertEqual(self.ids(indice), {self.primero.pk})
+
+        # Fechada antes de la última leída, pero confirmada después de esa lectura
+        self.ubicar(self.tardio, self.ahora - timedelta(seconds=10))
+        indice.refrescar(forzar=True)
+        self.assertEqual(self.ids(indice), {self.primero.pk, self.tardio.pk})
+
+    def test_sin_margen_se_pierde(self):
+        indice = IndiceUltimasUbicaciones(refresco=60)
+        self.ubicar(self.primero, self.ahora)
+        indice.refrescar(forzar=True)
+        self.ubicar(self.tardio, self.ahora - timedelta(seconds=10))
+        indice.refrescar(forzar=True)
+        self.assertEqual(self.ids(indice), {self.primero.pk})
+
+
+@override_settings(PROXIES_CONFIABLES=['10.0.0.0/8'])
+class IpClienteTests(SimpleTestCase):
+
+    def ip(self, remote_addr, forwarded=None):
+        extra = {'HTTP_X_FORWARDED_FOR': forwarded} if forwarded else {}
+        return ip_cliente(RequestFactory().get('/', REMOTE_ADDR=remote_addr, **extra))
+
+    def test_detras_de_un_proxy_confiable(self):
+        self.assertEqual(self.ip('10.0.0.2', '203.0.113.7, 10.0.0.1'), '203.0.113.7')
+
+    def test_el_cliente_no_puede_falsificar_su_ip(self):
+        self.assertEqual(self.ip('10.0.0.2', '1.2.3.4, 203.0.113.7'), '203.0.113.7')
+
+    def test_sin_proxy_confiable_se_ignora_el_encabezado(self):
+        self.assertEqual(self.ip('198.51.100.1', '203.0.113.7'), '198.51.100.1')
+
+
+@override_settings(
+    PROXIES_CONFIABLES=['10.0.0.1'], LOGIN_INTENTOS_MAXIMOS=3, LOGIN_INTENTOS_POR_IP=50,
+    LOGIN_INTENTOS_POR_LOGIN=5, LOGIN_DEMORA_SEGUNDOS=1,
+)
+class BloqueoLoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        perfil, _ = Perfil.objects.get_or_create(perfil_id=1, defaults={'perfil_nombre': 'Administrador'})
+        Usuario.objects.create_user(
+            username='cajero', email='cajero@prueba.com', password='clave-segura-123',
+            full_name='Cajero', perfil=perfil,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def entrar(self, ip, clave):
+        # Todas las peticiones llegan por el mismo proxy
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=ip)
+        return authenticate(request, username='cajero', password=clave)
+
+    def fallar(self, ip, veces):
+        for _ in range(veces):
+            self.assertIsNone(self.entrar(ip, 'incorrecta'))
+
+    def test_bloquea_el_login_solo_desde_la_ip_atacante(self):
+        self.fallar('203.0.113.7', 3)
+        self.assertIsNone(self.entrar('203.0.113.7', 'clave-segura-123'))
+        self.assertIsNotNone(self.entrar('198.51.100.1', 'clave-segura-123'))
+
+    def test_por_login_admite_un_intento_por_turno(self):
+        for numero in range(5):
+            self.fallar(f'203.0.113.{numero}', 1)
+        self.fallar('203.0.113.9', 1)
+
+        # El turno ya se usó: se rechaza al momento, sin calcular el hash
+        with mock.patch.object(Usuario, 'check_password') as verificar:
+            self.assertIsNone(self.entrar('198.51.100.1', 'clave-segura-123'))
+        verificar.assert_not_called()
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='198.51.100.1')
+        self.assertEqual(espera_login(request, 'cajero'), 1)
+
+        cache.delete('login_turno:cajero')  # venció LOGIN_DEMORA_SEGUNDOS
+        self.assertIsNotNone(self.entrar('198.51.100.1', 'clave-segura-123'))
+        self.assertEqual(espera_login(request, 'cajero'), 0)
+
+    def test_token_responde_429_con_retry_after(self):
+        self.fallar('203.0.113.7', 3)
+        respuesta = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'cajero', 'password': 'clave-segura-123'},
+            REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.7'
+        )
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertEqual(respuesta['Retry-After'], '300')
+
+        respuesta = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'cajero', 'password': 'incorrecta'},
+            REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='198.51.100.1'
+        )
+        self.assertEqual(respuesta.status_code, 401)
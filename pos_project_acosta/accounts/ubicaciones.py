@@ -0,0 +1,357 @@
+"""
+Ingesta por lotes de ubicaciones GPS de los dispositivos móviles.
+
+Los dispositivos envían arreglos de fixes (POST /api/ubicaciones/lote/). La vista
+los valida y los deja en un buffer en memoria del proceso; un hilo en segundo
+plano los escribe cada UBICACIONES_INTERVALO_SEGUNDOS, o antes si se juntan
+UBICACIONES_LOTE filas, con COPY en PostgreSQL (a una tabla temporal y de ahí
+INSERT ... ON CONFLICT DO NOTHING) o bulk_create en otras bases.
+
+- Contrapresión: si el buffer llega a UBICACIONES_BUFFER_MAXIMO filas el lote se
+  rechaza entero (BufferLleno; la vista responde 503 con Retry-After) y el
+  dispositivo lo reenvía más tarde.
+- Duplicados: los fixes repetidos de un dispositivo (mismo fecha_hora) se
+  descartan en el buffer y, entre escrituras o procesos, por la restricción
+  única (dispositivo, fecha_hora).
+- Dispositivos eliminados: antes de escribir se descartan las filas de
+  dispositivos que ya no existen, así su FK no hace fallar el lote entero.
+- Cada escritura actualiza también UltimaUbicacion (la posición más reciente
+  de cada dispositivo), que consulta el índice de proximidad.
+
+Cada proceso del servidor tiene su propio buffer; lo pendiente se escribe al
+salir (atexit). Un proceso que muere sin salir pierde a lo sumo un intervalo de
+fixes, que el dispositivo no reenvía: es el costo aceptado frente a un INSERT
+por fix.
+"""
+import atexit
+import io
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import DispositivoMovil, UbicacionDispositivo, UltimaUbicacion
+
+logger = logging.getLogger(__name__)
+
+SEIS_DECIMALES = Decimal('0.000001')
+COLUMNAS = ('dispositivo_id', 'latitud', 'longitud', 'precision', 'altitud', 'velocidad', 'fecha_hora')
+
+
+class BufferLleno(Exception):
+    """El buffer no tiene lugar para el lote; el cliente debe reintentar"""
+    pass
+
+
+def _decimal(valor, minimo, maximo, campo):
+    try:
+        numero = Decimal(str(valor)).quantize(SEIS_DECIMALES)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'{campo} inválida')
+    if not minimo <= numero <= maximo:
+        raise ValueError(f'{campo} fuera de rango')
+    return numero
+
+
+def _flotante(valor, campo):
+    if valor is None:
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f'{campo} inválida')
+
+
+def normalizar_fix(dato, ahora=None):
+    """
+    Validar un fix recibido.
+
+    Args:
+        dato: dict con latitud, longitud, fecha_hora (ISO 8601) y opcionalmente
+            precision, altitud y velocidad
+        ahora: referencia para rechazar fechas futuras (default: ahora)
+
+    Returns:
+        (latitud, longitud, precision, altitud, velocidad, fecha_hora)
+
+    Raises:
+        ValueError: con el motivo
+    """
+    if not isinstance(dato, dict):
+        raise ValueError('Cada ubicación debe ser un objeto')
+    try:
+        fecha_hora = datetime.fromisoformat(str(dato['fecha_hora']))
+    except KeyError:
+        raise ValueError('fecha_hora es requerida')
+    except ValueError:
+        raise ValueError('fecha_hora inválida')
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora, dt_timezone.utc)
+    if fecha_hora > (ahora or timezone.now()) + timedelta(minutes=5):
+        raise ValueError('fecha_hora en el futuro')
+
+    return (
+        _decimal(dato.get('latitud'), -90, 90, 'latitud'),
+        _decimal(dato.get('longitud'), -180, 180, 'longitud'),
+        _flotante(dato.get('precision'), 'precision'),
+        _flotante(dato.get('altitud'), 'altitud'),
+        _flotante(dato.get('velocidad'), 'velocidad'),
+        fecha_hora,
+    )
+
+
+_dispositivos = {}   # imei -> (id, usuario_id, vencimiento)
+
+
+def dispositivo_por_imei(imei):
+    """
+    (id, usuario_id) del dispositivo; None si no está registrado. Se cachea en el
+    proceso hasta UBICACIONES_CACHE_DISPOSITIVOS_SEGUNDOS: olvidar_dispositivo
+    invalida la entrada en este proceso y el vencimiento acota lo que tarda en
+    notarse un cambio hecho en otro.
+    """
+    ahora = time.monotonic()
+    entrada = _dispositivos.get(imei)
+    if entrada is None or entrada[2] <= ahora:
+        fila = DispositivoMovil.objects.filter(imei=imei).values_list('id', 'usuario_id').first()
+        if fila is None:
+            _dispositivos.pop(imei, None)
+            return None
+        entrada = (*fila, ahora + settings.UBICACIONES_CACHE_DISPOSITIVOS_SEGUNDOS)
+        _dispositivos[imei] = entrada
+    return entrada[:2]
+
+
+def olvidar_dispositivos(ids=(), imeis=()):
+    """Sacar de la caché los dispositivos indicados por id o por IMEI"""
+    ids, imeis = set(ids), set(imeis)
+    for imei, entrada in list(_dispositivos.items()):
+        if imei in imeis or entrada[0] in ids:
+            _dispositivos.pop(imei, None)
+
+
+def olvidar_dispositivo(sender, instance, **kwargs):
+    """Receptor de post_save/post_delete de DispositivoMovil (registrado en AccountsConfig.ready)"""
+    # Por id también: si cambió el IMEI, la entrada está bajo el anterior
+    olvidar_dispositivos(ids=[instance.pk], imeis=[instance.imei])
+
+
+# ---------------------------------------------------
+# Escritura
+# ---------------------------------------------------
+def _texto_copy(valor):
+    if valor is None:
+        return r'\N'
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _copiar_postgres(filas):
+    """COPY a una tabla temporal e INSERT ... ON CONFLICT DO NOTHING en la tabla real"""
+    texto = ''.join('\t'.join(_texto_copy(valor) for valor in fila) + '\n' for fila in filas)
+    columnas = ', '.join(COLUMNAS)
+    copy = f'COPY carga_ubicaciones ({columnas}) FROM STDIN'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS carga_ubicaciones ('
+            'dispositivo_id bigint, latitud numeric(9, 6), longitud numeric(9, 6), '
+            'precision double precision, altitud double precision, velocidad double precision, '
+            'fecha_hora timestamp with time zone) ON COMMIT DELETE ROWS'
+        )
+        if hasattr(cursor, 'copy_expert'):  # psycopg2
+            cursor.copy_expert(copy, io.StringIO(texto))
+        else:  # psycopg 3
+            with cursor.copy(copy) as copia:
+                copia.write(texto)
+        cursor.execute(
+            f'INSERT INTO {UbicacionDispositivo._meta.db_table} ({columnas}) '
+            f'SELECT {columnas} FROM carga_ubicaciones ON CONFLICT DO NOTHING'
+        )
+
+
+def escribir_ubicaciones(filas, tamano_lote=5000):
+    """Escribir filas (tuplas en el orden de COLUMNAS) ignorando duplicados"""
+    if connection.vendor == 'postgresql':
+        for inicio in range(0, len(filas), tamano_lote):
+            _copiar_postgres(filas[inicio:inicio + tamano_lote])
+        return
+    UbicacionDispositivo.objects.bulk_create(
+        [UbicacionDispositivo(**dict(zip(COLUMNAS, fila))) for fila in filas],
+        batch_size=tamano_lote, ignore_conflicts=True
+    )
+
+
+def actualizar_ultimas(filas):
+    """
+    Actualizar UltimaUbicacion con el fix más reciente de cada dispositivo de las
+    filas. El upsert solo reemplaza posiciones más antiguas (un lote atrasado no
+    pisa una posición nueva); la sintaxis sirve para PostgreSQL y SQLite.
+    """
+    ultimas = {}
+    for fila in filas:
+        previa = ultimas.get(fila[0])
+        if previa is None or fila[-1] > previa[-1]:
+            ultimas[fila[0]] = fila
+    if not ultimas:
+        return
+
+    tabla = UltimaUbicacion._meta.db_table
+    ahora = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {tabla} (dispositivo_id, latitud, longitud, precision, velocidad, fecha_hora, actualizado_en) '
+            f'VALUES (%s, %s, %s, %s, %s, %s, %s) '
+            f'ON CONFLICT (dispositivo_id) DO UPDATE SET latitud = EXCLUDED.latitud, '
+            f'longitud = EXCLUDED.longitud, precision = EXCLUDED.precision, velocidad = EXCLUDED.velocidad, '
+            f'fecha_hora = EXCLUDED.fecha_hora, actualizado_en = EXCLUDED.actualizado_en '
+            f'WHERE {tabla}.fecha_hora < EXCLUDED.fecha_hora',
+            [
+                (dispositivo_id, latitud, longitud, precision, velocidad, fecha_hora, ahora)
+                for dispositivo_id, latitud, longitud, precision, _, velocidad, fecha_hora in ultimas.values()
+            ]
+        )
+
+
+# ---------------------------------------------------
+# Buffer
+# ---------------------------------------------------
+class BufferUbicaciones:
+    """Buffer del proceso con su hilo de escritura"""
+
+    def __init__(self, maximo, lote, intervalo):
+        self.maximo = maximo
+        self.lote = lote
+        self.intervalo = intervalo
+        self.estadisticas = Counter()
+        self._filas = []
+        self._pendientes = {}         # dispositivo_id -> fechas en el buffer
+        self._lock = threading.Lock()
+        self._escritura = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self._filas)
+
+    def agregar(self, dispositivo_id, fixes):
+        """
+        Agregar los fixes normalizados (normalizar_fix) de un dispositivo.
+
+        Returns:
+            (aceptados, duplicados)
+
+        Raises:
+            BufferLleno: no se aceptó ninguno
+        """
+        with self._lock:
+            if len(self._filas) + len(fixes) > self.maximo:
+                self.estadisticas['rechazados'] += len(fixes)
+                raise BufferLleno()
+
+            fechas = self._pendientes.setdefault(dispositivo_id, set())
+            aceptados = 0
+            for latitud, longitud, precision, altitud, velocidad, fecha_hora in fixes:
+                if fecha_hora in fechas:
+                    continue
+                fechas.add(fecha_hora)
+                self._filas.append((dispositivo_id, latitud, longitud, precision, altitud, velocidad, fecha_hora))
+                aceptados += 1
+            total = len(self._filas)
+
+        self.estadisticas['aceptados'] += aceptados
+        self.estadisticas['duplicados'] += len(fixes) - aceptados
+        self.iniciar()
+        if total >= self.lote:
+            self._despertar.set()
+        return aceptados, len(fixes) - aceptados
+
+    def vaciar(self):
+        """Escribir lo pendiente; devuelve la cantidad de filas escritas"""
+        with self._escritura:
+            with self._lock:
+                filas, self._filas = self._filas, []
+                self._pendientes = {}
+            if not filas:
+                return 0
+            try:
+                filas = self.descartar_huerfanas(filas)
+                escribir_ubicaciones(filas, self.lote)
+                actualizar_ultimas(filas)
+            except Exception:
+                logger.exception('No se pudieron escribir %s ubicaciones', len(filas))
+                self.reencolar(filas)
+                return 0
+            self.estadisticas['escritos'] += len(filas)
+            self.estadisticas['escrituras'] += 1
+            return len(filas)
+
+    def descartar_huerfanas(self, filas):
+        """
+        Quitar las filas de dispositivos que ya no existen (borrados después de
+        entrar al buffer): su FK haría fallar la escritura de todo el lote, que se
+        reencolaría una y otra vez.
+        """
+        ids = {fila[0] for fila in filas}
+        existentes = set(DispositivoMovil.objects.filter(id__in=ids).values_list('id', flat=True))
+        if len(existentes) == len(ids):
+            return filas
+        olvidar_dispositivos(ids=ids - existentes)
+        validas = [fila for fila in filas if fila[0] in existentes]
+        self.estadisticas['descartados'] += len(filas) - len(validas)
+        logger.warning('Se descartaron %s ubicaciones de dispositivos eliminados', len(filas) - len(validas))
+        return validas
+
+    def reencolar(self, filas):
+        """Devolver al buffer las filas de una escritura fallida (hasta el máximo)"""
+        with self._lock:
+            lugar = max(0, self.maximo - len(self._filas))
+            self._filas[:0] = filas[:lugar]
+            for fila in filas[:lugar]:
+                self._pendientes.setdefault(fila[0], set()).add(fila[-1])
+        self.estadisticas['perdidos'] += len(filas) - lugar
+
+    def iniciar(self):
+        """Arrancar el hilo de escritura (también en un proceso hijo después de fork)"""
+        if self._hilo is not None and self._hilo.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._ejecutar, name='ubicaciones-buffer', daemon=True)
+            self._hilo.start()
+
+    def _ejecutar(self):
+        while True:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            close_old_connections()
+            self.vaciar()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def buffer_ubicaciones():
+    """Buffer del proceso, creado con la configuración de settings"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = BufferUbicaciones(
+                    maximo=settings.UBICACIONES_BUFFER_MAXIMO,
+                    lote=settings.UBICACIONES_LOTE,
+                    intervalo=settings.UBICACIONES_INTERVALO_SEGUNDOS,
+                )
+                atexit.register(_buffer.vaciar)
+    return _buffer
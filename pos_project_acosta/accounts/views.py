@@ -3,6 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.forms import AuthenticationForm
+from .backends import espera_login, login_bloqueado
 from .models import Usuario, Perfil
 
 
@@ -74,18 +75,9 @@ def login_view(request):
         password = request.POST.get('password')
         
         if login_field and password:
-            # Intentar autenticar con username o email
+            # El backend acepta username o email (accounts/backends.py)
             user = authenticate(request, username=login_field, password=password)
-            
-            # Si no funciona con username, intentar con email
-            if user is None:
-                try:
-                    from .models import Usuario
-                    user_obj = Usuario.objects.get(email=login_field)
-                    user = authenticate(request, username=user_obj.username, password=password)
-                except Usuario.DoesNotExist:
-                    pass
-            
+
             if user is not None:
                 login(request, user)
                 messages.success(request, f'Bienvenido, {user.full_name or user.username}!')
@@ -101,6 +93,10 @@ def login_view(request):
                 if next_page:
                     return redirect(next_page)
                 return redirect('home')
+            elif login_bloqueado(request, login_field):
+                messages.error(request, 'Demasiados intentos fallidos. Intente nuevamente en unos minutos.')
+            elif espera := espera_login(request, login_field):
+                messages.error(request, f'Demasiados intentos fallidos. Intente nuevamente en {espera} segundos.')
             else:
                 messages.error(request, 'Usuario o contraseña incorrectos.')
         else:
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Versión de tokens JWT y caché de usuarios al guardar un Usuario
+        from .autenticacion import conectar_senales
+        conectar_senales()
@@ -0,0 +1,317 @@
+# api/autenticacion.py
+"""
+Autenticación JWT sin consultar el usuario en cada petición.
+
+Los tokens llevan los claims que usan las vistas (username, email, full_name,
+is_staff, is_superuser, perfil_id, empresa_id, sucursal_id) y la versión de
+tokens del usuario ("ver"). JWTAutenticacion arma con ellos un UsuarioToken
+(accounts/models.py) sin ir a la base de datos; los tokens emitidos antes de
+este cambio, o todos si JWT_USUARIO_DESDE_TOKEN es False, cargan el Usuario
+completo a través de una caché del proceso de JWT_USUARIO_CACHE_SEGUNDOS.
+
+Revocación: revocar_tokens() incrementa Usuario.token_version y los tokens con
+una versión anterior dejan de valer (también al desactivar o eliminar el
+usuario). La versión vigente se lee de la caché de Django
+(JWT_VERSION_CACHE_SEGUNDOS); los cambios se escriben en la caché al momento,
+así que con una caché compartida (Redis) la revocación es inmediata y con la
+caché local de cada proceso tarda a lo sumo ese tiempo en los demás procesos.
+
+Los claims se renuevan con cada refresh: un cambio de perfil, empresa o
+permisos llega a los tokens en a lo sumo ACCESS_TOKEN_LIFETIME (o al instante,
+revocando los tokens del usuario).
+
+AlcanceMiddleware fija el alcance por empresa/sucursal de cada petición
+(core/alcance.py) con los claims del token o el usuario de la sesión.
+"""
+import copy
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from accounts.models import Perfil, Usuario, UsuarioToken
+from core import metricas
+from core.alcance import alcance_de_usuario, fijar_alcance, restaurar_alcance
+
+# Este módulo lo importa DEFAULT_AUTHENTICATION_CLASSES: no debe importar
+# rest_framework.views (que lee esa configuración al cargarse)
+
+CLAIM_VERSION = 'ver'
+REVOCADO = -1
+
+
+class CacheLocal:
+    """
+    Caché por proceso con vencimiento: {clave: (vence, valor)}. Los aciertos y
+    fallos se cuentan en las métricas con el nombre de la caché.
+    """
+
+    def __init__(self, nombre, segundos, maximo=10000):
+        self.nombre = nombre
+        self.segundos = segundos
+        self.maximo = maximo
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, cargar):
+        ahora = time.monotonic()
+        entrada = self._datos.get(clave)
+        acierto = entrada is not None and entrada[0] > ahora
+        metricas.contar_cache(self.nombre, acierto)
+        if acierto:
+            return entrada[1]
+        valor = cargar(clave)
+        with self._lock:
+            if len(self._datos) >= self.maximo:
+                self._datos.clear()
+            self._datos[clave] = (ahora + self.segundos, valor)
+        return valor
+
+    def descartar(self, clave):
+        self._datos.pop(clave, None)
+
+    def limpiar(self):
+        self._datos.clear()
+
+
+_usuarios = CacheLocal('jwt_usuarios', settings.JWT_USUARIO_CACHE_SEGUNDOS)
+_perfiles = CacheLocal('jwt_perfiles', settings.JWT_USUARIO_CACHE_SEGUNDOS)
+
+
+# ---------------------------------------------------
+# Versión de tokens
+# ---------------------------------------------------
+def _clave_version(username):
+    return f'jwt_version:{username}'
+
+
+def _version_de(usuario):
+    return usuario.token_version if usuario.is_active else REVOCADO
+
+
+def version_tokens(username):
+    """Versión vigente de los tokens del usuario (REVOCADO si no existe o está inactivo)"""
+    clave = _clave_version(username)
+    version = cache.get(clave)
+    metricas.contar_cache('jwt_version', version is not None)
+    if version is None:
+        fila = Usuario.objects.filter(username=username).values_list('token_version', 'is_active').first()
+        version = fila[0] if fila and fila[1] else REVOCADO
+        cache.set(clave, version, settings.JWT_VERSION_CACHE_SEGUNDOS)
+    return version
+
+
+def revocar_tokens(usuario):
+    """Invalidar todos los tokens emitidos al usuario"""
+    Usuario.objects.filter(pk=usuario.pk).update(token_version=F('token_version') + 1)
+    usuario.token_version = Usuario.objects.filter(pk=usuario.pk).values_list('token_version', flat=True).get()
+    cache.set(_clave_version(usuario.pk), _version_de(usuario), settings.JWT_VERSION_CACHE_SEGUNDOS)
+    _usuarios.descartar(usuario.pk)
+
+
+def _usuario_guardado(sender, instance, **kwargs):
+    cache.set(_clave_version(instance.pk), _version_de(instance), settings.JWT_VERSION_CACHE_SEGUNDOS)
+    _usuarios.descartar(instance.pk)
+
+
+def _usuario_eliminado(sender, instance, **kwargs):
+    cache.set(_clave_version(instance.pk), REVOCADO, settings.JWT_VERSION_CACHE_SEGUNDOS)
+    _usuarios.descartar(instance.pk)
+
+
+def conectar_senales():
+    """Mantener la caché al día cuando se guarda o elimina un usuario (ApiConfig.ready)"""
+    post_save.connect(_usuario_guardado, sender=Usuario, dispatch_uid='jwt_version_usuario')
+    post_delete.connect(_usuario_eliminado, sender=Usuario, dispatch_uid='jwt_version_usuario_eliminado')
+
+
+# ---------------------------------------------------
+# Claims y usuario del token
+# ---------------------------------------------------
+def agregar_claims(token, usuario):
+    """Copiar al token los datos del usuario que usan las vistas"""
+    token['username'] = usuario.username
+    token['email'] = usuario.email
+    token['full_name'] = usuario.full_name
+    token['is_staff'] = usuario.is_staff
+    token['is_superuser'] = usuario.is_superuser
+    token['perfil_id'] = usuario.perfil_id
+    token['empresa_id'] = str(usuario.empresa_id) if usuario.empresa_id else None
+    token['sucursal_id'] = str(usuario.sucursal_id) if usuario.sucursal_id else None
+    token[CLAIM_VERSION] = usuario.token_version
+    return token
+
+
+def _cargar_perfil(perfil_id):
+    return Perfil.objects.filter(pk=perfil_id).first()
+
+
+def _cargar_usuario(username):
+    return Usuario.objects.filter(username=username).first()
+
+
+def usuario_desde_token(token):
+    """UsuarioToken con los claims del token (el perfil sale de la caché del proceso)"""
+    usuario = UsuarioToken(
+        username=token[jwt_settings.USER_ID_CLAIM],
+        email=token.get('email') or '',
+        full_name=token.get('full_name') or '',
+        is_staff=token.get('is_staff', False),
+        is_superuser=token.get('is_superuser', False),
+        is_active=True,
+        perfil_id=token['perfil_id'],
+        empresa_id=token.get('empresa_id'),
+        sucursal_id=token.get('sucursal_id'),
+        token_version=token.get(CLAIM_VERSION, 0),
+    )
+    usuario._state.adding = False
+    usuario._state.db = 'default'
+    perfil = _perfiles.obtener(usuario.perfil_id, _cargar_perfil)
+    if perfil is not None:
+        usuario._state.fields_cache['perfil'] = perfil
+    return usuario
+
+
+class JWTAutenticacion(JWTAuthentication):
+    """
+    JWTAuthentication que arma el usuario con los claims del token y verifica
+    su versión contra la caché en lugar de consultar el Usuario. Si
+    AlcanceMiddleware ya autenticó la petición, reutiliza ese resultado.
+    """
+
+    def authenticate(self, request):
+        previo = getattr(getattr(request, '_request', request), '_jwt_autenticacion', None)
+        if previo is not None:
+            return previo
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            username = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('El token no identifica al usuario')
+
+        if validated_token.get(CLAIM_VERSION, 0) != version_tokens(username):
+            raise AuthenticationFailed('El token fue revocado', code='token_revocado')
+
+        if settings.JWT_USUARIO_DESDE_TOKEN and 'perfil_id' in validated_token:
+            return usuario_desde_token(validated_token)
+
+        usuario = _usuarios.obtener(username, _cargar_usuario)
+        if usuario is None or not usuario.is_active:
+            raise AuthenticationFailed('Usuario no encontrado o inactivo', code='user_not_found')
+        # Copia: la vista puede modificar request.user sin afectar a la caché
+        return copy.copy(usuario)
+
+
+# ---------------------------------------------------
+# Emisión y refresh
+# ---------------------------------------------------
+class TokenUsuarioSerializer(TokenObtainPairSerializer):
+    """Par de tokens con los claims del usuario"""
+
+    @classmethod
+    def get_token(cls, user):
+        return agregar_claims(super().get_token(user), user)
+
+
+class TokenRefreshUsuarioSerializer(TokenRefreshSerializer):
+    """Refresh que rechaza tokens revocados y renueva los claims del access token"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        usuario = Usuario.objects.filter(username=refresh.payload.get(jwt_settings.USER_ID_CLAIM)).first()
+        if usuario is None or not usuario.is_active:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        if refresh.payload.get(CLAIM_VERSION, 0) != usuario.token_version:
+            raise AuthenticationFailed('El token fue revocado', code='token_revocado')
+
+        data = {'access': str(agregar_claims(refresh.access_token, usuario))}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(agregar_claims(refresh, usuario))
+        return data
+
+
+# ---------------------------------------------------
+# Alcance por empresa/sucursal
+# ---------------------------------------------------
+def _iterar_con_alcance(contenido, alcance):
+    token = fijar_alcance(alcance)
+    try:
+        yield from contenido
+    finally:
+        restaurar_alcance(token)
+
+
+class AlcanceMiddleware:
+    """
+    Resolver una vez por petición la empresa/sucursal del usuario y fijarla como
+    alcance de las consultas (core/alcance.py). Con un token JWT válido guarda
+    el resultado en la petición para que JWTAutenticacion no lo repita; un
+    token inválido se deja para que DRF responda 401. Las peticiones anónimas
+    no tienen alcance.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        alcance = self.resolver(request)
+        token = fijar_alcance(alcance)
+        try:
+            response = self.get_response(request)
+        finally:
+            restaurar_alcance(token)
+        return self.finalizar(response, alcance)
+
+    async def __acall__(self, request):
+        alcance = await sync_to_async(self.resolver)(request)
+        token = fijar_alcance(alcance)
+        try:
+            response = await self.get_response(request)
+        finally:
+            restaurar_alcance(token)
+        return self.finalizar(response, alcance)
+
+    @staticmethod
+    def resolver(request):
+        usuario = getattr(request, 'user', None)
+        if usuario is not None and usuario.is_authenticated:
+            return alcance_de_usuario(usuario)
+        if not request.META.get('HTTP_AUTHORIZATION'):
+            return None
+        try:
+            resultado = JWTAutenticacion().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            return None
+        if resultado is None:
+            return None
+        request._jwt_autenticacion = resultado
+        return alcance_de_usuario(resultado[0])
+
+    @staticmethod
+    def finalizar(response, alcance):
+        # Las respuestas en streaming se generan después de salir del middleware
+        if alcance is not None and response.streaming and not response.is_async:
+            response.streaming_content = _iterar_con_alcance(response.streaming_content, alcance)
+        return response
@@ -0,0 +1,71 @@
+# api/renderers.py
+"""
+Renderer y parser JSON rápidos basados en orjson.
+
+Si orjson no está instalado se comportan exactamente como los de DRF (json de
+la librería estándar). UUID y tipos nativos se codifican en C; los tipos que
+orjson no conoce o que DRF representa distinto (Decimal, fechas, textos
+traducibles) se delegan al JSONEncoder de DRF, así la salida es la misma con
+o sin orjson.
+"""
+import codecs
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+_encoder = JSONEncoder()
+
+if orjson is not None:
+    # Fechas por el encoder de DRF (formato 'Z' para UTC); claves no str como en json
+    OPCIONES_ORJSON = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def _por_defecto(obj):
+    """Tipos no nativos de orjson: misma representación que el encoder de DRF"""
+    return _encoder.default(obj)
+
+
+class JSONRendererRapido(JSONRenderer):
+    """
+    JSONRenderer que usa orjson cuando está disponible.
+    Las respuestas con sangría (?format=json; indent=N o la API navegable)
+    siguen usando el renderer estándar.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_por_defecto, option=OPCIONES_ORJSON)
+        # Igual que DRF: escapar U+2028/U+2029 para que el JSON sea JavaScript válido
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class JSONParserRapido(JSONParser):
+    """JSONParser que usa orjson para cuerpos UTF-8 (el resto, parser estándar)"""
+    renderer_class = JSONRendererRapido
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        if orjson is None or codecs.lookup(get_encoding(parser_context)).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+def render_json(data):
+    """Serializar datos a JSON (bytes) fuera de una vista DRF"""
+    return JSONRendererRapido().render(data)
@@ -2,9 +2,13 @@ from rest_framework import serializers, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.views import APIView
+from rest_framework import ISO_8601
+from rest_framework.settings import api_settings
 from django.http import Http404
 from django.apps import apps
 from pos_project_acosta.choices import EstadoOrden, EstadoEntidades
+from core.perfilado import medir, SERIALIZACION
+from .versiones import relaciones_versionadas
 
 # ------------------------------------------------------------
 # Helpers para resolver modelos dinámicamente sin importar módulos
@@ -37,13 +41,30 @@ PrecioArticulo        = _get_model(('api', 'PrecioArticulo'),        ('core', 'P
 ReglaPrecio           = _get_model(('api', 'ReglaPrecio'),           ('core', 'ReglaPrecio'))
 CombinacionProducto   = _get_model(('api', 'CombinacionProducto'),  ('core', 'CombinacionProducto'))
 DescuentoProveedor    = _get_model(('api', 'DescuentoProveedor'),    ('core', 'DescuentoProveedor'))
+PrecioEfectivo        = _get_model(('api', 'PrecioEfectivo'),        ('core', 'PrecioEfectivo'))
 #TipoIdentificacion    = _get_model(('api', 'TipoIdentificacion'),    ('core', 'TipoIdentificacion'))
 #CanalCliente          = _get_model(('api', 'CanalCliente'),          ('core', 'CanalCliente'))
 
 # ------------------------------------------------------------
 # SERIALIZERS BASE (opcional; útil para validaciones personalizadas)
 # ------------------------------------------------------------
-class ArticuloPlainSerializer(serializers.Serializer):
+class SerializacionMedidaMixin:
+    """Acumula el tiempo de to_representation en el perfil de la petición (core.perfilado)"""
+
+    def to_representation(self, instance):
+        with medir(SERIALIZACION):
+            return super().to_representation(instance)
+
+
+class ModelSerializerMedido(SerializacionMedidaMixin, serializers.ModelSerializer):
+    pass
+
+
+class SerializerMedido(SerializacionMedidaMixin, serializers.Serializer):
+    pass
+
+
+class ArticuloPlainSerializer(SerializerMedido):
     articulo_id = serializers.UUIDField(read_only=True)
     codigo_articulo = serializers.CharField(max_length=25)
     codigo_barras = serializers.CharField(max_length=25, required=False, allow_blank=True)
@@ -110,23 +131,23 @@ class ArticuloPlainSerializer(serializers.Serializer):
 # ------------------------------------------------------------
 # MODEL SERIALIZERS
 # ------------------------------------------------------------
-class GrupoArticuloSerializer(serializers.ModelSerializer):
+class GrupoArticuloSerializer(ModelSerializerMedido):
     class Meta:
         model = GrupoArticulo
         fields = ['grupo_id', 'codigo_grupo', 'nombre_grupo']
 
-class LineaArticuloSerializer(serializers.ModelSerializer):
+class LineaArticuloSerializer(ModelSerializerMedido):
     class Meta:
         model = LineaArticulo
         fields = ['linea_id', 'codigo_linea', 'nombre_linea']
 
-class ListaPrecioSerializer(serializers.ModelSerializer):
+class ListaPrecioSerializer(ModelSerializerMedido):
     """Serializer para el modelo antiguo PrecioArticuloAntiguo (compatibilidad)"""
     class Meta:
         model = PrecioArticuloAntiguo
         fields = ['precio_1', 'precio_2', 'precio_3', 'precio_4', 'precio_compra', 'precio_costo']
 
-class ArticuloSerializer(serializers.ModelSerializer):
+class ArticuloSerializer(ModelSerializerMedido):
     grupo = GrupoArticuloSerializer(read_only=True)
     linea = LineaArticuloSerializer(read_only=True)
     grupo_id = serializers.UUIDField(write_only=True)
@@ -149,13 +170,18 @@ class ArticuloSerializer(serializers.ModelSerializer):
         articulo = Articulo.objects.create(grupo=grupo, linea=linea, **validated_data)
         return articulo
 
-class ArticuloListSerializer(serializers.ModelSerializer):
+class ArticuloListSerializer(ModelSerializerMedido):
     grupo_nombre = serializers.CharField(source='grupo.nombre_grupo', read_only=True)
     linea_nombre = serializers.CharField(source='linea.nombre_linea', read_only=True)
     precio = serializers.SerializerMethodField()
     
     def get_precio(self, obj):
-        """Obtener el precio del artículo desde el modelo antiguo"""
+        """
+        Precio efectivo anotado por la vista (join con PrecioEfectivo);
+        si la vista no resolvió una lista, se usa el modelo antiguo.
+        """
+        if hasattr(obj, 'precio_efectivo'):
+            return obj.precio_efectivo
         precio_antiguo = obj.precios_antiguos.first()
         if precio_antiguo:
             return precio_antiguo.precio_1
@@ -168,7 +194,7 @@ class ArticuloListSerializer(serializers.ModelSerializer):
 # ------------------------------------------------------------
 # SERIALIZER DINÁMICO (útil si quieres limitar campos con ?fields=)
 # ------------------------------------------------------------
-class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(ModelSerializerMedido):
     def __init__(self, *args, **kwargs):
         fields = kwargs.pop('fields', None)
         super().__init__(*args, **kwargs)
@@ -192,16 +218,21 @@ class ArticuloDynamicSerializer(DynamicFieldsModelSerializer):
 # ------------------------------------------------------------
 # ÓRDENES E ÍTEMS
 # ------------------------------------------------------------
-class ItemOrdenSerializer(serializers.ModelSerializer):
+class ItemOrdenSerializer(ModelSerializerMedido):
     articulo_descripcion = serializers.CharField(source='articulo.descripcion', read_only=True)
 
     class Meta:
         model = ItemOrdenCompraCliente
         fields = ['item_id', 'nro_item', 'articulo', 'articulo_descripcion', 'cantidad', 'precio_unitario', 'total_item']
 
-class OrdenSerializer(serializers.ModelSerializer):
-    items = ItemOrdenSerializer(source='item_orden_compra', many=True, read_only=True)
-    cliente_nombre = serializers.CharField(source='cliente.nombres', read_only=True)
+class OrdenSerializer(ModelSerializerMedido):
+    """
+    Orden con sus ítems. Para no consultar por orden ni por ítem, el queryset debe
+    traer el cliente (select_related) y los ítems con su artículo (ver
+    api.views.consulta_ordenes).
+    """
+    items = ItemOrdenSerializer(source='items_orden_compra', many=True, read_only=True)
+    cliente_nombre = serializers.CharField(source='cliente.nombre', read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
 
     class Meta:
@@ -212,10 +243,24 @@ class OrdenSerializer(serializers.ModelSerializer):
             'estado_display', 'notas', 'items'
         ]
 
+class OrdenResumenSerializer(ModelSerializerMedido):
+    """Orden sin ítems para listados (?resumen=true); cantidad_items viene anotada"""
+    cliente_nombre = serializers.CharField(source='cliente.nombre', read_only=True)
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    cantidad_items = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = OrdenCompraCliente
+        fields = [
+            'pedido_id', 'nro_pedido', 'fecha_pedido', 'cliente',
+            'cliente_nombre', 'vendedor', 'importe', 'estado',
+            'estado_display', 'cantidad_items'
+        ]
+
 # ------------------------------------------------------------
 # CREACIÓN DE ARTÍCULO (con validaciones y creación de lista de precios)
 # ------------------------------------------------------------
-class ArticuloCreateSerializer(serializers.ModelSerializer):
+class ArticuloCreateSerializer(ModelSerializerMedido):
     grupo_id = serializers.UUIDField()
     linea_id = serializers.UUIDField()
     precio_1 = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
@@ -340,7 +385,7 @@ class ArticuloDetailView(APIView):
 # SERIALIZERS PARA SISTEMA DE GESTIÓN DE LISTAS DE PRECIOS Y POLÍTICAS COMERCIALES
 # ============================================================================
 
-class EmpresaSerializer(serializers.ModelSerializer):
+class EmpresaSerializer(ModelSerializerMedido):
     class Meta:
         model = Empresa
         fields = [
@@ -349,7 +394,7 @@ class EmpresaSerializer(serializers.ModelSerializer):
             'creado_en', 'actualizado_en'
         ]
 
-class SucursalSerializer(serializers.ModelSerializer):
+class SucursalSerializer(ModelSerializerMedido):
     empresa_nombre = serializers.CharField(source='empresa.nombre', read_only=True)
     
     class Meta:
@@ -360,7 +405,7 @@ class SucursalSerializer(serializers.ModelSerializer):
             'creado_en', 'actualizado_en'
         ]
 
-class ListaPrecioNuevaSerializer(serializers.ModelSerializer):
+class ListaPrecioNuevaSerializer(ModelSerializerMedido):
     empresa_nombre = serializers.CharField(source='empresa.nombre', read_only=True)
     sucursal_nombre = serializers.CharField(source='sucursal.nombre', read_only=True)
     tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
@@ -378,7 +423,7 @@ class ListaPrecioNuevaSerializer(serializers.ModelSerializer):
             'creado_en', 'actualizado_en'
         ]
 
-class PrecioArticuloSerializer(serializers.ModelSerializer):
+class PrecioArticuloSerializer(ModelSerializerMedido):
     articulo_descripcion = serializers.CharField(source='articulo.descripcion', read_only=True)
     articulo_codigo = serializers.CharField(source='articulo.codigo_articulo', read_only=True)
     lista_precio_nombre = serializers.CharField(source='lista_precio.nombre', read_only=True)
@@ -394,7 +439,7 @@ class PrecioArticuloSerializer(serializers.ModelSerializer):
             'creado_por', 'creado_por_nombre', 'creado_en', 'actualizado_en'
         ]
 
-class ReglaPrecioSerializer(serializers.ModelSerializer):
+class ReglaPrecioSerializer(ModelSerializerMedido):
     lista_precio_nombre = serializers.CharField(source='lista_precio.nombre', read_only=True)
     tipo_regla_display = serializers.CharField(source='get_tipo_regla_display', read_only=True)
     canal_venta_display = serializers.CharField(source='get_canal_venta_display', read_only=True)
@@ -420,7 +465,7 @@ class ReglaPrecioSerializer(serializers.ModelSerializer):
             'creado_en', 'actualizado_en'
         ]
 
-class CombinacionProductoSerializer(serializers.ModelSerializer):
+class CombinacionProductoSerializer(ModelSerializerMedido):
     lista_precio_nombre = serializers.CharField(source='lista_precio.nombre', read_only=True)
     tipo_descuento_display = serializers.CharField(source='get_tipo_descuento_display', read_only=True)
     grupo_nombre = serializers.CharField(source='grupo.nombre_grupo', read_only=True)
@@ -441,7 +486,7 @@ class CombinacionProductoSerializer(serializers.ModelSerializer):
             'creado_en', 'actualizado_en'
         ]
 
-class DescuentoProveedorSerializer(serializers.ModelSerializer):
+class DescuentoProveedorSerializer(ModelSerializerMedido):
     precio_articulo_info = serializers.CharField(source='precio_articulo.articulo.descripcion', read_only=True)
     autorizado_por_nombre = serializers.CharField(source='autorizado_por.username', read_only=True)
     
@@ -454,6 +499,188 @@ class DescuentoProveedorSerializer(serializers.ModelSerializer):
             'fecha_autorizacion', 'notas'
         ]
 
+class PrecioEfectivoSerializer(ModelSerializerMedido):
+    articulo_codigo = serializers.CharField(source='articulo.codigo_articulo', read_only=True)
+    articulo_descripcion = serializers.CharField(source='articulo.descripcion', read_only=True)
+    canal_venta_display = serializers.CharField(source='get_canal_venta_display', read_only=True)
+
+    class Meta:
+        model = PrecioEfectivo
+        fields = [
+            'precio_efectivo_id', 'lista_precio', 'articulo', 'articulo_codigo',
+            'articulo_descripcion', 'canal_venta', 'canal_venta_display',
+            'precio_base', 'precio_final', 'precio_valido', 'actualizado_en'
+        ]
+        read_only_fields = fields
+
+# ------------------------------------------------------------
+# SERIALIZERS DE FILAS (listados grandes, solo lectura)
+# ------------------------------------------------------------
+def _conversor_fecha_hora(campo):
+    """DateTimeField.to_representation con la zona horaria actual resuelta una sola vez"""
+    formato = getattr(campo, 'format', api_settings.DATETIME_FORMAT)
+    zona = campo.timezone if hasattr(campo, 'timezone') else campo.default_timezone()
+    if formato is None or formato.lower() != ISO_8601 or zona is None:
+        return campo.to_representation
+
+    def convertir(valor):
+        if valor.utcoffset() is None:
+            return campo.to_representation(valor)
+        texto = valor.astimezone(zona).isoformat()
+        return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+    return convertir
+
+
+class FilasSerializer:
+    """
+    Serializer de solo lectura para listados de alto volumen.
+
+    Compila una sola vez los campos del ModelSerializer de origen (serializer_class)
+    a columnas de queryset.values_list(): las relaciones 'x.y' se unen en SQL y los
+    get_<campo>_display se resuelven con un diccionario de opciones. Cada fila se
+    arma como dict sin instanciar modelos ni recorrer campos DRF; el JSON resultante
+    es el mismo que produce el serializer de origen.
+
+    Acepta fields=[...] igual que DynamicFieldsModelSerializer (?fields=).
+    """
+    serializer_class = None
+    _compilados = {}
+
+    def __init__(self, queryset=None, fields=None):
+        self.queryset = queryset
+        self.columnas = self.compilar(fields)
+
+    @classmethod
+    def compilar(cls, fields=None):
+        """
+        Lista de (nombre, lookup, conversor, relación nula) por campo. Se cachea solo
+        la compilación completa de cada clase; fields (que llega de ?fields=) la filtra.
+        """
+        columnas = cls._compilados.get(cls)
+        if columnas is None:
+            serializer = cls.serializer_class()
+            model = serializer.Meta.model
+            columnas = [
+                (nombre,) + cls._columna(model, campo)
+                for nombre, campo in serializer.fields.items()
+                if not campo.write_only
+            ]
+            cls._compilados[cls] = columnas
+        if fields is None:
+            return columnas
+        fields = set(fields)
+        return [columna for columna in columnas if columna[0] in fields]
+
+    @staticmethod
+    def _columna(model, campo):
+        """Traducir un campo DRF a (lookup ORM, conversor o None, lookup de la FK nullable o None)"""
+        source = campo.source
+        if source.startswith('get_') and source.endswith('_display'):
+            model_field = model._meta.get_field(source[len('get_'):-len('_display')])
+            opciones = {valor: str(etiqueta) for valor, etiqueta in model_field.flatchoices}
+            return model_field.name, lambda valor: opciones.get(valor, valor), None
+
+        if isinstance(campo, (serializers.BaseSerializer, serializers.SerializerMethodField,
+                              serializers.ManyRelatedField)) or (
+                isinstance(campo, serializers.RelatedField)
+                and not isinstance(campo, serializers.PrimaryKeyRelatedField)):
+            raise TypeError(f"{type(campo).__name__} no se puede leer con values_list ({source})")
+
+        # DRF omite 'x.y' cuando la relación x es nula; se lee también la FK para imitarlo
+        relacion = source.split('.')[0]
+        model_field = model._meta.get_field(relacion)
+        nula = relacion if '.' in source and model_field.null else None
+
+        lookup = source.replace('.', '__')
+        if isinstance(campo, serializers.DecimalField):
+            # La base de datos ya devuelve los decimales con sus decimal_places
+            coerce = getattr(campo, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+            return lookup, str if coerce else None, nula
+        if isinstance(campo, serializers.DateTimeField):
+            # La zona horaria se resuelve por petición en armar()
+            return lookup, campo, nula
+        if isinstance(campo, serializers.DateField):
+            return lookup, campo.to_representation, nula
+        if isinstance(campo, serializers.UUIDField):
+            return lookup, str, nula
+        return lookup, None, nula
+
+    def lookups(self):
+        """Columnas de values_list() en el orden de consulta()"""
+        lookups = []
+        for _, lookup, _, nula in self.columnas:
+            lookups.append(lookup)
+            if nula:
+                lookups.append(nula)
+        return list(dict.fromkeys(lookups))
+
+    def relaciones(self):
+        """Relaciones unidas en consulta() cuyo actualizado_en versiona la respuesta (ETag)"""
+        return relaciones_versionadas(self.serializer_class.Meta.model, self.lookups())
+
+    def consulta(self, queryset=None):
+        """values_list con las columnas necesarias (paginable)"""
+        queryset = self.queryset if queryset is None else queryset
+        return queryset.values_list(*self.lookups())
+
+    def armar(self, filas):
+        """Convertir tuplas de consulta() en dicts de salida"""
+        with medir(SERIALIZACION):
+            return list(self.iterar(filas))
+
+    def iterar(self, filas):
+        """Igual que armar(), fila por fila (para respuestas en streaming)"""
+        indices = {lookup: i for i, lookup in enumerate(self.lookups())}
+        plan = [
+            (
+                nombre, indices[lookup],
+                _conversor_fecha_hora(conversor) if isinstance(conversor, serializers.DateTimeField) else conversor,
+                indices[nula] if nula else None
+            )
+            for nombre, lookup, conversor, nula in self.columnas
+        ]
+        for fila in filas:
+            salida = {}
+            for nombre, i, conversor, nula in plan:
+                if nula is not None and fila[nula] is None:
+                    continue
+                valor = fila[i]
+                salida[nombre] = valor if conversor is None or valor is None else conversor(valor)
+            yield salida
+
+    @property
+    def data(self):
+        return self.armar(self.consulta())
+
+
+class ArticuloSyncSerializer(ModelSerializerMedido):
+    """Artículo tal como lo recibe una terminal en /api/sync/"""
+    class Meta:
+        model = Articulo
+        fields = [
+            'articulo_id', 'codigo_articulo', 'codigo_barras', 'descripcion',
+            'presentacion', 'grupo', 'linea', 'stock', 'estado', 'actualizado_en'
+        ]
+
+
+class ArticuloFilasSerializer(FilasSerializer):
+    serializer_class = ArticuloSyncSerializer
+
+class ListaPrecioFilasSerializer(FilasSerializer):
+    serializer_class = ListaPrecioNuevaSerializer
+
+class PrecioArticuloFilasSerializer(FilasSerializer):
+    serializer_class = PrecioArticuloSerializer
+
+class ReglaPrecioFilasSerializer(FilasSerializer):
+    serializer_class = ReglaPrecioSerializer
+
+class CombinacionProductoFilasSerializer(FilasSerializer):
+    serializer_class = CombinacionProductoSerializer
+
+class PrecioEfectivoFilasSerializer(FilasSerializer):
+    serializer_class = PrecioEfectivoSerializer
+
 # Serializer para el cálculo de precios
 class CalcularPrecioRequestSerializer(serializers.Serializer):
     empresa_id = serializers.UUIDField(required=True)
@@ -464,13 +691,36 @@ class CalcularPrecioRequestSerializer(serializers.Serializer):
     monto_pedido = serializers.DecimalField(max_digits=12, decimal_places=2, default=0, min_value=0)
     fecha = serializers.DateField(required=False, allow_null=True)
 
-class CalcularPrecioResponseSerializer(serializers.Serializer):
+class CalcularPrecioResponseSerializer(SerializerMedido):
+    # Los resultados con error no traen costo, validación ni lista
+    articulo_id = serializers.UUIDField(required=False)
     precio_base = serializers.DecimalField(max_digits=12, decimal_places=2)
     precio_final = serializers.DecimalField(max_digits=12, decimal_places=2)
-    ultimo_costo = serializers.DecimalField(max_digits=12, decimal_places=2)
+    ultimo_costo = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
     reglas_aplicadas = serializers.ListField()
     autorizado_bajo_costo = serializers.BooleanField()
-    validacion_costo = serializers.DictField()
-    lista_precio_id = serializers.UUIDField()
-    lista_precio_nombre = serializers.CharField()
+    validacion_costo = serializers.DictField(required=False)
+    lista_precio_id = serializers.UUIDField(required=False)
+    lista_precio_nombre = serializers.CharField(required=False)
     error = serializers.CharField(required=False, allow_null=True)
+
+# Serializers para el cálculo por lote y la lectura de código de barras
+class ItemLoteSerializer(serializers.Serializer):
+    articulo_id = serializers.UUIDField(required=True)
+    cantidad = serializers.IntegerField(default=1, min_value=1)
+
+class CalcularPrecioLoteRequestSerializer(serializers.Serializer):
+    empresa_id = serializers.UUIDField(required=True)
+    sucursal_id = serializers.UUIDField(required=False, allow_null=True)
+    canal = serializers.IntegerField(required=False, allow_null=True)
+    monto_pedido = serializers.DecimalField(max_digits=12, decimal_places=2, default=0, min_value=0)
+    fecha = serializers.DateField(required=False, allow_null=True)
+    items = ItemLoteSerializer(many=True, allow_empty=False, max_length=500)
+
+class EscanearCodigoRequestSerializer(serializers.Serializer):
+    empresa_id = serializers.UUIDField(required=True)
+    sucursal_id = serializers.UUIDField(required=False, allow_null=True)
+    codigo_barras = serializers.CharField(max_length=50)
+    canal = serializers.IntegerField(required=False, allow_null=True)
+    cantidad = serializers.IntegerField(default=1, min_value=1)
+    fecha = serializers.DateField(required=False, allow_null=True)
@@ -1,3 +1,677 @@
-from django.test import TestCase
+import io
+import json
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import Permission
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import AuthenticationFailed, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.models import DispositivoMovil, Usuario, UsuarioToken
+from accounts.proximidad import IndiceEspacial
+from accounts.ubicaciones import BufferUbicaciones
+from core.alcance import Alcance, alcance_actual, con_alcance
+from core.models import (
+    Cliente, ItemOrdenCompraCliente, ListaPrecio, OrdenCompraCliente, PrecioArticulo, RegistroEliminacion, Sucursal,
+    Vendedor,
+)
+from core.services import PrecioService
+from core.tests import crear_datos, crear_regla
+
+from . import renderers
+from .autenticacion import AlcanceMiddleware, JWTAutenticacion, TokenUsuarioSerializer, revocar_tokens
+from .renderers import JSONParserRapido, JSONRendererRapido
+from .serializers import FilasSerializer, PrecioArticuloFilasSerializer
+from .views_sync import codificar_cursor
+
+
+def crear_lista_de_sucursal(datos):
+    """Lista con sucursal y sin empresa (ListaPrecio.clean lo admite)"""
+    sucursal = Sucursal.objects.create(empresa=datos['empresa'], codigo_sucursal='S1', nombre='Sucursal 1')
+    ListaPrecio.objects.create(sucursal=sucursal, nombre='Lista de sucursal', creado_por=datos['usuario'])
+    return {'empresa_id': str(datos['empresa'].empresa_id), 'sucursal_id': str(sucursal.sucursal_id)}
+
+
+def cabecera_jwt(usuario):
+    """Authorization con un access token emitido como en /api/token/"""
+    return {'headers': {'Authorization': f'Bearer {TokenUsuarioSerializer.get_token(usuario).access_token}'}}
+
+
+class FilasSerializerTests(SimpleTestCase):
+
+    def test_campos_pedidos_no_agrandan_la_cache(self):
+        PrecioArticuloFilasSerializer.compilar()
+        tamano = len(FilasSerializer._compilados)
+        for numero in range(200):
+            PrecioArticuloFilasSerializer.compilar({'precio_base', f'campo_{numero}'})
+        self.assertEqual(len(FilasSerializer._compilados), tamano)
+
+    def test_filtra_la_compilacion_completa(self):
+        columnas = PrecioArticuloFilasSerializer.compilar(['precio_base', 'no_existe', 'articulo'])
+        self.assertEqual([columna[0] for columna in columnas], ['articulo', 'precio_base'])
+
+
+class RenderersRapidosTests(SimpleTestCase):
+    """JSONRendererRapido/JSONParserRapido deben dar lo mismo que los de DRF"""
+
+    datos = {
+        'precio': Decimal('12.50'),
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'creado': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        'local': datetime(2024, 5, 1, 12, 30),
+        'dia': date(2024, 5, 1),
+        'hora': time(8, 15, 30, 250000),
+        'mensaje': gettext_lazy('Precio'),
+        'texto': 'línea\u2028separada\u2029ñ',
+        'claves': {1: 'uno', 2: 'dos'},
+        'lista': [1, 1.5, True, None, Decimal('0.10')],
+    }
+
+    def setUp(self):
+        if renderers.orjson is None:
+            self.skipTest('orjson no está instalado')
+
+    def analizar(self, parser, cuerpo):
+        return parser.parse(io.BytesIO(cuerpo), 'application/json', {'encoding': 'utf-8'})
+
+    def test_render_igual_que_drf(self):
+        self.assertEqual(JSONRendererRapido().render(self.datos), JSONRenderer().render(self.datos))
+
+    def test_render_con_sangria_usa_el_estandar(self):
+        contexto = {'indent': 2}
+        self.assertEqual(
+            JSONRendererRapido().render(self.datos, 'application/json', contexto),
+            JSONRenderer().render(self.datos, 'application/json', contexto)
+        )
+
+    def test_render_sin_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(JSONRendererRapido().render(self.datos), JSONRenderer().render(self.datos))
+
+    def test_parser_igual_que_drf(self):
+        cuerpo = JSONRenderer().render(self.datos)
+        self.assertEqual(self.analizar(JSONParserRapido(), cuerpo), self.analizar(JSONParser(), cuerpo))
+
+    def test_cuerpos_invalidos(self):
+        for cuerpo in (b'', b'{', b'{"a": NaN}', b'{"a": 1,}', b'\xff\xfe'):
+            with self.subTest(cuerpo=cuerpo):
+                with self.assertRaises(ParseError):
+                    self.analizar(JSONParser(), cuerpo)
+                with self.assertRaises(ParseError):
+                    self.analizar(JSONParserRapido(), cuerpo)
+
+
+class GetCondicionalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos()
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.datos['usuario'])
+        self.url = reverse('lista-precio-precios-articulos', args=[self.datos['lista'].lista_precio_id])
+
+    def test_304_no_lee_filas(self):
+        etag = self.cliente.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.cliente.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('MAX(', consultas[0]['sql'])
+
+    def test_renombrar_articulo_cambia_el_etag(self):
+        etag = self.cliente.get(self.url)['ETag']
+        articulo = self.datos['articulos'][0]
+        articulo.descripcion = 'Artículo renombrado'
+        articulo.save()
+
+        respuesta = self.cliente.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('Artículo renombrado', [fila['articulo_descripcion'] for fila in respuesta.json()])
+
+    def test_lista_vigente_se_resuelve_una_vez(self):
+        url = reverse('calcular-precio-lista-vigente')
+        parametros = {'empresa_id': str(self.datos['empresa'].empresa_id)}
+        with mock.patch.object(
+            PrecioService, 'obtener_lista_vigente', wraps=PrecioService.obtener_lista_vigente
+        ) as obtener:
+            respuesta = self.cliente.get(url, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        obtener.assert_called_once()
+
+    def test_lista_vigente_de_sucursal_sin_empresa(self):
+        url = reverse('calcular-precio-lista-vigente')
+        parametros = crear_lista_de_sucursal(self.datos)
+        respuesta = self.cliente.get(url, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['nombre'], 'Lista de sucursal')
+        respuesta = self.cliente.get(url, parametros, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_id_de_lista_invalido_responde_404(self):
+        url = reverse('lista-precio-precios-articulos', args=['no-es-un-uuid'])
+        self.assertEqual(self.cliente.get(url).status_code, 404)
+
+
+@override_settings(SYNC_MARGEN_SEGUNDOS=0)
+class SincronizacionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.propia = crear_datos('E1')
+        cls.ajena = crear_datos('E2')
+        cls.usuario = cls.propia['usuario']
+        cls.usuario.empresa = cls.propia['empresa']
+        cls.usuario.save()
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.usuario)
+
+    def sincronizar(self, **parametros):
+        respuesta = self.cliente.get(reverse('sync'), parametros)
+        if respuesta.status_code != 200:
+            return respuesta, None
+        lineas = [json.loads(linea) for linea in b''.join(respuesta.streaming_content).splitlines()]
+        return respuesta, lineas
+
+    def test_sin_parametros_sincroniza_la_empresa_del_usuario(self):
+        _, lineas = self.sincronizar()
+        listas = {linea['datos']['lista_precio_id'] for linea in lineas if linea.get('modelo') == 'lista_precio'}
+        self.assertEqual(listas, {str(self.propia['lista'].lista_precio_id)})
+
+    def test_otra_empresa_responde_403(self):
+        respuesta, _ = self.sincronizar(empresa_id=str(self.ajena['empresa'].empresa_id))
+        self.assertEqual(respuesta.status_code, 403)
+
+    def test_bajas_de_otra_empresa_no_se_informan(self):
+        ajena = PrecioArticulo.objects.filter(lista_precio=self.ajena['lista']).first()
+        propia = PrecioArticulo.objects.filter(lista_precio=self.propia['lista']).first()
+        propia_id = propia.pk
+        ajena.delete()
+        propia.delete()
+
+        desde = (datetime.now().astimezone() - timedelta(hours=1)).isoformat()
+        _, lineas = self.sincronizar(cursor=codificar_cursor({'desde': desde}))
+        bajas = {linea['id'] for linea in lineas if linea.get('op') == 'eliminar'}
+        self.assertEqual(bajas, {str(propia_id)})
+
+        with con_alcance(Alcance(empresa_id=self.propia['empresa'].empresa_id)):
+            visibles = set(RegistroEliminacion.objects.values_list('objeto_id', flat=True))
+        self.assertEqual(visibles, {propia_id})
+
+    def test_cursor_con_fecha_sin_zona_horaria_responde_400(self):
+        cursor = codificar_cursor({'desde': datetime.now().replace(tzinfo=None).isoformat()})
+        respuesta, _ = self.sincronizar(cursor=cursor)
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class PaqueteOfflineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos()
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.datos['usuario'])
+        self.url = reverse('calcular-precio-paquete-offline')
+        self.parametros = {'empresa_id': str(self.datos['empresa'].empresa_id)}
+
+    def test_304_no_arma_el_paquete(self):
+        etag = self.cliente.get(self.url, self.parametros)['ETag']
+        with mock.patch.object(
+            PrecioService, 'generar_paquete_offline', wraps=PrecioService.generar_paquete_offline
+        ) as generar:
+            respuesta = self.cliente.get(self.url, self.parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        generar.assert_not_called()
+
+    def test_cambiar_un_precio_cambia_el_etag(self):
+        etag = self.cliente.get(self.url, self.parametros)['ETag']
+        precio = PrecioArticulo.objects.filter(lista_precio=self.datos['lista']).first()
+        precio.precio_base += 1
+        precio.save()
+
+        respuesta = self.cliente.get(self.url, self.parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_lista_de_sucursal_sin_empresa(self):
+        parametros = crear_lista_de_sucursal(self.datos)
+        respuesta = self.cliente.get(self.url, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('ETag', respuesta)
+
+
+class IngestaUbicacionesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.propio = crear_datos('E1')['usuario']
+        cls.ajeno = crear_datos('E2')['usuario']
+        cls.dispositivo = DispositivoMovil.objects.create(imei='356938035643809', numero_celular='999', usuario=cls.propio)
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.buffer = BufferUbicaciones(maximo=100, lote=100, intervalo=60)
+        self.buffer.iniciar = lambda: None
+        parche = mock.patch('api.views_ubicaciones.buffer_ubicaciones', return_value=self.buffer)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def enviar(self, usuario):
+        self.cliente.force_authenticate(usuario)
+        return self.cliente.post(reverse('ubicaciones-lote'), {
+            'imei': self.dispositivo.imei,
+            'ubicaciones': [{'latitud': -6.77, 'longitud': -79.84, 'fecha_hora': '2025-11-04T10:00:05Z'}],
+        }, format='json')
+
+    def test_el_usuario_asignado_envia_sus_fixes(self):
+        self.assertEqual(self.enviar(self.propio).status_code, 202)
+        self.assertEqual(len(self.buffer), 1)
+
+    def test_dispositivo_de_otro_usuario_responde_403(self):
+        self.assertEqual(self.enviar(self.ajeno).status_code, 403)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_pasarela_con_permiso_de_ingesta(self):
+        self.ajeno.user_permissions.add(Permission.objects.get(codename='add_ubicaciondispositivo'))
+        self.assertEqual(self.enviar(self.ajeno).status_code, 202)
+
+
+class UbicacionesSupervisionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.propia, cls.ajena = crear_datos('E1'), crear_datos('E2')
+        for datos, imei in ((cls.propia, '111'), (cls.ajena, '222')):
+            datos['usuario'].empresa = datos['empresa']
+            datos['usuario'].save()
+            datos['dispositivo'] = DispositivoMovil.objects.create(
+                imei=imei, numero_celular='999', usuario=datos['usuario']
+            )
+        cls.supervisor = cls.propia['usuario']
+        cls.supervisor.user_permissions.add(Permission.objects.get(codename='view_ubicaciondispositivo'))
+
+    def setUp(self):
+        self.cliente = APIClient()
+        indice = IndiceEspacial()
+        for datos in (self.propia, self.ajena):
+            indice.actualizar(datos['dispositivo'].pk, -6.77, -79.84, timezone.now())
+        parche = mock.patch('api.views_ubicaciones.indice_ubicaciones', return_value=indice)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def consultar(self, usuario, **parametros):
+        self.cliente.force_authenticate(usuario)
+        return (
+            self.cliente.get(reverse('ubicaciones-cercanas'), {'latitud': -6.77, 'longitud': -79.84, **parametros}),
+            self.cliente.get(
+                reverse('ubicaciones-area'), {'sur': -6.8, 'oeste': -79.9, 'norte': -6.7, 'este': -79.8, **parametros}
+            ),
+        )
+
+    def test_sin_permiso_de_supervision_responde_403(self):
+        for respuesta in self.consultar(self.ajena['usuario']):
+            self.assertEqual(respuesta.status_code, 403)
+
+    def test_el_supervisor_ve_solo_su_empresa(self):
+        for respuesta in self.consultar(self.supervisor):
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual([fila['imei'] for fila in respuesta.json()], ['111'])
+
+    def test_minutos(self):
+        for respuesta in self.consultar(self.supervisor, minutos=30):
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(len(respuesta.json()), 1)
+        for minutos, error in (('abc', 'minutos inválido'), ('10' * 20, 'minutos fuera de rango')):
+            for respuesta in self.consultar(self.supervisor, minutos=minutos):
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertEqual(respuesta.json()['error'], error)
+
+
+class RecorridoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.propia, cls.ajena = crear_datos('E1'), crear_datos('E2')
+        for datos in (cls.propia, cls.ajena):
+            datos['usuario'].empresa = datos['empresa']
+            datos['usuario'].save()
+        cls.vendedor = Usuario.objects.create_user(
+            username='vendedor_e1', email='vendedor_e1@prueba.com', password='clave-segura-123',
+            full_name='Vendedor', perfil=cls.propia['usuario'].perfil, empresa=cls.propia['empresa'],
+        )
+        cls.dispositivo = DispositivoMovil.objects.create(imei='111', numero_celular='999', usuario=cls.vendedor)
+        supervision = Permission.objects.get(codename='view_ubicaciondispositivo')
+        for datos in (cls.propia, cls.ajena):
+            datos['usuario'].user_permissions.add(supervision)
+
+    def recorrido(self, usuario, **parametros):
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        return cliente.get(reverse('ubicaciones-recorrido', args=[self.dispositivo.pk]), parametros)
+
+    def test_el_vendedor_ve_su_recorrido(self):
+        self.assertEqual(self.recorrido(self.vendedor).status_code, 200)
+
+    def test_el_supervisor_de_la_empresa_ve_el_recorrido(self):
+        self.assertEqual(self.recorrido(self.propia['usuario']).status_code, 200)
+
+    def test_otra_empresa_no_ve_el_dispositivo(self):
+        self.assertEqual(self.recorrido(self.ajena['usuario']).status_code, 404)
+
+    def test_sin_supervision_no_ve_otros_dispositivos(self):
+        companero = Usuario.objects.create_user(
+            username='otro_e1', email='otro_e1@prueba.com', password='clave-segura-123',
+            full_name='Otro', perfil=self.vendedor.perfil, empresa=self.propia['empresa'],
+        )
+        self.assertEqual(self.recorrido(companero).status_code, 404)
+
+    def test_fechas_invalidas_responden_400(self):
+        for parametros in ({'hasta': '0001-01-01'}, {'hasta': 'ayer'}, {'desde': '2024-05-02', 'hasta': '2024-05-01'}):
+            with self.subTest(**parametros):
+                self.assertEqual(self.recorrido(self.vendedor, **parametros).status_code, 400)
+
+
+class OrdenesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos()
+        cls.usuario = cls.datos['usuario']
+        cls.cliente_propio = Cliente.objects.create(nombre='Cliente propio', email=cls.usuario.email)
+        cls.cliente_ajeno = Cliente.objects.create(nombre='Cliente ajeno', email='otro@prueba.com')
+        cls.vendedor = Vendedor.objects.create(nombre='Vendedor', usuario=cls.usuario)
+        cls.agregar_ordenes(cls.cliente_ajeno, 1)
+
+    @classmethod
+    def agregar_ordenes(cls, cliente, cantidad, items=3):
+        inicio = OrdenCompraCliente.objects.count()
+        ordenes = OrdenCompraCliente.objects.bulk_create([
+            OrdenCompraCliente(
+                nro_pedido=inicio + numero + 1, cliente=cliente, vendedor=cls.vendedor, creado_por=cls.usuario
+            )
+            for numero in range(cantidad)
+        ])
+        ItemOrdenCompraCliente.objects.bulk_create([
+            ItemOrdenCompraCliente(
+                pedido=orden, nro_item=nro_item, articulo=articulo, precio_unitario=Decimal('10.00'),
+                total_item=Decimal('10.00'), creado_por=cls.usuario
+            )
+            for orden in ordenes
+            for nro_item, articulo in enumerate(reversed(cls.datos['articulos'][:items]), start=1)
+        ])
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.usuario)
+        self.url = reverse('orden-list')
+        Site.objects.get_current()  # la primera petición del proceso la consulta y la cachea
+
+    def consultas_del_listado(self, **parametros):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.cliente.get(self.url, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas), respuesta.json()['results']
+
+    def test_consultas_constantes_al_crecer_las_ordenes(self):
+        self.agregar_ordenes(self.cliente_propio, 1)
+        consultas, ordenes = self.consultas_del_listado()
+        self.assertEqual(len(ordenes), 1)
+
+        self.agregar_ordenes(self.cliente_propio, 9, items=5)
+        with self.assertNumQueries(consultas):
+            respuesta = self.cliente.get(self.url)
+        ordenes = respuesta.json()['results']
+        self.assertEqual(len(ordenes), 10)
+        self.assertTrue(all(orden['cliente_nombre'] == 'Cliente propio' for orden in ordenes))
+        items = ordenes[0]['items']
+        self.assertIn(len(items), (3, 5))
+        self.assertEqual([item['nro_item'] for item in items], list(range(1, len(items) + 1)))
+        self.assertTrue(all(item['articulo_descripcion'] for item in items))
+
+    def test_resumen_sin_items(self):
+        self.agregar_ordenes(self.cliente_propio, 2, items=4)
+        consultas_resumen, ordenes = self.consultas_del_listado(resumen='true')
+        consultas_completo, _ = self.consultas_del_listado()
+        self.assertLess(consultas_resumen, consultas_completo)
+        self.assertEqual(len(ordenes), 2)
+        for orden in ordenes:
+            self.assertNotIn('items', orden)
+            self.assertEqual(orden['cantidad_items'], 4)
+
+        self.agregar_ordenes(self.cliente_propio, 8, items=2)
+        self.assertEqual(self.consultas_del_listado(resumen='true')[0], consultas_resumen)
+
+    def test_resumen_no_aplica_al_detalle(self):
+        self.agregar_ordenes(self.cliente_propio, 1)
+        orden = OrdenCompraCliente.objects.get(cliente=self.cliente_propio)
+        respuesta = self.cliente.get(reverse('orden-detail', args=[orden.pk]), {'resumen': 'true'})
+        self.assertEqual(len(respuesta.json()['items']), 3)
+
+
+class VistasAsincronasTests(TestCase):
+    """Las vistas de api/views_async.py responden lo mismo que las vistas DRF"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.propia, cls.ajena = crear_datos('E1'), crear_datos('E2')
+        for datos in (cls.propia, cls.ajena):
+            datos['usuario'].empresa = datos['empresa']
+            datos['usuario'].save()
+        cls.articulo = cls.propia['articulos'][0]
+        cls.articulo.codigo_barras = '7750000000001'
+        cls.articulo.save()
+
+    def setUp(self):
+        self.cabecera = cabecera_jwt(self.propia['usuario'])
+        self.empresa_id = str(self.propia['empresa'].empresa_id)
+
+    def post_json(self, cliente, url, datos):
+        return cliente.post(url, json.dumps(datos), content_type='application/json', **self.cabecera)
+
+    async def test_calcular_igual_que_la_vista_sincronica(self):
+        datos = {'empresa_id': self.empresa_id, 'articulo_id': str(self.articulo.articulo_id), 'cantidad': 3}
+        asincrona = await self.async_client.post(
+            reverse('async-calcular-precio'), datos, content_type='application/json', **self.cabecera
+        )
+        sincronica = await sync_to_async(self.post_json)(self.client, reverse('calcular-precio-calcular'), datos)
+        self.assertEqual(asincrona.status_code, 200)
+        self.assertEqual(asincrona.json(), sincronica.json())
+
+    async def test_lote_igual_que_calcular_por_articulo(self):
+        articulos = self.propia['articulos'][:3]
+        respuesta = await self.async_client.post(reverse('async-calcular-lote'), {
+            'empresa_id': self.empresa_id,
+            'items': [{'articulo_id': str(articulo.articulo_id), 'cantidad': 2} for articulo in articulos],
+        }, content_type='application/json', **self.cabecera)
+        self.assertEqual(respuesta.status_code, 200)
+        for articulo, resultado in zip(articulos, respuesta.json()['resultados']):
+            individual = await sync_to_async(self.post_json)(self.client, reverse('calcular-precio-calcular'), {
+                'empresa_id': self.empresa_id, 'articulo_id': str(articulo.articulo_id), 'cantidad': 2,
+            })
+            self.assertEqual(resultado.pop('articulo_id'), str(articulo.articulo_id))
+            self.assertEqual(resultado, individual.json())
+
+    async def test_lista_vigente_igual_que_la_vista_sincronica(self):
+        parametros = {'empresa_id': self.empresa_id}
+        asincrona = await self.async_client.get(reverse('async-lista-vigente'), parametros, **self.cabecera)
+        sincronica = await sync_to_async(self.client.get)(
+            reverse('calcular-precio-lista-vigente'), parametros, **self.cabecera
+        )
+        self.assertEqual(asincrona.status_code, 200)
+        self.assertEqual(asincrona.json(), sincronica.json())
+
+    async def test_escanear(self):
+        respuesta = await self.async_client.get(reverse('async-escanear'), {
+            'empresa_id': self.empresa_id, 'codigo_barras': self.articulo.codigo_barras,
+        }, **self.cabecera)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['articulo_id'], str(self.articulo.articulo_id))
+
+        respuesta = await self.async_client.get(reverse('async-escanear'), {
+            'empresa_id': self.empresa_id, 'codigo_barras': 'no-existe',
+        }, **self.cabecera)
+        self.assertEqual(respuesta.status_code, 404)
+
+    async def test_otra_empresa_no_es_visible(self):
+        parametros = {'empresa_id': str(self.ajena['empresa'].empresa_id)}
+        respuesta = await self.async_client.get(reverse('async-lista-vigente'), parametros, **self.cabecera)
+        self.assertEqual(respuesta.status_code, 404)
+
+        respuesta = await self.async_client.post(reverse('async-calcular-precio'), {
+            **parametros, 'articulo_id': str(self.ajena['articulos'][0].articulo_id),
+        }, content_type='application/json', **self.cabecera)
+        self.assertEqual(respuesta.json()['error'], 'No se encontró una lista de precios vigente')
+
+    async def test_entradas_invalidas(self):
+        url = reverse('async-calcular-precio')
+        respuesta = await self.async_client.post(url, 'no es json', content_type='application/json', **self.cabecera)
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta = await self.async_client.post(url, {'empresa_id': 'x'}, content_type='application/json', **self.cabecera)
+        self.assertEqual(respuesta.status_code, 400)
+
+        url = reverse('async-lista-vigente')
+        self.assertEqual((await self.async_client.get(url, **self.cabecera)).status_code, 400)
+        respuesta = await self.async_client.get(url, {'empresa_id': self.empresa_id, 'fecha': '2025-13-01'}, **self.cabecera)
+        self.assertEqual(respuesta.status_code, 400)
+
+    async def test_sin_token_responde_401(self):
+        respuesta = await self.async_client.get(reverse('async-lista-vigente'), {'empresa_id': self.empresa_id})
+        self.assertEqual(respuesta.status_code, 401)
+
+
+class AutenticacionJWTTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos()
+        cls.usuario = cls.datos['usuario']
+        cls.usuario.empresa = cls.datos['empresa']
+        cls.usuario.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def autenticar(self, token):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return JWTAutenticacion().authenticate(request)
+
+    def test_token_valido_sin_consultar_el_usuario(self):
+        token = TokenUsuarioSerializer.get_token(self.usuario).access_token
+        self.autenticar(token)  # carga la versión y el perfil en las cachés
+        with self.assertNumQueries(0):
+            usuario, _ = self.autenticar(token)
+        self.assertIsInstance(usuario, UsuarioToken)
+        self.assertEqual(usuario.username, self.usuario.username)
+        self.assertEqual(str(usuario.empresa_id), str(self.datos['empresa'].empresa_id))
+
+    def test_token_revocado(self):
+        token = TokenUsuarioSerializer.get_token(self.usuario).access_token
+        self.autenticar(token)
+        revocar_tokens(self.usuario)
+        with self.assertRaises(AuthenticationFailed):
+            self.autenticar(token)
+
+        respuesta = self.client.get(reverse('orden-list'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(respuesta.status_code, 401)
+
+    def test_usuario_inactivo(self):
+        token = TokenUsuarioSerializer.get_token(self.usuario).access_token
+        self.usuario.is_active = False
+        self.usuario.save()
+        for desde_token in (True, False):
+            with self.subTest(desde_token=desde_token), override_settings(JWT_USUARIO_DESDE_TOKEN=desde_token):
+                with self.assertRaises(AuthenticationFailed):
+                    self.autenticar(token)
+
+    def test_refresh_emitido_antes_de_revocar(self):
+        anterior = str(TokenUsuarioSerializer.get_token(self.usuario))
+        revocar_tokens(self.usuario)
+        vigente = str(TokenUsuarioSerializer.get_token(self.usuario))
+
+        url = reverse('token_refresh')
+        self.assertEqual(self.client.post(url, {'refresh': anterior}).status_code, 401)
+        respuesta = self.client.post(url, {'refresh': vigente})
+        self.assertEqual(respuesta.status_code, 200)
+        usuario, _ = self.autenticar(respuesta.json()['access'])
+        self.assertEqual(usuario.username, self.usuario.username)
+
+
+class AlcanceMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.propia, cls.ajena = crear_datos('E1'), crear_datos('E2')
+        for datos in (cls.propia, cls.ajena):
+            datos['usuario'].empresa = datos['empresa']
+            datos['usuario'].save()
+            datos['regla'] = crear_regla(datos)
+            datos['precio'] = PrecioArticulo.objects.filter(lista_precio=datos['lista']).first()
+        cls.sin_empresa = Usuario.objects.create_user(
+            username='sin_empresa', email='sin_empresa@prueba.com', password='clave-segura-123',
+            full_name='Sin empresa', perfil=cls.propia['usuario'].perfil,
+        )
+
+    def get(self, usuario, nombre, *args):
+        return self.client.get(reverse(nombre, args=args), **cabecera_jwt(usuario))
+
+    def test_otra_empresa_responde_404(self):
+        usuario = self.propia['usuario']
+        for nombre, pk in (
+            ('lista-precio-detail', self.ajena['lista'].pk),
+            ('lista-precio-precios-articulos', self.ajena['lista'].pk),
+            ('regla-precio-detail', self.ajena['regla'].pk),
+            ('precio-articulo-detail', self.ajena['precio'].pk),
+        ):
+            with self.subTest(nombre=nombre):
+                self.assertEqual(self.get(usuario, nombre, pk).status_code, 404)
+        self.assertEqual(self.get(usuario, 'lista-precio-detail', self.propia['lista'].pk).status_code, 200)
+        self.assertIsNone(alcance_actual())
+
+    def test_usuario_sin_empresa_no_ve_listas(self):
+        respuesta = self.get(self.sin_empresa, 'lista-precio-list')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['count'], 0)
+        self.assertEqual(self.get(self.sin_empresa, 'lista-precio-detail', self.propia['lista'].pk).status_code, 404)
+
+    def peticion(self):
+        request = RequestFactory().get('/')
+        request.user = self.propia['usuario']
+        return request
+
+    def test_restaura_el_alcance_si_la_vista_falla(self):
+        def fallar(request):
+            self.assertEqual(alcance_actual().empresa_id, self.propia['empresa'].empresa_id)
+            raise RuntimeError()
+
+        with self.assertRaises(RuntimeError):
+            AlcanceMiddleware(fallar)(self.peticion())
+        self.assertIsNone(alcance_actual())
+
+    async def test_restaura_el_alcance_si_la_vista_asincronica_falla(self):
+        async def fallar(request):
+            self.assertEqual(alcance_actual().empresa_id, self.propia['empresa'].empresa_id)
+            raise RuntimeError()
+
+        with self.assertRaises(RuntimeError):
+            await AlcanceMiddleware(fallar)(self.peticion())
+        self.assertIsNone(alcance_actual())
@@ -4,14 +4,24 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status, viewsets, filters
 from django_filters.rest_framework import DjangoFilterBackend
+from core import metricas
 from core.models import Articulo
 from .serializers import ArticuloListSerializer
 
-class BurstRateThrottle(AnonRateThrottle):
+
+class RechazosMedidosMixin:
+    """Contar cada rechazo en las métricas (throttle_rechazos_total) por scope"""
+
+    def throttle_failure(self):
+        metricas.registro.sumar('throttle_rechazos_total', scope=self.scope)
+        return super().throttle_failure()
+
+
+class BurstRateThrottle(RechazosMedidosMixin, AnonRateThrottle):
     scope = 'burst'
 
 
-class SustainedRateThrottle(UserRateThrottle):
+class SustainedRateThrottle(RechazosMedidosMixin, UserRateThrottle):
     scope = 'sustained'
 
 
@@ -1,9 +1,9 @@
 # api/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 
-from . import views, views_precios
+from . import views, views_precios, views_async, views_sync, views_ubicaciones
 
 router = DefaultRouter()
 router.register(r'articulos', views.ArticuloViewSet, basename='articulo')
@@ -17,6 +17,7 @@ router.register(r'precios-articulos', views_precios.PrecioArticuloViewSet, basen
 router.register(r'reglas-precios', views_precios.ReglaPrecioViewSet, basename='regla-precio')
 router.register(r'combinaciones-productos', views_precios.CombinacionProductoViewSet, basename='combinacion-producto')
 router.register(r'descuentos-proveedor', views_precios.DescuentoProveedorViewSet, basename='descuento-proveedor')
+router.register(r'precios-efectivos', views_precios.PrecioEfectivoViewSet, basename='precio-efectivo')
 router.register(r'calcular-precio', views_precios.CalcularPrecioViewSet, basename='calcular-precio')
 
 urlpatterns = [
@@ -31,8 +32,28 @@ urlpatterns = [
     path('v1/articulos/generic/', views.ArticuloListCreateSimple.as_view(), name='articulo-list-generic'),
     path('v1/articulos/generic/<uuid:pk>/', views.ArticuloDetailSimple.as_view(), name='articulo-detail-generic'),
 
+    # Cálculo de precios asíncrono (ASGI) para terminales
+    path('async/calcular-precio/', views_async.calcular_precio, name='async-calcular-precio'),
+    path('async/lista-vigente/', views_async.lista_vigente, name='async-lista-vigente'),
+    path('async/calcular-lote/', views_async.calcular_lote, name='async-calcular-lote'),
+    path('async/escanear/', views_async.escanear, name='async-escanear'),
+
+    # Sincronización incremental de terminales (NDJSON)
+    path('sync/', views_sync.SincronizacionView.as_view(), name='sync'),
+
+    # Ubicaciones GPS de dispositivos móviles
+    path('ubicaciones/lote/', views_ubicaciones.IngestaUbicacionesView.as_view(), name='ubicaciones-lote'),
+    path('ubicaciones/cercanas/', views_ubicaciones.UbicacionesCercanasView.as_view(), name='ubicaciones-cercanas'),
+    path('ubicaciones/area/', views_ubicaciones.UbicacionesAreaView.as_view(), name='ubicaciones-area'),
+    path('ubicaciones/dispositivos/<int:dispositivo_id>/recorrido/', views_ubicaciones.RecorridoView.as_view(),
+         name='ubicaciones-recorrido'),
+
     # JWT
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', views.TokenUsuarioView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+    path('token/revocar/', views.RevocarTokensView.as_view(), name='token_revocar'),
+
+    # Métricas del servicio de precios (core/metricas.py)
+    path('metricas/precios/', views.MetricasPreciosView.as_view(), name='metricas-precios'),
 ]
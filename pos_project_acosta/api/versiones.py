@@ -0,0 +1,97 @@
+# api/versiones.py
+"""
+GET condicional (ETag / Last-Modified) a partir de la versión de los datos.
+
+La versión de un recurso es un agregado barato sobre sus filas: el máximo de
+actualizado_en y la cantidad de filas (la cantidad detecta eliminaciones, que no
+cambian el máximo), más el máximo actualizado_en de las relaciones cuyos datos
+aparecen en la respuesta (renombrar un artículo cambia el ETag de sus precios). Si el ETag enviado en If-None-Match coincide, la vista
+responde 304 sin ejecutar las consultas del listado ni serializar.
+"""
+import functools
+import hashlib
+from calendar import timegm
+from datetime import datetime
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def version_de(queryset, campo='actualizado_en', relaciones=(), **agregados):
+    """
+    Versión de un queryset: último actualizado_en, total de filas y agregados extra.
+    relaciones son las relaciones unidas en la respuesta (nombre del artículo, de la
+    línea...): su último actualizado_en también cuenta.
+    """
+    for relacion in relaciones:
+        agregados[f'ultimo_{relacion}'] = Max(f'{relacion}__{campo}')
+    return queryset.order_by().aggregate(
+        ultimo=Max(campo), total=Count('pk'), **agregados
+    )
+
+
+def relaciones_versionadas(modelo, lookups, campo='actualizado_en'):
+    """
+    Relaciones que recorren los lookups ('articulo__descripcion' -> 'articulo') cuyo
+    modelo tiene el campo de versión, para pasarlas a version_de
+    """
+    relaciones = []
+    for lookup in lookups:
+        partes = lookup.split('__')[:-1]
+        actual = modelo
+        for i, parte in enumerate(partes):
+            actual = actual._meta.get_field(parte).related_model
+            if actual is None:
+                break
+            ruta = '__'.join(partes[:i + 1])
+            if ruta not in relaciones and any(field.name == campo for field in actual._meta.concrete_fields):
+                relaciones.append(ruta)
+    return relaciones
+
+
+def _etag(version, request):
+    # El formato (json / api navegable) cambia la representación con la misma URL
+    formato = getattr(getattr(request, 'accepted_renderer', None), 'format', '')
+    texto = repr((sorted(version.items()), formato))
+    return hashlib.md5(texto.encode()).hexdigest()
+
+
+def _ultima_modificacion(version):
+    fechas = [valor for valor in version.values() if isinstance(valor, datetime)]
+    return max(fechas) if fechas else None
+
+
+def condicional(version_func):
+    """
+    Decorador para métodos GET de vistas DRF, al estilo de django.views.decorators.http.condition.
+
+    version_func(view, request, *args, **kwargs) devuelve un dict con la versión
+    (por ejemplo el de version_de) o None si la respuesta no se puede versionar.
+    Solo If-None-Match decide el 304: Last-Modified se informa pero no detecta
+    eliminaciones por sí solo.
+    """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return metodo(self, request, *args, **kwargs)
+
+            version = version_func(self, request, *args, **kwargs)
+            if version is None:
+                return metodo(self, request, *args, **kwargs)
+
+            etag = quote_etag(_etag(version, request))
+            ultima = _ultima_modificacion(version)
+
+            respuesta = get_conditional_response(request, etag=etag)
+            if respuesta is None:
+                respuesta = metodo(self, request, *args, **kwargs)
+
+            if respuesta.status_code in (200, 304):
+                respuesta.headers.setdefault('ETag', etag)
+                if ultima is not None:
+                    respuesta.headers.setdefault('Last-Modified', http_date(timegm(ultima.utctimetuple())))
+            return respuesta
+        return envoltura
+    return decorador
@@ -1,11 +1,23 @@
 from rest_framework import mixins, generics, viewsets, filters, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from django.db.models import F, Q, Count, Max, FilteredRelation, Prefetch
+from django.http import HttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.views import TokenObtainPairView
+import uuid
 
+from accounts.backends import espera_login
+from core import metricas
+from core.services import PrecioService
+
+from .autenticacion import revocar_tokens
 from .pagination import CustomPagination
+from .versiones import condicional, version_de
 from .permissions import IsAdminOrReadOnly, IsOwnerOrReadOnly  # si no lo usas, puedes quitarlo
 
 from .serializers import (
@@ -14,6 +26,8 @@ from .serializers import (
     ArticuloCreateSerializer,
     ListaPrecioSerializer,
     OrdenSerializer,
+    OrdenResumenSerializer,
+    ItemOrdenSerializer,
 )
 
 # Helpers para no repetir código
@@ -25,6 +39,67 @@ def _orden_model():
     """Devuelve el modelo asociado al OrdenSerializer."""
     return OrdenSerializer.Meta.model
 
+def _item_orden_model():
+    """Devuelve el modelo asociado al ItemOrdenSerializer."""
+    return ItemOrdenSerializer.Meta.model
+
+def _uuid_valido(valor):
+    try:
+        uuid.UUID(str(valor))
+        return True
+    except ValueError:
+        return False
+
+def anotar_precio_efectivo(queryset, request):
+    """
+    Anota 'precio_efectivo' en los artículos con un LEFT JOIN a PrecioEfectivo.
+    La lista se toma de ?lista_precio_id= o de la lista vigente para ?empresa_id=/?sucursal_id=;
+    ?canal= elige el canal (sin canal por defecto). Sin lista, el queryset no se modifica.
+    """
+    params = request.query_params
+    lista_precio_id = params.get('lista_precio_id')
+    empresa_id = params.get('empresa_id')
+    sucursal_id = params.get('sucursal_id')
+
+    if not lista_precio_id and (empresa_id or sucursal_id):
+        if all(_uuid_valido(valor) for valor in (empresa_id, sucursal_id) if valor):
+            lista = PrecioService.obtener_lista_vigente(empresa_id, sucursal_id)
+            lista_precio_id = lista.lista_precio_id if lista else None
+
+    if not lista_precio_id or not _uuid_valido(lista_precio_id):
+        return queryset
+
+    condicion = Q(precios_efectivos__lista_precio_id=lista_precio_id)
+    canal = params.get('canal')
+    if canal and canal.isdigit():
+        condicion &= Q(precios_efectivos__canal_venta=int(canal))
+    else:
+        condicion &= Q(precios_efectivos__canal_venta__isnull=True)
+
+    return queryset.annotate(
+        efectivo=FilteredRelation('precios_efectivos', condition=condicion)
+    ).annotate(precio_efectivo=F('efectivo__precio_final'))
+
+
+def version_articulos(queryset):
+    """
+    Versión de un listado de artículos con precio efectivo (ETag): artículos, sus
+    precios de la lista elegida y el grupo y la línea cuyos nombres se incluyen. Sin lista el precio sale de la tabla antigua, que
+    no registra cambios, y la respuesta no se versiona.
+    """
+    if 'precio_efectivo' not in queryset.query.annotations:
+        return None
+    return version_de(
+        queryset,
+        relaciones=('grupo', 'linea'),
+        precios=Max('efectivo__actualizado_en'),
+        total_precios=Count('efectivo__precio_efectivo_id'),
+    )
+
+
+def version_catalogo(view, request, *args, **kwargs):
+    return version_articulos(view.filter_queryset(view.get_queryset()))
+
 
 # ----------------------------------------------------------------------
 # MIXINS Y VISTAS GENÉRICAS DE ARTÍCULOS
@@ -46,8 +121,9 @@ class ArticuloListCreateGeneric(mixins.ListModelMixin,
     def get_queryset(self):
         # Siempre toma el modelo desde el serializer
         Model = _articulo_model()
-        return Model.objects.all()
+        return anotar_precio_efectivo(Model.objects.all(), self.request)
 
+    @condicional(version_catalogo)
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
 
@@ -93,13 +169,17 @@ class ArticuloListCreateSimple(generics.ListCreateAPIView):
 
     def get_queryset(self):
         Model = _articulo_model()
-        return Model.objects.all()
+        return anotar_precio_efectivo(Model.objects.all(), self.request)
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return ArticuloCreateSerializer
         return ArticuloListSerializer
 
+    @condicional(version_catalogo)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class ArticuloDetailSimple(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -126,9 +206,13 @@ class ArticuloViewSet(viewsets.ModelViewSet):
     ordering_fields = ['codigo_articulo', 'descripcion', 'stock']
     throttle_classes = [UserRateThrottle, AnonRateThrottle]
     permission_classes = [IsAdminOrReadOnly]
+    # Lecturas que pueden ir a una réplica (core/enrutador.py)
+    lectura_replica = {'list', 'retrieve', 'precios', 'bajo_stock'}
 
     def get_queryset(self):
         Model = _articulo_model()
+        if self.action in ('list', 'bajo_stock'):
+            return anotar_precio_efectivo(Model.objects.all(), self.request)
         return Model.objects.all()
 
     def get_serializer_class(self):
@@ -138,6 +222,10 @@ class ArticuloViewSet(viewsets.ModelViewSet):
             return ArticuloListSerializer
         return ArticuloSerializer
 
+    @condicional(version_catalogo)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=True, methods=['get'])
     def precios(self, request, pk=None):
         """
@@ -153,13 +241,13 @@ class ArticuloViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @condicional(lambda view, request, *args, **kwargs: version_articulos(view.get_queryset()))
     def bajo_stock(self, request):
         """
         Endpoint personalizado para obtener artículos con bajo stock.
         GET /api/articulos/bajo_stock/
         """
-        Model = _articulo_model()
-        articulos = Model.objects.filter(stock__lt=10)
+        articulos = self.get_queryset().filter(stock__lt=10)
         serializer = ArticuloListSerializer(articulos, many=True)
         return Response(serializer.data)
 
@@ -167,20 +255,58 @@ class ArticuloViewSet(viewsets.ModelViewSet):
 # ----------------------------------------------------------------------
 # VIEWSET DE ÓRDENES
 # ----------------------------------------------------------------------
-class OrdenViewSet(viewsets.ReadOnlyModelViewSet):
+def consulta_ordenes(queryset, resumen=False):
     """
-    ViewSet para ver órdenes (solo lectura).
+    Órdenes con el cliente en la misma consulta y, en modo resumen, la cantidad de
+    ítems anotada; si no, los ítems con su artículo en una sola consulta adicional.
+    La cantidad de consultas no depende de cuántas órdenes o ítems haya.
+    """
+    queryset = queryset.select_related('cliente')
+    if resumen:
+        # Con GROUP BY Django no aplica Meta.ordering; se repite para paginar estable
+        return queryset.annotate(cantidad_items=Count('items_orden_compra')) \
+            .order_by(*queryset.model._meta.ordering, 'pk')
+    return queryset.prefetch_related(Prefetch(
+        'items_orden_compra',
+        queryset=_item_orden_model().objects.select_related('articulo').order_by('nro_item')
+    ))
+
+
+class OrdenesMixin:
+    """
+    Consulta y serializer de los ViewSets de órdenes: staff ve todas, el resto las de
+    su cliente (por email). ?resumen=true en los listados omite los ítems.
     """
-    serializer_class = OrdenSerializer
     permission_classes = [IsAuthenticated]
+    presupuesto_consultas = 10
+
+    def es_resumen(self):
+        # Solo en listados (list y acciones detail=False)
+        return not self.detail and \
+            self.request.query_params.get('resumen', '').lower() in ('1', 'true', 'si')
 
     def get_queryset(self):
         Model = _orden_model()
         user = self.request.user
         if user.is_staff:
-            return Model.objects.all()
-        # Para usuarios normales, mostrar solo sus propias órdenes
-        return Model.objects.filter(cliente__correo_electronico=user.email)
+            queryset = Model.objects.all()
+        elif user.email:
+            # Para usuarios normales, mostrar solo sus propias órdenes
+            queryset = Model.objects.filter(cliente__email=user.email)
+        else:
+            queryset = Model.objects.none()
+        return consulta_ordenes(queryset, resumen=self.es_resumen())
+
+    def get_serializer_class(self):
+        if self.es_resumen():
+            return OrdenResumenSerializer
+        return OrdenSerializer
+
+
+class OrdenViewSet(OrdenesMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet para ver órdenes (solo lectura).
+    """
 
     @action(detail=True, methods=['post'])
     def cancelar(self, request, pk=None):
@@ -201,3 +327,59 @@ class OrdenViewSet(viewsets.ReadOnlyModelViewSet):
         orden.save(update_fields=['estado'])
         serializer = self.get_serializer(orden)
         return Response(serializer.data)
+
+
+# ----------------------------------------------------------------------
+# Tokens JWT
+# ----------------------------------------------------------------------
+class TokenUsuarioView(TokenObtainPairView):
+    """
+    Par de tokens JWT. Con el login bloqueado o en espera por intentos fallidos
+    (accounts/backends.py) responde 429 con Retry-After en lugar de 401.
+    POST /api/token/
+    """
+
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            login = request.data.get('username')
+            espera = espera_login(request, str(login)) if login else 0
+            if not espera:
+                raise
+            respuesta = Response(
+                {'detail': 'Demasiados intentos fallidos, intente más tarde.'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            respuesta['Retry-After'] = str(espera)
+            return respuesta
+
+
+class RevocarTokensView(APIView):
+    """
+    Cerrar la sesión del usuario en todos sus dispositivos (api/autenticacion.py).
+    POST /api/token/revocar/
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        revocar_tokens(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# ----------------------------------------------------------------------
+# Métricas
+# ----------------------------------------------------------------------
+class MetricasPreciosView(APIView):
+    """
+    Métricas del servicio de precios de este proceso en formato de texto de
+    Prometheus (requiere core.metricas.SumideroPrometheus en PRECIOS_METRICAS_SUMIDEROS).
+    GET /api/metricas/precios/
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            metricas.registro.texto_prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -0,0 +1,253 @@
+"""
+Vistas asíncronas (ASGI) para el cálculo de precios desde terminales.
+
+Las terminales mantienen muchas conexiones casi inactivas; servidas por ASGI
+(pos_project_acosta.asgi) estas vistas no ocupan un hilo del servidor mientras
+esperan a la base de datos. Replican CalcularPrecioViewSet.calcular y
+lista_vigente y agregan el cálculo por lote y la lectura de código de barras.
+
+La autenticación es solo por JWT (sin cookies de sesión, por eso no aplica CSRF)
+y se aplican los mismos throttles por defecto que en las vistas DRF. Solo leen,
+así que sus consultas pueden ir a una réplica (core/enrutador.py).
+"""
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from core.enrutador import lectura_replica
+from core.services import PrecioService
+from .autenticacion import JWTAutenticacion
+from .renderers import render_json
+from .serializers import (
+    ListaPrecioNuevaSerializer, CalcularPrecioRequestSerializer, CalcularPrecioResponseSerializer,
+    CalcularPrecioLoteRequestSerializer, EscanearCodigoRequestSerializer
+)
+
+
+def _respuesta(data, status_code=status.HTTP_200_OK):
+    """Serializar con el mismo renderer JSON que las vistas DRF"""
+    return HttpResponse(render_json(data), status=status_code, content_type='application/json')
+
+
+def _autenticar_y_limitar(request):
+    """
+    Autenticar por JWT y aplicar los throttles por defecto.
+    Es síncrono (usa la caché y, si hace falta, la base de datos); se llama con sync_to_async.
+
+    Returns:
+        HttpResponse de error o None si la petición puede continuar
+    """
+    try:
+        resultado = JWTAutenticacion().authenticate(request)
+    except (InvalidToken, AuthenticationFailed) as e:
+        return _respuesta({'detail': str(e.detail)}, status.HTTP_401_UNAUTHORIZED)
+    if resultado is None:
+        return _respuesta(
+            {'detail': 'Las credenciales de autenticación no se proveyeron.'},
+            status.HTTP_401_UNAUTHORIZED
+        )
+    request.user = resultado[0]
+
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view=None):
+            return _respuesta(
+                {'detail': 'Solicitud limitada por exceso de peticiones.'},
+                status.HTTP_429_TOO_MANY_REQUESTS
+            )
+    return None
+
+
+def _leer_json(request):
+    """Decodificar el cuerpo JSON de la petición (None si es inválido)"""
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+
+
+@lectura_replica
+@csrf_exempt
+@require_POST
+async def calcular_precio(request):
+    """
+    Versión asíncrona de CalcularPrecioViewSet.calcular (mismo cuerpo y respuesta).
+    """
+    error = await sync_to_async(_autenticar_y_limitar)(request)
+    if error:
+        return error
+
+    serializer = CalcularPrecioRequestSerializer(data=_leer_json(request))
+    if not serializer.is_valid():
+        return _respuesta(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+
+    try:
+        resultado = await PrecioService.acalcular_precio(
+            empresa_id=data['empresa_id'],
+            sucursal_id=data.get('sucursal_id'),
+            articulo_id=data['articulo_id'],
+            canal=data.get('canal'),
+            cantidad=data.get('cantidad', 1),
+            monto_pedido=Decimal(str(data.get('monto_pedido', 0))),
+            fecha=data.get('fecha')
+        )
+        return _respuesta(CalcularPrecioResponseSerializer(resultado).data)
+
+    except Exception as e:
+        return _respuesta({'error': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@lectura_replica
+@require_GET
+async def lista_vigente(request):
+    """
+    Versión asíncrona de CalcularPrecioViewSet.lista_vigente.
+
+    Query params:
+    - empresa_id: UUID de la empresa (requerido)
+    - sucursal_id: UUID de la sucursal (opcional)
+    - fecha: Fecha para verificar vigencia (opcional, default: hoy)
+    """
+    error = await sync_to_async(_autenticar_y_limitar)(request)
+    if error:
+        return error
+
+    empresa_id = request.GET.get('empresa_id', None)
+    sucursal_id = request.GET.get('sucursal_id', None)
+    fecha_str = request.GET.get('fecha', None)
+
+    if not empresa_id:
+        return _respuesta({'error': 'empresa_id es requerido'}, status.HTTP_400_BAD_REQUEST)
+
+    fecha = None
+    if fecha_str:
+        try:
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+        except ValueError:
+            return _respuesta(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status.HTTP_400_BAD_REQUEST
+            )
+
+    try:
+        lista = await PrecioService.aobtener_lista_vigente(
+            empresa_id=empresa_id,
+            sucursal_id=sucursal_id,
+            fecha=fecha
+        )
+
+        if lista:
+            return _respuesta(ListaPrecioNuevaSerializer(lista).data)
+        return _respuesta(
+            {'error': 'No se encontró una lista de precios vigente'},
+            status.HTTP_404_NOT_FOUND
+        )
+
+    except Exception as e:
+        return _respuesta({'error': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@lectura_replica
+@csrf_exempt
+@require_POST
+async def calcular_lote(request):
+    """
+    Calcular el precio de varios artículos de un pedido en una sola petición.
+
+    Request body:
+    {
+        "empresa_id": "uuid",
+        "sucursal_id": "uuid" (opcional),
+        "canal": 1 (opcional),
+        "monto_pedido": 0.00,
+        "fecha": "2025-01-01" (opcional),
+        "items": [{"articulo_id": "uuid", "cantidad": 1}, ...]
+    }
+
+    Response:
+    {
+        "resultados": [{"articulo_id": "uuid", "precio_base": ..., "precio_final": ..., ...}]
+    }
+    """
+    error = await sync_to_async(_autenticar_y_limitar)(request)
+    if error:
+        return error
+
+    serializer = CalcularPrecioLoteRequestSerializer(data=_leer_json(request))
+    if not serializer.is_valid():
+        return _respuesta(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+
+    try:
+        resultados = await PrecioService.acalcular_lote(
+            empresa_id=data['empresa_id'],
+            sucursal_id=data.get('sucursal_id'),
+            items=data['items'],
+            canal=data.get('canal'),
+            monto_pedido=Decimal(str(data.get('monto_pedido', 0))),
+            fecha=data.get('fecha')
+        )
+        return _respuesta({
+            'resultados': CalcularPrecioResponseSerializer(resultados, many=True).data
+        })
+
+    except Exception as e:
+        return _respuesta({'error': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@lectura_replica
+@require_GET
+async def escanear(request):
+    """
+    Precio de un artículo a partir de su código de barras.
+
+    Query params:
+    - empresa_id: UUID de la empresa (requerido)
+    - codigo_barras: Código leído por la terminal (requerido)
+    - sucursal_id, canal, cantidad, fecha: opcionales, como en calcular
+    """
+    error = await sync_to_async(_autenticar_y_limitar)(request)
+    if error:
+        return error
+
+    serializer = EscanearCodigoRequestSerializer(data=request.GET.dict())
+    if not serializer.is_valid():
+        return _respuesta(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+
+    try:
+        articulo, resultado = await PrecioService.aescanear_codigo_barras(
+            empresa_id=data['empresa_id'],
+            sucursal_id=data.get('sucursal_id'),
+            codigo_barras=data['codigo_barras'],
+            canal=data.get('canal'),
+            cantidad=data.get('cantidad', 1),
+            fecha=data.get('fecha')
+        )
+        if articulo is None:
+            return _respuesta(
+                {'error': 'No existe un artículo activo con ese código de barras'},
+                status.HTTP_404_NOT_FOUND
+            )
+
+        respuesta = CalcularPrecioResponseSerializer(resultado).data
+        respuesta['articulo_id'] = str(articulo.articulo_id)
+        respuesta['codigo_articulo'] = articulo.codigo_articulo
+        respuesta['descripcion'] = articulo.descripcion
+        return _respuesta(respuesta)
+
+    except Exception as e:
+        return _respuesta({'error': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
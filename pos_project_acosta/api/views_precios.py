@@ -6,20 +6,74 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
+from django.http import HttpResponse
 from django.utils import timezone
+from datetime import datetime
 from decimal import Decimal
+import uuid
 
+from core import paquetes
 from core.services import PrecioService
 from core.models import (
     Empresa, Sucursal, ListaPrecio, PrecioArticulo, ReglaPrecio,
-    CombinacionProducto, DescuentoProveedor
+    CombinacionProducto, DescuentoProveedor, PrecioEfectivo
 )
 from .serializers import (
     EmpresaSerializer, SucursalSerializer, ListaPrecioNuevaSerializer,
     PrecioArticuloSerializer, ReglaPrecioSerializer, CombinacionProductoSerializer,
-    DescuentoProveedorSerializer, CalcularPrecioRequestSerializer, CalcularPrecioResponseSerializer
+    DescuentoProveedorSerializer, CalcularPrecioRequestSerializer, CalcularPrecioResponseSerializer,
+    PrecioEfectivoSerializer, PrecioArticuloFilasSerializer, ReglaPrecioFilasSerializer,
+    CombinacionProductoFilasSerializer, PrecioEfectivoFilasSerializer
 )
 from pos_project_acosta.choices import EstadoEntidades
+from .versiones import condicional, version_de
+
+
+def campos_solicitados(request):
+    """Campos pedidos con ?fields=a,b,c (None = todos)"""
+    fields = request.query_params.get('fields', None)
+    if not fields:
+        return None
+    return [campo.strip() for campo in fields.split(',') if campo.strip()]
+
+
+def version_listado(view, request, *args, **kwargs):
+    filas = view.filas_serializer_class(fields=campos_solicitados(request))
+    return version_de(view.filter_queryset(view.get_queryset()), relaciones=filas.relaciones())
+
+
+def version_lista(filas_serializer_class):
+    """Versión de las filas (y sus relaciones unidas) que pertenecen a la lista de la URL"""
+    modelo = filas_serializer_class.serializer_class.Meta.model
+
+    def version(view, request, lista_precio_id=None, *args, **kwargs):
+        try:
+            uuid.UUID(str(lista_precio_id))
+        except ValueError:
+            return None     # Sin ETag: la vista responde su 404
+        filas = filas_serializer_class(fields=campos_solicitados(request))
+        return version_de(modelo.objects.filter(lista_precio_id=lista_precio_id), relaciones=filas.relaciones())
+    return version
+
+
+class ListadoFilasMixin:
+    """
+    list() con un FilasSerializer: una consulta con las relaciones unidas en SQL
+    y sin instanciar modelos. Respeta la paginación y ?fields=, y responde 304
+    si los datos no cambiaron (ETag). Las lecturas pueden ir a una réplica.
+    """
+    filas_serializer_class = None
+    lectura_replica = {'list', 'retrieve'}
+
+    @condicional(version_listado)
+    def list(self, request, *args, **kwargs):
+        serializer = self.filas_serializer_class(fields=campos_solicitados(request))
+        filas = serializer.consulta(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(filas)
+        if page is not None:
+            return self.get_paginated_response(serializer.armar(page))
+        return Response(serializer.armar(filas))
 
 
 class EmpresaViewSet(viewsets.ModelViewSet):
@@ -68,6 +122,8 @@ class ListaPrecioViewSet(viewsets.ModelViewSet):
     serializer_class = ListaPrecioNuevaSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'lista_precio_id'
+    # Lecturas que pueden ir a una réplica (core/enrutador.py)
+    lectura_replica = {'list', 'retrieve', 'precios_articulos', 'reglas', 'combinaciones'}
 
     def get_queryset(self):
         queryset = ListaPrecio.objects.all()
@@ -92,41 +148,45 @@ class ListaPrecioViewSet(viewsets.ModelViewSet):
         serializer.save(creado_por=self.request.user)
 
     @action(detail=True, methods=['get'])
+    @condicional(version_lista(PrecioArticuloFilasSerializer))
     def precios_articulos(self, request, lista_precio_id=None):
         """Obtener todos los precios de artículos de una lista"""
         lista_precio = self.get_object()
         precios = PrecioArticulo.objects.filter(lista_precio=lista_precio)
-        serializer = PrecioArticuloSerializer(precios, many=True)
+        serializer = PrecioArticuloFilasSerializer(precios, fields=campos_solicitados(request))
         return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
+    @condicional(version_lista(ReglaPrecioFilasSerializer))
     def reglas(self, request, lista_precio_id=None):
         """Obtener todas las reglas de una lista"""
         lista_precio = self.get_object()
         reglas = ReglaPrecio.objects.filter(lista_precio=lista_precio)
-        serializer = ReglaPrecioSerializer(reglas, many=True)
+        serializer = ReglaPrecioFilasSerializer(reglas, fields=campos_solicitados(request))
         return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
+    @condicional(version_lista(CombinacionProductoFilasSerializer))
     def combinaciones(self, request, lista_precio_id=None):
         """Obtener todas las combinaciones de una lista"""
         lista_precio = self.get_object()
         combinaciones = CombinacionProducto.objects.filter(lista_precio=lista_precio)
-        serializer = CombinacionProductoSerializer(combinaciones, many=True)
+        serializer = CombinacionProductoFilasSerializer(combinaciones, fields=campos_solicitados(request))
         return Response(serializer.data)
 
 
-class PrecioArticuloViewSet(viewsets.ModelViewSet):
+class PrecioArticuloViewSet(ListadoFilasMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar precios de artículos
     """
     queryset = PrecioArticulo.objects.all()
     serializer_class = PrecioArticuloSerializer
+    filas_serializer_class = PrecioArticuloFilasSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'precio_articulo_id'
 
     def get_queryset(self):
-        queryset = PrecioArticulo.objects.all()
+        queryset = PrecioArticulo.objects.select_related('lista_precio', 'articulo')
         lista_precio_id = self.request.query_params.get('lista_precio_id', None)
         articulo_id = self.request.query_params.get('articulo_id', None)
         
@@ -140,17 +200,18 @@ class PrecioArticuloViewSet(viewsets.ModelViewSet):
         serializer.save(creado_por=self.request.user)
 
 
-class ReglaPrecioViewSet(viewsets.ModelViewSet):
+class ReglaPrecioViewSet(ListadoFilasMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar reglas de precio
     """
     queryset = ReglaPrecio.objects.all()
     serializer_class = ReglaPrecioSerializer
+    filas_serializer_class = ReglaPrecioFilasSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'regla_precio_id'
 
     def get_queryset(self):
-        queryset = ReglaPrecio.objects.all()
+        queryset = ReglaPrecio.objects.select_related('lista_precio', 'grupo', 'linea', 'articulo')
         lista_precio_id = self.request.query_params.get('lista_precio_id', None)
         tipo_regla = self.request.query_params.get('tipo_regla', None)
         estado = self.request.query_params.get('estado', None)
@@ -167,17 +228,18 @@ class ReglaPrecioViewSet(viewsets.ModelViewSet):
         serializer.save(creado_por=self.request.user)
 
 
-class CombinacionProductoViewSet(viewsets.ModelViewSet):
+class CombinacionProductoViewSet(ListadoFilasMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar combinaciones de productos
     """
     queryset = CombinacionProducto.objects.all()
     serializer_class = CombinacionProductoSerializer
+    filas_serializer_class = CombinacionProductoFilasSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'combinacion_id'
 
     def get_queryset(self):
-        queryset = CombinacionProducto.objects.all()
+        queryset = CombinacionProducto.objects.select_related('lista_precio', 'grupo', 'linea', 'articulo')
         lista_precio_id = self.request.query_params.get('lista_precio_id', None)
         estado = self.request.query_params.get('estado', None)
         
@@ -223,11 +285,64 @@ class DescuentoProveedorViewSet(viewsets.ModelViewSet):
         serializer.instance = descuento
 
 
+class PrecioEfectivoViewSet(ListadoFilasMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet de solo lectura para precios efectivos precalculados (cantidad 1, sin monto de pedido).
+    Se mantienen automáticamente al modificar precios, reglas o combinaciones.
+    """
+    queryset = PrecioEfectivo.objects.all()
+    serializer_class = PrecioEfectivoSerializer
+    filas_serializer_class = PrecioEfectivoFilasSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'precio_efectivo_id'
+    lectura_replica = True
+
+    def get_queryset(self):
+        queryset = PrecioEfectivo.objects.select_related('articulo')
+        lista_precio_id = self.request.query_params.get('lista_precio_id', None)
+        articulo_id = self.request.query_params.get('articulo_id', None)
+        canal = self.request.query_params.get('canal', None)
+
+        if lista_precio_id:
+            queryset = queryset.filter(lista_precio_id=lista_precio_id)
+        if articulo_id:
+            queryset = queryset.filter(articulo_id=articulo_id)
+        if canal:
+            queryset = queryset.filter(canal_venta=canal)
+        return queryset.order_by('articulo__descripcion', 'canal_venta')
+
+
 class CalcularPrecioViewSet(viewsets.ViewSet):
     """
     ViewSet para calcular precios aplicando todas las reglas y políticas
     """
     permission_classes = [IsAuthenticated]
+    # Cotizaciones: solo lecturas, pueden ir a una réplica (core/enrutador.py)
+    lectura_replica = True
+
+    def version_lista_vigente(self, request):
+        """Versión (ETag) de la lista vigente; None si los parámetros no son válidos"""
+        empresa_id = request.query_params.get('empresa_id', None)
+        sucursal_id = request.query_params.get('sucursal_id', None)
+        fecha_str = request.query_params.get('fecha', None)
+        try:
+            uuid.UUID(str(empresa_id))
+            if sucursal_id:
+                uuid.UUID(sucursal_id)
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date() if fecha_str else None
+        except ValueError:
+            return None
+
+        # lista_vigente() la reutiliza: no se resuelve dos veces por petición
+        self.lista_resuelta = lista = PrecioService.obtener_lista_vigente(empresa_id, sucursal_id, fecha)
+        if lista is None:
+            return None
+        return {
+            'lista_precio_id': lista.lista_precio_id,
+            'ultimo': lista.actualizado_en,
+            'empresa': lista.empresa.actualizado_en if lista.empresa_id else None,
+            'sucursal': lista.sucursal.actualizado_en if lista.sucursal_id else None,
+        }
 
     @action(detail=False, methods=['post'])
     def calcular(self, request):
@@ -284,6 +399,7 @@ class CalcularPrecioViewSet(viewsets.ViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @condicional(lambda view, request, *args, **kwargs: view.version_lista_vigente(request))
     def lista_vigente(self, request):
         """
         Obtener la lista de precios vigente para una empresa/sucursal
@@ -305,7 +421,6 @@ class CalcularPrecioViewSet(viewsets.ViewSet):
         
         fecha = None
         if fecha_str:
-            from datetime import datetime
             try:
                 fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
             except ValueError:
@@ -315,11 +430,14 @@ class CalcularPrecioViewSet(viewsets.ViewSet):
                 )
         
         try:
-            lista = PrecioService.obtener_lista_vigente(
-                empresa_id=empresa_id,
-                sucursal_id=sucursal_id,
-                fecha=fecha
-            )
+            if hasattr(self, 'lista_resuelta'):
+                lista = self.lista_resuelta
+            else:
+                lista = PrecioService.obtener_lista_vigente(
+                    empresa_id=empresa_id,
+                    sucursal_id=sucursal_id,
+                    fecha=fecha
+                )
             
             if lista:
                 serializer = ListaPrecioNuevaSerializer(lista)
@@ -336,3 +454,53 @@ class CalcularPrecioViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def version_paquete_offline(self, request):
+        """
+        Versión (ETag) del paquete offline sin armarlo: la de la lista vigente (sus
+        reglas y combinaciones la actualizan) más el agregado de sus precios y artículos
+        """
+        version = self.version_lista_vigente(request)
+        if version is None:
+            return None
+        precios = version_de(
+            PrecioArticulo.objects.filter(lista_precio_id=version['lista_precio_id']),
+            relaciones=('articulo',)
+        )
+        version.update({f'precios_{clave}': valor for clave, valor in precios.items()})
+        version['fecha'] = request.query_params.get('fecha') or timezone.now().date().isoformat()
+        version['formato'] = paquetes.VERSION_FORMATO
+        return version
+
+    @action(detail=False, methods=['get'])
+    @condicional(lambda view, request, *args, **kwargs: view.version_paquete_offline(request))
+    def paquete_offline(self, request):
+        """
+        Descargar el paquete de precios para operar sin conexión (core/paquetes.py).
+        El ETag sale de la versión de la lista y sus precios: con If-None-Match
+        responde 304 sin armar el paquete ni calcular su checksum.
+        
+        Query params:
+        - empresa_id: UUID de la empresa (requerido)
+        - sucursal_id: UUID de la sucursal (opcional)
+        - fecha: Fecha de vigencia (opcional, default: hoy)
+        """
+        empresa_id = request.query_params.get('empresa_id', None)
+        sucursal_id = request.query_params.get('sucursal_id', None)
+        fecha_str = request.query_params.get('fecha', None)
+        
+        try:
+            empresa_id = uuid.UUID(str(empresa_id))
+            sucursal_id = uuid.UUID(sucursal_id) if sucursal_id else None
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date() if fecha_str else None
+        except ValueError:
+            return Response(
+                {'error': 'empresa_id es requerido; sucursal_id debe ser un UUID y fecha YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        datos, _ = PrecioService.generar_paquete_offline(empresa_id, sucursal_id, fecha)
+        respuesta = HttpResponse(datos, content_type='application/octet-stream')
+        respuesta['Content-Disposition'] = (
+            f'attachment; filename="precios_{sucursal_id or empresa_id}.paquete"'
+        )
+        return respuesta
@@ -0,0 +1,298 @@
+# api/views_sync.py
+"""
+Sincronización incremental para terminales POS sin conexión permanente.
+
+GET /api/sync/?empresa_id=<uuid>&sucursal_id=<uuid>&cursor=<cursor>&tamano=<n>
+
+La empresa y la sucursal salen del usuario (empresa_sucursal_permitidas): los
+parámetros solo los elige el staff; para el resto deben coincidir con las suyas.
+
+Devuelve en NDJSON (una línea JSON por cambio) las listas de precios de la
+empresa/sucursal, el catálogo de artículos y los precios, reglas y combinaciones
+de esas listas que cambiaron desde el cursor, seguidos de las bajas registradas
+en RegistroEliminacion:
+
+    {"modelo": "precio_articulo", "op": "guardar", "datos": {...}}
+    {"modelo": "regla_precio", "op": "eliminar", "id": "uuid"}
+    {"cursor": "...", "mas": false}
+
+La última línea trae el cursor para la siguiente llamada; con "mas": true el
+cliente debe pedir la página siguiente de inmediato. Sin cursor se envía todo
+(sincronización inicial, sin bajas). Un cursor más antiguo que
+SYNC_RETENCION_DIAS responde 410 y el cliente debe sincronizar desde cero.
+
+Cada sincronización cubre la ventana (desde, hasta], con hasta = ahora menos
+SYNC_MARGEN_SEGUNDOS, para no saltarse filas de transacciones que confirman con
+un actualizado_en anterior al momento de la consulta.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.alcance import alcance_de_usuario
+from core.models import (
+    ListaPrecio, Articulo, PrecioArticulo, ReglaPrecio, CombinacionProducto, RegistroEliminacion, Sucursal
+)
+from .renderers import render_json
+from .serializers import (
+    ListaPrecioFilasSerializer, ArticuloFilasSerializer, PrecioArticuloFilasSerializer,
+    ReglaPrecioFilasSerializer, CombinacionProductoFilasSerializer
+)
+
+# (modelo en el flujo, clase, serializer de filas, campos enviados)
+MODELOS = [
+    ('lista_precio', ListaPrecio, ListaPrecioFilasSerializer, [
+        'lista_precio_id', 'empresa', 'sucursal', 'nombre', 'tipo', 'canal_venta',
+        'fecha_inicio', 'fecha_fin', 'estado', 'actualizado_en'
+    ]),
+    ('articulo', Articulo, ArticuloFilasSerializer, None),
+    ('precio_articulo', PrecioArticulo, PrecioArticuloFilasSerializer, [
+        'precio_articulo_id', 'lista_precio', 'articulo', 'precio_base', 'ultimo_costo',
+        'autorizado_bajo_costo', 'actualizado_en'
+    ]),
+    ('regla_precio', ReglaPrecio, ReglaPrecioFilasSerializer, [
+        'regla_precio_id', 'lista_precio', 'tipo_regla', 'nombre', 'prioridad', 'canal_venta',
+        'cantidad_minima', 'cantidad_maxima', 'monto_minimo', 'monto_maximo',
+        'monto_total_minimo', 'monto_total_maximo', 'tipo_descuento', 'valor_descuento',
+        'grupo', 'linea', 'articulo', 'estado', 'actualizado_en'
+    ]),
+    ('combinacion_producto', CombinacionProducto, CombinacionProductoFilasSerializer, [
+        'combinacion_id', 'lista_precio', 'nombre', 'grupo', 'linea', 'articulo',
+        'cantidad_minima_combinacion', 'cantidad_maxima_combinacion',
+        'tipo_descuento', 'valor_descuento', 'estado', 'actualizado_en'
+    ]),
+]
+ELIMINACIONES = len(MODELOS)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(datos):
+    texto = json.dumps(datos, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(texto).decode().rstrip('=')
+
+
+def _fecha_cursor(texto):
+    """Fecha ISO del cursor; las que no traen zona horaria no las generó el servidor"""
+    if not texto:
+        return None
+    fecha = datetime.fromisoformat(texto)
+    if timezone.is_naive(fecha):
+        raise CursorInvalido(f'Fecha sin zona horaria: {texto}')
+    return fecha
+
+
+def decodificar_cursor(cursor):
+    """
+    Cursor: desde/hasta de la ventana, modelo en curso y última fila enviada (fecha, pk).
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return {
+            'desde': _fecha_cursor(datos.get('desde')),
+            'hasta': _fecha_cursor(datos.get('hasta')),
+            'modelo': int(datos.get('modelo', 0)),
+            'fecha': _fecha_cursor(datos.get('fecha')),
+            'pk': str(uuid.UUID(datos['pk'])) if datos.get('pk') else None,
+        }
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise CursorInvalido(str(e))
+
+
+def _uuid(valor):
+    return uuid.UUID(str(valor)) if valor else None
+
+
+def empresa_sucursal_permitidas(usuario, empresa_id, sucursal_id):
+    """
+    Empresa y sucursal a sincronizar según el alcance del usuario (core/alcance.py).
+    El staff elige ambas por parámetro; el resto sincroniza su empresa (y su sucursal
+    si la tiene asignada), y los parámetros solo pueden repetirlas o, sin sucursal
+    asignada, elegir una sucursal de su empresa.
+
+    Returns:
+        (empresa_id, sucursal_id) o None si el usuario no tiene acceso
+    """
+    alcance = alcance_de_usuario(usuario)
+    if alcance.global_:
+        return empresa_id, sucursal_id
+
+    propia, sucursal_propia = _uuid(alcance.empresa_id), _uuid(alcance.sucursal_id)
+    if propia is None or empresa_id not in (None, propia):
+        return None
+    if sucursal_propia is not None:
+        return (propia, sucursal_propia) if sucursal_id in (None, sucursal_propia) else None
+    if sucursal_id and not Sucursal._base_manager.filter(pk=sucursal_id, empresa_id=propia).exists():
+        return None
+    return propia, sucursal_id
+
+
+class SincronizacionView(APIView):
+    """
+    Cambios desde un cursor para una empresa/sucursal, en NDJSON.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            empresa_id = _uuid(request.query_params.get('empresa_id', None))
+            sucursal_id = _uuid(request.query_params.get('sucursal_id', None))
+        except ValueError:
+            return Response(
+                {'error': 'empresa_id y sucursal_id deben ser UUID válidos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        permitidas = empresa_sucursal_permitidas(request.user, empresa_id, sucursal_id)
+        if permitidas is None:
+            return Response(
+                {'error': 'No tiene acceso a la empresa o sucursal solicitada'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        empresa_id, sucursal_id = permitidas
+        if empresa_id is None:
+            return Response({'error': 'empresa_id es requerido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        tamano = request.query_params.get('tamano', '')
+        tamano = min(int(tamano), settings.SYNC_TAMANO_PAGINA) if tamano.isdigit() and int(tamano) > 0 \
+            else settings.SYNC_TAMANO_PAGINA
+
+        cursor = request.query_params.get('cursor', None)
+        if cursor:
+            try:
+                posicion = decodificar_cursor(cursor)
+            except CursorInvalido:
+                return Response({'error': 'Cursor inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            posicion = {'desde': None, 'hasta': None, 'modelo': 0, 'fecha': None, 'pk': None}
+
+        ahora = timezone.now()
+        if posicion['desde'] and posicion['desde'] < ahora - timedelta(days=settings.SYNC_RETENCION_DIAS):
+            return Response(
+                {'error': 'El cursor es demasiado antiguo; sincronice desde cero', 'resincronizar': True},
+                status=status.HTTP_410_GONE
+            )
+        if posicion['hasta'] is None:
+            posicion['hasta'] = ahora - timedelta(seconds=settings.SYNC_MARGEN_SEGUNDOS)
+
+        return StreamingHttpResponse(
+            self.generar(empresa_id, sucursal_id, posicion, tamano),
+            content_type='application/x-ndjson'
+        )
+
+    @staticmethod
+    def alcance_listas(empresa_id, sucursal_id):
+        """Listas de la empresa (generales) y de la sucursal"""
+        alcance = Q(empresa_id=empresa_id, sucursal__isnull=True)
+        if sucursal_id:
+            alcance |= Q(sucursal_id=sucursal_id)
+        return alcance
+
+    @staticmethod
+    def consulta_modelo(clase, listas):
+        """El catálogo de artículos es común; el resto se limita a las listas del alcance"""
+        if clase is Articulo:
+            return clase.objects.all()
+        return clase.objects.filter(lista_precio_id__in=listas)
+
+    @staticmethod
+    def consulta_eliminaciones(empresa_id, sucursal_id, listas):
+        bajas_listas = Q(modelo='lista_precio', empresa_id=empresa_id, sucursal_id__isnull=True)
+        if sucursal_id:
+            bajas_listas |= Q(modelo='lista_precio', sucursal_id=sucursal_id)
+        # Incluye las filas de listas ya eliminadas que pertenecían al alcance
+        listas = set(listas) | set(
+            RegistroEliminacion._base_manager.filter(bajas_listas).values_list('objeto_id', flat=True)
+        )
+        # objects además limita las bajas al alcance de la petición (RegistroEliminacion.filtro_alcance)
+        return RegistroEliminacion.objects.filter(
+            bajas_listas | Q(modelo='articulo') | Q(lista_precio_id__in=listas)
+        )
+
+    @staticmethod
+    def ventana(queryset, campo, pk, posicion):
+        """Filtrar por (desde, hasta] y continuar después de la última fila enviada"""
+        queryset = queryset.filter(**{f'{campo}__lte': posicion['hasta']})
+        if posicion['desde']:
+            queryset = queryset.filter(**{f'{campo}__gt': posicion['desde']})
+        if posicion['fecha']:
+            queryset = queryset.filter(
+                Q(**{f'{campo}__gt': posicion['fecha']}) | Q(**{campo: posicion['fecha'], f'{pk}__gt': posicion['pk']})
+            )
+        return queryset.order_by(campo, pk)
+
+    def generar(self, empresa_id, sucursal_id, posicion, tamano):
+        listas = list(
+            ListaPrecio.objects.filter(self.alcance_listas(empresa_id, sucursal_id))
+            .values_list('lista_precio_id', flat=True)
+        )
+        restantes = tamano
+
+        while posicion['modelo'] <= ELIMINACIONES and restantes > 0:
+            if posicion['modelo'] < ELIMINACIONES:
+                enviadas, ultima = yield from self.generar_modelo(posicion, listas, restantes)
+            elif posicion['desde']:
+                enviadas, ultima = yield from self.generar_eliminaciones(
+                    empresa_id, sucursal_id, posicion, listas, restantes
+                )
+            else:
+                enviadas, ultima = 0, None  # La sincronización inicial no necesita bajas
+
+            restantes -= enviadas
+            if restantes > 0:
+                # Modelo completo: pasar al siguiente
+                posicion.update(modelo=posicion['modelo'] + 1, fecha=None, pk=None)
+            else:
+                posicion.update(fecha=ultima[0], pk=str(ultima[1]))
+
+        mas = posicion['modelo'] <= ELIMINACIONES
+        if mas:
+            siguiente = {
+                'desde': posicion['desde'].isoformat() if posicion['desde'] else None,
+                'hasta': posicion['hasta'].isoformat(),
+                'modelo': posicion['modelo'],
+                'fecha': posicion['fecha'].isoformat() if posicion['fecha'] else None,
+                'pk': posicion['pk'],
+            }
+        else:
+            siguiente = {'desde': posicion['hasta'].isoformat()}
+        yield render_json({'cursor': codificar_cursor(siguiente), 'mas': mas}) + b'\n'
+
+    def generar_modelo(self, posicion, listas, restantes):
+        nombre, clase, filas_serializer_class, campos = MODELOS[posicion['modelo']]
+        serializer = filas_serializer_class(fields=campos)
+        pk = clase._meta.pk.name
+        queryset = self.ventana(self.consulta_modelo(clase, listas), 'actualizado_en', pk, posicion)
+        crudas = list(serializer.consulta(queryset)[:restantes])
+
+        lookups = serializer.lookups()
+        i_fecha, i_pk = lookups.index('actualizado_en'), lookups.index(pk)
+        for datos in serializer.iterar(crudas):
+            yield render_json({'modelo': nombre, 'op': 'guardar', 'datos': datos}) + b'\n'
+
+        ultima = (crudas[-1][i_fecha], crudas[-1][i_pk]) if crudas else None
+        return len(crudas), ultima
+
+    def generar_eliminaciones(self, empresa_id, sucursal_id, posicion, listas, restantes):
+        queryset = self.ventana(
+            self.consulta_eliminaciones(empresa_id, sucursal_id, listas), 'eliminado_en', 'registro_id', posicion
+        )
+        crudas = list(queryset.values_list('modelo', 'objeto_id', 'eliminado_en', 'registro_id')[:restantes])
+        for modelo, objeto_id, _, _ in crudas:
+            yield render_json({'modelo': modelo, 'op': 'eliminar', 'id': objeto_id}) + b'\n'
+
+        ultima = (crudas[-1][2], crudas[-1][3]) if crudas else None
+        return len(crudas), ultima
@@ -0,0 +1,327 @@
+# api/views_ubicaciones.py
+"""
+Ubicaciones GPS de los dispositivos móviles de la fuerza de ventas.
+
+POST /api/ubicaciones/lote/
+
+    {"imei": "356938035643809",
+     "ubicaciones": [{"latitud": -6.771, "longitud": -79.840, "fecha_hora": "2025-11-04T10:00:05Z",
+                      "precision": 8.0, "altitud": 30.0, "velocidad": 1.2}, ...]}
+
+Solo el usuario asignado al dispositivo (DispositivoMovil.usuario) o quien tenga el
+permiso PERMISO_INGESTA puede enviar sus fixes; si no, responde 403.
+Responde 202 cuando el lote quedó en el buffer de ingesta (accounts/ubicaciones.py),
+con los aceptados, los duplicados y los fixes rechazados por índice. Con el buffer
+lleno responde 503 con Retry-After y el dispositivo debe reenviar el lote.
+
+GET /api/ubicaciones/cercanas/?latitud=-6.77&longitud=-79.84&radio_km=5&limite=20&minutos=30
+GET /api/ubicaciones/area/?sur=-6.8&oeste=-79.9&norte=-6.7&este=-79.8&limite=500&minutos=30
+
+Última posición de los dispositivos (con su vendedor) cerca de un punto, del más
+cercano al más lejano, o dentro de un rectángulo. Se responden desde el índice en
+memoria de accounts/proximidad.py; minutos descarta posiciones más viejas. Son
+solo para supervisores (PERMISO_SUPERVISION) y muestran los dispositivos de los
+usuarios de su empresa.
+
+GET /api/ubicaciones/dispositivos/<id>/recorrido/?desde=...&hasta=...&tolerancia=10&maximo=2000
+
+Recorrido de un dispositivo en una ventana de hasta UBICACIONES_RECORRIDO_MAXIMO_HORAS,
+opcionalmente simplificado (Douglas–Peucker) a una tolerancia en metros o a un
+máximo de puntos. Los puntos van como encoded polyline y los tiempos como
+segundos desde "inicio", con la misma codificación (accounts/recorridos.py):
+
+    {"dispositivo": 1, "puntos": 17280, "enviados": 412, "precision": 5,
+     "inicio": "2025-11-04T10:00:00Z", "polilinea": "zxq`@...", "tiempos": "?_@..."}
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import BasePermission, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts.models import DispositivoMovil, UbicacionDispositivo
+from accounts.proximidad import indice_ubicaciones
+from accounts.recorridos import codificar_enteros, codificar_polilinea, simplificar
+from accounts.ubicaciones import BufferLleno, buffer_ubicaciones, dispositivo_por_imei, normalizar_fix
+from core.alcance import alcance_de_usuario
+
+# Credencial de pasarela: enviar fixes de dispositivos asignados a otros usuarios
+PERMISO_INGESTA = 'accounts.add_ubicaciondispositivo'
+# Supervisores: ver las posiciones y recorridos de los dispositivos de su empresa
+PERMISO_SUPERVISION = 'accounts.view_ubicaciondispositivo'
+
+
+class SupervisaUbicaciones(BasePermission):
+    """Usuarios con PERMISO_SUPERVISION"""
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.has_perm(PERMISO_SUPERVISION))
+
+
+def dispositivos_visibles(usuario):
+    """
+    Dispositivos cuyas ubicaciones puede ver el usuario: los asignados a él y, con
+    PERMISO_SUPERVISION, los de los usuarios de su empresa (todos con alcance global,
+    core/alcance.py).
+    """
+    propios = Q(usuario_id=usuario.pk)
+    if not usuario.has_perm(PERMISO_SUPERVISION):
+        return DispositivoMovil.objects.filter(propios)
+    alcance = alcance_de_usuario(usuario)
+    if alcance.global_:
+        return DispositivoMovil.objects.all()
+    if alcance.empresa_id is None:
+        return DispositivoMovil.objects.filter(propios)
+    return DispositivoMovil.objects.filter(propios | Q(usuario__empresa_id=alcance.empresa_id))
+
+
+def _ids_visibles(usuario):
+    """Ids de dispositivos_visibles de un supervisor para filtrar el índice; None si ve todos"""
+    if alcance_de_usuario(usuario).global_:
+        return None
+    return set(dispositivos_visibles(usuario).values_list('id', flat=True))
+
+
+class IngestaUbicacionesView(APIView):
+    """
+    Recibir un lote de fixes de un dispositivo.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        imei = request.data.get('imei') if isinstance(request.data, dict) else None
+        ubicaciones = request.data.get('ubicaciones') if imei else None
+        if not imei or not isinstance(ubicaciones, list):
+            return Response(
+                {'error': 'Se requieren imei y una lista de ubicaciones'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ubicaciones) > settings.UBICACIONES_MAXIMO_POR_LOTE:
+            return Response(
+                {'error': f'Máximo {settings.UBICACIONES_MAXIMO_POR_LOTE} ubicaciones por lote'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        dispositivo = dispositivo_por_imei(str(imei))
+        if dispositivo is None:
+            return Response({'error': 'Dispositivo no registrado'}, status=status.HTTP_404_NOT_FOUND)
+        dispositivo_id, usuario_id = dispositivo
+        if usuario_id != request.user.pk and not request.user.has_perm(PERMISO_INGESTA):
+            return Response(
+                {'error': 'El dispositivo no está asignado al usuario'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        ahora = timezone.now()
+        fixes, rechazados = [], []
+        for indice, dato in enumerate(ubicaciones):
+            try:
+                fixes.append(normalizar_fix(dato, ahora))
+            except ValueError as e:
+                rechazados.append({'indice': indice, 'error': str(e)})
+
+        buffer = buffer_ubicaciones()
+        try:
+            aceptados, duplicados = buffer.agregar(dispositivo_id, fixes)
+        except BufferLleno:
+            respuesta = Response(
+                {'error': 'Ingesta saturada, reintente más tarde'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            respuesta['Retry-After'] = str(max(1, round(buffer.intervalo)))
+            return respuesta
+
+        return Response(
+            {'aceptados': aceptados, 'duplicados': duplicados, 'rechazados': rechazados},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+def _parametro_float(request, nombre, minimo, maximo, default=None):
+    valor = request.query_params.get(nombre)
+    if valor in (None, ''):
+        if default is None:
+            raise ValueError(f'{nombre} es requerido')
+        return default
+    try:
+        numero = float(valor)
+    except ValueError:
+        raise ValueError(f'{nombre} inválido')
+    if not minimo <= numero <= maximo:
+        raise ValueError(f'{nombre} fuera de rango')
+    return numero
+
+
+def _desde(request):
+    minutos = request.query_params.get('minutos')
+    if not minutos:
+        return None
+    try:
+        minutos = int(minutos)
+    except ValueError:
+        raise ValueError('minutos inválido')
+    try:
+        return timezone.now() - timedelta(minutes=minutos)
+    except OverflowError:
+        raise ValueError('minutos fuera de rango')
+
+
+def _con_dispositivos(encontrados):
+    """Agregar imei y vendedor a los resultados del índice (una sola consulta)"""
+    dispositivos = {
+        dispositivo['id']: dispositivo
+        for dispositivo in DispositivoMovil.objects.filter(
+            id__in=[encontrado['dispositivo'] for encontrado in encontrados]
+        ).values('id', 'imei', 'numero_celular', 'usuario_id', 'usuario__full_name')
+    }
+    resultado = []
+    for encontrado in encontrados:
+        dispositivo = dispositivos.get(encontrado['dispositivo'])
+        if dispositivo is None:
+            continue
+        resultado.append({
+            **encontrado,
+            'imei': dispositivo['imei'],
+            'numero_celular': dispositivo['numero_celular'],
+            'usuario': dispositivo['usuario_id'],
+            'vendedor': dispositivo['usuario__full_name'],
+        })
+    return resultado
+
+
+class UbicacionesCercanasView(APIView):
+    """
+    Dispositivos a menos de radio_km (default 5, máximo 200) de un punto.
+    """
+    permission_classes = [IsAuthenticated, SupervisaUbicaciones]
+
+    def get(self, request):
+        try:
+            latitud = _parametro_float(request, 'latitud', -90, 90)
+            longitud = _parametro_float(request, 'longitud', -180, 180)
+            radio_km = _parametro_float(request, 'radio_km', 0, 200, default=5)
+            limite = int(_parametro_float(request, 'limite', 1, 500, default=50))
+            desde = _desde(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        encontrados = indice_ubicaciones().en_radio(
+            latitud, longitud, radio_km * 1000, limite=limite, desde=desde,
+            dispositivos=_ids_visibles(request.user)
+        )
+        return Response(_con_dispositivos([
+            {
+                'dispositivo': dispositivo_id,
+                'latitud': latitud_d,
+                'longitud': longitud_d,
+                'fecha_hora': fecha_hora,
+                'distancia_metros': round(distancia, 1),
+            }
+            for distancia, dispositivo_id, latitud_d, longitud_d, fecha_hora in encontrados
+        ]))
+
+
+class UbicacionesAreaView(APIView):
+    """
+    Dispositivos dentro de un rectángulo (sur, oeste, norte, este); con más de
+    limite (default 500, máximo 2000), los de posición más reciente.
+    """
+    permission_classes = [IsAuthenticated, SupervisaUbicaciones]
+
+    def get(self, request):
+        try:
+            sur = _parametro_float(request, 'sur', -90, 90)
+            oeste = _parametro_float(request, 'oeste', -180, 180)
+            norte = _parametro_float(request, 'norte', -90, 90)
+            este = _parametro_float(request, 'este', -180, 180)
+            limite = int(_parametro_float(request, 'limite', 1, 2000, default=500))
+            desde = _desde(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if sur > norte or oeste > este:
+            return Response(
+                {'error': 'Se requiere sur <= norte y oeste <= este'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        encontrados = indice_ubicaciones().en_rectangulo(
+            sur, oeste, norte, este, limite=limite, desde=desde, dispositivos=_ids_visibles(request.user)
+        )
+        return Response(_con_dispositivos([
+            {'dispositivo': dispositivo_id, 'latitud': latitud, 'longitud': longitud, 'fecha_hora': fecha_hora}
+            for dispositivo_id, latitud, longitud, fecha_hora in encontrados
+        ]))
+
+
+def _parametro_fecha(request, nombre, default):
+    valor = request.query_params.get(nombre)
+    if not valor:
+        return default
+    try:
+        fecha = datetime.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f'{nombre} inválida')
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha, dt_timezone.utc)
+    return fecha
+
+
+class RecorridoView(APIView):
+    """
+    Recorrido de un dispositivo en [desde, hasta) (default: las últimas 24 horas).
+    Lo ven el usuario asignado al dispositivo y los supervisores de su empresa
+    (dispositivos_visibles).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dispositivo_id):
+        try:
+            hasta = _parametro_fecha(request, 'hasta', timezone.now())
+            desde = _parametro_fecha(request, 'desde', hasta - timedelta(hours=24))
+            tolerancia = _parametro_float(request, 'tolerancia', 0, 10000, default=0) or None
+            maximo = request.query_params.get('maximo')
+            maximo = int(_parametro_float(request, 'maximo', 2, 100000)) if maximo else None
+            precision = int(_parametro_float(request, 'precision', 5, 6, default=5))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except OverflowError:
+            # hasta en el límite de datetime: hasta - 24 horas no es representable
+            return Response({'error': 'Fecha fuera de rango'}, status=status.HTTP_400_BAD_REQUEST)
+        if desde >= hasta or hasta - desde > timedelta(hours=settings.UBICACIONES_RECORRIDO_MAXIMO_HORAS):
+            return Response(
+                {'error': f'La ventana debe ser positiva y de hasta {settings.UBICACIONES_RECORRIDO_MAXIMO_HORAS} horas'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Fuera del alcance del usuario el dispositivo no existe, como con AlcanceManager
+        if not dispositivos_visibles(request.user).filter(pk=dispositivo_id).exists():
+            return Response({'error': 'Dispositivo no registrado'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Recorrido en orden del índice (dispositivo, fecha_hora), leído por bloques
+        puntos, fechas = [], []
+        for latitud, longitud, fecha_hora in (
+            UbicacionDispositivo.objects
+            .filter(dispositivo_id=dispositivo_id, fecha_hora__gte=desde, fecha_hora__lt=hasta)
+            .order_by('fecha_hora')
+            .values_list('latitud', 'longitud', 'fecha_hora')
+            .iterator(chunk_size=5000)
+        ):
+            puntos.append((float(latitud), float(longitud)))
+            fechas.append(fecha_hora)
+
+        conservados = simplificar(puntos, tolerancia=tolerancia, maximo=maximo)
+        inicio = fechas[0] if fechas else None
+        return Response({
+            'dispositivo': dispositivo_id,
+            'desde': desde,
+            'hasta': hasta,
+            'puntos': len(puntos),
+            'enviados': len(conservados),
+            'precision': precision,
+            'inicio': inicio,
+            'polilinea': codificar_polilinea((puntos[i] for i in conservados), precision),
+            'tiempos': codificar_enteros(round((fechas[i] - inicio).total_seconds()) for i in conservados),
+        })
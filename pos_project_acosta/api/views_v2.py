@@ -5,11 +5,12 @@ from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Count
 
-from core.models import Articulo, OrdenCompraCliente, GrupoArticulo, LineaArticulo
-from .serializers import ArticuloSerializer, ArticuloListSerializer, OrdenSerializer, ListaPrecioSerializer
+from core.models import Articulo, GrupoArticulo, LineaArticulo
+from .serializers import ArticuloSerializer, ArticuloListSerializer, ListaPrecioSerializer
 from .permissions import IsAdminOrReadOnly
 from .throttling import SustainedRateThrottle
 from .pagination import CustomPagination
+from .views import anotar_precio_efectivo, OrdenesMixin
 
 
 class ArticuloViewSetV2(viewsets.ModelViewSet):
@@ -28,6 +29,14 @@ class ArticuloViewSetV2(viewsets.ModelViewSet):
     throttle_classes = [SustainedRateThrottle]
     permission_classes = [IsAdminOrReadOnly]
     pagination_class = CustomPagination
+    # Lecturas que pueden ir a una réplica (core/enrutador.py)
+    lectura_replica = {'list', 'retrieve', 'precios', 'stats'}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            return anotar_precio_efectivo(queryset, self.request)
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -72,35 +81,20 @@ class ArticuloViewSetV2(viewsets.ModelViewSet):
         })
 
 
-class OrdenViewSetV2(viewsets.ReadOnlyModelViewSet):
+class OrdenViewSetV2(OrdenesMixin, viewsets.ReadOnlyModelViewSet):
     """
     API v2: Un viewset para ver órdenes (solo lectura).
+    Solo las órdenes del usuario actual, a menos que sea staff.
     """
-    queryset = OrdenCompraCliente.objects.all()
-    serializer_class = OrdenSerializer
     pagination_class = CustomPagination
 
-    def get_queryset(self):
-        """
-        Este viewset debe devolver solo las órdenes del usuario actual,
-        a menos que sea staff.
-        """
-        user = self.request.user
-        if user.is_staff:
-            return OrdenCompraCliente.objects.all()
-
-        # Para usuarios normales, mostrar solo sus propias órdenes
-        return OrdenCompraCliente.objects.filter(
-            cliente__correo_electronico=user.email
-        )
-
     @action(detail=True, methods=['post'])
     def cancelar(self, request, pk=None):
         """
         Endpoint para cancelar una orden.
         POST /api/v2/ordenes/{id}/cancelar/
         """
-        from pos_project.choices import EstadoOrden
+        from pos_project_acosta.choices import EstadoOrden
         orden = self.get_object()
 
         # Solo se pueden cancelar órdenes pendientes
@@ -121,7 +115,7 @@ class OrdenViewSetV2(viewsets.ReadOnlyModelViewSet):
         Endpoint nuevo en V2 que muestra solo órdenes pendientes.
         GET /api/v2/ordenes/pendientes/
         """
-        from pos_project.choices import EstadoOrden
+        from pos_project_acosta.choices import EstadoOrden
 
         ordenes = self.get_queryset().filter(estado=EstadoOrden.PENDIENTE)
         page = self.paginate_queryset(ordenes)
@@ -0,0 +1,80 @@
+"""
+Aislamiento por empresa/sucursal (multiempresa).
+
+El alcance de la petición (empresa y, opcionalmente, sucursal del usuario) lo
+fija AlcanceMiddleware (api/autenticacion.py) a partir de los claims del token o
+del usuario de la sesión. Mientras está fijado, el manager por defecto
+(AlcanceManager) de los modelos de precios filtra sus consultas con el
+filtro_alcance() del modelo, por la columna inicial de sus índices: empresa_id
+en listas, lista_precio_id en precios, reglas y combinaciones.
+
+- Staff y superusuarios: alcance global (sin filtro).
+- Usuarios sin empresa asignada: no ven filas.
+- Fuera de una petición (comandos, tareas, migraciones) no hay alcance y las
+  consultas no se filtran; con_alcance() lo fija explícitamente.
+
+Los accesos por relación (lista.empresa, precio.lista_precio) usan el
+_base_manager de Django y no se filtran: parten de una fila ya autorizada.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.db import models
+
+
+@dataclass(frozen=True)
+class Alcance:
+    empresa_id: object = None
+    sucursal_id: object = None
+    global_: bool = False
+
+
+GLOBAL = Alcance(global_=True)
+
+_alcance = ContextVar('alcance_empresa', default=None)
+
+
+def alcance_actual():
+    """Alcance fijado para el contexto actual (None: sin filtrar)"""
+    return _alcance.get()
+
+
+def alcance_de_usuario(usuario):
+    """Alcance de un usuario autenticado (Usuario o UsuarioToken)"""
+    if usuario.is_staff or usuario.is_superuser:
+        return GLOBAL
+    return Alcance(empresa_id=usuario.empresa_id, sucursal_id=usuario.sucursal_id)
+
+
+@contextmanager
+def con_alcance(alcance):
+    token = _alcance.set(alcance)
+    try:
+        yield alcance
+    finally:
+        _alcance.reset(token)
+
+
+def fijar_alcance(alcance):
+    """Fijar el alcance; devuelve el token para restaurar el anterior (restaurar_alcance)"""
+    return _alcance.set(alcance)
+
+
+def restaurar_alcance(token):
+    _alcance.reset(token)
+
+
+class AlcanceManager(models.Manager):
+    """
+    Manager que filtra por el alcance actual con model.filtro_alcance(alcance) (un Q).
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        alcance = _alcance.get()
+        if alcance is None or alcance.global_:
+            return queryset
+        if alcance.empresa_id is None:
+            return queryset.none()
+        return queryset.filter(self.model.filtro_alcance(alcance))
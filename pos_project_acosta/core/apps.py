@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Registrar señales que mantienen la tabla PrecioEfectivo
+        from . import signals  # noqa: F401
+
+        # Contar las consultas de cada petición (core.perfilado.PerfiladoMiddleware)
+        from django.db.backends.signals import connection_created
+        from .perfilado import instalar_en_conexion
+        connection_created.connect(instalar_en_conexion, dispatch_uid='perfilado_consultas')
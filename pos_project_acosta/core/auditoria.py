@@ -0,0 +1,155 @@
+"""
+Auditoría de planes de las consultas críticas (manage.py auditar_consultas).
+
+Cada consulta registrada con @consulta_critica arma, sobre los datos de
+core.rendimiento.generar_datos (más órdenes de prueba), el queryset tal como lo
+ejecutan las vistas y servicios. auditar() obtiene su plan con EXPLAIN y marca
+las tablas indicadas que se recorren completas (Seq Scan en PostgreSQL, SCAN sin
+índice en SQLite).
+
+En PostgreSQL el plan se pide con enable_seqscan desactivado: con pocos datos el
+planificador prefiere recorrer la tabla aunque exista un índice, así que solo
+queda un Seq Scan cuando ningún índice sirve para la consulta.
+"""
+import re
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from pos_project_acosta.choices import EstadoEntidades, EstadoOrden
+from .models import (
+    Articulo, Cliente, Vendedor, OrdenCompraCliente, ItemOrdenCompraCliente, ReglaPrecio,
+    LineaArticulo, PrecioArticulo
+)
+
+CONSULTAS = {}
+
+_ESCANEO_POSTGRES = re.compile(r'Seq Scan on "?(\w+)"?')
+_ESCANEO_SQLITE = re.compile(r'\bSCAN (\w+)$')
+
+
+def consulta_critica(nombre, tablas):
+    """
+    Registrar una consulta. La función recibe el DatosBenchmark y devuelve el
+    queryset; tablas son las que no deben recorrerse completas.
+    """
+    def registrar(armar):
+        CONSULTAS[nombre] = (armar, tablas)
+        return armar
+    return registrar
+
+
+def generar_ordenes(datos, clientes=50, ordenes_por_cliente=20, items_por_orden=5):
+    """Clientes con órdenes e ítems para las consultas de historial de pedidos"""
+    rng = datos.aleatorio('ordenes')
+    vendedor = Vendedor.objects.first() or Vendedor.objects.create(nombre='Vendedor', usuario=datos.usuario)
+    nuevos = Cliente.objects.bulk_create([
+        Cliente(nombre=f'Cliente {c}', email=f'cliente{c}@auditoria.local') for c in range(clientes)
+    ])
+    datos.clientes = [cliente.email for cliente in nuevos]
+
+    ordenes = OrdenCompraCliente.objects.bulk_create([
+        OrdenCompraCliente(
+            nro_pedido=c * ordenes_por_cliente + o + 1, cliente=cliente, vendedor=vendedor,
+            estado=rng.choice(EstadoOrden.values), creado_por=datos.usuario
+        )
+        for c, cliente in enumerate(nuevos) for o in range(ordenes_por_cliente)
+    ], batch_size=2000)
+    datos.ordenes = [orden.pedido_id for orden in ordenes]
+
+    # bulk_create no pasa por ItemOrdenCompraCliente.save (que recalcula la orden)
+    items = []
+    for orden in ordenes:
+        for nro_item, articulo_id in enumerate(rng.sample(datos.articulo_ids, items_por_orden), start=1):
+            precio = Decimal(rng.randint(100, 10000)) / 100
+            items.append(ItemOrdenCompraCliente(
+                pedido=orden, nro_item=nro_item, articulo_id=articulo_id, cantidad=1,
+                precio_unitario=precio, total_item=precio, creado_por=datos.usuario
+            ))
+    ItemOrdenCompraCliente.objects.bulk_create(items, batch_size=2000)
+
+
+def tablas_recorridas(plan, vendor):
+    """Tablas que el plan recorre completas"""
+    if vendor == 'postgresql':
+        return set(_ESCANEO_POSTGRES.findall(plan))
+    tablas = set()
+    for linea in plan.splitlines():
+        coincidencia = _ESCANEO_SQLITE.search(linea.strip())
+        if coincidencia:
+            tablas.add(coincidencia.group(1))
+    return tablas
+
+
+def explicar(queryset):
+    """Plan de ejecución del queryset (sin Seq Scan preferidos en PostgreSQL)"""
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def auditar(datos, nombres=None):
+    """
+    Returns:
+        Lista de (consulta, tablas recorridas completas, plan)
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    resultados = []
+    for nombre in nombres or CONSULTAS:
+        armar, tablas = CONSULTAS[nombre]
+        plan = explicar(armar(datos))
+        resultados.append((nombre, sorted(tablas_recorridas(plan, connection.vendor) & set(tablas)), plan))
+    return resultados
+
+
+# ---------------------------------------------------
+# Consultas críticas
+# ---------------------------------------------------
+@consulta_critica('articulos_bajo_stock', ['articulos'])
+def articulos_bajo_stock(datos):
+    """/api/articulos/bajo_stock/ y el panel de inicio"""
+    return Articulo.objects.filter(stock__lt=10)
+
+
+@consulta_critica('articulo_por_codigo_barras', ['articulos'])
+def articulo_por_codigo_barras(datos):
+    """Lectura de código de barras en caja (PrecioService.aescanear)"""
+    return Articulo.objects.filter(codigo_barras=datos.codigos_barras[0], estado=EstadoEntidades.ACTIVO)
+
+
+@consulta_critica('ordenes_por_cliente', ['ordenes_compra_cliente', 'clientes'])
+def ordenes_por_cliente(datos):
+    """Historial de órdenes de un cliente por su email y estado"""
+    return OrdenCompraCliente.objects.filter(cliente__email=datos.clientes[0], estado=EstadoOrden.PENDIENTE)
+
+
+@consulta_critica('items_por_pedido', ['items_ordenes_compra_cliente'])
+def items_por_pedido(datos):
+    """Ítems de una orden"""
+    return ItemOrdenCompraCliente.objects.filter(pedido_id=datos.ordenes[0]).order_by('nro_item')
+
+
+@consulta_critica('reglas_activas_lista', ['reglas_precios'])
+def reglas_activas_lista(datos):
+    """Reglas de una lista en orden de aplicación (PrecioService._consultas_plan)"""
+    return ReglaPrecio.objects.filter(
+        lista_precio=datos.listas[0], estado=EstadoEntidades.ACTIVO
+    ).order_by('prioridad', 'tipo_regla')
+
+
+@consulta_critica('lineas_por_grupo', ['lineas_articulo'])
+def lineas_por_grupo(datos):
+    """core.views.get_lineas_por_grupo"""
+    return LineaArticulo.objects.filter(grupo_id=datos.lineas[0][1], estado=EstadoEntidades.ACTIVO)
+
+
+@consulta_critica('precio_articulo_lista', ['precios_articulos'])
+def precio_articulo_lista(datos):
+    """Precio de un artículo en la lista vigente (PrecioService.calcular_precio)"""
+    return PrecioArticulo.objects.filter(lista_precio=datos.listas[0], articulo_id=datos.articulo_ids[0])
@@ -0,0 +1,243 @@
+"""
+Generador de carga que simula terminales POS contra un servidor en marcha (manage.py carga).
+
+Cada terminal es una tarea asyncio con su propio cliente HTTP (httpx, dependencia
+opcional) que repite sesiones de venta como las de una caja:
+
+    login JWT (una vez) → por cada venta: lectura de códigos de barras
+    (async/escanear), consulta de precio (calcular-precio/calcular), precio del
+    carrito (async/calcular-lote) y listado de órdenes; con web=True además
+    agrega al carrito (carrito/agregar) y confirma (checkout) con sesión Django.
+
+Los artículos, la empresa y la sucursal se descubren al inicio con
+/api/sucursales/ y /api/sync/. El resultado es, por endpoint, la cantidad de
+solicitudes, errores, respuestas limitadas (429), latencias p50/p95/p99 y
+solicitudes por segundo. Corriendo el mismo escenario contra runserver (WSGI)
+y contra un servidor ASGI se comparan ambos despliegues.
+"""
+import asyncio
+import json
+import random
+from collections import Counter
+from time import perf_counter
+
+try:
+    import httpx
+except ImportError:  # dependencia opcional
+    httpx = None
+
+
+def percentil(ordenados, p):
+    """Percentil p (0-100) por el método del rango más cercano"""
+    if not ordenados:
+        return 0.0
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+class Estadisticas:
+    """Latencias y códigos de estado por endpoint"""
+
+    def __init__(self):
+        self.latencias = {}
+        self.estados = {}
+        self.errores = Counter()
+
+    def registrar(self, endpoint, duracion_ms, estado, ok):
+        self.latencias.setdefault(endpoint, []).append(duracion_ms)
+        self.estados.setdefault(endpoint, Counter())[estado] += 1
+        if not ok:
+            self.errores[endpoint] += 1
+
+    def resumen(self, duracion_s):
+        resultado = {}
+        for endpoint, latencias in sorted(self.latencias.items()):
+            ordenadas = sorted(latencias)
+            resultado[endpoint] = {
+                'solicitudes': len(ordenadas),
+                'errores': self.errores[endpoint],
+                'limitadas': self.estados[endpoint].get(429, 0),
+                'p50_ms': round(percentil(ordenadas, 50), 2),
+                'p95_ms': round(percentil(ordenadas, 95), 2),
+                'p99_ms': round(percentil(ordenadas, 99), 2),
+                'max_ms': round(ordenadas[-1], 2),
+                'rps': round(len(ordenadas) / duracion_s, 2) if duracion_s else 0.0,
+                'estados': {str(estado): total for estado, total in sorted(self.estados[endpoint].items(), key=str)},
+            }
+        return resultado
+
+
+class Catalogo:
+    """Datos descubiertos en el servidor para armar las ventas"""
+
+    def __init__(self, empresa_id, sucursal_id, articulos):
+        self.empresa_id = empresa_id
+        self.sucursal_id = sucursal_id
+        # (articulo_id, codigo_barras)
+        self.articulos = articulos
+
+
+class Terminal:
+    """Una caja: su propio cliente HTTP, token JWT y, con web=True, sesión Django"""
+
+    def __init__(self, numero, config, catalogo, estadisticas):
+        self.numero = numero
+        self.config = config
+        self.catalogo = catalogo
+        self.estadisticas = estadisticas
+        self.rng = random.Random(f"{config['semilla']}:{numero}")
+        self.cliente = httpx.AsyncClient(
+            base_url=config['url'], timeout=config['timeout'], follow_redirects=False
+        )
+        self.token = None
+
+    async def solicitud(self, endpoint, metodo, ruta, aceptar=(200,), **kwargs):
+        """Ejecutar y medir una solicitud; None si falló la conexión"""
+        if self.token and 'headers' not in kwargs:
+            kwargs['headers'] = {'Authorization': f'Bearer {self.token}'}
+        inicio = perf_counter()
+        try:
+            respuesta = await self.cliente.request(metodo, ruta, **kwargs)
+        except httpx.HTTPError:
+            self.estadisticas.registrar(endpoint, (perf_counter() - inicio) * 1000, 'conexion', False)
+            return None
+        self.estadisticas.registrar(
+            endpoint, (perf_counter() - inicio) * 1000, respuesta.status_code, respuesta.status_code in aceptar
+        )
+        return respuesta
+
+    async def pausa(self):
+        """Tiempo del cajero entre acciones (exponencial alrededor de la media configurada)"""
+        if self.config['pausa']:
+            await asyncio.sleep(self.rng.expovariate(1 / self.config['pausa']))
+
+    async def iniciar(self):
+        credenciales = {'username': self.config['usuario'], 'password': self.config['clave']}
+        respuesta = await self.solicitud('token', 'POST', '/api/token/', json=credenciales)
+        if respuesta is None or respuesta.status_code != 200:
+            return False
+        self.token = respuesta.json()['access']
+
+        if self.config['web']:
+            # Sesión Django para carrito y checkout (core/urls.py)
+            await self.solicitud('web_login_form', 'GET', '/accounts/login/', headers={})
+            datos = {
+                'login': self.config['usuario'], 'password': self.config['clave'],
+                'csrfmiddlewaretoken': self.cliente.cookies.get('csrftoken', ''),
+            }
+            await self.solicitud('web_login', 'POST', '/accounts/login/', aceptar=(302,), data=datos, headers={})
+        return True
+
+    def cabeceras_web(self):
+        return {'X-CSRFToken': self.cliente.cookies.get('csrftoken', '')}
+
+    async def venta(self):
+        catalogo = self.catalogo
+        base = {'empresa_id': catalogo.empresa_id, 'sucursal_id': catalogo.sucursal_id}
+        items = self.rng.sample(catalogo.articulos, min(self.config['articulos_por_venta'], len(catalogo.articulos)))
+
+        for articulo_id, codigo_barras in items:
+            await self.pausa()
+            if codigo_barras:
+                await self.solicitud(
+                    'escanear', 'GET', '/api/async/escanear/',
+                    params=dict(base, codigo_barras=codigo_barras, cantidad=self.rng.randint(1, 3))
+                )
+            else:
+                await self.solicitud(
+                    'calcular', 'POST', '/api/calcular-precio/calcular/',
+                    json=dict(base, articulo_id=articulo_id, cantidad=self.rng.randint(1, 3))
+                )
+            if self.config['web']:
+                await self.solicitud(
+                    'carrito_agregar', 'POST', f'/carrito/agregar/{articulo_id}/', aceptar=(302,),
+                    data={'cantidad': 1}, headers=self.cabeceras_web()
+                )
+
+        await self.pausa()
+        lote = [{'articulo_id': articulo_id, 'cantidad': self.rng.randint(1, 3)} for articulo_id, _ in items]
+        await self.solicitud('calcular_lote', 'POST', '/api/async/calcular-lote/', json=dict(base, items=lote))
+        if self.config['web']:
+            await self.solicitud(
+                'checkout', 'POST', '/checkout/', aceptar=(302,), data={'notas': 'carga'},
+                headers=self.cabeceras_web()
+            )
+
+        await self.solicitud('ordenes', 'GET', '/api/ordenes/')
+
+    async def ejecutar(self, fin):
+        while perf_counter() < fin:
+            await self.venta()
+
+
+async def descubrir_catalogo(config, limite=500):
+    """Empresa, sucursal y artículos (con código de barras si tienen) para las ventas"""
+    async with httpx.AsyncClient(base_url=config['url'], timeout=config['timeout']) as cliente:
+        respuesta = await cliente.post(
+            '/api/token/', json={'username': config['usuario'], 'password': config['clave']}
+        )
+        if respuesta.status_code != 200:
+            raise RuntimeError(f'Login JWT fallido ({respuesta.status_code}): {respuesta.text[:200]}')
+        cabeceras = {'Authorization': f"Bearer {respuesta.json()['access']}"}
+
+        empresa_id, sucursal_id = config.get('empresa_id'), config.get('sucursal_id')
+        if not empresa_id:
+            respuesta = await cliente.get('/api/sucursales/', headers=cabeceras)
+            sucursales = respuesta.json().get('results', []) if respuesta.status_code == 200 else []
+            if not sucursales:
+                raise RuntimeError('No hay sucursales; indique --empresa')
+            empresa_id, sucursal_id = sucursales[0]['empresa'], sucursales[0]['sucursal_id']
+
+        articulos = []
+        params = {'empresa_id': empresa_id, 'sucursal_id': sucursal_id or '', 'tamano': limite}
+        respuesta = await cliente.get('/api/sync/', params=params, headers=cabeceras)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f'No se pudo leer el catálogo ({respuesta.status_code})')
+        for linea in respuesta.text.splitlines():
+            cambio = json.loads(linea)
+            if cambio.get('modelo') == 'articulo':
+                articulos.append((cambio['datos']['articulo_id'], cambio['datos']['codigo_barras']))
+        if not articulos:
+            raise RuntimeError('El catálogo está vacío')
+        return Catalogo(empresa_id, sucursal_id, articulos)
+
+
+async def ejecutar_carga(config):
+    """
+    Correr la simulación.
+
+    Args:
+        config: dict con url, usuario, clave, terminales, duracion (s), pausa (s),
+            articulos_por_venta, web, timeout, semilla y opcionalmente empresa_id/sucursal_id
+
+    Returns:
+        dict con la configuración, la duración real y el resumen por endpoint
+    """
+    if httpx is None:
+        raise RuntimeError('Se requiere httpx (pip install httpx)')
+
+    catalogo = await descubrir_catalogo(config)
+    estadisticas = Estadisticas()
+    terminales = [Terminal(numero, config, catalogo, estadisticas) for numero in range(config['terminales'])]
+    try:
+        # Los logins no cuentan en la ventana de medición (sí en las estadísticas de 'token')
+        iniciadas = await asyncio.gather(*(terminal.iniciar() for terminal in terminales))
+        activas = [terminal for terminal, ok in zip(terminales, iniciadas) if ok]
+        if not activas:
+            raise RuntimeError('Ninguna terminal pudo iniciar sesión')
+
+        inicio = perf_counter()
+        fin = inicio + config['duracion']
+        await asyncio.gather(*(terminal.ejecutar(fin) for terminal in activas))
+        duracion = perf_counter() - inicio
+    finally:
+        await asyncio.gather(*(terminal.cliente.aclose() for terminal in terminales))
+
+    configuracion = {clave: valor for clave, valor in config.items() if clave != 'clave'}
+    return {
+        'configuracion': configuracion,
+        'terminales_activas': len(activas),
+        'duracion_s': round(duracion, 2),
+        'articulos_catalogo': len(catalogo.articulos),
+        'endpoints': estadisticas.resumen(duracion),
+    }
@@ -0,0 +1,203 @@
+"""
+Enrutador de base de datos con réplicas de lectura.
+
+Las lecturas seguras (catálogo, cotización de precios, estadísticas) van a una
+de las réplicas de REPLICAS_BD; todo lo demás usa 'default' (primaria). Una
+lectura va a una réplica solo si:
+
+- la vista lo declara con el atributo lectura_replica (True para toda la vista
+  o un conjunto de acciones del ViewSet) o el código usa leer_de_replica(),
+- el modelo es de una app de REPLICA_APPS,
+- en la petición todavía no se escribió en esas apps y no hay una transacción
+  abierta en la primaria,
+- el cliente no escribió hace menos de REPLICA_VENTANA_SEGUNDOS (cookie que deja
+  ReplicaMiddleware), para que vea sus propios cambios aunque la réplica tenga
+  retraso.
+
+Después de la primera escritura el resto de la petición lee de la primaria. Fuera
+de una petición (comandos, shell) todo va a la primaria salvo dentro de
+leer_de_replica().
+
+Para probarlo localmente basta con dos alias que apunten a la misma base (o a
+dos archivos SQLite) y la réplica declarada como espejo en tests:
+
+    DATABASES['replica_1'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    REPLICAS_BD = ['replica_1']
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_estado = ContextVar('estado_lectura', default=None)
+
+COOKIE_PRIMARIA = 'primaria_hasta'
+
+
+class EstadoLectura:
+    """Estado de una petición (o bloque leer_de_replica); se modifica en el lugar"""
+    __slots__ = ('replica', 'primaria', 'escribio')
+
+    def __init__(self, replica=False, primaria=False):
+        self.replica = replica      # la vista o el bloque admite lecturas de réplica
+        self.primaria = primaria    # fijada a la primaria (escritura o ventana de retraso)
+        self.escribio = False       # hubo escrituras en la petición
+
+
+def replicas():
+    return list(getattr(settings, 'REPLICAS_BD', []))
+
+
+def _apps_replica():
+    return getattr(settings, 'REPLICA_APPS', ['core'])
+
+
+@contextmanager
+def leer_de_replica():
+    """Permitir lecturas de réplica dentro del bloque (se fija a la primaria si escribe)"""
+    estado = _estado.get()
+    if estado is not None:
+        anterior = estado.replica
+        estado.replica = True
+        try:
+            yield
+        finally:
+            estado.replica = anterior
+        return
+
+    token = _estado.set(EstadoLectura(replica=True))
+    try:
+        yield
+    finally:
+        _estado.reset(token)
+
+
+@contextmanager
+def usar_primaria():
+    """Leer de la primaria dentro del bloque aunque la vista admita réplicas"""
+    estado = _estado.get()
+    if estado is None:
+        yield
+        return
+    anterior = estado.replica
+    estado.replica = False
+    try:
+        yield
+    finally:
+        estado.replica = anterior
+
+
+def lectura_replica(vista):
+    """Decorador para vistas de función cuyas lecturas pueden ir a una réplica"""
+    vista.lectura_replica = True
+    return vista
+
+
+class EnrutadorReplicas:
+    """DATABASE_ROUTERS: lecturas a réplicas según el estado de la petición"""
+
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado is None or not estado.replica or estado.primaria:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label not in _apps_replica():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        disponibles = replicas()
+        return random.choice(disponibles) if disponibles else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Siempre la primaria: una instancia leída de una réplica se guarda en 'default'
+        estado = _estado.get()
+        if estado is not None and model._meta.app_label in _apps_replica():
+            estado.primaria = True
+            estado.escribio = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas y primaria tienen los mismos datos
+        alias = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in alias and obj2._state.db in alias:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Crea el estado de lectura de cada petición, aplica el atributo lectura_replica
+    de la vista y mantiene la cookie que fija al cliente a la primaria después de
+    escribir.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        estado = self.estado_inicial(request)
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self.finalizar(response, estado)
+
+    async def __acall__(self, request):
+        estado = self.estado_inicial(request)
+        token = _estado.set(estado)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self.finalizar(response, estado)
+
+    @staticmethod
+    def estado_inicial(request):
+        try:
+            fijada_hasta = float(request.COOKIES.get(COOKIE_PRIMARIA, 0))
+        except ValueError:
+            fijada_hasta = 0
+        return EstadoLectura(primaria=fijada_hasta > time.time())
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        estado = _estado.get()
+        if estado is None:
+            return None
+
+        # APIView.as_view() expone la clase en .cls; las vistas de Django en .view_class
+        vista = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None) or view_func
+        permitido = getattr(vista, 'lectura_replica', False)
+        if permitido is True:
+            estado.replica = True
+        elif permitido:
+            # ViewSet: as_view() guarda el mapeo método -> acción en .actions
+            acciones = getattr(view_func, 'actions', None) or {}
+            estado.replica = acciones.get(request.method.lower()) in permitido
+        return None
+
+    @staticmethod
+    def finalizar(response, estado):
+        if estado.escribio:
+            ventana = getattr(settings, 'REPLICA_VENTANA_SEGUNDOS', 5)
+            response.set_cookie(
+                COOKIE_PRIMARIA, f'{time.time() + ventana:.3f}', max_age=ventana,
+                httponly=True, samesite='Lax'
+            )
+        return response
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core import auditoria, rendimiento
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta EXPLAIN sobre las consultas críticas con datos generados en una base de datos "
+        "de prueba y falla si alguna recorre completa una tabla que debería leer por índice"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consultas', help="Consultas separadas por coma (default: todas)")
+        parser.add_argument('--plan', action='store_true', help="Mostrar el plan de cada consulta")
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--articulos', type=int, default=2000,
+                            help="Cantidad de artículos generados (default: 2000)")
+
+    def handle(self, *args, **options):
+        nombres = list(auditoria.CONSULTAS)
+        if options['consultas']:
+            nombres = [nombre.strip() for nombre in options['consultas'].split(',')]
+            desconocidas = [nombre for nombre in nombres if nombre not in auditoria.CONSULTAS]
+            if desconocidas:
+                raise CommandError(f"Consultas desconocidas: {', '.join(desconocidas)}")
+
+        # Base de datos de prueba, como el test runner: nunca se tocan datos reales
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write("Generando datos...")
+            datos = rendimiento.generar_datos(
+                rendimiento.crear_usuario(), semilla=options['semilla'], articulos=options['articulos']
+            )
+            auditoria.generar_ordenes(datos)
+            resultados = auditoria.auditar(datos, nombres)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        fallidas = 0
+        for nombre, recorridas, plan in resultados:
+            if recorridas:
+                fallidas += 1
+                self.stdout.write(self.style.ERROR(f"{nombre:32} recorre completa: {', '.join(recorridas)}"))
+            else:
+                self.stdout.write(f"{nombre:32} OK")
+            if options['plan'] or recorridas:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if fallidas:
+            raise CommandError(f"{fallidas} consultas críticas sin índice utilizable ({connection.vendor})")
+        self.stdout.write(self.style.SUCCESS("Todas las consultas críticas usan índices"))
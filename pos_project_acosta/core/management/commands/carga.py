@@ -0,0 +1,67 @@
+import asyncio
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import carga
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula terminales POS concurrentes contra un servidor en marcha (runserver, gunicorn o "
+        "uvicorn) y reporta latencias p50/p95/p99 y throughput por endpoint. Requiere httpx. "
+        "Los throttles de DRF se aplican también a la carga: las respuestas 429 se informan aparte"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="URL base del servidor")
+        parser.add_argument('--usuario', required=True, help="Usuario para JWT (y sesión con --web)")
+        parser.add_argument('--clave', required=True)
+        parser.add_argument('--terminales', type=int, default=20, help="Terminales concurrentes (default: 20)")
+        parser.add_argument('--duracion', type=float, default=60, help="Segundos de carga (default: 60)")
+        parser.add_argument('--pausa', type=float, default=0.0,
+                            help="Pausa media del cajero entre acciones, en segundos (default: 0, sin pausa)")
+        parser.add_argument('--articulos-por-venta', dest='articulos_por_venta', type=int, default=5)
+        parser.add_argument('--web', action='store_true',
+                            help="Incluir carrito y checkout de core/urls.py (sesión Django)")
+        parser.add_argument('--empresa', dest='empresa_id', help="UUID de la empresa (default: la de la primera sucursal)")
+        parser.add_argument('--sucursal', dest='sucursal_id', help="UUID de la sucursal")
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', help="Guardar el resultado en un archivo JSON")
+
+    def handle(self, *args, **options):
+        if carga.httpx is None:
+            raise CommandError("Se requiere httpx: pip install httpx")
+
+        config = {
+            clave: options[clave] for clave in (
+                'url', 'usuario', 'clave', 'terminales', 'duracion', 'pausa', 'articulos_por_venta',
+                'web', 'empresa_id', 'sucursal_id', 'timeout', 'semilla',
+            )
+        }
+        self.stdout.write(f"{config['terminales']} terminales contra {config['url']} durante {config['duracion']} s...")
+        try:
+            resultado = asyncio.run(carga.ejecutar_carga(config))
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"\n{'endpoint':18} {'solic.':>7} {'errores':>7} {'429':>5} "
+            f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}"
+        )
+        total = 0
+        for endpoint, datos in resultado['endpoints'].items():
+            total += datos['solicitudes']
+            linea = (
+                f"{endpoint:18} {datos['solicitudes']:7} {datos['errores']:7} {datos['limitadas']:5} "
+                f"{datos['p50_ms']:9.1f} {datos['p95_ms']:9.1f} {datos['p99_ms']:9.1f} {datos['rps']:8.1f}"
+            )
+            self.stdout.write(self.style.ERROR(linea) if datos['errores'] else linea)
+        self.stdout.write(f"\nTotal: {total} solicitudes en {resultado['duracion_s']} s "
+                          f"({total / resultado['duracion_s']:.1f} req/s)")
+
+        if options['salida']:
+            Path(options['salida']).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"Resultado guardado en {options['salida']}"))
@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.models import Sucursal
+from core.services import PrecioService
+from pos_project_acosta.choices import EstadoEntidades
+
+
+def _inicializar_proceso():
+    """Cada proceso abre sus propias conexiones (no se heredan las del proceso padre)"""
+    django.setup()
+    connections.close_all()
+
+
+def _generar(empresa_id, sucursal_id, fecha, directorio):
+    datos, checksum = PrecioService.generar_paquete_offline(empresa_id, sucursal_id, fecha)
+    ruta = Path(directorio) / f"{sucursal_id}.paquete"
+    temporal = ruta.with_suffix('.tmp')
+    temporal.write_bytes(datos)
+    os.replace(temporal, ruta)  # La terminal nunca ve un paquete a medio escribir
+    return ruta, len(datos), checksum
+
+
+class Command(BaseCommand):
+    help = "Genera en paralelo los paquetes de precios offline de todas las sucursales activas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', dest='empresa_id', help="UUID de una empresa específica (default: todas)")
+        parser.add_argument('--fecha', help="Fecha de vigencia YYYY-MM-DD (default: hoy)")
+        parser.add_argument('--directorio', default=str(settings.PAQUETES_OFFLINE_DIR),
+                            help="Directorio de salida (default: PAQUETES_OFFLINE_DIR)")
+        parser.add_argument('--procesos', type=int, default=os.cpu_count(),
+                            help="Procesos en paralelo (default: cantidad de CPUs)")
+
+    def handle(self, *args, **options):
+        fecha = None
+        if options['fecha']:
+            try:
+                fecha = datetime.strptime(options['fecha'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Formato de fecha inválido. Use YYYY-MM-DD")
+
+        sucursales = Sucursal.objects.filter(estado=EstadoEntidades.ACTIVO)
+        if options['empresa_id']:
+            sucursales = sucursales.filter(empresa_id=options['empresa_id'])
+        sucursales = list(sucursales.values_list('empresa_id', 'sucursal_id', 'nombre'))
+
+        directorio = Path(options['directorio'])
+        directorio.mkdir(parents=True, exist_ok=True)
+
+        # Las conexiones abiertas no pueden compartirse con los procesos hijos
+        connections.close_all()
+
+        errores = 0
+        with ProcessPoolExecutor(max_workers=max(1, options['procesos']), initializer=_inicializar_proceso) as pool:
+            tareas = {
+                pool.submit(_generar, empresa_id, sucursal_id, fecha, directorio): nombre
+                for empresa_id, sucursal_id, nombre in sucursales
+            }
+            for tarea in as_completed(tareas):
+                nombre = tareas[tarea]
+                try:
+                    ruta, tamano, checksum = tarea.result()
+                except Exception as e:
+                    errores += 1
+                    self.stderr.write(f"{nombre}: error al generar el paquete ({e})")
+                    continue
+                self.stdout.write(f"{nombre}: {ruta.name} ({tamano} bytes, sha256 {checksum[:12]})")
+
+        if errores:
+            raise CommandError(f"{errores} paquetes no se pudieron generar")
+        self.stdout.write(self.style.SUCCESS(f"{len(sucursales)} paquetes generados en {directorio}"))
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RegistroEliminacion
+
+
+class Command(BaseCommand):
+    help = "Elimina los registros de bajas más antiguos que SYNC_RETENCION_DIAS (los cursores más viejos ya no son válidos)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.SYNC_RETENCION_DIAS,
+                            help="Antigüedad mínima en días (default: SYNC_RETENCION_DIAS)")
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        eliminados, _ = RegistroEliminacion.objects.filter(eliminado_en__lt=limite).delete()
+        self.stdout.write(self.style.SUCCESS(f"{eliminados} registros de bajas eliminados"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ListaPrecio
+from core.services import PrecioService
+from pos_project_acosta.choices import EstadoEntidades
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la tabla de precios efectivos (cantidad 1, sin monto de pedido) de las listas de precios"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lista', dest='lista_precio_id', help="UUID de una lista específica (default: todas las activas)")
+
+    def handle(self, *args, **options):
+        listas = ListaPrecio.objects.filter(estado=EstadoEntidades.ACTIVO)
+        if options['lista_precio_id']:
+            listas = ListaPrecio.objects.filter(lista_precio_id=options['lista_precio_id'])
+            if not listas.exists():
+                raise CommandError(f"No existe la lista {options['lista_precio_id']}")
+
+        for lista in listas:
+            filas = PrecioService.recalcular_precios_efectivos(lista)
+            self.stdout.write(f"{lista.nombre}: {filas} precios efectivos")
+
+        self.stdout.write(self.style.SUCCESS("Precios efectivos actualizados"))
@@ -0,0 +1,123 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from core import rendimiento
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta los benchmarks de precios, catálogo y checkout sobre una base de datos de "
+        "prueba con datos generados, guarda los resultados en JSON y opcionalmente los compara "
+        "con una línea base"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escenarios', help="Escenarios separados por coma (default: todos)")
+        parser.add_argument('--listar', action='store_true', help="Mostrar los escenarios disponibles y salir")
+        parser.add_argument('--salida', default='rendimiento.json', help="Archivo JSON de resultados")
+        parser.add_argument('--comparar', help="JSON de una ejecución anterior (línea base)")
+        parser.add_argument('--tolerancia', type=float, default=0.10,
+                            help="Empeoramiento de la mediana aceptado al comparar (default: 0.10)")
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--articulos', type=int, help="Cantidad de artículos (default: todos los del CSV)")
+        parser.add_argument('--repeticiones', type=float, default=1.0,
+                            help="Multiplicador de las repeticiones de cada escenario")
+
+    def handle(self, *args, **options):
+        if options['listar']:
+            for nombre, (preparar, repeticiones) in rendimiento.ESCENARIOS.items():
+                descripcion = (preparar.__doc__ or '').strip().splitlines()
+                self.stdout.write(f"{nombre} ({repeticiones}): {descripcion[0] if descripcion else ''}")
+            return
+
+        nombres = list(rendimiento.ESCENARIOS)
+        if options['escenarios']:
+            nombres = [nombre.strip() for nombre in options['escenarios'].split(',')]
+            desconocidos = [nombre for nombre in nombres if nombre not in rendimiento.ESCENARIOS]
+            if desconocidos:
+                raise CommandError(f"Escenarios desconocidos: {', '.join(desconocidos)}")
+
+        base = None
+        if options['comparar']:
+            try:
+                base = json.loads(Path(options['comparar']).read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la línea base: {e}")
+
+        # Base de datos de prueba, como el test runner: nunca se tocan datos reales
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Sin throttling (caché nula) ni presupuestos de consultas durante la medición
+            with override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+                PERFILADO_PRESUPUESTO_CONSULTAS=None, PERFILADO_PRESUPUESTOS={},
+            ):
+                resultados = self.ejecutar(nombres, options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        Path(options['salida']).write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+        if base is not None:
+            self.mostrar_comparacion(resultados, base, options['tolerancia'])
+
+    def ejecutar(self, nombres, options):
+        self.stdout.write("Generando datos...")
+        datos = rendimiento.generar_datos(
+            rendimiento.crear_usuario(), semilla=options['semilla'], articulos=options['articulos']
+        )
+
+        resultados = {
+            'fecha': timezone.now().isoformat(),
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base_datos': connection.vendor,
+                'debug': settings.DEBUG,
+                'semilla': options['semilla'],
+                'articulos': len(datos.articulo_ids),
+                'listas': len(datos.listas),
+            },
+            'resultados': {},
+        }
+        for nombre in nombres:
+            preparar, repeticiones = rendimiento.ESCENARIOS[nombre]
+            repeticiones = max(1, round(repeticiones * options['repeticiones']))
+            resultado = rendimiento.cronometrar(preparar(datos), repeticiones)
+            resultados['resultados'][nombre] = resultado
+            self.stdout.write(
+                f"{nombre:32} mediana {resultado['mediana_ms']:10.3f} ms  "
+                f"p95 {resultado['p95_ms']:10.3f} ms  consultas {resultado['consultas']}"
+            )
+        return resultados
+
+    def mostrar_comparacion(self, resultados, base, tolerancia):
+        filas = rendimiento.comparar(resultados, base, tolerancia)
+        regresiones = 0
+        self.stdout.write(f"\n{'escenario':32} {'base ms':>10} {'actual ms':>10} {'cambio':>8}  consultas")
+        for nombre, previo, actual, variacion, consultas_previas, consultas, regresion in filas:
+            linea = (
+                f"{nombre:32} {previo:10.3f} {actual:10.3f} {variacion:+8.1%}  "
+                f"{consultas_previas} -> {consultas}"
+            )
+            if regresion:
+                regresiones += 1
+                self.stdout.write(self.style.ERROR(linea + "  REGRESIÓN"))
+            else:
+                self.stdout.write(linea)
+
+        if regresiones:
+            raise CommandError(f"{regresiones} escenarios empeoraron respecto de la línea base")
+        self.stdout.write(self.style.SUCCESS("Sin regresiones respecto de la línea base"))
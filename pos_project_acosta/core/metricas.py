@@ -0,0 +1,518 @@
+"""
+Métricas de la aplicación en formato de texto de Prometheus.
+
+El registro del proceso (registro) acumula contadores, medidores e histogramas:
+
+- peticiones HTTP y su duración por vista, con las consultas SQL de cada una
+  (PerfiladoMiddleware, core/perfilado.py);
+- aciertos y fallos de las cachés (planes de precios, usuarios y versiones de
+  tokens JWT);
+- rechazos de BurstRateThrottle y SustainedRateThrottle (api/throttling.py);
+- duración del checkout y envíos de correo en curso y terminados (core/views.py);
+- métricas del servicio de precios (abajo).
+
+GET /metrics (core.views.metricas) las expone para Prometheus. Con varios
+procesos (workers de gunicorn) cada uno vuelca su registro a un archivo de
+METRICAS_DIRECTORIO como mucho cada METRICAS_VOLCADO_SEGUNDOS, y /metrics suma
+los archivos de todos: los contadores e histogramas de procesos ya terminados
+se conservan, los medidores solo cuentan si el proceso sigue vivo. El nombre
+del archivo lleva el arranque del servidor (arranque()) y el pid con el
+instante de inicio del proceso: un worker que recibe el pid de otro ya
+terminado escribe su propio archivo, y los archivos de arranques anteriores se
+borran en vez de sumarse.
+
+Servicio de precios: cada llamada a calcular_precio (y sus variantes
+asíncronas) se describe con una MedicionPrecio: tiempo hasta resolver la lista
+vigente, si el plan compilado salió de la caché del proceso, reglas
+consideradas (las candidatas que deja el índice del plan) y aplicadas,
+combinaciones evaluadas y aplicadas, resultado de la validación de costo y
+resultado del cálculo. Al terminar la llamada la medición
+se entrega a los sumideros de PRECIOS_METRICAS_SUMIDEROS:
+
+- SumideroMemoria: conserva las últimas mediciones del proceso (inspección, tests).
+- SumideroLog: una línea JSON por medición en el logger 'metricas'.
+- SumideroPrometheus: contadores e histogramas en el registro del proceso.
+  GET /metrics los expone con el resto de las métricas y sumando los procesos;
+  GET /api/metricas/precios/ (solo staff) muestra el registro de este proceso.
+
+Sin sumideros configurados (valor por defecto) nueva_medicion() devuelve None y
+el servicio no mide nada: el costo es una comparación por llamada.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+from .motor_precios import ERROR_SIN_LISTA, ERROR_SIN_PRECIO, ERROR_SIN_ARTICULO
+
+logger = logging.getLogger('metricas')
+
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CODIGOS_ERROR = {
+    ERROR_SIN_LISTA: 'sin_lista',
+    ERROR_SIN_PRECIO: 'sin_precio',
+    ERROR_SIN_ARTICULO: 'sin_articulo',
+}
+
+
+# ---------------------------------------------------
+# Registro de contadores e histogramas
+# ---------------------------------------------------
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(etiquetas, extra=None):
+    pares = list(etiquetas) + ([extra] if extra else [])
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + '}'
+
+
+def _numero(valor):
+    if valor == int(valor):
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class RegistroMetricas:
+    """
+    Contadores (counter), medidores (gauge) e histogramas con etiquetas, en
+    memoria del proceso. Las métricas se declaran con definir() antes de usarse.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._definiciones = {}     # nombre -> (tipo, ayuda, buckets)
+        self._valores = {}          # (nombre, etiquetas) -> número | [cuentas por bucket..., suma, total]
+
+    def definir(self, nombre, tipo, ayuda, buckets=None):
+        self._definiciones.setdefault(nombre, (tipo, ayuda, tuple(buckets or ())))
+
+    def sumar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def fijar(self, nombre, valor, **etiquetas):
+        """Valor de un medidor"""
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._valores[clave] = valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        buckets = self._definiciones[nombre][2]
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            acumulado = self._valores.get(clave)
+            if acumulado is None:
+                acumulado = self._valores[clave] = [0] * len(buckets) + [0.0, 0]
+            for i, limite in enumerate(buckets):
+                if valor <= limite:
+                    acumulado[i] += 1
+                    break
+            acumulado[-2] += valor
+            acumulado[-1] += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._valores.clear()
+
+    def valores(self):
+        """Copia de los valores: {(nombre, etiquetas): número o lista}"""
+        with self._lock:
+            return {clave: list(valor) if isinstance(valor, list) else valor
+                    for clave, valor in self._valores.items()}
+
+    def exportar(self):
+        """Valores como tipos JSON: [[nombre, [[etiqueta, valor], ...], valor], ...]"""
+        return [
+            [nombre, [list(par) for par in etiquetas], valor]
+            for (nombre, etiquetas), valor in self.valores().items()
+        ]
+
+    def importar(self, filas, medidores=True):
+        """Sumar valores exportados por otro registro (los medidores solo si medidores es True)"""
+        with self._lock:
+            for nombre, etiquetas, valor in filas:
+                definicion = self._definiciones.get(nombre)
+                if definicion is None or (definicion[0] == 'gauge' and not medidores):
+                    continue
+                clave = (nombre, tuple(tuple(par) for par in etiquetas))
+                previo = self._valores.get(clave)
+                if isinstance(valor, list):
+                    self._valores[clave] = list(valor) if previo is None else [a + b for a, b in zip(previo, valor)]
+                else:
+                    self._valores[clave] = (previo or 0) + valor
+
+    def vacio(self):
+        """Registro con las mismas definiciones y sin valores"""
+        nuevo = RegistroMetricas()
+        nuevo._definiciones = dict(self._definiciones)
+        return nuevo
+
+    def texto_prometheus(self):
+        """Valores en el formato de texto de Prometheus (versión 0.0.4)"""
+        valores = self.valores()
+        lineas = []
+        for nombre, (tipo, ayuda, buckets) in sorted(self._definiciones.items()):
+            series = sorted((etiquetas, valor) for (serie, etiquetas), valor in valores.items() if serie == nombre)
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            for etiquetas, valor in series:
+                if tipo != 'histogram':
+                    lineas.append(f'{nombre}{_etiquetas(etiquetas)} {_numero(valor)}')
+                    continue
+                acumulado = 0
+                for limite, cuenta in zip(buckets, valor):
+                    acumulado += cuenta
+                    lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas, ("le", limite))} {acumulado}')
+                lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas, ("le", "+Inf"))} {valor[-1]}')
+                lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {_numero(valor[-2])}')
+                lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {valor[-1]}')
+        return '\n'.join(lineas) + '\n'
+
+
+registro = RegistroMetricas()
+
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+registro.definir('http_peticiones_total', 'counter', 'Peticiones HTTP por vista, método y estado')
+registro.definir('http_peticion_segundos', 'histogram', 'Duración de las peticiones HTTP por vista',
+                 BUCKETS_SEGUNDOS)
+registro.definir('bd_consultas_por_peticion', 'histogram', 'Consultas SQL por petición y vista',
+                 BUCKETS_CONSULTAS)
+registro.definir('bd_segundos_total', 'counter', 'Tiempo en consultas SQL por vista')
+registro.definir('cache_consultas_total', 'counter', 'Lecturas de caché por caché y resultado (hit/miss)')
+registro.definir('throttle_rechazos_total', 'counter', 'Peticiones rechazadas por límite de frecuencia, por scope')
+registro.definir('checkout_segundos', 'histogram', 'Duración de la confirmación del carrito', BUCKETS_SEGUNDOS)
+registro.definir('correo_envios_en_curso', 'gauge', 'Correos enviándose en este momento')
+registro.definir('correo_enviados_total', 'counter', 'Correos enviados por resultado')
+registro.definir('correo_bandeja_salida', 'gauge', 'Correos en la bandeja de salida del backend en memoria (tests)')
+
+registro.definir('precios_calculos_total', 'counter', 'Cálculos de precio por operación y resultado')
+registro.definir('precios_llamada_segundos', 'histogram', 'Duración de cada llamada del servicio de precios',
+                 BUCKETS_SEGUNDOS)
+registro.definir('precios_lista_segundos', 'histogram', 'Tiempo hasta resolver la lista vigente',
+                 BUCKETS_SEGUNDOS)
+registro.definir('precios_reglas_consideradas_total', 'counter', 'Reglas evaluadas tras el índice de alcance y tramos')
+registro.definir('precios_reglas_aplicadas_total', 'counter', 'Reglas que cambiaron el precio')
+registro.definir('precios_combinaciones_evaluadas_total', 'counter', 'Combinaciones dentro del alcance del artículo')
+registro.definir('precios_combinaciones_aplicadas_total', 'counter', 'Combinaciones que cambiaron el precio')
+registro.definir('precios_validacion_costo_total', 'counter', 'Resultado de la validación de costo')
+
+
+# ---------------------------------------------------
+# Medición de una llamada
+# ---------------------------------------------------
+class MedicionPrecio:
+    """
+    Acumuladores de una llamada del servicio. Una llamada por lote suma los
+    contadores de todos sus ítems (calculos es la cantidad de ítems).
+    """
+    __slots__ = (
+        'operacion', 'inicio', 'segundos', 'lista_segundos', 'lista_precio_id', 'plan_en_cache',
+        'calculos', 'resultados', 'reglas_consideradas', 'reglas_aplicadas',
+        'combinaciones_evaluadas', 'combinaciones_aplicadas', 'costo',
+    )
+
+    def __init__(self, operacion):
+        self.operacion = operacion
+        self.inicio = perf_counter()
+        self.segundos = None
+        self.lista_segundos = None
+        self.lista_precio_id = None
+        self.plan_en_cache = None
+        self.calculos = 0
+        self.resultados = {}
+        self.reglas_consideradas = 0
+        self.reglas_aplicadas = 0
+        self.combinaciones_evaluadas = 0
+        self.combinaciones_aplicadas = 0
+        self.costo = {}
+
+    def lista_resuelta(self, lista_precio):
+        self.lista_segundos = perf_counter() - self.inicio
+        if lista_precio is not None:
+            self.lista_precio_id = lista_precio.lista_precio_id
+
+    def sumar_evaluacion(self, reglas_consideradas, reglas_aplicadas,
+                         combinaciones_evaluadas, combinaciones_aplicadas, costo):
+        """Llamado por PlanPrecios.evaluar"""
+        self.reglas_consideradas += reglas_consideradas
+        self.reglas_aplicadas += reglas_aplicadas
+        self.combinaciones_evaluadas += combinaciones_evaluadas
+        self.combinaciones_aplicadas += combinaciones_aplicadas
+        self.costo[costo] = self.costo.get(costo, 0) + 1
+
+    def sumar_resultado(self, resultado):
+        """Contar un resultado de calcular_precio (correcto o con error)"""
+        codigo = CODIGOS_ERROR.get(resultado.get('error'), 'error') if 'error' in resultado else 'ok'
+        self.calculos += 1
+        self.resultados[codigo] = self.resultados.get(codigo, 0) + 1
+
+    def a_dict(self):
+        return {
+            'operacion': self.operacion,
+            'ms': round(self.segundos * 1000, 3) if self.segundos is not None else None,
+            'lista_ms': round(self.lista_segundos * 1000, 3) if self.lista_segundos is not None else None,
+            'lista_precio_id': str(self.lista_precio_id) if self.lista_precio_id else None,
+            'plan_en_cache': self.plan_en_cache,
+            'calculos': self.calculos,
+            'resultados': self.resultados,
+            'reglas_consideradas': self.reglas_consideradas,
+            'reglas_aplicadas': self.reglas_aplicadas,
+            'combinaciones_evaluadas': self.combinaciones_evaluadas,
+            'combinaciones_aplicadas': self.combinaciones_aplicadas,
+            'costo': self.costo,
+        }
+
+
+# ---------------------------------------------------
+# Sumideros
+# ---------------------------------------------------
+class SumideroMemoria:
+    """Últimas mediciones del proceso"""
+    maximo = 1000
+
+    def __init__(self):
+        self.mediciones = deque(maxlen=self.maximo)
+
+    def registrar(self, medicion):
+        self.mediciones.append(medicion)
+
+
+class SumideroLog:
+    """Una línea JSON por medición en el logger 'metricas'"""
+
+    def registrar(self, medicion):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(medicion.a_dict()))
+
+
+class SumideroPrometheus:
+    """
+    Contadores e histogramas en el registro del proceso (GET /metrics). Los
+    aciertos de la caché de planes se cuentan siempre en cache_consultas_total.
+    """
+
+    def __init__(self, registro=registro):
+        self.registro = registro
+
+    def registrar(self, medicion):
+        registro, operacion = self.registro, medicion.operacion
+        registro.observar('precios_llamada_segundos', medicion.segundos, operacion=operacion)
+        if medicion.lista_segundos is not None:
+            registro.observar('precios_lista_segundos', medicion.lista_segundos, operacion=operacion)
+        for codigo, cantidad in medicion.resultados.items():
+            registro.sumar('precios_calculos_total', cantidad, operacion=operacion, resultado=codigo)
+        for resultado, cantidad in medicion.costo.items():
+            registro.sumar('precios_validacion_costo_total', cantidad, resultado=resultado)
+        if medicion.calculos:
+            registro.sumar('precios_reglas_consideradas_total', medicion.reglas_consideradas)
+            registro.sumar('precios_reglas_aplicadas_total', medicion.reglas_aplicadas)
+            registro.sumar('precios_combinaciones_evaluadas_total', medicion.combinaciones_evaluadas)
+            registro.sumar('precios_combinaciones_aplicadas_total', medicion.combinaciones_aplicadas)
+
+
+_sumideros = None
+
+
+def sumideros():
+    """Sumideros configurados (instanciados una vez por proceso)"""
+    global _sumideros
+    if _sumideros is None:
+        _sumideros = [import_string(ruta)() for ruta in settings.PRECIOS_METRICAS_SUMIDEROS]
+    return _sumideros
+
+
+def _sumideros_cambiados(setting, **kwargs):
+    global _sumideros
+    if setting == 'PRECIOS_METRICAS_SUMIDEROS':
+        _sumideros = None
+
+
+setting_changed.connect(_sumideros_cambiados, dispatch_uid='metricas_sumideros')
+
+
+def nueva_medicion(operacion):
+    """MedicionPrecio para una llamada, o None si no hay sumideros configurados"""
+    if not (_sumideros if _sumideros is not None else sumideros()):
+        return None
+    return MedicionPrecio(operacion)
+
+
+def registrar(medicion):
+    """Cerrar la medición y entregarla a los sumideros; un sumidero con errores no afecta al cálculo"""
+    medicion.segundos = perf_counter() - medicion.inicio
+    for sumidero in sumideros():
+        try:
+            sumidero.registrar(medicion)
+        except Exception:
+            logger.exception('Error en el sumidero de métricas %s', type(sumidero).__name__)
+
+
+# ---------------------------------------------------
+# Métricas de la aplicación
+# ---------------------------------------------------
+def registrar_peticion(vista, metodo, estado, segundos, consultas, segundos_sql):
+    """Llamado por PerfiladoMiddleware al terminar cada petición"""
+    registro.sumar('http_peticiones_total', vista=vista, metodo=metodo, estado=str(estado))
+    registro.observar('http_peticion_segundos', segundos, vista=vista, metodo=metodo)
+    registro.observar('bd_consultas_por_peticion', consultas, vista=vista)
+    if segundos_sql:
+        registro.sumar('bd_segundos_total', segundos_sql, vista=vista)
+
+
+def contar_cache(cache, acierto):
+    registro.sumar('cache_consultas_total', cache=cache, resultado='hit' if acierto else 'miss')
+
+
+@contextmanager
+def duracion(nombre, **etiquetas):
+    """Observar la duración del bloque en el histograma, con resultado ok o error"""
+    inicio = perf_counter()
+    resultado = 'error'
+    try:
+        yield
+        resultado = 'ok'
+    finally:
+        registro.observar(nombre, perf_counter() - inicio, resultado=resultado, **etiquetas)
+
+
+_envios_en_curso = 0
+_envios_lock = threading.Lock()
+
+
+def _sumar_envio(valor):
+    global _envios_en_curso
+    with _envios_lock:
+        _envios_en_curso += valor
+        registro.fijar('correo_envios_en_curso', _envios_en_curso)
+
+
+@contextmanager
+def envio_correo():
+    """Contar un envío de correo mientras dura y su resultado al terminar"""
+    _sumar_envio(1)
+    resultado = 'error'
+    try:
+        yield
+        resultado = 'ok'
+    finally:
+        _sumar_envio(-1)
+        registro.sumar('correo_enviados_total', resultado=resultado)
+
+
+# ---------------------------------------------------
+# Varios procesos
+# ---------------------------------------------------
+_ultimo_volcado = 0.0
+_identidad = None
+
+
+def _inicio_proceso(pid):
+    """Instante de arranque del proceso (en ticks, de /proc); None si no se puede leer"""
+    try:
+        estado = Path(f'/proc/{pid}/stat').read_text()
+    except OSError:
+        return None
+    # El nombre del comando (2º campo) puede tener espacios: starttime es el campo 22
+    return int(estado.rsplit(')', 1)[1].split()[19])
+
+
+def _identidad_proceso():
+    """(pid, inicio): distingue este proceso de otro que reciba su pid más adelante"""
+    global _identidad
+    pid = os.getpid()
+    if _identidad is None or _identidad[0] != pid:
+        _identidad = (pid, _inicio_proceso(pid) or uuid.uuid4().hex[:12])
+    return _identidad
+
+
+def arranque():
+    """
+    Identificador del arranque del servidor que comparten sus workers:
+    METRICAS_ARRANQUE o, por defecto, el proceso padre (el master de gunicorn)
+    """
+    configurado = getattr(settings, 'METRICAS_ARRANQUE', None)
+    if configurado:
+        return configurado
+    padre = os.getppid()
+    return f'{padre}-{_inicio_proceso(padre) or 0}'
+
+
+def _archivo(directorio):
+    pid, inicio = _identidad_proceso()
+    return Path(directorio) / f'metricas_{arranque()}_{pid}-{inicio}.json'
+
+
+def volcar(forzar=False):
+    """Escribir el registro del proceso en METRICAS_DIRECTORIO (como mucho cada METRICAS_VOLCADO_SEGUNDOS)"""
+    global _ultimo_volcado
+    directorio = settings.METRICAS_DIRECTORIO
+    if not directorio:
+        return
+    ahora = time.monotonic()
+    if not forzar and ahora - _ultimo_volcado < settings.METRICAS_VOLCADO_SEGUNDOS:
+        return
+    _ultimo_volcado = ahora
+
+    pid, inicio = _identidad_proceso()
+    destino = _archivo(directorio)
+    temporal = destino.with_name(f'.{destino.name}.{threading.get_ident()}')
+    try:
+        temporal.write_text(json.dumps({'pid': pid, 'inicio': inicio, 'valores': registro.exportar()}))
+        os.replace(temporal, destino)
+    except OSError:
+        logger.exception('No se pudieron volcar las métricas en %s', directorio)
+
+
+# Lo acumulado desde el último volcado no se pierde al terminar el worker
+atexit.register(volcar, forzar=True)
+
+
+def _proceso_vivo(pid, inicio=None):
+    """El proceso sigue vivo y no es otro que recibió el mismo pid"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    actual = _inicio_proceso(pid)
+    return not isinstance(inicio, int) or actual is None or actual == inicio
+
+
+def texto_metricas():
+    """Texto de Prometheus con las métricas de todos los procesos (o solo de este, sin METRICAS_DIRECTORIO)"""
+    directorio = settings.METRICAS_DIRECTORIO
+    if not directorio:
+        return registro.texto_prometheus()
+
+    volcar(forzar=True)
+    actual = f'metricas_{arranque()}_'
+    combinado = registro.vacio()
+    for archivo in Path(directorio).glob('metricas_*.json'):
+        if not archivo.name.startswith(actual):
+            # De un arranque anterior del servidor (o de un comando): no se suma
+            archivo.unlink(missing_ok=True)
+            continue
+        try:
+            datos = json.loads(archivo.read_text())
+        except (OSError, ValueError):    # el proceso lo está reemplazando
+            continue
+        combinado.importar(datos['valores'], medidores=_proceso_vivo(datos['pid'], datos.get('inicio')))
+    return combinado.texto_prometheus()
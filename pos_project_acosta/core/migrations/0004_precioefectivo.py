@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:37
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_empresa_alter_listaprecio_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecioEfectivo',
+            fields=[
+                ('precio_efectivo_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('canal_venta', models.IntegerField(blank=True, choices=[(1, 'Mostrador'), (2, 'Mayorista'), (3, 'Minorista'), (4, 'Online'), (5, 'Telefónico')], null=True)),
+                ('precio_base', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('precio_final', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('precio_valido', models.BooleanField(default=True, help_text='False si el precio final queda bajo costo sin autorización')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precios_efectivos', to='core.articulo')),
+                ('lista_precio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precios_efectivos', to='core.listaprecio')),
+            ],
+            options={
+                'db_table': 'precios_efectivos',
+                'unique_together': {('lista_precio', 'articulo', 'canal_venta')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_precioefectivo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articulo',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:50
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_articulo_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroEliminacion',
+            fields=[
+                ('registro_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('modelo', models.CharField(max_length=30)),
+                ('objeto_id', models.UUIDField()),
+                ('lista_precio_id', models.UUIDField(blank=True, null=True)),
+                ('empresa_id', models.UUIDField(blank=True, null=True)),
+                ('sucursal_id', models.UUIDField(blank=True, null=True)),
+                ('eliminado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'registros_eliminacion',
+                'indexes': [models.Index(fields=['eliminado_en'], name='registros_e_elimina_6372ef_idx')],
+            },
+        ),
+    ]
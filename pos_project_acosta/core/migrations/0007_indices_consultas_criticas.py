@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_registroeliminacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(condition=models.Q(('codigo_barras__isnull', False)), fields=['codigo_barras', 'estado'], name='articulos_codigo_barras_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(condition=models.Q(('stock__lt', 10)), fields=['descripcion'], name='articulos_bajo_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(condition=models.Q(('email__isnull', False)), fields=['email'], name='clientes_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemordencompracliente',
+            index=models.Index(fields=['pedido', 'nro_item'], name='items_pedido_nro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lineaarticulo',
+            index=models.Index(fields=['grupo', 'estado', 'codigo_linea'], include=('nombre_linea',), name='lineas_grupo_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordencompracliente',
+            index=models.Index(fields=['cliente', 'estado', '-fecha_creacion'], name='ordenes_cliente_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reglaprecio',
+            index=models.Index(fields=['lista_precio', 'estado', 'prioridad', 'tipo_regla'], name='reglas_lista_estado_prio_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:44
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def eliminar_duplicados_sin_canal(apps, schema_editor):
+    """Dejar una sola fila sin canal por lista y artículo (la más reciente)"""
+    PrecioEfectivo = apps.get_model('core', 'PrecioEfectivo')
+    repetidos = (
+        PrecioEfectivo.objects.filter(canal_venta__isnull=True)
+        .values('lista_precio_id', 'articulo_id')
+        .annotate(filas=Count('pk'))
+        .filter(filas__gt=1)
+    )
+    for grupo in repetidos.iterator():
+        filas = PrecioEfectivo.objects.filter(
+            lista_precio_id=grupo['lista_precio_id'], articulo_id=grupo['articulo_id'], canal_venta__isnull=True
+        ).order_by('-actualizado_en', 'pk')
+        conservar = filas.values_list('pk', flat=True)[0]
+        filas.exclude(pk=conservar).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_indices_consultas_criticas'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_duplicados_sin_canal, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='precioefectivo',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='precioefectivo',
+            constraint=models.UniqueConstraint(condition=models.Q(('canal_venta__isnull', False)), fields=('lista_precio', 'articulo', 'canal_venta'), name='precio_efectivo_unico_canal'),
+        ),
+        migrations.AddConstraint(
+            model_name='precioefectivo',
+            constraint=models.UniqueConstraint(condition=models.Q(('canal_venta__isnull', True)), fields=('lista_precio', 'articulo'), name='precio_efectivo_unico_sin_canal'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_precio_efectivo_unico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grupoarticulo',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='lineaarticulo',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
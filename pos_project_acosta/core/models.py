@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.db.models import Q
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from pos_project_acosta.choices import (
@@ -8,6 +9,9 @@ from pos_project_acosta.choices import (
 )
 from django.conf import settings
 
+from .alcance import AlcanceManager
+from .motor_precios import TIPOS_ESCALA, limites_regla, rango
+
 
 class Cliente(models.Model):
     nombre = models.CharField(max_length=150)
@@ -21,6 +25,10 @@ class Cliente(models.Model):
     class Meta:
         db_table = 'clientes'
         ordering = ['nombre']
+        indexes = [
+            # Órdenes del usuario por su email (OrdenViewSet)
+            models.Index(fields=['email'], condition=Q(email__isnull=False), name='clientes_email_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -51,6 +59,7 @@ class GrupoArticulo(models.Model):
     codigo_grupo = models.CharField(max_length=5, null=False)
     nombre_grupo = models.CharField(max_length=150, null=False)
     estado = models.IntegerField(choices=EstadoEntidades, default=EstadoEntidades.ACTIVO)
+    actualizado_en = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "grupos_articulos"
@@ -66,10 +75,16 @@ class LineaArticulo(models.Model):
     grupo = models.ForeignKey(GrupoArticulo, on_delete=models.RESTRICT, null=False, related_name='grupo_linea')
     nombre_linea = models.CharField(max_length=150, null=False)
     estado = models.IntegerField(choices=EstadoEntidades, default=EstadoEntidades.ACTIVO)
+    actualizado_en = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "lineas_articulo"
         ordering = ["codigo_linea"]
+        indexes = [
+            # get_lineas_por_grupo: filtro y orden desde el índice, con el nombre incluido
+            models.Index(fields=['grupo', 'estado', 'codigo_linea'], include=['nombre_linea'],
+                         name='lineas_grupo_estado_idx'),
+        ]
 
     def __str__(self):
         return self.nombre_linea
@@ -85,10 +100,18 @@ class Articulo(models.Model):
     linea = models.ForeignKey(LineaArticulo, on_delete=models.RESTRICT, null=True, blank=True)
     stock = models.IntegerField(default=0)  # 🔹 AHORA ENTERO SIN DECIMALES
     estado = models.IntegerField(choices=EstadoEntidades, default=EstadoEntidades.ACTIVO)
+    actualizado_en = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "articulos"
         ordering = ["descripcion"]
+        indexes = [
+            # Lectura de códigos de barras en caja; la mayoría de artículos no tiene código
+            models.Index(fields=['codigo_barras', 'estado'], condition=Q(codigo_barras__isnull=False),
+                         name='articulos_codigo_barras_idx'),
+            # Artículos con bajo stock (stock < 10), en el orden del listado
+            models.Index(fields=['descripcion'], condition=Q(stock__lt=10), name='articulos_bajo_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.codigo_articulo} - {self.descripcion}"
@@ -140,6 +163,9 @@ class OrdenCompraCliente(models.Model):
     class Meta:
         db_table = "ordenes_compra_cliente"
         ordering = ["-fecha_creacion"]
+        indexes = [
+            models.Index(fields=['cliente', 'estado', '-fecha_creacion'], name='ordenes_cliente_estado_idx'),
+        ]
 
 
 class ItemOrdenCompraCliente(models.Model):
@@ -172,6 +198,9 @@ class ItemOrdenCompraCliente(models.Model):
 
     class Meta:
         db_table = "items_ordenes_compra_cliente"
+        indexes = [
+            models.Index(fields=['pedido', 'nro_item'], name='items_pedido_nro_idx'),
+        ]
 
 
 # ============================================================================
@@ -191,10 +220,17 @@ class Empresa(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = AlcanceManager()
+
     class Meta:
         db_table = "empresas"
         ordering = ["nombre"]
 
+    @staticmethod
+    def filtro_alcance(alcance):
+        """Empresas visibles en el alcance (core/alcance.py)"""
+        return Q(empresa_id=alcance.empresa_id)
+
     def __str__(self):
         return self.nombre
 
@@ -212,11 +248,20 @@ class Sucursal(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = AlcanceManager()
+
     class Meta:
         db_table = "sucursales"
         ordering = ["nombre"]
         unique_together = [['empresa', 'codigo_sucursal']]
 
+    @staticmethod
+    def filtro_alcance(alcance):
+        """Sucursales de la empresa del alcance; con sucursal, solo esa (core/alcance.py)"""
+        if alcance.sucursal_id:
+            return Q(empresa_id=alcance.empresa_id, sucursal_id=alcance.sucursal_id)
+        return Q(empresa_id=alcance.empresa_id)
+
     def __str__(self):
         return f"{self.empresa.nombre} - {self.nombre}"
 
@@ -240,6 +285,8 @@ class ListaPrecio(models.Model):
     creado_en = models.DateTimeField(default=timezone.now)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = AlcanceManager()
+
     class Meta:
         db_table = "listas_precios_nuevas"
         ordering = ["-fecha_inicio", "nombre"]
@@ -248,6 +295,23 @@ class ListaPrecio(models.Model):
             models.Index(fields=['estado', 'fecha_inicio', 'fecha_fin']),
         ]
 
+    @staticmethod
+    def filtro_alcance(alcance):
+        """
+        Listas de la empresa del alcance y de sus sucursales; con sucursal, solo
+        las generales de la empresa y las de esa sucursal (core/alcance.py).
+        """
+        if alcance.sucursal_id:
+            return Q(empresa_id=alcance.empresa_id, sucursal__isnull=True) | Q(sucursal_id=alcance.sucursal_id)
+        return Q(empresa_id=alcance.empresa_id) | Q(
+            sucursal_id__in=Sucursal._base_manager.filter(empresa_id=alcance.empresa_id).values('pk')
+        )
+
+    @staticmethod
+    def listas_en_alcance(alcance):
+        """Subconsulta con los ids de las listas del alcance"""
+        return ListaPrecio._base_manager.filter(ListaPrecio.filtro_alcance(alcance)).values('pk')
+
     def clean(self):
         """Validar que no haya solapamiento de vigencias"""
         if self.empresa is None and self.sucursal is None:
@@ -327,6 +391,8 @@ class PrecioArticulo(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = AlcanceManager()
+
     class Meta:
         db_table = "precios_articulos"
         unique_together = [['lista_precio', 'articulo']]
@@ -334,6 +400,11 @@ class PrecioArticulo(models.Model):
             models.Index(fields=['lista_precio', 'articulo']),
         ]
 
+    @staticmethod
+    def filtro_alcance(alcance):
+        """Filas de las listas del alcance: lista_precio_id encabeza sus índices (core/alcance.py)"""
+        return Q(lista_precio_id__in=ListaPrecio.listas_en_alcance(alcance))
+
     def clean(self):
         """Validar que el precio base no sea inferior al último costo"""
         if self.precio_base < self.ultimo_costo:
@@ -399,14 +470,23 @@ class ReglaPrecio(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = AlcanceManager()
+
     class Meta:
         db_table = "reglas_precios"
         ordering = ["prioridad", "tipo_regla"]
         indexes = [
             models.Index(fields=['lista_precio', 'tipo_regla', 'estado']),
             models.Index(fields=['prioridad', 'estado']),
+            # Reglas activas de una lista en orden de aplicación (PrecioService._consultas_plan)
+            models.Index(fields=['lista_precio', 'estado', 'prioridad', 'tipo_regla'], name='reglas_lista_estado_prio_idx'),
         ]
 
+    @staticmethod
+    def filtro_alcance(alcance):
+        """Filas de las listas del alcance: lista_precio_id encabeza sus índices (core/alcance.py)"""
+        return Q(lista_precio_id__in=ListaPrecio.listas_en_alcance(alcance))
+
     def clean(self):
         """Validar que los campos sean consistentes con el tipo de regla"""
         if self.tipo_regla == TipoReglaPrecio.CANAL_VENTA and not self.canal_venta:
@@ -430,6 +510,35 @@ class ReglaPrecio(models.Model):
             if self.monto_total_minimo and self.monto_total_maximo and self.monto_total_minimo > self.monto_total_maximo:
                 raise ValidationError("El monto total mínimo no puede ser mayor que el máximo")
 
+        if self.tipo_regla in TIPOS_ESCALA and self.estado == EstadoEntidades.ACTIVO and self.lista_precio_id:
+            self.validar_tramos()
+
+    def validar_tramos(self):
+        """
+        Los tramos activos de un mismo tipo de escala y alcance (artículo, línea y
+        grupo) no pueden solaparse: para cada valor aplica a lo sumo uno, que el
+        motor encuentra por búsqueda binaria (core/motor_precios.py).
+        """
+        # _base_manager: la validación ve todas las reglas de la lista, sin el alcance de la petición
+        tramos = ReglaPrecio._base_manager.filter(
+            lista_precio_id=self.lista_precio_id,
+            tipo_regla=self.tipo_regla,
+            estado=EstadoEntidades.ACTIVO,
+            articulo_id=self.articulo_id,
+            linea_id=self.linea_id,
+            grupo_id=self.grupo_id,
+        ).exclude(pk=self.pk)
+
+        propio_minimo, propio_maximo = rango(*limites_regla(self))
+        for regla in tramos:
+            limites = limites_regla(regla)
+            minimo, maximo = rango(*limites)
+            if minimo <= propio_maximo and propio_minimo <= maximo:
+                raise ValidationError(
+                    f"El tramo se solapa con la regla '{regla.nombre}' "
+                    f"({limites[0] or 'Sin mínimo'} - {limites[1] or 'Sin máximo'})"
+                )
+
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
@@ -466,6 +575,8 @@ class CombinacionProducto(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = AlcanceManager()
+
     class Meta:
         db_table = "combinaciones_productos"
         ordering = ["nombre"]
@@ -473,6 +584,11 @@ class CombinacionProducto(models.Model):
             models.Index(fields=['lista_precio', 'estado']),
         ]
 
+    @staticmethod
+    def filtro_alcance(alcance):
+        """Filas de las listas del alcance: lista_precio_id encabeza sus índices (core/alcance.py)"""
+        return Q(lista_precio_id__in=ListaPrecio.listas_en_alcance(alcance))
+
     def clean(self):
         """Validar que se especifique al menos grupo, línea o artículo"""
         if not self.grupo and not self.linea and not self.articulo:
@@ -504,10 +620,17 @@ class DescuentoProveedor(models.Model):
     fecha_autorizacion = models.DateTimeField(auto_now_add=True)
     notas = models.TextField(null=True, blank=True)
 
+    objects = AlcanceManager()
+
     class Meta:
         db_table = "descuentos_proveedor"
         ordering = ["-fecha_autorizacion"]
 
+    @staticmethod
+    def filtro_alcance(alcance):
+        """Descuentos de precios de las listas del alcance (core/alcance.py)"""
+        return Q(precio_articulo__lista_precio_id__in=ListaPrecio.listas_en_alcance(alcance))
+
     def clean(self):
         """Validar que el porcentaje esté en el rango permitido"""
         if self.porcentaje_descuento < 50 or self.porcentaje_descuento > 70:
@@ -519,3 +642,93 @@ class DescuentoProveedor(models.Model):
 
     def __str__(self):
         return f"Descuento {self.porcentaje_descuento}% - {self.precio_articulo.articulo.descripcion}"
+
+
+class PrecioEfectivo(models.Model):
+    """
+    Precio final precalculado por lista, artículo y canal (cantidad 1, sin monto de pedido).
+    Lo mantiene PrecioService.recalcular_precios_efectivos desde core.signals; no se edita a mano.
+    Un canal_venta nulo representa la venta sin canal específico.
+    """
+    precio_efectivo_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    lista_precio = models.ForeignKey(ListaPrecio, on_delete=models.CASCADE, related_name='precios_efectivos', null=False)
+    articulo = models.ForeignKey(Articulo, on_delete=models.CASCADE, related_name='precios_efectivos', null=False)
+    canal_venta = models.IntegerField(choices=CanalVenta, null=True, blank=True)
+    precio_base = models.DecimalField(max_digits=12, decimal_places=2, null=False)
+    precio_final = models.DecimalField(max_digits=12, decimal_places=2, null=False)
+    precio_valido = models.BooleanField(default=True, help_text="False si el precio final queda bajo costo sin autorización")
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    objects = AlcanceManager()
+
+    class Meta:
+        db_table = "precios_efectivos"
+        # canal_venta nulo es un valor más (venta sin canal): una restricción por caso,
+        # porque en un UNIQUE común dos NULL no se consideran iguales
+        constraints = [
+            models.UniqueConstraint(
+                fields=['lista_precio', 'articulo', 'canal_venta'],
+                condition=Q(canal_venta__isnull=False),
+                name='precio_efectivo_unico_canal',
+            ),
+            models.UniqueConstraint(
+                fields=['lista_precio', 'articulo'],
+                condition=Q(canal_venta__isnull=True),
+                name='precio_efectivo_unico_sin_canal',
+            ),
+        ]
+
+    @staticmethod
+    def filtro_alcance(alcance):
+        """Filas de las listas del alcance: lista_precio_id encabeza sus índices (core/alcance.py)"""
+        return Q(lista_precio_id__in=ListaPrecio.listas_en_alcance(alcance))
+
+    def __str__(self):
+        return f"{self.articulo_id} - {self.precio_final} ({self.get_canal_venta_display() or 'Sin canal'})"
+
+
+class RegistroEliminacion(models.Model):
+    """
+    Registro (tombstone) de una fila eliminada, para que la sincronización incremental
+    de las terminales (/api/sync/) pueda informar bajas. Lo escribe core.signals.
+    Los precios, reglas y combinaciones guardan su lista; las listas, su empresa y
+    sucursal; los artículos no tienen alcance (catálogo común).
+    """
+    registro_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    modelo = models.CharField(max_length=30)
+    objeto_id = models.UUIDField()
+    lista_precio_id = models.UUIDField(null=True, blank=True)
+    empresa_id = models.UUIDField(null=True, blank=True)
+    sucursal_id = models.UUIDField(null=True, blank=True)
+    eliminado_en = models.DateTimeField(default=timezone.now)
+
+    objects = AlcanceManager()
+
+    class Meta:
+        db_table = "registros_eliminacion"
+        indexes = [
+            models.Index(fields=['eliminado_en']),
+        ]
+
+    @staticmethod
+    def filtro_alcance(alcance):
+        """
+        Bajas del alcance (core/alcance.py): artículos (catálogo común), listas de la
+        empresa/sucursal y filas de esas listas, existan todavía o ya se hayan eliminado.
+        """
+        if alcance.sucursal_id:
+            listas = Q(empresa_id=alcance.empresa_id, sucursal_id__isnull=True) | Q(sucursal_id=alcance.sucursal_id)
+        else:
+            listas = Q(empresa_id=alcance.empresa_id) | Q(
+                sucursal_id__in=Sucursal._base_manager.filter(empresa_id=alcance.empresa_id).values('pk')
+            )
+        listas &= Q(modelo='lista_precio')
+        listas_eliminadas = RegistroEliminacion._base_manager.filter(listas).values('objeto_id')
+        return (
+            Q(modelo='articulo') | listas
+            | Q(lista_precio_id__in=ListaPrecio.listas_en_alcance(alcance))
+            | Q(lista_precio_id__in=listas_eliminadas)
+        )
+
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id} eliminado {self.eliminado_en}"
@@ -0,0 +1,546 @@
+"""
+Motor de evaluación de precios sin acceso a base de datos.
+
+Las reglas y combinaciones de una lista se compilan una vez en un PlanPrecios
+(valores primitivos, factores de descuento precalculados) y luego se evalúan
+en memoria. La aritmética es Decimal exacta; el redondeo a céntimos se hace
+una sola vez, al construir la respuesta.
+
+El plan indexa las reglas por alcance (artículo, línea, grupo) y, dentro de cada
+alcance, los tramos de escala (ESCALA_UNIDADES, ESCALA_MONTO, MONTO_TOTAL_PEDIDO)
+como listas ordenadas por su límite inferior: el tramo que corresponde a un
+valor se encuentra con bisect en lugar de recorrer todas las reglas. El orden
+de aplicación (prioridad, tipo) y el resultado son los mismos que evaluando las
+reglas una por una; los tramos solapados de un mismo alcance (que
+ReglaPrecio.clean ya no permite) se evalúan uno por uno.
+
+Un plan también se puede exportar a valores JSON (a_dict / desde_dict) para
+evaluarlo fuera del servidor, como hacen los paquetes offline (core/paquetes.py).
+"""
+import uuid
+from bisect import bisect_right, insort
+from decimal import Decimal, ROUND_HALF_UP
+from operator import itemgetter
+
+from pos_project_acosta.choices import TipoReglaPrecio, TipoDescuento
+
+CERO = Decimal('0')
+CIEN = Decimal('100')
+CENTIMOS = Decimal('0.01')
+INFINITO = Decimal('Infinity')
+
+# Reglas por artículo que guarda cada plan (PlanPrecios._reglas_articulo)
+_MAX_ARTICULOS_PLAN = 20000
+
+# Clave de orden de los pares (orden de aplicación, regla)
+_orden = itemgetter(0)
+
+TIPOS_ESCALA = (
+    TipoReglaPrecio.ESCALA_UNIDADES, TipoReglaPrecio.ESCALA_MONTO, TipoReglaPrecio.MONTO_TOTAL_PEDIDO,
+)
+
+TIPO_COMBINACION = 'Combinación de Productos'
+
+ERROR_SIN_LISTA = 'No se encontró una lista de precios vigente'
+ERROR_SIN_PRECIO = 'No se encontró precio base para el artículo en esta lista'
+ERROR_SIN_ARTICULO = 'Artículo no encontrado'
+
+# Resultado de la validación de costo (métricas del servicio, core/metricas.py)
+COSTO_VALIDO = 'valido'
+COSTO_AUTORIZADO = 'bajo_costo_autorizado'
+COSTO_RECHAZADO = 'bajo_costo_rechazado'
+
+
+def _texto(valor):
+    """Decimal/UUID a texto para exportar (None se conserva)"""
+    return None if valor is None else str(valor)
+
+
+def _decimal(valor):
+    return None if valor is None else Decimal(valor)
+
+
+def _uuid(valor):
+    return None if valor is None else uuid.UUID(valor)
+
+
+def a_centimos(valor):
+    """Redondear un Decimal a céntimos (redondeo comercial)"""
+    return valor.quantize(CENTIMOS, rounding=ROUND_HALF_UP)
+
+
+def limites_regla(regla):
+    """Límites (minimo, maximo) de una ReglaPrecio según su tipo"""
+    if regla.tipo_regla == TipoReglaPrecio.ESCALA_UNIDADES:
+        return regla.cantidad_minima, regla.cantidad_maxima
+    if regla.tipo_regla == TipoReglaPrecio.ESCALA_MONTO:
+        return regla.monto_minimo, regla.monto_maximo
+    if regla.tipo_regla == TipoReglaPrecio.MONTO_TOTAL_PEDIDO:
+        return regla.monto_total_minimo, regla.monto_total_maximo
+    return None, None
+
+
+def rango(minimo, maximo):
+    """Límites inclusivos con infinitos en lugar de los vacíos (vacío o cero no restringe)"""
+    return minimo or -INFINITO, maximo or INFINITO
+
+
+class ReglaCompilada:
+    """
+    Regla de precio o combinación reducida a valores primitivos.
+    minimo/maximo son los límites del tipo de regla (cantidad, monto o monto total);
+    un límite vacío o cero no restringe, igual que en el modelo.
+    """
+    __slots__ = (
+        'id', 'es_combinacion', 'nombre', 'tipo', 'tipo_display', 'canal',
+        'articulo_id', 'linea_id', 'grupo_id', 'minimo', 'maximo',
+        'tipo_descuento', 'valor', 'factor',
+    )
+
+    def __init__(self, id, es_combinacion, nombre, tipo, tipo_display, canal,
+                 articulo_id, linea_id, grupo_id, minimo, maximo, tipo_descuento, valor):
+        self.id = id
+        self.es_combinacion = es_combinacion
+        self.nombre = nombre
+        self.tipo = tipo
+        self.tipo_display = tipo_display
+        self.canal = canal
+        self.articulo_id = articulo_id
+        self.linea_id = linea_id
+        self.grupo_id = grupo_id
+        self.minimo = minimo or None
+        self.maximo = maximo or None
+        self.tipo_descuento = tipo_descuento
+        self.valor = valor
+        # El factor de un descuento porcentual se calcula una sola vez por regla
+        self.factor = 1 - valor / CIEN if tipo_descuento == TipoDescuento.PORCENTAJE else None
+
+    @classmethod
+    def desde_regla(cls, regla):
+        """Compilar una ReglaPrecio (o cualquier objeto con sus atributos)"""
+        minimo, maximo = limites_regla(regla)
+
+        return cls(
+            id=str(regla.regla_precio_id),
+            es_combinacion=False,
+            nombre=regla.nombre,
+            tipo=regla.tipo_regla,
+            tipo_display=TipoReglaPrecio(regla.tipo_regla).label,
+            canal=regla.canal_venta,
+            articulo_id=regla.articulo_id,
+            linea_id=regla.linea_id,
+            grupo_id=regla.grupo_id,
+            minimo=minimo,
+            maximo=maximo,
+            tipo_descuento=regla.tipo_descuento,
+            valor=regla.valor_descuento,
+        )
+
+    @classmethod
+    def desde_combinacion(cls, combinacion):
+        """Compilar una CombinacionProducto (o cualquier objeto con sus atributos)"""
+        return cls(
+            id=str(combinacion.combinacion_id),
+            es_combinacion=True,
+            nombre=combinacion.nombre,
+            tipo=TipoReglaPrecio.COMBINACION_PRODUCTOS,
+            tipo_display=TIPO_COMBINACION,
+            canal=None,
+            articulo_id=combinacion.articulo_id,
+            linea_id=combinacion.linea_id,
+            grupo_id=combinacion.grupo_id,
+            minimo=combinacion.cantidad_minima_combinacion,
+            maximo=combinacion.cantidad_maxima_combinacion,
+            tipo_descuento=combinacion.tipo_descuento,
+            valor=combinacion.valor_descuento,
+        )
+
+    def a_lista(self):
+        """Valores del constructor como tipos JSON (Decimal y UUID como texto)"""
+        return [
+            self.id, self.es_combinacion, self.nombre, self.tipo, str(self.tipo_display), self.canal,
+            _texto(self.articulo_id), _texto(self.linea_id), _texto(self.grupo_id),
+            _texto(self.minimo), _texto(self.maximo), self.tipo_descuento, _texto(self.valor),
+        ]
+
+    @classmethod
+    def desde_lista(cls, valores):
+        """Inverso de a_lista"""
+        (id, es_combinacion, nombre, tipo, tipo_display, canal, articulo_id, linea_id, grupo_id,
+         minimo, maximo, tipo_descuento, valor) = valores
+        return cls(
+            id, es_combinacion, nombre, tipo, tipo_display, canal,
+            _uuid(articulo_id), _uuid(linea_id), _uuid(grupo_id),
+            _decimal(minimo), _decimal(maximo), tipo_descuento, Decimal(valor),
+        )
+
+    def aplica_articulo(self, articulo_id, linea_id, grupo_id):
+        """Verificar el alcance por artículo, línea y grupo"""
+        if self.articulo_id and self.articulo_id != articulo_id:
+            return False
+        if self.linea_id and self.linea_id != linea_id:
+            return False
+        if self.grupo_id and self.grupo_id != grupo_id:
+            return False
+        return True
+
+    def en_rango(self, valor):
+        """Verificar que el valor esté dentro de [minimo, maximo] (límites inclusivos)"""
+        if self.minimo and valor < self.minimo:
+            return False
+        if self.maximo and valor > self.maximo:
+            return False
+        return True
+
+    def limites(self):
+        return rango(self.minimo, self.maximo)
+
+    def cumple(self, precio_actual, canal, cantidad, monto_pedido):
+        """Verificar la condición propia del tipo de regla"""
+        if self.es_combinacion or self.tipo == TipoReglaPrecio.ESCALA_UNIDADES:
+            return self.en_rango(cantidad)
+        if self.tipo == TipoReglaPrecio.CANAL_VENTA:
+            return bool(canal) and self.canal == canal
+        if self.tipo == TipoReglaPrecio.ESCALA_MONTO:
+            return self.en_rango(precio_actual * cantidad)
+        if self.tipo == TipoReglaPrecio.MONTO_TOTAL_PEDIDO:
+            return self.en_rango(monto_pedido)
+        return False
+
+    def aplicar_descuento(self, precio):
+        """Aplicar el descuento de la regla al precio, sin redondear"""
+        if self.factor is not None:
+            return precio * self.factor
+        if self.tipo_descuento == TipoDescuento.MONTO_FIJO:
+            return max(CERO, precio - self.valor)
+        return precio
+
+
+class Escalas:
+    """
+    Tramos sin solapamiento de un tipo de escala y un alcance, ordenados por su
+    límite inferior. Cada tramo es (orden de aplicación, ReglaCompilada).
+    """
+    __slots__ = ('minimos', 'maximos', 'tramos')
+
+    def __init__(self, tramos):
+        tramos = sorted(tramos, key=lambda tramo: tramo[1].limites()[0])
+        self.minimos = [regla.limites()[0] for _, regla in tramos]
+        self.maximos = [regla.limites()[1] for _, regla in tramos]
+        self.tramos = tramos
+
+    @classmethod
+    def crear(cls, tramos):
+        """Escalas de los tramos, o None si alguno se solapa con otro"""
+        escalas = cls(tramos)
+        for i in range(1, len(escalas.tramos)):
+            if escalas.minimos[i] <= escalas.maximos[i - 1]:
+                return None
+        return escalas
+
+    def buscar(self, valor):
+        """Tramo que contiene el valor, o None"""
+        i = bisect_right(self.minimos, valor) - 1
+        if i >= 0 and valor <= self.maximos[i]:
+            return self.tramos[i]
+        return None
+
+
+class ReglasAlcance:
+    """Reglas de un alcance: escalas indexadas por tipo y el resto (orden, regla) en orden"""
+    __slots__ = ('escalas', 'otras')
+
+    def __init__(self):
+        self.escalas = {}
+        self.otras = []
+
+
+def _indexar(reglas):
+    """
+    {(articulo_id, linea_id, grupo_id): ReglasAlcance} y las formas de alcance
+    presentes ((articulo?, linea?, grupo?) como booleanos)
+    """
+    indice, tramos_por_grupo = {}, {}
+    for orden, regla in enumerate(reglas):
+        alcance = (regla.articulo_id, regla.linea_id, regla.grupo_id)
+        if regla.tipo in TIPOS_ESCALA:
+            tramos_por_grupo.setdefault((alcance, regla.tipo), []).append((orden, regla))
+        else:
+            indice.setdefault(alcance, ReglasAlcance()).otras.append((orden, regla))
+
+    for (alcance, tipo), tramos in tramos_por_grupo.items():
+        reglas_alcance = indice.setdefault(alcance, ReglasAlcance())
+        escalas = Escalas.crear(tramos)
+        if escalas is None:
+            # Tramos solapados (anteriores a la validación de ReglaPrecio.clean): uno por uno
+            reglas_alcance.otras = sorted(reglas_alcance.otras + tramos, key=_orden)
+        else:
+            reglas_alcance.escalas[tipo] = escalas
+
+    formas = {tuple(valor is not None for valor in alcance) for alcance in indice}
+    return indice, formas
+
+
+class PlanPrecios:
+    """
+    Reglas activas (ordenadas por prioridad y tipo) y combinaciones activas de una
+    lista de precios, compiladas para evaluarse sin consultas.
+    """
+    __slots__ = ('lista_precio_id', 'version', 'reglas', 'combinaciones', '_indice', '_formas', '_por_articulo')
+
+    def __init__(self, lista_precio_id, version, reglas, combinaciones):
+        self.lista_precio_id = lista_precio_id
+        self.version = version
+        self.reglas = reglas
+        self.combinaciones = combinaciones
+        self._indice, self._formas = _indexar(reglas)
+        self._por_articulo = {}
+
+    @classmethod
+    def compilar(cls, lista_precio_id, version, reglas, combinaciones):
+        """Compilar reglas (ya ordenadas) y combinaciones cargadas del ORM"""
+        return cls(
+            lista_precio_id,
+            version,
+            [ReglaCompilada.desde_regla(regla) for regla in reglas],
+            [ReglaCompilada.desde_combinacion(combinacion) for combinacion in combinaciones],
+        )
+
+    def a_dict(self):
+        """Plan como valores JSON; la versión no se exporta (la define quien lo empaqueta)"""
+        return {
+            'lista_precio_id': str(self.lista_precio_id),
+            'reglas': [regla.a_lista() for regla in self.reglas],
+            'combinaciones': [combinacion.a_lista() for combinacion in self.combinaciones],
+        }
+
+    @classmethod
+    def desde_dict(cls, datos, version=None):
+        """Inverso de a_dict"""
+        return cls(
+            uuid.UUID(datos['lista_precio_id']),
+            version,
+            [ReglaCompilada.desde_lista(valores) for valores in datos['reglas']],
+            [ReglaCompilada.desde_lista(valores) for valores in datos['combinaciones']],
+        )
+
+    def _reglas_articulo(self, articulo_id, linea_id, grupo_id):
+        """
+        Reglas de los alcances que incluyen al artículo: (otras en orden de
+        aplicación, [(tipo, Escalas), ...]). Se guardan por artículo en el plan.
+        """
+        clave = (articulo_id, linea_id, grupo_id)
+        resultado = self._por_articulo.get(clave)
+        if resultado is not None:
+            return resultado
+
+        otras, escalas = [], []
+        for usa_articulo, usa_linea, usa_grupo in self._formas:
+            if (usa_articulo and articulo_id is None) or (usa_linea and linea_id is None) \
+                    or (usa_grupo and grupo_id is None):
+                continue
+            reglas_alcance = self._indice.get((
+                articulo_id if usa_articulo else None,
+                linea_id if usa_linea else None,
+                grupo_id if usa_grupo else None,
+            ))
+            if reglas_alcance is not None:
+                otras.extend(reglas_alcance.otras)
+                escalas.extend(reglas_alcance.escalas.items())
+        otras.sort(key=_orden)
+
+        resultado = (otras, escalas)
+        if len(self._por_articulo) >= _MAX_ARTICULOS_PLAN:
+            self._por_articulo.clear()
+        self._por_articulo[clave] = resultado
+        return resultado
+
+    def _candidatas(self, articulo_id, linea_id, grupo_id, cantidad, monto_pedido):
+        """
+        Reglas que pueden aplicar al artículo: (orden, regla) en orden de aplicación,
+        con el tramo de unidades y de monto total que corresponde en cada alcance,
+        y las escalas de monto (dependen del precio al momento de evaluarlas).
+        """
+        candidatas, escalas_articulo = self._reglas_articulo(articulo_id, linea_id, grupo_id)
+        escalas_monto = []
+        copiada = False
+        for tipo, escalas in escalas_articulo:
+            if tipo == TipoReglaPrecio.ESCALA_MONTO:
+                escalas_monto.append(escalas)
+                continue
+            tramo = escalas.buscar(cantidad if tipo == TipoReglaPrecio.ESCALA_UNIDADES else monto_pedido)
+            if tramo is not None:
+                if not copiada:
+                    candidatas, copiada = list(candidatas), True
+                insort(candidatas, tramo, key=_orden)
+        return candidatas, escalas_monto
+
+    @staticmethod
+    def _aplicar_con_escalas_monto(candidatas, escalas_monto, precio_final, aplicadas,
+                                   canal, cantidad, monto_pedido):
+        """
+        Aplicar las candidatas y los tramos de monto en orden. Mientras el precio no
+        cambia, cada escala de monto tiene a lo sumo un tramo que aplica; se vuelve
+        a buscar cada vez que una regla cambia el precio.
+
+        Returns:
+            (precio_final, cantidad de tramos de monto evaluados)
+        """
+        siguiente, posicion, evaluados = 0, -1, 0
+        tramos, precio_tramos = [], None
+        while True:
+            if precio_tramos != precio_final:
+                valor = precio_final * cantidad
+                tramos = sorted(
+                    (tramo for tramo in (escalas.buscar(valor) for escalas in escalas_monto) if tramo is not None),
+                    key=_orden
+                )
+                precio_tramos = precio_final
+            tramo = next((tramo for tramo in tramos if tramo[0] > posicion), None)
+
+            if siguiente < len(candidatas) and (tramo is None or candidatas[siguiente][0] < tramo[0]):
+                posicion, regla = candidatas[siguiente]
+                siguiente += 1
+                if not regla.cumple(precio_final, canal, cantidad, monto_pedido):
+                    continue
+            elif tramo is not None:
+                posicion, regla = tramo
+                evaluados += 1
+            else:
+                return precio_final, evaluados
+
+            precio_nuevo = regla.aplicar_descuento(precio_final)
+            if precio_nuevo != precio_final:
+                aplicadas.append((regla, precio_final, precio_nuevo))
+                precio_final = precio_nuevo
+
+    def evaluar(self, articulo_id, linea_id, grupo_id, precio_base, ultimo_costo,
+                autorizado_bajo_costo, canal=None, cantidad=1, monto_pedido=CERO, medicion=None):
+        """
+        Aplicar reglas en orden, validar costo y aplicar combinaciones.
+        Con medicion (core.metricas.MedicionPrecio) se suman las reglas y
+        combinaciones consideradas y aplicadas y el resultado de la validación de costo.
+
+        Returns:
+            tupla (precio_final sin redondear, aplicadas, validacion_costo) donde aplicadas
+            es una lista de (ReglaCompilada, precio_anterior, precio_nuevo)
+        """
+        precio_final = precio_base
+        aplicadas = []
+
+        candidatas, escalas_monto = self._candidatas(articulo_id, linea_id, grupo_id, cantidad, monto_pedido)
+        consideradas = len(candidatas)
+        if not escalas_monto:
+            for _, regla in candidatas:
+                if not regla.cumple(precio_final, canal, cantidad, monto_pedido):
+                    continue
+                precio_nuevo = regla.aplicar_descuento(precio_final)
+                if precio_nuevo != precio_final:
+                    aplicadas.append((regla, precio_final, precio_nuevo))
+                    precio_final = precio_nuevo
+        else:
+            precio_final, tramos_aplicados = self._aplicar_con_escalas_monto(
+                candidatas, escalas_monto, precio_final, aplicadas, canal, cantidad, monto_pedido
+            )
+            consideradas += tramos_aplicados
+
+        validacion_costo = validar_costo(precio_final, ultimo_costo, autorizado_bajo_costo)
+        reglas_aplicadas = len(aplicadas)
+        bajo_costo = precio_final < ultimo_costo
+        evaluadas = 0
+
+        for combinacion in self.combinaciones:
+            if not combinacion.aplica_articulo(articulo_id, linea_id, grupo_id):
+                continue
+            evaluadas += 1
+            if not combinacion.cumple(precio_final, canal, cantidad, monto_pedido):
+                continue
+            precio_nuevo = combinacion.aplicar_descuento(precio_final)
+            if precio_nuevo != precio_final:
+                aplicadas.append((combinacion, precio_final, precio_nuevo))
+                precio_final = precio_nuevo
+
+        if medicion is not None:
+            medicion.sumar_evaluacion(
+                consideradas, reglas_aplicadas, evaluadas, len(aplicadas) - reglas_aplicadas,
+                (COSTO_AUTORIZADO if autorizado_bajo_costo else COSTO_RECHAZADO) if bajo_costo else COSTO_VALIDO
+            )
+        return precio_final, aplicadas, validacion_costo
+
+
+def resultado_error(mensaje, precio_base=CERO, autorizado_bajo_costo=False):
+    """Respuesta de cálculo cuando no se puede evaluar el artículo"""
+    return {
+        'precio_base': precio_base,
+        'precio_final': precio_base,
+        'reglas_aplicadas': [],
+        'autorizado_bajo_costo': autorizado_bajo_costo,
+        'error': mensaje
+    }
+
+
+def armar_resultado(plan, lista_precio_id, lista_precio_nombre, articulo_id, linea_id, grupo_id,
+                    precio_base, ultimo_costo, autorizado_bajo_costo, canal, cantidad, monto_pedido,
+                    medicion=None):
+    """Evaluar el plan para un artículo y construir la respuesta de calcular_precio"""
+    precio_final, aplicadas, validacion_costo = plan.evaluar(
+        articulo_id, linea_id, grupo_id, precio_base, ultimo_costo,
+        autorizado_bajo_costo, canal, cantidad, monto_pedido, medicion
+    )
+
+    # Único punto de redondeo: el motor trabaja con Decimal exacto
+    return {
+        'precio_base': precio_base,
+        'precio_final': a_centimos(precio_final),
+        'ultimo_costo': ultimo_costo,
+        'reglas_aplicadas': formatear_aplicadas(aplicadas),
+        'autorizado_bajo_costo': autorizado_bajo_costo,
+        'validacion_costo': validacion_costo,
+        'lista_precio_id': str(lista_precio_id),
+        'lista_precio_nombre': lista_precio_nombre
+    }
+
+
+def validar_costo(precio_final, ultimo_costo, autorizado_bajo_costo):
+    """
+    Validar que el precio final no sea inferior al costo (a menos que esté autorizado).
+
+    Returns:
+        dict con validación, mensaje y diferencia en céntimos
+    """
+    if precio_final < ultimo_costo:
+        diferencia = a_centimos(ultimo_costo - precio_final)
+        if autorizado_bajo_costo:
+            return {
+                'valido': True,
+                'mensaje': f'Precio bajo costo autorizado. Diferencia: {diferencia}',
+                'diferencia': diferencia
+            }
+        return {
+            'valido': False,
+            'mensaje': f'Precio final ({a_centimos(precio_final)}) es inferior al costo ({ultimo_costo}). No autorizado.',
+            'diferencia': diferencia
+        }
+    return {
+        'valido': True,
+        'mensaje': 'Precio válido',
+        'diferencia': a_centimos(precio_final - ultimo_costo)
+    }
+
+
+def formatear_aplicadas(aplicadas):
+    """Convertir las reglas aplicadas al formato de respuesta, redondeando a céntimos"""
+    resultado = []
+    for regla, precio_anterior, precio_nuevo in aplicadas:
+        clave_id = 'combinacion_id' if regla.es_combinacion else 'regla_id'
+        precio_anterior = a_centimos(precio_anterior)
+        precio_nuevo = a_centimos(precio_nuevo)
+        resultado.append({
+            clave_id: regla.id,
+            'nombre': regla.nombre,
+            'tipo': regla.tipo_display,
+            'precio_anterior': precio_anterior,
+            'precio_nuevo': precio_nuevo,
+            'descuento_aplicado': precio_anterior - precio_nuevo
+        })
+    return resultado
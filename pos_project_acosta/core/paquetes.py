@@ -0,0 +1,156 @@
+"""
+Paquetes de precios para terminales sin conexión.
+
+Un paquete contiene, para una empresa/sucursal y una fecha, la lista de precios
+vigente, todos sus precios (con los datos del artículo que usa el motor) y el
+plan de reglas y combinaciones ya compilado (PlanPrecios.a_dict), de modo que
+la terminal calcula precios con el mismo motor que el servidor y sin base de
+datos. Se genera con PrecioService.generar_paquete_offline.
+
+Formato (versión 1):
+
+    b'GPPQ' | versión (1 byte) | SHA-256 del contenido (32 bytes) | contenido
+
+donde contenido es el JSON del paquete comprimido con zlib. Decimales y UUID
+viajan como texto para no perder precisión.
+
+Este módulo no usa el ORM: leer_paquete y PaqueteOffline se pueden usar en la
+terminal con solo el código del motor (core/motor_precios.py).
+"""
+import hashlib
+import json
+import struct
+import uuid
+import zlib
+from decimal import Decimal
+
+from .motor_precios import (
+    PlanPrecios, armar_resultado, resultado_error, ERROR_SIN_LISTA, ERROR_SIN_PRECIO
+)
+
+MAGIA = b'GPPQ'
+VERSION_FORMATO = 1
+_CABECERA = struct.Struct('>4sB32s')
+
+# Columnas de cada artículo del paquete, en orden
+COLUMNAS_ARTICULOS = [
+    'articulo_id', 'codigo_articulo', 'codigo_barras', 'descripcion', 'linea_id', 'grupo_id',
+    'precio_base', 'ultimo_costo', 'autorizado_bajo_costo',
+]
+
+
+class PaqueteInvalido(ValueError):
+    """El paquete está dañado, incompleto o es de una versión de formato desconocida"""
+    pass
+
+
+def empaquetar(contenido):
+    """
+    Serializar y comprimir el contenido de un paquete.
+
+    Args:
+        contenido: dict con valores JSON (ver PrecioService.generar_paquete_offline)
+
+    Returns:
+        (bytes del paquete, checksum SHA-256 en hexadecimal)
+    """
+    texto = json.dumps(contenido, separators=(',', ':'), ensure_ascii=False, sort_keys=True)
+    comprimido = zlib.compress(texto.encode('utf-8'), 9)
+    resumen = hashlib.sha256(comprimido).digest()
+    return _CABECERA.pack(MAGIA, VERSION_FORMATO, resumen) + comprimido, resumen.hex()
+
+
+def desempaquetar(datos):
+    """Verificar cabecera y checksum y devolver el contenido del paquete como dict"""
+    if len(datos) < _CABECERA.size:
+        raise PaqueteInvalido('Paquete incompleto')
+
+    magia, version, resumen = _CABECERA.unpack_from(datos)
+    if magia != MAGIA:
+        raise PaqueteInvalido('No es un paquete de precios')
+    if version != VERSION_FORMATO:
+        raise PaqueteInvalido(f'Versión de formato no soportada: {version}')
+
+    comprimido = datos[_CABECERA.size:]
+    if hashlib.sha256(comprimido).digest() != resumen:
+        raise PaqueteInvalido('Checksum inválido')
+
+    try:
+        return json.loads(zlib.decompress(comprimido).decode('utf-8'))
+    except (zlib.error, ValueError) as e:
+        raise PaqueteInvalido(str(e))
+
+
+def leer_paquete(datos):
+    """Cargar un paquete (bytes) para calcular precios sin conexión"""
+    return PaqueteOffline(desempaquetar(datos))
+
+
+class PaqueteOffline:
+    """
+    Paquete cargado en memoria. calcular_precio y escanear devuelven el mismo
+    resultado que PrecioService.calcular_precio para la fecha del paquete.
+    """
+
+    def __init__(self, contenido):
+        self.contenido = contenido
+        self.fecha = contenido['fecha']
+        self.lista = contenido['lista']
+        self.plan = PlanPrecios.desde_dict(contenido['plan']) if contenido['plan'] else None
+
+        self.articulos = {}
+        self.codigos_barras = {}
+        for fila in contenido['articulos']:
+            articulo = dict(zip(COLUMNAS_ARTICULOS, fila))
+            articulo_id = uuid.UUID(articulo['articulo_id'])
+            articulo.update(
+                articulo_id=articulo_id,
+                linea_id=uuid.UUID(articulo['linea_id']) if articulo['linea_id'] else None,
+                grupo_id=uuid.UUID(articulo['grupo_id']) if articulo['grupo_id'] else None,
+                precio_base=Decimal(articulo['precio_base']),
+                ultimo_costo=Decimal(articulo['ultimo_costo']),
+            )
+            self.articulos[articulo_id] = articulo
+            if articulo['codigo_barras']:
+                self.codigos_barras[articulo['codigo_barras']] = articulo
+
+    def calcular_precio(self, articulo_id, canal=None, cantidad=1, monto_pedido=Decimal('0')):
+        """
+        Calcular el precio final de un artículo con el plan del paquete.
+
+        Args:
+            articulo_id: UUID (o texto) del artículo
+            canal: Canal de venta (opcional)
+            cantidad: Cantidad del artículo
+            monto_pedido: Monto total del pedido
+
+        Returns:
+            dict con el formato de PrecioService.calcular_precio
+        """
+        if self.plan is None:
+            return resultado_error(ERROR_SIN_LISTA)
+
+        articulo = self.articulos.get(uuid.UUID(str(articulo_id)))
+        if articulo is None:
+            return resultado_error(ERROR_SIN_PRECIO)
+        return self._evaluar(articulo, canal, cantidad, monto_pedido)
+
+    def escanear(self, codigo_barras, canal=None, cantidad=1, monto_pedido=Decimal('0')):
+        """
+        Precio de un artículo a partir de su código de barras.
+
+        Returns:
+            (dict del artículo o None, resultado o None si el código no está en el paquete)
+        """
+        articulo = self.codigos_barras.get(codigo_barras)
+        if articulo is None:
+            return None, None
+        return articulo, self._evaluar(articulo, canal, cantidad, monto_pedido)
+
+    def _evaluar(self, articulo, canal, cantidad, monto_pedido):
+        return armar_resultado(
+            self.plan, self.lista['lista_precio_id'], self.lista['nombre'],
+            articulo['articulo_id'], articulo['linea_id'], articulo['grupo_id'],
+            articulo['precio_base'], articulo['ultimo_costo'], articulo['autorizado_bajo_costo'],
+            canal, cantidad, Decimal(str(monto_pedido))
+        )
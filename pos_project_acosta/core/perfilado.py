@@ -0,0 +1,206 @@
+"""
+Perfilado por petición: consultas SQL, tiempo de serialización y del motor de precios.
+
+PerfiladoMiddleware crea un PerfilPeticion por petición (en un ContextVar, así
+también lo ven las consultas de vistas asíncronas que corren en otro hilo) y al
+terminar:
+
+- agrega el encabezado Server-Timing (sql, serializacion, motor, total),
+- registra una línea JSON en el logger 'perfilado',
+- compara la cantidad de consultas con el presupuesto de la vista,
+- suma la petición a las métricas de /metrics (core/metricas.py).
+
+Las consultas se cuentan con un execute_wrapper que se instala en cada conexión
+al crearse (señal connection_created). Las secciones se miden con medir():
+
+    with medir('motor'):
+        ...
+
+El presupuesto de consultas se toma, en orden, del atributo presupuesto_consultas
+de la vista, de PERFILADO_PRESUPUESTOS[url_name] o de PERFILADO_PRESUPUESTO_CONSULTAS.
+Con PERFILADO_ESTRICTO (pensado para tests) excederlo lanza
+PresupuestoConsultasExcedido; si no, solo se registra una advertencia.
+Las consultas hechas durante la serialización se informan aparte porque son el
+síntoma típico de un N+1.
+"""
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metricas
+
+logger = logging.getLogger('perfilado')
+
+_perfil = ContextVar('perfil_peticion', default=None)
+
+SERIALIZACION = 'serializacion'
+MOTOR = 'motor'
+
+
+class PresupuestoConsultasExcedido(Exception):
+    pass
+
+
+class PerfilPeticion:
+    """Acumuladores de una petición"""
+    __slots__ = ('inicio', 'consultas', 'tiempo_sql', 'tiempos', 'activas', 'consultas_por_seccion')
+
+    def __init__(self):
+        self.inicio = perf_counter()
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.tiempos = {}
+        self.activas = set()
+        self.consultas_por_seccion = {}
+
+    def sumar_consulta(self, duracion):
+        self.consultas += 1
+        self.tiempo_sql += duracion
+        for seccion in self.activas:
+            self.consultas_por_seccion[seccion] = self.consultas_por_seccion.get(seccion, 0) + 1
+
+    def server_timing(self, total):
+        partes = [f'sql;dur={self.tiempo_sql * 1000:.2f};desc="{self.consultas} consultas"']
+        partes += [f'{seccion};dur={tiempo * 1000:.2f}' for seccion, tiempo in self.tiempos.items()]
+        partes.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(partes)
+
+
+def perfil_actual():
+    """Perfil de la petición en curso (None fuera de una petición perfilada)"""
+    return _perfil.get()
+
+
+@contextmanager
+def medir(seccion):
+    """
+    Acumular el tiempo de una sección en el perfil de la petición.
+    Las secciones anidadas del mismo nombre (serializers dentro de serializers)
+    se miden una sola vez, en la más externa.
+    """
+    perfil = _perfil.get()
+    if perfil is None or seccion in perfil.activas:
+        yield
+        return
+
+    perfil.activas.add(seccion)
+    inicio = perf_counter()
+    try:
+        yield
+    finally:
+        perfil.activas.discard(seccion)
+        perfil.tiempos[seccion] = perfil.tiempos.get(seccion, 0.0) + perf_counter() - inicio
+
+
+def registrar_consulta(execute, sql, params, many, context):
+    """execute_wrapper: contar la consulta y su duración en el perfil de la petición"""
+    perfil = _perfil.get()
+    if perfil is None:
+        return execute(sql, params, many, context)
+
+    inicio = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        perfil.sumar_consulta(perf_counter() - inicio)
+
+
+def instalar_en_conexion(sender, connection, **kwargs):
+    """Receptor de connection_created (registrado en CoreConfig.ready)"""
+    if registrar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(registrar_consulta)
+
+
+class PerfiladoMiddleware:
+    """Mide cada petición y aplica el presupuesto de consultas de la vista"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        perfil = PerfilPeticion()
+        token = _perfil.set(perfil)
+        try:
+            response = self.get_response(request)
+        finally:
+            _perfil.reset(token)
+        return self.finalizar(request, response, perfil)
+
+    async def __acall__(self, request):
+        perfil = PerfilPeticion()
+        token = _perfil.set(perfil)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _perfil.reset(token)
+        return self.finalizar(request, response, perfil)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # APIView.as_view() expone la clase en .cls; las vistas de Django en .view_class
+        vista = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None) or view_func
+        request.presupuesto_consultas = getattr(vista, 'presupuesto_consultas', None)
+        return None
+
+    def presupuesto(self, request):
+        presupuesto = getattr(request, 'presupuesto_consultas', None)
+        if presupuesto is not None:
+            return presupuesto
+        coincidencia = getattr(request, 'resolver_match', None)
+        nombre = coincidencia.url_name if coincidencia else None
+        presupuestos = getattr(settings, 'PERFILADO_PRESUPUESTOS', {})
+        if nombre in presupuestos:
+            return presupuestos[nombre]
+        return getattr(settings, 'PERFILADO_PRESUPUESTO_CONSULTAS', None)
+
+    def finalizar(self, request, response, perfil):
+        total = perf_counter() - perfil.inicio
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = coincidencia.view_name if coincidencia else None
+
+        if getattr(settings, 'PERFILADO_SERVER_TIMING', True):
+            response['Server-Timing'] = perfil.server_timing(total)
+
+        registro = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': vista,
+            'estado': response.status_code,
+            'consultas': perfil.consultas,
+            'sql_ms': round(perfil.tiempo_sql * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }
+        for seccion, tiempo in perfil.tiempos.items():
+            registro[f'{seccion}_ms'] = round(tiempo * 1000, 2)
+        for seccion, consultas in perfil.consultas_por_seccion.items():
+            registro[f'consultas_{seccion}'] = consultas
+        logger.info(json.dumps(registro, ensure_ascii=False))
+        metricas.registrar_peticion(
+            vista or 'sin_ruta', request.method, response.status_code, total, perfil.consultas, perfil.tiempo_sql
+        )
+        metricas.volcar()
+
+        presupuesto = self.presupuesto(request)
+        if presupuesto is not None and perfil.consultas > presupuesto:
+            mensaje = (
+                f'{request.method} {request.path} ({vista}) ejecutó {perfil.consultas} consultas; '
+                f'presupuesto: {presupuesto}'
+            )
+            if perfil.consultas_por_seccion.get(SERIALIZACION):
+                mensaje += f' ({perfil.consultas_por_seccion[SERIALIZACION]} durante la serialización)'
+            if getattr(settings, 'PERFILADO_ESTRICTO', False):
+                raise PresupuestoConsultasExcedido(mensaje)
+            logger.warning(mensaje)
+
+        return response
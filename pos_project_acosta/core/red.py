@@ -0,0 +1,49 @@
+"""
+Dirección IP del cliente detrás de proxies inversos.
+
+Detrás de nginx o de un balanceador REMOTE_ADDR es la IP del proxy, la misma
+para todos los clientes. ip_cliente() recorre X-Forwarded-For de derecha a
+izquierda saltando los proxies de PROXIES_CONFIABLES (IPs o redes en notación
+CIDR) y devuelve la primera dirección que no es uno de ellos. Las entradas que
+agregó el cliente quedan a la izquierda y nunca se alcanzan, así que no puede
+falsificar su IP; si REMOTE_ADDR no es un proxy confiable el encabezado se
+ignora.
+"""
+import ipaddress
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=8)
+def _redes(proxies):
+    return tuple(ipaddress.ip_network(proxy, strict=False) for proxy in proxies)
+
+
+def _ip(texto):
+    try:
+        return ipaddress.ip_address(texto.strip())
+    except ValueError:
+        return None
+
+
+def _confiable(ip, redes):
+    return any(ip.version == red.version and ip in red for red in redes)
+
+
+def ip_cliente(request):
+    """IP del cliente (texto) o None si la petición no trae una válida"""
+    if request is None:
+        return None
+    ip = _ip(request.META.get('REMOTE_ADDR') or '')
+    if ip is None:
+        return None
+
+    redes = _redes(tuple(getattr(settings, 'PROXIES_CONFIABLES', ())))
+    saltos = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+    while _confiable(ip, redes) and saltos:
+        anterior = _ip(saltos.pop())
+        if anterior is None:
+            break
+        ip = anterior
+    return str(ip)
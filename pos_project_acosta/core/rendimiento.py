@@ -0,0 +1,571 @@
+"""
+Benchmarks reproducibles de los caminos críticos (manage.py rendimiento).
+
+generar_datos() crea, con una semilla fija, empresas, sucursales, listas de
+precios, los artículos de template_articulos_clases_sipan.csv (con sus grupos y
+líneas) y cientos de reglas y combinaciones. Cada escenario registrado con
+@escenario prepara su operación sobre esos datos y cronometrar() la repite y
+resume los tiempos (mínimo, mediana, p95) y las consultas SQL por operación.
+
+Los resultados se guardan como JSON; comparar() los contrasta con una línea base
+guardada y marca como regresión un escenario cuya mediana empeora más que la
+tolerancia o que ejecuta más consultas.
+"""
+import csv
+import random
+import statistics
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from time import perf_counter
+
+from asgiref.sync import async_to_sync
+from django.core.signals import request_started, request_finished
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from pos_project_acosta.choices import (
+    TipoReglaPrecio, TipoDescuento, CanalVenta
+)
+from .models import (
+    Empresa, Sucursal, ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto,
+    Articulo, GrupoArticulo, LineaArticulo, Cliente, Vendedor, OrdenCompraCliente,
+    ItemOrdenCompraCliente
+)
+from .motor_precios import PlanPrecios
+from .services import PrecioService
+
+DIRECTORIO_DATOS = Path(__file__).resolve().parent
+ARCHIVO_ARTICULOS = DIRECTORIO_DATOS / 'template_articulos_clases_sipan.csv'
+ARCHIVO_GRUPOS = DIRECTORIO_DATOS / 'grupos_articulos.csv'
+ARCHIVO_LINEAS = DIRECTORIO_DATOS / 'catalogo_lineas_proyecto_uss.csv'
+
+ESCENARIOS = {}
+
+
+def escenario(nombre, repeticiones=50):
+    """
+    Registrar un escenario. La función recibe el DatosBenchmark y devuelve la
+    operación a cronometrar (un callable sin argumentos).
+    """
+    def registrar(preparar):
+        ESCENARIOS[nombre] = (preparar, repeticiones)
+        return preparar
+    return registrar
+
+
+def _leer_csv(ruta):
+    with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+        return list(csv.DictReader(archivo))
+
+
+def crear_usuario():
+    """Usuario staff con el que se crean los datos y se llaman las APIs"""
+    from accounts.models import Perfil, Usuario
+    perfil, _ = Perfil.objects.get_or_create(perfil_id=1, defaults={'perfil_nombre': 'Administrador'})
+    usuario = Usuario(
+        username='benchmark', full_name='Benchmark', email='benchmark@benchmark.local',
+        perfil=perfil, is_staff=True
+    )
+    usuario.set_unusable_password()
+    usuario.save()
+    return usuario
+
+
+class DatosBenchmark:
+    """Identificadores de los datos generados, compartidos por los escenarios"""
+
+    def __init__(self, semilla, usuario):
+        self.semilla = semilla
+        self.usuario = usuario
+        self.empresas = []
+        self.sucursales = []
+        self.listas = []
+        self.articulo_ids = []
+        self.codigos_barras = []
+        self.lineas = []
+
+    def aleatorio(self, nombre):
+        """Generador aleatorio propio de cada escenario (no depende del orden de ejecución)"""
+        return random.Random(f'{self.semilla}:{nombre}')
+
+
+def generar_datos(usuario, semilla=42, articulos=None, empresas=3, sucursales_por_empresa=4,
+                  reglas_por_lista=40, combinaciones_por_lista=15):
+    """
+    Poblar la base de datos (vacía) con datos de prueba reproducibles.
+
+    Args:
+        usuario: Usuario que figura como creado_por
+        semilla: Semilla del generador aleatorio
+        articulos: Cantidad de artículos (default: todos los del CSV; si se piden
+            más, se repiten con otro código)
+        empresas, sucursales_por_empresa: Tamaño de la estructura comercial; cada
+            empresa tiene una lista general y la mitad de sus sucursales una propia
+        reglas_por_lista, combinaciones_por_lista: Reglas y combinaciones por lista
+
+    Returns:
+        DatosBenchmark
+    """
+    rng = random.Random(semilla)
+    datos = DatosBenchmark(semilla, usuario)
+
+    GrupoArticulo.objects.bulk_create([
+        GrupoArticulo(grupo_id=fila['grupo_id'], codigo_grupo=fila['codigo_grupo'][:5],
+                      nombre_grupo=fila['nombre_grupo'])
+        for fila in _leer_csv(ARCHIVO_GRUPOS)
+    ])
+    lineas = [
+        LineaArticulo(linea_id=fila['linea_id'], codigo_linea=fila['codigo_linea'][:10],
+                      grupo_id=fila['grupo_id'], nombre_linea=fila['nombre_linea'])
+        for fila in _leer_csv(ARCHIVO_LINEAS)
+    ]
+    LineaArticulo.objects.bulk_create(lineas)
+    datos.lineas = [(linea.linea_id, linea.grupo_id) for linea in lineas]
+
+    filas = _leer_csv(ARCHIVO_ARTICULOS)
+    total = articulos or len(filas)
+    nuevos = []
+    for i in range(total):
+        fila = filas[i % len(filas)]
+        vuelta = i // len(filas)
+        sufijo = f'-{vuelta}' if vuelta else ''
+        nuevos.append(Articulo(
+            articulo_id=uuid.UUID(fila['articulo_id']) if not vuelta else uuid.uuid4(),
+            codigo_articulo=f"{fila['codigo_articulo']}{sufijo}"[:30],
+            codigo_barras=f"{fila['codigo_barras']}{sufijo}" if fila['codigo_barras'] else None,
+            descripcion=fila['descripcion'],
+            stock=int(fila['stock']),
+            grupo_id=fila['grupo_id'],
+            linea_id=fila['linea_id'],
+        ))
+    Articulo.objects.bulk_create(nuevos, batch_size=2000)
+    datos.articulo_ids = [articulo.articulo_id for articulo in nuevos]
+    datos.codigos_barras = [articulo.codigo_barras for articulo in nuevos if articulo.codigo_barras]
+
+    hoy = timezone.now().date()
+    for e in range(empresas):
+        empresa = Empresa.objects.create(codigo_empresa=f'BENCH{e:02d}', nombre=f'Empresa {e}')
+        datos.empresas.append(empresa.empresa_id)
+        datos.listas.append(ListaPrecio.objects.create(
+            empresa=empresa, nombre=f'General {e}', fecha_inicio=hoy - timedelta(days=30), creado_por=usuario
+        ))
+        for s in range(sucursales_por_empresa):
+            sucursal = Sucursal.objects.create(empresa=empresa, codigo_sucursal=f'S{s:02d}', nombre=f'Sucursal {e}-{s}')
+            datos.sucursales.append((empresa.empresa_id, sucursal.sucursal_id))
+            if s % 2 == 0:
+                datos.listas.append(ListaPrecio.objects.create(
+                    empresa=empresa, sucursal=sucursal, nombre=f'Sucursal {e}-{s}',
+                    fecha_inicio=hoy - timedelta(days=30), creado_por=usuario
+                ))
+
+    for lista in datos.listas:
+        precios = []
+        for articulo in nuevos:
+            costo = Decimal(rng.randint(100, 50000)) / 100
+            precios.append(PrecioArticulo(
+                lista_precio=lista, articulo_id=articulo.articulo_id,
+                precio_base=(costo * Decimal(rng.choice(['1.15', '1.25', '1.40', '1.60']))).quantize(Decimal('0.01')),
+                ultimo_costo=costo, autorizado_bajo_costo=rng.random() < 0.05, creado_por=usuario,
+            ))
+        PrecioArticulo.objects.bulk_create(precios, batch_size=2000)
+        tramos = {}
+        ReglaPrecio.objects.bulk_create(
+            [_regla_aleatoria(rng, lista, datos, usuario, i, tramos) for i in range(reglas_por_lista)]
+        )
+        CombinacionProducto.objects.bulk_create(
+            [_combinacion_aleatoria(rng, lista, datos, usuario, i) for i in range(combinaciones_por_lista)]
+        )
+
+    Cliente.objects.create(nombre='Cliente benchmark', email='cliente@benchmark.local')
+    Vendedor.objects.create(nombre='Vendedor benchmark', usuario=usuario)
+    return datos
+
+
+def _alcance_aleatorio(rng, datos):
+    """Sin filtro, por grupo, por línea o por artículo"""
+    opcion = rng.random()
+    if opcion < 0.3:
+        return {}
+    linea_id, grupo_id = rng.choice(datos.lineas)
+    if opcion < 0.6:
+        return {'grupo_id': grupo_id}
+    if opcion < 0.85:
+        return {'linea_id': linea_id}
+    return {'articulo_id': rng.choice(datos.articulo_ids)}
+
+
+def _descuento_aleatorio(rng):
+    if rng.random() < 0.7:
+        return {'tipo_descuento': TipoDescuento.PORCENTAJE, 'valor_descuento': Decimal(rng.randint(1, 25))}
+    return {'tipo_descuento': TipoDescuento.MONTO_FIJO, 'valor_descuento': Decimal(rng.randint(50, 500)) / 100}
+
+
+def _regla_aleatoria(rng, lista, datos, usuario, i, tramos):
+    """
+    Regla aleatoria de la lista. bulk_create no pasa por ReglaPrecio.clean: los
+    tramos de un mismo tipo de escala y alcance se generan consecutivos para que
+    no se solapen (tramos guarda el primer valor libre de cada uno).
+    """
+    tipo = rng.choice([
+        TipoReglaPrecio.CANAL_VENTA, TipoReglaPrecio.ESCALA_UNIDADES,
+        TipoReglaPrecio.ESCALA_MONTO, TipoReglaPrecio.MONTO_TOTAL_PEDIDO,
+    ])
+    alcance = _alcance_aleatorio(rng, datos)
+    clave = (tipo, tuple(sorted(alcance.items())))
+    campos = {}
+    if tipo == TipoReglaPrecio.CANAL_VENTA:
+        campos['canal_venta'] = rng.choice(CanalVenta.values)
+    elif tipo == TipoReglaPrecio.ESCALA_UNIDADES:
+        minimo = tramos.get(clave) or rng.randint(2, 20)
+        maximo = tramos[clave] = minimo + rng.randint(5, 50)
+        tramos[clave] += 1
+        campos.update(cantidad_minima=minimo, cantidad_maxima=maximo)
+    elif tipo == TipoReglaPrecio.ESCALA_MONTO:
+        minimo = tramos.get(clave) or Decimal(rng.randint(50, 500))
+        maximo = minimo + Decimal(rng.randint(500, 5000))
+        tramos[clave] = maximo + Decimal('0.01')
+        campos.update(monto_minimo=minimo, monto_maximo=maximo)
+    else:
+        minimo = tramos.get(clave) or Decimal(rng.randint(200, 2000))
+        maximo = minimo + Decimal(rng.randint(1000, 10000))
+        tramos[clave] = maximo + Decimal('0.01')
+        campos.update(monto_total_minimo=minimo, monto_total_maximo=maximo)
+
+    return ReglaPrecio(
+        lista_precio=lista, tipo_regla=tipo, nombre=f'Regla {i}', prioridad=rng.randint(1, 10),
+        creado_por=usuario, **campos, **alcance, **_descuento_aleatorio(rng),
+    )
+
+
+def _combinacion_aleatoria(rng, lista, datos, usuario, i):
+    minimo = rng.randint(2, 6)
+    return CombinacionProducto(
+        lista_precio=lista, nombre=f'Combinación {i}', cantidad_minima_combinacion=minimo,
+        cantidad_maxima_combinacion=rng.choice([None, minimo * 3]), creado_por=usuario,
+        **_alcance_aleatorio(rng, datos), **_descuento_aleatorio(rng),
+    )
+
+
+# ---------------------------------------------------
+# Medición
+# ---------------------------------------------------
+def cronometrar(operacion, repeticiones, calentamiento=2):
+    """
+    Ejecutar la operación y resumir sus tiempos.
+    Las consultas se cuentan en una ejecución aparte para no sumar el costo de
+    registrarlas a los tiempos.
+    """
+    for _ in range(calentamiento):
+        operacion()
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = perf_counter()
+        operacion()
+        tiempos.append((perf_counter() - inicio) * 1000)
+
+    with CaptureQueriesContext(connection) as consultas:
+        operacion()
+
+    tiempos.sort()
+    return {
+        'repeticiones': repeticiones,
+        'min_ms': round(tiempos[0], 3),
+        'mediana_ms': round(statistics.median(tiempos), 3),
+        'p95_ms': round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 3),
+        'media_ms': round(statistics.fmean(tiempos), 3),
+        'consultas': len(consultas.captured_queries),
+    }
+
+
+def comparar(actual, base, tolerancia=0.10):
+    """
+    Comparar resultados con una línea base.
+
+    Returns:
+        Lista de (escenario, mediana base, mediana actual, variación, consultas base,
+        consultas actuales, es_regresion) para los escenarios presentes en ambos
+    """
+    filas = []
+    for nombre, resultado in actual['resultados'].items():
+        previo = base['resultados'].get(nombre)
+        if previo is None:
+            continue
+        variacion = resultado['mediana_ms'] / previo['mediana_ms'] - 1 if previo['mediana_ms'] else 0.0
+        regresion = variacion > tolerancia or resultado['consultas'] > previo['consultas']
+        filas.append((
+            nombre, previo['mediana_ms'], resultado['mediana_ms'], variacion,
+            previo['consultas'], resultado['consultas'], regresion
+        ))
+    return filas
+
+
+# ---------------------------------------------------
+# Escenarios
+# ---------------------------------------------------
+def _cliente_api(datos):
+    from rest_framework.test import APIClient
+    cliente = APIClient()
+    cliente.force_authenticate(datos.usuario)
+    return cliente
+
+
+def _get_ok(cliente, ruta, params=None):
+    def operacion():
+        respuesta = cliente.get(ruta, params)
+        assert respuesta.status_code == 200, (ruta, respuesta.status_code)
+    return operacion
+
+
+@escenario('obtener_lista_vigente', repeticiones=200)
+def lista_vigente(datos):
+    rng = datos.aleatorio('obtener_lista_vigente')
+
+    def operacion():
+        empresa_id, sucursal_id = rng.choice(datos.sucursales)
+        PrecioService.obtener_lista_vigente(empresa_id, sucursal_id)
+    return operacion
+
+
+@escenario('calcular_precio', repeticiones=200)
+def calcular_precio(datos):
+    rng = datos.aleatorio('calcular_precio')
+
+    def operacion():
+        empresa_id, sucursal_id = rng.choice(datos.sucursales)
+        PrecioService.calcular_precio(
+            empresa_id, sucursal_id, rng.choice(datos.articulo_ids),
+            canal=rng.choice([None] + CanalVenta.values), cantidad=rng.randint(1, 30),
+            monto_pedido=Decimal(rng.randint(0, 3000))
+        )
+    return operacion
+
+
+@escenario('calcular_lote_async', repeticiones=50)
+def calcular_lote(datos):
+    rng = datos.aleatorio('calcular_lote_async')
+
+    def operacion():
+        empresa_id, sucursal_id = rng.choice(datos.sucursales)
+        items = [
+            {'articulo_id': articulo_id, 'cantidad': rng.randint(1, 10)}
+            for articulo_id in rng.sample(datos.articulo_ids, 25)
+        ]
+        async_to_sync(PrecioService.acalcular_lote)(empresa_id, sucursal_id, items)
+    return operacion
+
+
+@escenario('motor_evaluar_lista', repeticiones=10)
+def motor_evaluar(datos):
+    """Motor Decimal sin base de datos: todos los precios de una lista, canal y cantidad 1"""
+    lista = datos.listas[0]
+    plan = PrecioService.obtener_plan(lista)
+    filas = list(PrecioArticulo.objects.filter(lista_precio=lista).values_list(
+        'articulo_id', 'articulo__linea_id', 'articulo__grupo_id',
+        'precio_base', 'ultimo_costo', 'autorizado_bajo_costo'
+    ))
+
+    def operacion():
+        for articulo_id, linea_id, grupo_id, base, costo, autorizado in filas:
+            plan.evaluar(articulo_id, linea_id, grupo_id, base, costo, autorizado, CanalVenta.values[0])
+    return operacion
+
+
+@escenario('motor_escalas', repeticiones=10)
+def motor_escalas(datos):
+    """
+    Motor con una lista mayorista: 200 tramos de unidades y 200 de monto por grupo
+    (sin guardar las reglas), evaluado para todos los precios de la lista
+    """
+    rng = datos.aleatorio('motor_escalas')
+    lista = datos.listas[0]
+    reglas = []
+    for grupo_id in sorted({grupo_id for _, grupo_id in datos.lineas}, key=str):
+        for tramo in range(200):
+            reglas.append(ReglaPrecio(
+                lista_precio=lista, tipo_regla=TipoReglaPrecio.ESCALA_UNIDADES, nombre=f'Unidades {tramo}',
+                prioridad=1, grupo_id=grupo_id, cantidad_minima=tramo * 5 + 1, cantidad_maxima=tramo * 5 + 5,
+                **_descuento_aleatorio(rng),
+            ))
+            reglas.append(ReglaPrecio(
+                lista_precio=lista, tipo_regla=TipoReglaPrecio.ESCALA_MONTO, nombre=f'Monto {tramo}',
+                prioridad=2, grupo_id=grupo_id, monto_minimo=Decimal(tramo * 100),
+                monto_maximo=Decimal(tramo * 100 + 99), **_descuento_aleatorio(rng),
+            ))
+    reglas.sort(key=lambda regla: (regla.prioridad, regla.tipo_regla))
+    plan = PlanPrecios.compilar(lista.lista_precio_id, None, reglas, [])
+    filas = [
+        (*fila, rng.randint(1, 1000))
+        for fila in PrecioArticulo.objects.filter(lista_precio=lista).values_list(
+            'articulo_id', 'articulo__linea_id', 'articulo__grupo_id',
+            'precio_base', 'ultimo_costo', 'autorizado_bajo_costo'
+        )
+    ]
+
+    def operacion():
+        for articulo_id, linea_id, grupo_id, base, costo, autorizado, cantidad in filas:
+            plan.evaluar(articulo_id, linea_id, grupo_id, base, costo, autorizado, cantidad=cantidad)
+    return operacion
+
+
+@escenario('api_articulos', repeticiones=30)
+def api_articulos(datos):
+    return _get_ok(_cliente_api(datos), '/api/articulos/', {'page': 5})
+
+
+@escenario('api_articulos_v1', repeticiones=30)
+def api_articulos_v1(datos):
+    return _get_ok(_cliente_api(datos), '/api/v1/articulos/')
+
+
+@escenario('api_precios_lista', repeticiones=10)
+def api_precios_lista(datos):
+    """Todos los precios de una lista en una respuesta (listado de alto volumen)"""
+    lista = datos.listas[0]
+    return _get_ok(_cliente_api(datos), f'/api/listas-precios/{lista.lista_precio_id}/precios_articulos/')
+
+
+@escenario('render_json_precios', repeticiones=10)
+def render_json(datos):
+    """Solo el renderer JSON sobre las filas ya serializadas de una lista completa"""
+    from api.renderers import JSONRendererRapido
+    from api.serializers import PrecioArticuloFilasSerializer
+    filas = PrecioArticuloFilasSerializer(
+        PrecioArticulo.objects.filter(lista_precio=datos.listas[0])
+    ).data
+    renderer = JSONRendererRapido()
+    return lambda: renderer.render(filas)
+
+
+@escenario('checkout', repeticiones=20)
+def checkout(datos):
+    """
+    Confirmar un carrito de 10 artículos: precio de cada uno con el motor, orden e
+    ítems en una transacción (las mismas escrituras que core.views.checkout).
+    """
+    rng = datos.aleatorio('checkout')
+    cliente = Cliente.objects.first()
+    vendedor = Vendedor.objects.first()
+    numeros = iter(range(10 ** 9, 2 * 10 ** 9))
+
+    def operacion():
+        empresa_id, sucursal_id = rng.choice(datos.sucursales)
+        with transaction.atomic():
+            orden = OrdenCompraCliente.objects.create(
+                nro_pedido=next(numeros), cliente=cliente, vendedor=vendedor, creado_por=datos.usuario
+            )
+            for nro_item, articulo_id in enumerate(rng.sample(datos.articulo_ids, 10), start=1):
+                cantidad = rng.randint(1, 5)
+                resultado = PrecioService.calcular_precio(empresa_id, sucursal_id, articulo_id, cantidad=cantidad)
+                ItemOrdenCompraCliente.objects.create(
+                    pedido=orden, nro_item=nro_item, articulo_id=articulo_id, cantidad=cantidad,
+                    precio_unitario=resultado['precio_final'], creado_por=datos.usuario
+                )
+    return operacion
+
+
+@escenario('importacion_precios', repeticiones=5)
+def importacion_precios(datos):
+    """Alta masiva de una lista con el precio de todos los artículos (se revierte)"""
+    rng = datos.aleatorio('importacion_precios')
+
+    def operacion():
+        with transaction.atomic():
+            # Empresa propia: la lista no debe solaparse con las vigentes
+            empresa = Empresa.objects.create(codigo_empresa='IMPORTACION', nombre='Importación')
+            lista = ListaPrecio.objects.create(empresa=empresa, nombre='Importación', creado_por=datos.usuario)
+            PrecioArticulo.objects.bulk_create([
+                PrecioArticulo(
+                    lista_precio=lista, articulo_id=articulo_id,
+                    precio_base=Decimal(rng.randint(200, 90000)) / 100, creado_por=datos.usuario
+                )
+                for articulo_id in datos.articulo_ids
+            ], batch_size=2000)
+            transaction.set_rollback(True)
+    return operacion
+
+
+@escenario('recalcular_precios_efectivos', repeticiones=3)
+def recalcular_efectivos(datos):
+    lista = datos.listas[-1]
+    return lambda: PrecioService.recalcular_precios_efectivos(lista)
+
+
+@escenario('conexion_bd', repeticiones=30)
+def conexion_bd(datos):
+    """Costo de abrir una conexión nueva y ejecutar una consulta mínima"""
+    def operacion():
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    return operacion
+
+
+@escenario('conexion_peticion', repeticiones=30)
+def conexion_peticion(datos):
+    """
+    Conexión en el ciclo de una petición (señales request_started/request_finished,
+    que cierran o conservan la conexión según CONN_MAX_AGE o la devuelven al pool).
+    Con conexiones persistentes o pool queda muy por debajo de conexion_bd.
+    """
+    def operacion():
+        request_started.send(sender=None)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        request_finished.send(sender=None)
+    return operacion
+
+
+def _indice_sintetico(rng, dispositivos=10000):
+    """Índice de proximidad con dispositivos repartidos en ~100 km alrededor de Chiclayo"""
+    from accounts.proximidad import IndiceEspacial
+    indice = IndiceEspacial()
+    ahora = timezone.now()
+    for dispositivo_id in range(1, dispositivos + 1):
+        indice.actualizar(
+            dispositivo_id, -6.77 + rng.uniform(-0.5, 0.5), -79.84 + rng.uniform(-0.5, 0.5),
+            ahora - timedelta(seconds=rng.randint(0, 3600))
+        )
+    return indice
+
+
+@escenario('proximidad_radio', repeticiones=200)
+def proximidad_radio(datos):
+    """Dispositivos a menos de 5 km de un punto, sobre 10.000 dispositivos en memoria"""
+    rng = datos.aleatorio('proximidad_radio')
+    indice = _indice_sintetico(rng)
+
+    def operacion():
+        indice.en_radio(-6.77 + rng.uniform(-0.4, 0.4), -79.84 + rng.uniform(-0.4, 0.4), 5000, limite=50)
+    return operacion
+
+
+@escenario('proximidad_area', repeticiones=200)
+def proximidad_area(datos):
+    """Dispositivos dentro de un rectángulo de ~10 km, sobre 10.000 dispositivos en memoria"""
+    rng = datos.aleatorio('proximidad_area')
+    indice = _indice_sintetico(rng)
+
+    def operacion():
+        sur, oeste = -6.77 + rng.uniform(-0.4, 0.3), -79.84 + rng.uniform(-0.4, 0.3)
+        indice.en_rectangulo(sur, oeste, sur + 0.09, oeste + 0.09)
+    return operacion
+
+
+@escenario('recorrido_simplificar', repeticiones=10)
+def recorrido_simplificar(datos):
+    """Un día de fixes cada 5 segundos (17.280 puntos) simplificado a 2.000 y codificado"""
+    from accounts.recorridos import codificar_polilinea, simplificar
+    rng = datos.aleatorio('recorrido_simplificar')
+    puntos, latitud, longitud = [], -6.77, -79.84
+    for _ in range(17280):
+        latitud += rng.gauss(0, 0.00005)
+        longitud += rng.gauss(0, 0.00005)
+        puntos.append((latitud, longitud))
+
+    def operacion():
+        codificar_polilinea(puntos[i] for i in simplificar(puntos, maximo=2000))
+    return operacion
@@ -2,16 +2,48 @@
 Servicio para gestionar la lógica de cálculo de precios
 Sistema de Gestión de Listas de Precios y Políticas Comerciales
 """
+import asyncio
 from decimal import Decimal
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
 from .models import (
     Empresa, Sucursal, ListaPrecio, PrecioArticulo, ReglaPrecio, 
-    CombinacionProducto, Articulo, GrupoArticulo, LineaArticulo
+    CombinacionProducto, Articulo, GrupoArticulo, LineaArticulo, PrecioEfectivo
 )
 from pos_project_acosta.choices import (
-    EstadoEntidades, TipoReglaPrecio, CanalVenta, TipoDescuento
+    EstadoEntidades, CanalVenta
 )
+from .motor_precios import (
+    PlanPrecios, ReglaCompilada, a_centimos, armar_resultado, resultado_error,
+    ERROR_SIN_LISTA, ERROR_SIN_PRECIO, ERROR_SIN_ARTICULO
+)
+from . import metricas, motor_precios, paquetes
+from .perfilado import medir, MOTOR
+
+# Planes compilados por lista, válidos mientras no cambie ListaPrecio.actualizado_en
+_planes = {}
+_MAX_PLANES = 256
+
+
+def _resultado_error(mensaje, precio_articulo=None):
+    """Respuesta de calcular_precio cuando no se puede evaluar el artículo"""
+    if precio_articulo is None:
+        return resultado_error(mensaje)
+    return resultado_error(mensaje, precio_articulo.precio_base, precio_articulo.autorizado_bajo_costo)
+
+
+def _cerrar(medicion, resultado):
+    """Contar el resultado en la medición y entregarla a los sumideros (core/metricas.py)"""
+    if medicion is not None:
+        medicion.sumar_resultado(resultado)
+        metricas.registrar(medicion)
+    return resultado
+
+
+async def _listar(queryset):
+    """Materializar un queryset con el ORM asíncrono"""
+    return [obj async for obj in queryset]
 
 
 class PrecioService:
@@ -87,20 +119,17 @@ class PrecioService:
         Returns:
             dict con precio_base, precio_final, reglas_aplicadas, autorizado_bajo_costo
         """
+        medicion = metricas.nueva_medicion('calcular_precio')
         if fecha is None:
             fecha = timezone.now().date()
         
         # Obtener lista vigente
         lista_precio = PrecioService.obtener_lista_vigente(empresa_id, sucursal_id, fecha)
+        if medicion is not None:
+            medicion.lista_resuelta(lista_precio)
         
         if not lista_precio:
-            return {
-                'precio_base': Decimal('0'),
-                'precio_final': Decimal('0'),
-                'reglas_aplicadas': [],
-                'autorizado_bajo_costo': False,
-                'error': 'No se encontró una lista de precios vigente'
-            }
+            return _cerrar(medicion, _resultado_error(ERROR_SIN_LISTA))
         
         # Obtener precio base del artículo
         try:
@@ -108,91 +137,373 @@ class PrecioService:
                 lista_precio=lista_precio,
                 articulo_id=articulo_id
             )
-            precio_base = precio_articulo.precio_base
-            ultimo_costo = precio_articulo.ultimo_costo
-            autorizado_bajo_costo = precio_articulo.autorizado_bajo_costo
         except PrecioArticulo.DoesNotExist:
-            return {
-                'precio_base': Decimal('0'),
-                'precio_final': Decimal('0'),
-                'reglas_aplicadas': [],
-                'autorizado_bajo_costo': False,
-                'error': 'No se encontró precio base para el artículo en esta lista'
-            }
+            return _cerrar(medicion, _resultado_error(ERROR_SIN_PRECIO))
         
         # Obtener artículo para aplicar reglas
         try:
             articulo = Articulo.objects.get(articulo_id=articulo_id)
         except Articulo.DoesNotExist:
-            return {
-                'precio_base': precio_base,
-                'precio_final': precio_base,
-                'reglas_aplicadas': [],
-                'autorizado_bajo_costo': autorizado_bajo_costo,
-                'error': 'Artículo no encontrado'
-            }
+            return _cerrar(medicion, _resultado_error(ERROR_SIN_ARTICULO, precio_articulo))
+        
+        plan = PrecioService.obtener_plan(lista_precio, medicion)
+        return _cerrar(medicion, PrecioService._armar_resultado(
+            lista_precio, plan, precio_articulo, articulo, canal, cantidad, monto_pedido, medicion
+        ))
+    
+    @staticmethod
+    def _armar_resultado(lista_precio, plan, precio_articulo, articulo, canal, cantidad, monto_pedido,
+                         medicion=None):
+        """Evaluar el plan para un artículo y construir la respuesta de calcular_precio"""
+        with medir(MOTOR):
+            return armar_resultado(
+                plan, lista_precio.lista_precio_id, lista_precio.nombre,
+                articulo.articulo_id, articulo.linea_id, articulo.grupo_id,
+                precio_articulo.precio_base, precio_articulo.ultimo_costo,
+                precio_articulo.autorizado_bajo_costo, canal, cantidad, monto_pedido, medicion
+            )
+    
+    @staticmethod
+    def obtener_plan(lista_precio, medicion=None):
+        """
+        Obtener el plan compilado (reglas y combinaciones activas) de una lista.
+        Se cachea por proceso y se invalida cuando cambia lista_precio.actualizado_en,
+        que core.signals actualiza al modificar reglas o combinaciones.
         
-        # Aplicar reglas en orden de prioridad
-        precio_final = precio_base
-        reglas_aplicadas = []
+        Args:
+            lista_precio: Instancia de ListaPrecio
+            medicion: MedicionPrecio donde anotar si el plan salió de la caché (opcional)
         
-        # Obtener reglas activas ordenadas por prioridad
+        Returns:
+            PlanPrecios
+        """
+        plan = _planes.get(lista_precio.lista_precio_id)
+        en_cache = plan is not None and plan.version == lista_precio.actualizado_en
+        metricas.contar_cache('planes_precios', en_cache)
+        if medicion is not None:
+            medicion.plan_en_cache = en_cache
+        if en_cache:
+            return plan
+        
+        reglas, combinaciones = PrecioService._consultas_plan(lista_precio)
+        return PrecioService._guardar_plan(lista_precio, reglas, combinaciones)
+    
+    @staticmethod
+    def _consultas_plan(lista_precio):
+        """Querysets de reglas (en orden de aplicación) y combinaciones activas de la lista"""
         reglas = ReglaPrecio.objects.filter(
             lista_precio=lista_precio,
             estado=EstadoEntidades.ACTIVO
         ).order_by('prioridad', 'tipo_regla')
-        
-        for regla in reglas:
-            precio_anterior = precio_final
-            precio_final = PrecioService.aplicar_regla(
-                regla, articulo, precio_final, canal, cantidad, monto_pedido
-            )
-            
-            if precio_final != precio_anterior:
-                reglas_aplicadas.append({
-                    'regla_id': str(regla.regla_precio_id),
-                    'nombre': regla.nombre,
-                    'tipo': regla.get_tipo_regla_display(),
-                    'precio_anterior': float(precio_anterior),
-                    'precio_nuevo': float(precio_final),
-                    'descuento_aplicado': float(precio_anterior - precio_final)
-                })
-        
-        # Validar costo
-        validacion_costo = PrecioService.validar_costo(precio_final, ultimo_costo, autorizado_bajo_costo)
-        
-        # Aplicar combinaciones de productos si aplica
         combinaciones = CombinacionProducto.objects.filter(
             lista_precio=lista_precio,
             estado=EstadoEntidades.ACTIVO
         )
+        return reglas, combinaciones
+    
+    @staticmethod
+    def _guardar_plan(lista_precio, reglas, combinaciones):
+        """Compilar el plan y guardarlo en la caché del proceso"""
+        plan = PlanPrecios.compilar(
+            lista_precio.lista_precio_id, lista_precio.actualizado_en, reglas, combinaciones
+        )
         
-        for combinacion in combinaciones:
-            if PrecioService._aplica_combinacion(combinacion, articulo, cantidad):
-                precio_anterior = precio_final
-                precio_final = PrecioService._aplicar_combinacion(combinacion, precio_final)
-                
-                if precio_final != precio_anterior:
-                    reglas_aplicadas.append({
-                        'combinacion_id': str(combinacion.combinacion_id),
-                        'nombre': combinacion.nombre,
-                        'tipo': 'Combinación de Productos',
-                        'precio_anterior': float(precio_anterior),
-                        'precio_nuevo': float(precio_final),
-                        'descuento_aplicado': float(precio_anterior - precio_final)
-                    })
-        
-        return {
-            'precio_base': float(precio_base),
-            'precio_final': float(precio_final),
-            'ultimo_costo': float(ultimo_costo),
-            'reglas_aplicadas': reglas_aplicadas,
-            'autorizado_bajo_costo': autorizado_bajo_costo,
-            'validacion_costo': validacion_costo,
-            'lista_precio_id': str(lista_precio.lista_precio_id),
-            'lista_precio_nombre': lista_precio.nombre
-        }
+        if len(_planes) >= _MAX_PLANES:
+            _planes.clear()
+        _planes[lista_precio.lista_precio_id] = plan
+        return plan
     
+    # ---------------------------------------------------
+    # Variantes asíncronas (vistas ASGI, api/views_async.py)
+    # ---------------------------------------------------
+    @staticmethod
+    async def aobtener_lista_vigente(empresa_id=None, sucursal_id=None, fecha=None):
+        """
+        Versión asíncrona de obtener_lista_vigente. Carga empresa, sucursal y
+        creado_por en la misma consulta para poder serializar la lista sin más
+        accesos a la base de datos.
+        """
+        if fecha is None:
+            fecha = timezone.now().date()
+        
+        listas = ListaPrecio.objects.filter(estado=EstadoEntidades.ACTIVO).select_related(
+            'empresa', 'sucursal', 'creado_por'
+        )
+        
+        # Buscar lista por sucursal primero (más específica)
+        if sucursal_id:
+            async for lista in listas.filter(
+                sucursal_id=sucursal_id, sucursal__estado=EstadoEntidades.ACTIVO
+            ):
+                if lista.esta_vigente(fecha):
+                    return lista
+        
+        # Buscar lista por empresa
+        if empresa_id:
+            async for lista in listas.filter(
+                empresa_id=empresa_id, empresa__estado=EstadoEntidades.ACTIVO, sucursal__isnull=True
+            ):
+                if lista.esta_vigente(fecha):
+                    return lista
+        
+        return None
+    
+    @staticmethod
+    async def aobtener_plan(lista_precio, medicion=None):
+        """Versión asíncrona de obtener_plan; reglas y combinaciones se leen en paralelo"""
+        plan = _planes.get(lista_precio.lista_precio_id)
+        en_cache = plan is not None and plan.version == lista_precio.actualizado_en
+        metricas.contar_cache('planes_precios', en_cache)
+        if medicion is not None:
+            medicion.plan_en_cache = en_cache
+        if en_cache:
+            return plan
+        
+        reglas, combinaciones = PrecioService._consultas_plan(lista_precio)
+        reglas, combinaciones = await asyncio.gather(_listar(reglas), _listar(combinaciones))
+        return PrecioService._guardar_plan(lista_precio, reglas, combinaciones)
+    
+    @staticmethod
+    async def acalcular_precio(empresa_id, sucursal_id, articulo_id, canal=None,
+                               cantidad=1, monto_pedido=Decimal('0'), fecha=None):
+        """
+        Versión asíncrona de calcular_precio. Una vez resuelta la lista, el precio
+        base, el artículo y el plan de reglas se consultan concurrentemente.
+        """
+        medicion = metricas.nueva_medicion('acalcular_precio')
+        lista_precio = await PrecioService.aobtener_lista_vigente(empresa_id, sucursal_id, fecha)
+        if medicion is not None:
+            medicion.lista_resuelta(lista_precio)
+        if not lista_precio:
+            return _cerrar(medicion, _resultado_error(ERROR_SIN_LISTA))
+        
+        precio_articulo, articulo, plan = await asyncio.gather(
+            PrecioArticulo.objects.filter(lista_precio=lista_precio, articulo_id=articulo_id).afirst(),
+            Articulo.objects.filter(articulo_id=articulo_id).only(
+                'articulo_id', 'linea_id', 'grupo_id'
+            ).afirst(),
+            PrecioService.aobtener_plan(lista_precio, medicion),
+        )
+        if precio_articulo is None:
+            return _cerrar(medicion, _resultado_error(ERROR_SIN_PRECIO))
+        if articulo is None:
+            return _cerrar(medicion, _resultado_error(ERROR_SIN_ARTICULO, precio_articulo))
+        
+        return _cerrar(medicion, PrecioService._armar_resultado(
+            lista_precio, plan, precio_articulo, articulo, canal, cantidad, monto_pedido, medicion
+        ))
+    
+    @staticmethod
+    async def aescanear_codigo_barras(empresa_id, sucursal_id, codigo_barras, canal=None,
+                                      cantidad=1, monto_pedido=Decimal('0'), fecha=None):
+        """
+        Resolver un código de barras y calcular su precio (lectura desde terminal).
+        La lista vigente y el artículo no dependen entre sí y se buscan en paralelo.
+        
+        Returns:
+            (articulo o None, resultado de calcular_precio o None si no existe el código)
+        """
+        medicion = metricas.nueva_medicion('escanear_codigo_barras')
+        lista_precio, articulo = await asyncio.gather(
+            PrecioService.aobtener_lista_vigente(empresa_id, sucursal_id, fecha),
+            Articulo.objects.filter(
+                codigo_barras=codigo_barras, estado=EstadoEntidades.ACTIVO
+            ).afirst(),
+        )
+        if medicion is not None:
+            medicion.lista_resuelta(lista_precio)
+        if articulo is None:
+            if medicion is not None:
+                metricas.registrar(medicion)
+            return None, None
+        if not lista_precio:
+            return articulo, _cerrar(medicion, _resultado_error(ERROR_SIN_LISTA))
+        
+        precio_articulo, plan = await asyncio.gather(
+            PrecioArticulo.objects.filter(lista_precio=lista_precio, articulo=articulo).afirst(),
+            PrecioService.aobtener_plan(lista_precio, medicion),
+        )
+        if precio_articulo is None:
+            return articulo, _cerrar(medicion, _resultado_error(ERROR_SIN_PRECIO))
+        
+        return articulo, _cerrar(medicion, PrecioService._armar_resultado(
+            lista_precio, plan, precio_articulo, articulo, canal, cantidad, monto_pedido, medicion
+        ))
+    
+    @staticmethod
+    async def acalcular_lote(empresa_id, sucursal_id, items, canal=None,
+                             monto_pedido=Decimal('0'), fecha=None):
+        """
+        Calcular el precio de varios artículos de un mismo pedido.
+        La lista se resuelve una vez y los precios, artículos y reglas se leen con
+        tres consultas concurrentes, sin importar la cantidad de ítems.
+        
+        Args:
+            items: Lista de dicts con articulo_id y cantidad
+        
+        Returns:
+            Lista de resultados (uno por ítem, en el mismo orden) con articulo_id
+        """
+        medicion = metricas.nueva_medicion('acalcular_lote')
+        lista_precio = await PrecioService.aobtener_lista_vigente(empresa_id, sucursal_id, fecha)
+        if medicion is not None:
+            medicion.lista_resuelta(lista_precio)
+        if not lista_precio:
+            resultados = [
+                dict(_resultado_error(ERROR_SIN_LISTA), articulo_id=str(item['articulo_id']))
+                for item in items
+            ]
+        else:
+            resultados = await PrecioService._calcular_items(
+                lista_precio, items, canal, monto_pedido, medicion
+            )
+        
+        if medicion is not None:
+            for resultado in resultados:
+                medicion.sumar_resultado(resultado)
+            metricas.registrar(medicion)
+        return resultados
+    
+    @staticmethod
+    async def _calcular_items(lista_precio, items, canal, monto_pedido, medicion):
+        """Ítems de acalcular_lote con la lista ya resuelta"""
+        articulo_ids = {item['articulo_id'] for item in items}
+        precios, articulos, plan = await asyncio.gather(
+            _listar(PrecioArticulo.objects.filter(
+                lista_precio=lista_precio, articulo_id__in=articulo_ids
+            )),
+            _listar(Articulo.objects.filter(articulo_id__in=articulo_ids).only(
+                'articulo_id', 'linea_id', 'grupo_id'
+            )),
+            PrecioService.aobtener_plan(lista_precio, medicion),
+        )
+        precios = {precio.articulo_id: precio for precio in precios}
+        articulos = {articulo.articulo_id: articulo for articulo in articulos}
+        
+        resultados = []
+        for item in items:
+            precio_articulo = precios.get(item['articulo_id'])
+            articulo = articulos.get(item['articulo_id'])
+            if precio_articulo is None:
+                resultado = _resultado_error(ERROR_SIN_PRECIO)
+            elif articulo is None:
+                resultado = _resultado_error(ERROR_SIN_ARTICULO, precio_articulo)
+            else:
+                resultado = PrecioService._armar_resultado(
+                    lista_precio, plan, precio_articulo, articulo,
+                    canal, item.get('cantidad', 1), monto_pedido, medicion
+                )
+            resultado['articulo_id'] = str(item['articulo_id'])
+            resultados.append(resultado)
+        return resultados
+    
+    @staticmethod
+    def recalcular_precios_efectivos(lista_precio, articulo_ids=None):
+        """
+        Recalcular la tabla PrecioEfectivo de una lista (cantidad 1, sin monto de pedido).
+        Las reglas y combinaciones se leen una sola vez y se evalúan en memoria para
+        todos los artículos y canales.
+
+        Args:
+            lista_precio: Instancia de ListaPrecio
+            articulo_ids: Iterable de UUID a recalcular (default: todos los de la lista)
+
+        Returns:
+            Cantidad de filas PrecioEfectivo generadas
+        """
+        with transaction.atomic():
+            # Un recálculo por lista a la vez: el siguiente espera y lee lo que confirmó el anterior
+            ListaPrecio._base_manager.select_for_update().filter(pk=lista_precio.pk).exists()
+
+            precios = PrecioArticulo.objects.filter(lista_precio=lista_precio).select_related('articulo')
+            efectivos = PrecioEfectivo.objects.filter(lista_precio=lista_precio)
+            if articulo_ids is not None:
+                articulo_ids = list(articulo_ids)
+                precios = precios.filter(articulo_id__in=articulo_ids)
+                efectivos = efectivos.filter(articulo_id__in=articulo_ids)
+
+            plan = PrecioService.obtener_plan(lista_precio)
+            canales = [None] + list(CanalVenta.values)
+            filas = []
+            for precio_articulo in precios.iterator(chunk_size=2000):
+                articulo = precio_articulo.articulo
+                for canal in canales:
+                    precio_final, _, validacion_costo = plan.evaluar(
+                        articulo.articulo_id, articulo.linea_id, articulo.grupo_id,
+                        precio_articulo.precio_base, precio_articulo.ultimo_costo,
+                        precio_articulo.autorizado_bajo_costo, canal
+                    )
+                    filas.append(PrecioEfectivo(
+                        lista_precio=lista_precio,
+                        articulo_id=precio_articulo.articulo_id,
+                        canal_venta=canal,
+                        precio_base=precio_articulo.precio_base,
+                        precio_final=a_centimos(precio_final),
+                        precio_valido=validacion_costo['valido']
+                    ))
+
+            efectivos.delete()
+            PrecioEfectivo.objects.bulk_create(filas, batch_size=1000)
+
+        return len(filas)
+
+    @staticmethod
+    def generar_paquete_offline(empresa_id, sucursal_id=None, fecha=None):
+        """
+        Generar el paquete de precios de una empresa/sucursal para terminales sin
+        conexión (formato en core/paquetes.py). El contenido solo depende de los
+        datos, así que el checksum no cambia mientras no cambien los precios.
+        
+        Args:
+            empresa_id: UUID de la empresa
+            sucursal_id: UUID de la sucursal (opcional)
+            fecha: Fecha de vigencia (default: hoy)
+        
+        Returns:
+            (bytes del paquete, checksum SHA-256 en hexadecimal)
+        """
+        if fecha is None:
+            fecha = timezone.now().date()
+        
+        contenido = {
+            'formato': paquetes.VERSION_FORMATO,
+            'empresa_id': str(empresa_id),
+            'sucursal_id': str(sucursal_id) if sucursal_id else None,
+            'fecha': fecha.isoformat(),
+            'lista': None,
+            'plan': None,
+            'articulos': [],
+        }
+        
+        lista_precio = PrecioService.obtener_lista_vigente(empresa_id, sucursal_id, fecha)
+        if lista_precio:
+            contenido['lista'] = {
+                'lista_precio_id': str(lista_precio.lista_precio_id),
+                'nombre': lista_precio.nombre,
+                'canal_venta': lista_precio.canal_venta,
+                'fecha_inicio': lista_precio.fecha_inicio.isoformat(),
+                'fecha_fin': lista_precio.fecha_fin.isoformat() if lista_precio.fecha_fin else None,
+            }
+            contenido['plan'] = PrecioService.obtener_plan(lista_precio).a_dict()
+            
+            filas = PrecioArticulo.objects.filter(lista_precio=lista_precio).order_by('articulo_id').values_list(
+                'articulo_id', 'articulo__codigo_articulo', 'articulo__codigo_barras',
+                'articulo__descripcion', 'articulo__linea_id', 'articulo__grupo_id',
+                'precio_base', 'ultimo_costo', 'autorizado_bajo_costo', 'articulo__estado'
+            )
+            for (articulo_id, codigo, codigo_barras, descripcion, linea_id, grupo_id,
+                 precio_base, ultimo_costo, autorizado, estado) in filas.iterator(chunk_size=2000):
+                # Como aescanear_codigo_barras: solo se escanean artículos activos
+                if estado != EstadoEntidades.ACTIVO:
+                    codigo_barras = None
+                contenido['articulos'].append([
+                    str(articulo_id), codigo, codigo_barras, descripcion,
+                    str(linea_id) if linea_id else None, str(grupo_id) if grupo_id else None,
+                    str(precio_base), str(ultimo_costo), autorizado,
+                ])
+        
+        return paquetes.empaquetar(contenido)
+
     @staticmethod
     def aplicar_regla(regla, articulo, precio_actual, canal=None, cantidad=1, monto_pedido=Decimal('0')):
         """
@@ -209,39 +520,12 @@ class PrecioService:
         Returns:
             Precio después de aplicar la regla
         """
-        # Verificar si la regla aplica al artículo
-        if not PrecioService._regla_aplica_articulo(regla, articulo):
+        compilada = ReglaCompilada.desde_regla(regla)
+        if not compilada.aplica_articulo(articulo.articulo_id, articulo.linea_id, articulo.grupo_id):
             return precio_actual
-        
-        precio_resultado = precio_actual
-        
-        # Aplicar según tipo de regla
-        if regla.tipo_regla == TipoReglaPrecio.CANAL_VENTA:
-            if canal and regla.canal_venta == canal:
-                precio_resultado = PrecioService._aplicar_descuento(
-                    precio_actual, regla.tipo_descuento, regla.valor_descuento
-                )
-        
-        elif regla.tipo_regla == TipoReglaPrecio.ESCALA_UNIDADES:
-            if PrecioService._cumple_escala_unidades(regla, cantidad):
-                precio_resultado = PrecioService._aplicar_descuento(
-                    precio_actual, regla.tipo_descuento, regla.valor_descuento
-                )
-        
-        elif regla.tipo_regla == TipoReglaPrecio.ESCALA_MONTO:
-            monto_item = precio_actual * cantidad
-            if PrecioService._cumple_escala_monto(regla, monto_item):
-                precio_resultado = PrecioService._aplicar_descuento(
-                    precio_actual, regla.tipo_descuento, regla.valor_descuento
-                )
-        
-        elif regla.tipo_regla == TipoReglaPrecio.MONTO_TOTAL_PEDIDO:
-            if PrecioService._cumple_monto_total_pedido(regla, monto_pedido):
-                precio_resultado = PrecioService._aplicar_descuento(
-                    precio_actual, regla.tipo_descuento, regla.valor_descuento
-                )
-        
-        return precio_resultado
+        if not compilada.cumple(precio_actual, canal, cantidad, monto_pedido):
+            return precio_actual
+        return compilada.aplicar_descuento(precio_actual)
     
     @staticmethod
     def validar_costo(precio_final, ultimo_costo, autorizado_bajo_costo):
@@ -251,25 +535,7 @@ class PrecioService:
         Returns:
             dict con validación y mensaje
         """
-        if precio_final < ultimo_costo:
-            if autorizado_bajo_costo:
-                return {
-                    'valido': True,
-                    'mensaje': f'Precio bajo costo autorizado. Diferencia: {ultimo_costo - precio_final}',
-                    'diferencia': float(ultimo_costo - precio_final)
-                }
-            else:
-                return {
-                    'valido': False,
-                    'mensaje': f'Precio final ({precio_final}) es inferior al costo ({ultimo_costo}). No autorizado.',
-                    'diferencia': float(ultimo_costo - precio_final)
-                }
-        else:
-            return {
-                'valido': True,
-                'mensaje': 'Precio válido',
-                'diferencia': float(precio_final - ultimo_costo)
-            }
+        return motor_precios.validar_costo(precio_final, ultimo_costo, autorizado_bajo_costo)
     
     @staticmethod
     def registrar_descuento_proveedor(precio_articulo_id, porcentaje_descuento, usuario, notas=None):
@@ -309,83 +575,3 @@ class PrecioService:
         precio_articulo.save()
         
         return descuento
-    
-    # Métodos auxiliares privados
-    
-    @staticmethod
-    def _regla_aplica_articulo(regla, articulo):
-        """Verificar si una regla aplica a un artículo específico"""
-        if regla.articulo and regla.articulo.articulo_id != articulo.articulo_id:
-            return False
-        
-        if regla.linea and (not articulo.linea or regla.linea.linea_id != articulo.linea.linea_id):
-            return False
-        
-        if regla.grupo and (not articulo.grupo or regla.grupo.grupo_id != articulo.grupo.grupo_id):
-            return False
-        
-        return True
-    
-    @staticmethod
-    def _cumple_escala_unidades(regla, cantidad):
-        """Verificar si la cantidad cumple con la escala de unidades"""
-        if regla.cantidad_minima and cantidad < regla.cantidad_minima:
-            return False
-        if regla.cantidad_maxima and cantidad > regla.cantidad_maxima:
-            return False
-        return True
-    
-    @staticmethod
-    def _cumple_escala_monto(regla, monto):
-        """Verificar si el monto cumple con la escala de monto"""
-        if regla.monto_minimo and monto < regla.monto_minimo:
-            return False
-        if regla.monto_maximo and monto > regla.monto_maximo:
-            return False
-        return True
-    
-    @staticmethod
-    def _cumple_monto_total_pedido(regla, monto_total):
-        """Verificar si el monto total del pedido cumple con la regla"""
-        if regla.monto_total_minimo and monto_total < regla.monto_total_minimo:
-            return False
-        if regla.monto_total_maximo and monto_total > regla.monto_total_maximo:
-            return False
-        return True
-    
-    @staticmethod
-    def _aplicar_descuento(precio, tipo_descuento, valor_descuento):
-        """Aplicar un descuento al precio"""
-        if tipo_descuento == TipoDescuento.PORCENTAJE:
-            return precio * (1 - valor_descuento / 100)
-        elif tipo_descuento == TipoDescuento.MONTO_FIJO:
-            return max(Decimal('0'), precio - valor_descuento)
-        return precio
-    
-    @staticmethod
-    def _aplica_combinacion(combinacion, articulo, cantidad):
-        """Verificar si una combinación aplica a un artículo"""
-        if combinacion.articulo and combinacion.articulo.articulo_id != articulo.articulo_id:
-            return False
-        
-        if combinacion.linea and (not articulo.linea or combinacion.linea.linea_id != articulo.linea.linea_id):
-            return False
-        
-        if combinacion.grupo and (not articulo.grupo or combinacion.grupo.grupo_id != articulo.grupo.grupo_id):
-            return False
-        
-        if cantidad < combinacion.cantidad_minima_combinacion:
-            return False
-        
-        if combinacion.cantidad_maxima_combinacion and cantidad > combinacion.cantidad_maxima_combinacion:
-            return False
-        
-        return True
-    
-    @staticmethod
-    def _aplicar_combinacion(combinacion, precio):
-        """Aplicar el descuento de una combinación"""
-        return PrecioService._aplicar_descuento(
-            precio, combinacion.tipo_descuento, combinacion.valor_descuento
-        )
-
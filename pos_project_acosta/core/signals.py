@@ -0,0 +1,181 @@
+"""
+Señales que mantienen actualizada la tabla PrecioEfectivo cuando cambian
+precios, reglas, combinaciones o la clasificación de un artículo, y que
+invalidan los planes de precios compilados de la lista afectada.
+El recálculo se difiere hasta el commit, se limita a los artículos afectados y
+se hace una sola vez por lista y transacción.
+También registran las eliminaciones (RegistroEliminacion) para /api/sync/.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    Articulo, ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto, RegistroEliminacion
+)
+from .services import PrecioService
+
+
+def _recalcular(pendientes):
+    """Recalcular PrecioEfectivo de cada lista pendiente: {lista_precio_id: articulo_ids o None (todos)}"""
+    for lista_precio_id, articulo_ids in pendientes.items():
+        lista_precio = ListaPrecio.objects.filter(lista_precio_id=lista_precio_id).first()
+        if lista_precio:
+            PrecioService.recalcular_precios_efectivos(lista_precio, articulo_ids)
+
+
+def _programar_recalculo(lista_precio_id, articulo_ids=None):
+    """
+    Recalcular PrecioEfectivo de una lista al confirmar la transacción actual.
+    Los pedidos de una misma transacción se acumulan por lista y se resuelven con
+    un solo recálculo al confirmar: una edición masiva no repite el trabajo por fila.
+    """
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        _recalcular({lista_precio_id: articulo_ids})
+        return
+
+    # Los pendientes valen mientras su callback siga registrado y sin ejecutar: si la
+    # transacción se revirtió Django lo descartó y se empieza de nuevo
+    pendientes = getattr(conexion, 'recalculos_pendientes', None)
+    if pendientes is None or pendientes.ejecutado or not any(
+        entrada[1] == pendientes.ejecutar for entrada in conexion.run_on_commit
+    ):
+        pendientes = _RecalculosPendientes()
+        conexion.recalculos_pendientes = pendientes
+        transaction.on_commit(pendientes.ejecutar)
+    pendientes.agregar(lista_precio_id, articulo_ids)
+
+
+class _RecalculosPendientes:
+    """Artículos a recalcular por lista en la transacción actual (None: la lista completa)"""
+
+    def __init__(self):
+        self.listas = {}
+        self.ejecutado = False
+
+    def agregar(self, lista_precio_id, articulo_ids):
+        if lista_precio_id in self.listas and self.listas[lista_precio_id] is None:
+            return
+        if articulo_ids is None:
+            self.listas[lista_precio_id] = None
+        else:
+            self.listas.setdefault(lista_precio_id, set()).update(articulo_ids)
+
+    def ejecutar(self):
+        self.ejecutado = True
+        _recalcular(self.listas)
+
+
+def _marcar_lista_modificada(lista_precio_id):
+    """Actualizar ListaPrecio.actualizado_en para invalidar los planes compilados en caché"""
+    ListaPrecio.objects.filter(lista_precio_id=lista_precio_id).update(actualizado_en=timezone.now())
+
+
+def _alcance(instancia):
+    """Lista y filtros (artículo, línea, grupo) a los que aplica una regla o combinación"""
+    return (instancia.lista_precio_id, instancia.articulo_id, instancia.linea_id, instancia.grupo_id)
+
+
+def _recalcular_alcance(lista_precio_id, articulo_id, linea_id, grupo_id):
+    """Programar el recálculo de los artículos de la lista alcanzados por el filtro"""
+    if not (articulo_id or linea_id or grupo_id):
+        _programar_recalculo(lista_precio_id)
+        return
+
+    precios = PrecioArticulo.objects.filter(lista_precio_id=lista_precio_id)
+    if articulo_id:
+        precios = precios.filter(articulo_id=articulo_id)
+    if linea_id:
+        precios = precios.filter(articulo__linea_id=linea_id)
+    if grupo_id:
+        precios = precios.filter(articulo__grupo_id=grupo_id)
+
+    articulo_ids = list(precios.values_list('articulo_id', flat=True))
+    if articulo_ids:
+        _programar_recalculo(lista_precio_id, articulo_ids)
+
+
+@receiver(pre_save, sender=ReglaPrecio)
+@receiver(pre_save, sender=CombinacionProducto)
+def guardar_alcance_anterior(sender, instance, **kwargs):
+    """Recordar el alcance previo para recalcular también los artículos que dejan de aplicar"""
+    anterior = sender.objects.filter(pk=instance.pk).values_list(
+        'lista_precio_id', 'articulo_id', 'linea_id', 'grupo_id'
+    ).first()
+    instance._alcance_anterior = anterior
+
+
+@receiver(post_save, sender=ReglaPrecio)
+@receiver(post_save, sender=CombinacionProducto)
+def regla_guardada(sender, instance, **kwargs):
+    alcance = _alcance(instance)
+    _marcar_lista_modificada(instance.lista_precio_id)
+    _recalcular_alcance(*alcance)
+
+    anterior = getattr(instance, '_alcance_anterior', None)
+    if anterior and anterior != alcance:
+        if anterior[0] != instance.lista_precio_id:
+            _marcar_lista_modificada(anterior[0])
+        _recalcular_alcance(*anterior)
+
+
+@receiver(post_delete, sender=ReglaPrecio)
+@receiver(post_delete, sender=CombinacionProducto)
+def regla_eliminada(sender, instance, **kwargs):
+    _marcar_lista_modificada(instance.lista_precio_id)
+    _recalcular_alcance(*_alcance(instance))
+
+
+@receiver(post_save, sender=PrecioArticulo)
+@receiver(post_delete, sender=PrecioArticulo)
+def precio_articulo_modificado(sender, instance, **kwargs):
+    _programar_recalculo(instance.lista_precio_id, [instance.articulo_id])
+
+
+@receiver(pre_save, sender=Articulo)
+def guardar_clasificacion_anterior(sender, instance, **kwargs):
+    instance._clasificacion_anterior = Articulo.objects.filter(pk=instance.pk).values_list(
+        'linea_id', 'grupo_id'
+    ).first()
+
+
+@receiver(post_save, sender=Articulo)
+def articulo_reclasificado(sender, instance, created, **kwargs):
+    """Un cambio de línea o grupo altera qué reglas aplican al artículo"""
+    anterior = getattr(instance, '_clasificacion_anterior', None)
+    if created or anterior is None or anterior == (instance.linea_id, instance.grupo_id):
+        return
+
+    listas = PrecioArticulo.objects.filter(articulo_id=instance.articulo_id).values_list(
+        'lista_precio_id', flat=True
+    )
+    for lista_precio_id in listas:
+        _programar_recalculo(lista_precio_id, [instance.articulo_id])
+
+
+# Nombre con que cada modelo sincronizable aparece en RegistroEliminacion y en /api/sync/
+MODELOS_SINCRONIZADOS = {
+    ListaPrecio: 'lista_precio',
+    Articulo: 'articulo',
+    PrecioArticulo: 'precio_articulo',
+    ReglaPrecio: 'regla_precio',
+    CombinacionProducto: 'combinacion_producto',
+}
+
+
+@receiver(post_delete, sender=ListaPrecio)
+@receiver(post_delete, sender=Articulo)
+@receiver(post_delete, sender=PrecioArticulo)
+@receiver(post_delete, sender=ReglaPrecio)
+@receiver(post_delete, sender=CombinacionProducto)
+def registrar_eliminacion(sender, instance, **kwargs):
+    """Dejar constancia de la baja con el alcance necesario para filtrarla por empresa/sucursal"""
+    RegistroEliminacion.objects.create(
+        modelo=MODELOS_SINCRONIZADOS[sender],
+        objeto_id=instance.pk,
+        lista_precio_id=getattr(instance, 'lista_precio_id', None),
+        empresa_id=instance.empresa_id if sender is ListaPrecio else None,
+        sucursal_id=instance.sucursal_id if sender is ListaPrecio else None,
+    )
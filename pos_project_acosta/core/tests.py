@@ -1,3 +1,701 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import tempfile
+import uuid
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.http import HttpResponse
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import Perfil, Usuario
+from pos_project_acosta.choices import CanalVenta, EstadoEntidades, TipoDescuento, TipoReglaPrecio
+
+from .models import (
+    Articulo, CombinacionProducto, Empresa, GrupoArticulo, LineaArticulo, ListaPrecio, PrecioArticulo,
+    PrecioEfectivo, ReglaPrecio
+)
+from . import auditoria, metricas
+from .alcance import Alcance, alcance_actual, alcance_de_usuario, con_alcance
+from .enrutador import COOKIE_PRIMARIA, EnrutadorReplicas, ReplicaMiddleware, leer_de_replica, usar_primaria
+from .motor_precios import CERO, TIPOS_ESCALA, Escalas, PlanPrecios, ReglaCompilada, a_centimos
+from .perfilado import PresupuestoConsultasExcedido
+from .rendimiento import DatosBenchmark, _regla_aleatoria
+from .views import metricas_prometheus
+from .services import PrecioService
+
+
+def crear_datos(codigo='E1', articulos=5):
+    """Empresa con una lista de precios y artículos de un mismo grupo y línea"""
+    perfil, _ = Perfil.objects.get_or_create(perfil_id=1, defaults={'perfil_nombre': 'Administrador'})
+    usuario = Usuario.objects.create_user(
+        username=f'admin_{codigo}'.lower(), email=f'admin_{codigo}@prueba.com'.lower(), password='clave-segura-123',
+        full_name='Administrador', perfil=perfil,
+    )
+    empresa = Empresa.objects.create(codigo_empresa=codigo, nombre=f'Empresa {codigo}')
+    grupo = GrupoArticulo.objects.create(codigo_grupo='G1', nombre_grupo='Grupo')
+    linea = LineaArticulo.objects.create(codigo_linea='L1', grupo=grupo, nombre_linea='Línea')
+    lista = ListaPrecio.objects.create(empresa=empresa, nombre=f'Lista {codigo}', creado_por=usuario)
+    lista_articulos = []
+    for i in range(articulos):
+        articulo = Articulo.objects.create(
+            codigo_articulo=f'{codigo}-A{i}', descripcion=f'Artículo {i}', grupo=grupo, linea=linea
+        )
+        PrecioArticulo.objects.create(
+            lista_precio=lista, articulo=articulo, precio_base=Decimal('100.00') + i,
+            ultimo_costo=Decimal('50.00'), creado_por=usuario,
+        )
+        lista_articulos.append(articulo)
+    return {
+        'usuario': usuario, 'empresa': empresa, 'grupo': grupo, 'linea': linea,
+        'lista': lista, 'articulos': lista_articulos,
+    }
+
+
+class PrecioEfectivoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.datos = crear_datos()
+
+    def test_un_solo_precio_sin_canal_por_articulo(self):
+        campos = {
+            'lista_precio': self.datos['lista'], 'articulo': self.datos['articulos'][0],
+            'precio_base': Decimal('10'), 'precio_final': Decimal('10'),
+        }
+        PrecioEfectivo.objects.filter(lista_precio=self.datos['lista']).delete()
+        PrecioEfectivo.objects.create(canal_venta=None, **campos)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PrecioEfectivo.objects.create(canal_venta=None, **campos)
+
+    def test_edicion_masiva_recalcula_una_vez_por_lista(self):
+        lista = self.datos['lista']
+        with mock.patch.object(
+            PrecioService, 'recalcular_precios_efectivos', wraps=PrecioService.recalcular_precios_efectivos
+        ) as recalcular:
+            with self.captureOnCommitCallbacks(execute=True):
+                for precio in PrecioArticulo.objects.filter(lista_precio=lista):
+                    precio.precio_base += 1
+                    precio.save()
+
+        recalcular.assert_called_once()
+        self.assertEqual(set(recalcular.call_args.args[1]), {a.articulo_id for a in self.datos['articulos']})
+        self.assertEqual(
+            PrecioEfectivo.objects.filter(lista_precio=lista).count(),
+            len(self.datos['articulos']) * (1 + len(CanalVenta.values))
+        )
+
+    def test_cambios_revertidos_no_se_recalculan(self):
+        revertido, confirmado = PrecioArticulo.objects.filter(lista_precio=self.datos['lista'])[:2]
+        with mock.patch.object(PrecioService, 'recalcular_precios_efectivos') as recalcular:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    revertido.save()
+                    raise RuntimeError
+                confirmado.save()
+
+        recalcular.assert_called_once()
+        self.assertEqual(set(recalcular.call_args.args[1]), {confirmado.articulo_id})
+
+
+class MotorAnterior:
+    """
+    Evaluación de PrecioService.calcular_precio antes de core/motor_precios.py
+    (reglas ORM recorridas una por una), sin la conversión final a float.
+    """
+
+    @staticmethod
+    def regla_aplica_articulo(regla, articulo):
+        if regla.articulo and regla.articulo.articulo_id != articulo.articulo_id:
+            return False
+        if regla.linea and (not articulo.linea or regla.linea.linea_id != articulo.linea.linea_id):
+            return False
+        if regla.grupo and (not articulo.grupo or regla.grupo.grupo_id != articulo.grupo.grupo_id):
+            return False
+        return True
+
+    @staticmethod
+    def en_rango(minimo, maximo, valor):
+        if minimo and valor < minimo:
+            return False
+        if maximo and valor > maximo:
+            return False
+        return True
+
+    @staticmethod
+    def aplicar_descuento(precio, tipo_descuento, valor_descuento):
+        if tipo_descuento == TipoDescuento.PORCENTAJE:
+            return precio * (1 - valor_descuento / 100)
+        elif tipo_descuento == TipoDescuento.MONTO_FIJO:
+            return max(Decimal('0'), precio - valor_descuento)
+        return precio
+
+    @classmethod
+    def aplicar_regla(cls, regla, articulo, precio, canal, cantidad, monto_pedido):
+        if not cls.regla_aplica_articulo(regla, articulo):
+            return precio
+        if regla.tipo_regla == TipoReglaPrecio.CANAL_VENTA:
+            cumple = bool(canal) and regla.canal_venta == canal
+        elif regla.tipo_regla == TipoReglaPrecio.ESCALA_UNIDADES:
+            cumple = cls.en_rango(regla.cantidad_minima, regla.cantidad_maxima, cantidad)
+        elif regla.tipo_regla == TipoReglaPrecio.ESCALA_MONTO:
+            cumple = cls.en_rango(regla.monto_minimo, regla.monto_maximo, precio * cantidad)
+        elif regla.tipo_regla == TipoReglaPrecio.MONTO_TOTAL_PEDIDO:
+            cumple = cls.en_rango(regla.monto_total_minimo, regla.monto_total_maximo, monto_pedido)
+        else:
+            cumple = False
+        return cls.aplicar_descuento(precio, regla.tipo_descuento, regla.valor_descuento) if cumple else precio
+
+    @classmethod
+    def aplica_combinacion(cls, combinacion, articulo, cantidad):
+        if not cls.regla_aplica_articulo(combinacion, articulo):
+            return False
+        if cantidad < combinacion.cantidad_minima_combinacion:
+            return False
+        if combinacion.cantidad_maxima_combinacion and cantidad > combinacion.cantidad_maxima_combinacion:
+            return False
+        return True
+
+    @classmethod
+    def calcular(cls, reglas, combinaciones, articulo, precio_base, ultimo_costo, canal, cantidad, monto_pedido):
+        """(precio_final, [(id, precio_anterior, precio_nuevo)], precio válido)"""
+        precio_final = precio_base
+        aplicadas = []
+        for regla in sorted(reglas, key=lambda regla: (regla.prioridad, regla.tipo_regla)):
+            anterior = precio_final
+            precio_final = cls.aplicar_regla(regla, articulo, precio_final, canal, cantidad, monto_pedido)
+            if precio_final != anterior:
+                aplicadas.append((str(regla.regla_precio_id), anterior, precio_final))
+        valido = precio_final >= ultimo_costo
+        for combinacion in combinaciones:
+            if cls.aplica_combinacion(combinacion, articulo, cantidad):
+                anterior = precio_final
+                precio_final = cls.aplicar_descuento(precio_final, combinacion.tipo_descuento, combinacion.valor_descuento)
+                if precio_final != anterior:
+                    aplicadas.append((str(combinacion.combinacion_id), anterior, precio_final))
+        return precio_final, aplicadas, valido
+
+
+class MotorDecimalPropiedadesTests(SimpleTestCase):
+    """
+    Propiedad: para reglas, combinaciones y pedidos aleatorios, PlanPrecios da el
+    mismo precio sin redondear y las mismas reglas aplicadas que el motor anterior.
+    """
+    CASOS_POR_PLAN = 25
+    PLANES = 120
+
+    def setUp(self):
+        self.aleatorio = random.Random(20261019)
+        self.grupos = [GrupoArticulo(grupo_id=uuid.uuid4()) for _ in range(2)]
+        self.lineas = [LineaArticulo(linea_id=uuid.uuid4(), grupo=grupo) for grupo in self.grupos for _ in range(2)]
+        self.articulos = [
+            Articulo(articulo_id=uuid.uuid4(), linea=linea, grupo=linea.grupo)
+            for linea in self.lineas for _ in range(2)
+        ] + [Articulo(articulo_id=uuid.uuid4())]
+
+    def monto(self, maximo):
+        return Decimal(self.aleatorio.randint(0, maximo * 100)) / 100
+
+    def descuento(self):
+        if self.aleatorio.random() < 0.7:
+            return {'tipo_descuento': TipoDescuento.PORCENTAJE, 'valor_descuento': self.monto(60)}
+        return {'tipo_descuento': TipoDescuento.MONTO_FIJO, 'valor_descuento': self.monto(80)}
+
+    def alcance(self):
+        elegir = self.aleatorio.choice
+        return {
+            'articulo': elegir([None, None, None, elegir(self.articulos)]),
+            'linea': elegir([None, None, elegir(self.lineas)]),
+            'grupo': elegir([None, elegir(self.grupos)]),
+        }
+
+    def regla(self):
+        elegir, entero = self.aleatorio.choice, self.aleatorio.randint
+        campos = {'tipo_regla': elegir(TipoReglaPrecio.values), 'canal_venta': elegir([None] + CanalVenta.values)}
+        minimo_unidades = elegir([None, 0, entero(1, 20)])
+        campos.update(cantidad_minima=minimo_unidades, cantidad_maxima=elegir([None, (minimo_unidades or 1) + entero(0, 30)]))
+        for prefijo in ('monto', 'monto_total'):
+            minimo = elegir([None, self.monto(300)])
+            campos[f'{prefijo}_minimo'] = minimo
+            campos[f'{prefijo}_maximo'] = elegir([None, (minimo or 0) + self.monto(500)])
+        return ReglaPrecio(
+            regla_precio_id=uuid.uuid4(), nombre='Regla', prioridad=entero(1, 5),
+            **campos, **self.alcance(), **self.descuento()
+        )
+
+    def tramos(self):
+        """Tramos sin solapamiento de un tipo de escala (los que indexa el plan)"""
+        tipo = self.aleatorio.choice([
+            TipoReglaPrecio.ESCALA_UNIDADES, TipoReglaPrecio.ESCALA_MONTO, TipoReglaPrecio.MONTO_TOTAL_PEDIDO
+        ])
+        alcance, prioridad, reglas = self.alcance(), self.aleatorio.randint(1, 5), []
+        for desde in range(0, 400, 40):
+            if tipo == TipoReglaPrecio.ESCALA_UNIDADES:
+                limites = {'cantidad_minima': desde // 10 + 1, 'cantidad_maxima': desde // 10 + 4}
+            elif tipo == TipoReglaPrecio.ESCALA_MONTO:
+                limites = {'monto_minimo': Decimal(desde), 'monto_maximo': Decimal(desde) + Decimal('39.99')}
+            else:
+                limites = {'monto_total_minimo': Decimal(desde), 'monto_total_maximo': Decimal(desde) + Decimal('39.99')}
+            reglas.append(ReglaPrecio(
+                regla_precio_id=uuid.uuid4(), nombre='Tramo', prioridad=prioridad, tipo_regla=tipo,
+                **limites, **alcance, **self.descuento()
+            ))
+        return reglas
+
+    def combinacion(self):
+        minimo = self.aleatorio.randint(1, 10)
+        return CombinacionProducto(
+            combinacion_id=uuid.uuid4(), nombre='Combinación', cantidad_minima_combinacion=minimo,
+            cantidad_maxima_combinacion=self.aleatorio.choice([None, minimo + self.aleatorio.randint(0, 20)]),
+            **self.alcance(), **self.descuento()
+        )
+
+    def test_mismos_resultados_que_el_motor_anterior(self):
+        for numero_plan in range(self.PLANES):
+            reglas = [self.regla() for _ in range(self.aleatorio.randint(0, 25))]
+            for _ in range(self.aleatorio.randint(0, 3)):
+                reglas += self.tramos()
+            combinaciones = [self.combinacion() for _ in range(self.aleatorio.randint(0, 4))]
+            ordenadas = sorted(reglas, key=lambda regla: (regla.prioridad, regla.tipo_regla))
+            plan = PlanPrecios.compilar(uuid.uuid4(), None, ordenadas, combinaciones)
+
+            for _ in range(self.CASOS_POR_PLAN):
+                articulo = self.aleatorio.choice(self.articulos)
+                precio_base, ultimo_costo = self.monto(400), self.monto(200)
+                canal = self.aleatorio.choice([None] + CanalVenta.values)
+                cantidad, monto_pedido = self.aleatorio.randint(1, 60), self.monto(800)
+
+                esperado = MotorAnterior.calcular(
+                    reglas, combinaciones, articulo, precio_base, ultimo_costo, canal, cantidad, monto_pedido
+                )
+                precio_final, aplicadas, validacion = plan.evaluar(
+                    articulo.articulo_id, articulo.linea_id, articulo.grupo_id, precio_base, ultimo_costo,
+                    False, canal, cantidad, monto_pedido
+                )
+                with self.subTest(plan=numero_plan, articulo=articulo.articulo_id, cantidad=cantidad):
+                    self.assertEqual(precio_final, esperado[0])
+                    self.assertEqual([(regla.id, antes, despues) for regla, antes, despues in aplicadas], esperado[1])
+                    self.assertEqual(validacion['valido'], esperado[2])
+                    self.assertEqual(a_centimos(precio_final), a_centimos(esperado[0]))
+
+
+def crear_regla(datos, **campos):
+    return ReglaPrecio.objects.create(
+        lista_precio=datos['lista'], tipo_regla=TipoReglaPrecio.CANAL_VENTA, canal_venta=CanalVenta.MAYORISTA,
+        nombre='Mayorista', valor_descuento=Decimal('5'), creado_por=datos['usuario'], **campos
+    )
+
+
+class AlcanceManagerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.propia, cls.ajena = crear_datos('E1'), crear_datos('E2')
+        for datos in (cls.propia, cls.ajena):
+            datos['regla'] = crear_regla(datos)
+            datos['precio'] = PrecioArticulo.objects.filter(lista_precio=datos['lista']).first()
+
+    def ids(self, modelo):
+        return set(modelo.objects.values_list('pk', flat=True))
+
+    def test_otra_empresa_no_es_visible(self):
+        with con_alcance(Alcance(empresa_id=self.propia['empresa'].empresa_id)):
+            self.assertEqual(self.ids(ListaPrecio), {self.propia['lista'].pk})
+            self.assertEqual(self.ids(ReglaPrecio), {self.propia['regla'].pk})
+            self.assertEqual(
+                self.ids(PrecioArticulo),
+                set(PrecioArticulo._base_manager.filter(lista_precio=self.propia['lista']).values_list('pk', flat=True))
+            )
+            for modelo, fila in ((ListaPrecio, 'lista'), (ReglaPrecio, 'regla'), (PrecioArticulo, 'precio')):
+                with self.subTest(modelo=modelo.__name__):
+                    with self.assertRaises(modelo.DoesNotExist):
+                        modelo.objects.get(pk=self.ajena[fila].pk)
+
+    def test_usuario_sin_empresa_no_ve_filas(self):
+        usuario = self.propia['usuario']
+        self.assertIsNone(usuario.empresa_id)
+        with con_alcance(alcance_de_usuario(usuario)):
+            for modelo in (ListaPrecio, PrecioArticulo, ReglaPrecio, PrecioEfectivo):
+                with self.subTest(modelo=modelo.__name__):
+                    self.assertFalse(modelo.objects.exists())
+
+    def test_staff_y_sin_peticion_ven_todo(self):
+        listas = {self.propia['lista'].pk, self.ajena['lista'].pk}
+        self.assertEqual(self.ids(ListaPrecio), listas)
+        staff = Usuario(username='staff', is_staff=True)
+        with con_alcance(alcance_de_usuario(staff)):
+            self.assertEqual(self.ids(ListaPrecio), listas)
+
+    def test_con_alcance_restaura_el_anterior(self):
+        with con_alcance(Alcance(empresa_id=self.propia['empresa'].empresa_id)):
+            with self.assertRaises(RuntimeError):
+                with con_alcance(Alcance()):
+                    raise RuntimeError()
+            self.assertEqual(alcance_actual().empresa_id, self.propia['empresa'].empresa_id)
+        self.assertIsNone(alcance_actual())
+
+
+def crear_tramo(datos, minima, maxima, **campos):
+    return ReglaPrecio.objects.create(
+        lista_precio=datos['lista'], tipo_regla=TipoReglaPrecio.ESCALA_UNIDADES, nombre=f'Tramo {minima}',
+        cantidad_minima=minima, cantidad_maxima=maxima, valor_descuento=Decimal('5'),
+        creado_por=datos['usuario'], **campos
+    )
+
+
+class TramosReglaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos()
+        crear_tramo(cls.datos, 1, 10)
+
+    def test_tramo_solapado_se_rechaza(self):
+        for minima, maxima in ((5, 15), (10, 20), (None, 1), (8, None)):
+            with self.subTest(minima=minima, maxima=maxima), self.assertRaises(ValidationError):
+                crear_tramo(self.datos, minima, maxima)
+
+    def test_tramo_contiguo_se_acepta(self):
+        crear_tramo(self.datos, 11, 20)
+        crear_tramo(self.datos, 21, None)
+        self.assertEqual(ReglaPrecio.objects.filter(tipo_regla=TipoReglaPrecio.ESCALA_UNIDADES).count(), 3)
+
+    def test_reglas_inactivas_o_de_otro_alcance_no_cuentan(self):
+        ReglaPrecio.objects.update(estado=EstadoEntidades.DE_BAJA)
+        crear_tramo(self.datos, 5, 15)
+        crear_tramo(self.datos, 5, 15, grupo=self.datos['grupo'])
+        crear_tramo(self.datos, 5, 15, linea=self.datos['linea'])
+        crear_tramo(self.datos, 5, 15, articulo=self.datos['articulos'][0])
+        otra = crear_datos('E2')
+        crear_tramo(otra, 5, 15)
+
+    def test_otro_tipo_de_escala_no_cuenta(self):
+        ReglaPrecio.objects.create(
+            lista_precio=self.datos['lista'], tipo_regla=TipoReglaPrecio.ESCALA_MONTO, nombre='Monto',
+            monto_minimo=Decimal('1'), monto_maximo=Decimal('10'), valor_descuento=Decimal('5'),
+            creado_por=self.datos['usuario'],
+        )
+
+    def test_editar_un_tramo_no_choca_consigo_mismo(self):
+        tramo = ReglaPrecio.objects.get()
+        tramo.cantidad_maxima = 12
+        tramo.save()
+
+
+class EscalasSolapadasTests(SimpleTestCase):
+    """Tramos guardados antes de la validación: el plan los aplica uno por uno"""
+
+    def tramo(self, minima, maxima, valor):
+        return ReglaPrecio(
+            regla_precio_id=uuid.uuid4(), nombre=f'Tramo {minima}', prioridad=1,
+            tipo_regla=TipoReglaPrecio.ESCALA_UNIDADES, cantidad_minima=minima, cantidad_maxima=maxima,
+            tipo_descuento=TipoDescuento.MONTO_FIJO, valor_descuento=Decimal(valor),
+        )
+
+    def test_escalas_contiguas(self):
+        reglas = [self.tramo(11, 20, 2), self.tramo(1, 10, 1)]
+        escalas = Escalas.crear([(orden, ReglaCompilada.desde_regla(regla)) for orden, regla in enumerate(reglas)])
+        self.assertEqual(escalas.minimos, [1, 11])
+        self.assertEqual(escalas.buscar(10)[1].nombre, 'Tramo 1')
+        self.assertIsNone(escalas.buscar(21))
+
+    def test_tramos_solapados_se_aplican_uno_por_uno(self):
+        reglas = [self.tramo(1, 10, 1), self.tramo(5, 20, 2)]
+        self.assertIsNone(
+            Escalas.crear([(orden, ReglaCompilada.desde_regla(regla)) for orden, regla in enumerate(reglas)])
+        )
+
+        plan = PlanPrecios.compilar(uuid.uuid4(), None, reglas, [])
+        for cantidad, esperado in ((3, ['Tramo 1']), (7, ['Tramo 1', 'Tramo 5']), (15, ['Tramo 5'])):
+            precio_final, aplicadas, _ = plan.evaluar(None, None, None, Decimal('100'), CERO, False, cantidad=cantidad)
+            with self.subTest(cantidad=cantidad):
+                self.assertEqual([regla.nombre for regla, _, _ in aplicadas], esperado)
+                self.assertEqual(precio_final, Decimal('100') - sum(
+                    regla.valor_descuento for regla in reglas if regla.nombre in esperado
+                ))
+
+    def test_datos_de_rendimiento_sin_tramos_solapados(self):
+        rng = random.Random(42)
+        datos = DatosBenchmark(42, None)
+        datos.lineas = [(uuid.uuid4(), uuid.uuid4()) for _ in range(2)]
+        datos.articulo_ids = [uuid.uuid4() for _ in range(2)]
+        lista, tramos = ListaPrecio(), {}
+        reglas = [_regla_aleatoria(rng, lista, datos, None, i, tramos) for i in range(500)]
+
+        por_alcance = {}
+        for orden, regla in enumerate(reglas):
+            if regla.tipo_regla in TIPOS_ESCALA:
+                clave = (regla.tipo_regla, regla.articulo_id, regla.linea_id, regla.grupo_id)
+                por_alcance.setdefault(clave, []).append((orden, ReglaCompilada.desde_regla(regla)))
+        self.assertTrue(any(len(escalas) > 1 for escalas in por_alcance.values()))
+        for clave, escalas in por_alcance.items():
+            with self.subTest(clave=clave):
+                self.assertIsNotNone(Escalas.crear(escalas))
+
+
+@override_settings(PERFILADO_PRESUPUESTOS={'lista-precio-precios-articulos': 1})
+class PresupuestoConsultasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos()
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.datos['usuario'])
+        self.url = reverse('lista-precio-precios-articulos', args=[self.datos['lista'].lista_precio_id])
+
+    @override_settings(PERFILADO_ESTRICTO=True)
+    def test_modo_estricto_falla_al_exceder_el_presupuesto(self):
+        with self.assertRaisesMessage(PresupuestoConsultasExcedido, 'presupuesto: 1'):
+            self.cliente.get(self.url)
+
+    @override_settings(PERFILADO_ESTRICTO=True, PERFILADO_PRESUPUESTOS={'lista-precio-precios-articulos': 10})
+    def test_modo_estricto_dentro_del_presupuesto(self):
+        self.assertEqual(self.cliente.get(self.url).status_code, 200)
+
+    def test_sin_modo_estricto_solo_advierte(self):
+        with self.assertLogs('perfilado', 'WARNING') as registros:
+            respuesta = self.cliente.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('presupuesto: 1', registros.output[-1])
+
+
+@override_settings(REPLICAS_BD=['replica_1'], REPLICA_APPS=['core'])
+class EnrutadorReplicasTests(SimpleTestCase):
+
+    def setUp(self):
+        self.enrutador = EnrutadorReplicas()
+
+    def test_fuera_de_una_peticion_lee_de_la_primaria(self):
+        self.assertEqual(self.enrutador.db_for_read(Articulo), DEFAULT_DB_ALIAS)
+
+    def test_leer_de_replica(self):
+        with leer_de_replica():
+            self.assertEqual(self.enrutador.db_for_read(Articulo), 'replica_1')
+            self.assertEqual(self.enrutador.db_for_read(Usuario), DEFAULT_DB_ALIAS)
+            with usar_primaria():
+                self.assertEqual(self.enrutador.db_for_read(Articulo), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.enrutador.db_for_read(Articulo), 'replica_1')
+
+    def test_despues_de_escribir_lee_de_la_primaria(self):
+        with leer_de_replica():
+            self.assertEqual(self.enrutador.db_for_write(Articulo), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.enrutador.db_for_read(Articulo), DEFAULT_DB_ALIAS)
+
+    def test_transaccion_abierta_lee_de_la_primaria(self):
+        with leer_de_replica(), mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertEqual(self.enrutador.db_for_read(Articulo), DEFAULT_DB_ALIAS)
+
+    def test_no_migra_las_replicas(self):
+        self.assertIs(self.enrutador.allow_migrate('replica_1', 'core'), False)
+        self.assertIsNone(self.enrutador.allow_migrate(DEFAULT_DB_ALIAS, 'core'))
+
+    def peticion(self, escribir=False, cookies=None):
+        """Pasar una petición GET de la acción 'list' por ReplicaMiddleware y devolver el alias leído"""
+        leidos = []
+
+        def vista(request):
+            leidos.append(self.enrutador.db_for_read(Articulo))
+            if escribir:
+                self.enrutador.db_for_write(Articulo)
+            return HttpResponse()
+        vista.cls = type('VistaPrueba', (), {'lectura_replica': {'list'}})
+        vista.actions = {'get': 'list'}
+
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        middleware = ReplicaMiddleware(lambda request: middleware.process_view(request, vista, (), {}) or vista(request))
+        respuesta = middleware(request)
+        return leidos[0], respuesta
+
+    def test_middleware_aplica_lectura_replica_por_accion(self):
+        alias, respuesta = self.peticion()
+        self.assertEqual(alias, 'replica_1')
+        self.assertNotIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+    def test_escribir_fija_al_cliente_a_la_primaria(self):
+        _, respuesta = self.peticion(escribir=True)
+        cookie = respuesta.cookies[COOKIE_PRIMARIA].value
+        alias, _ = self.peticion(cookies={COOKIE_PRIMARIA: cookie})
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+
+
+class TablasRecorridasTests(SimpleTestCase):
+
+    def test_postgresql(self):
+        plan = (
+            'Nested Loop\n'
+            '  ->  Seq Scan on "clientes"\n'
+            '  ->  Index Scan using ordenes_cliente_idx on ordenes_compra_cliente'
+        )
+        self.assertEqual(auditoria.tablas_recorridas(plan, 'postgresql'), {'clientes'})
+
+    def test_sqlite(self):
+        plan = '2 0 0 SCAN articulos\n3 0 0 SEARCH precios_articulos USING INDEX precios_idx (lista_precio_id=?)'
+        self.assertEqual(auditoria.tablas_recorridas(plan, 'sqlite'), {'articulos'})
+
+
+# El comando crea su propia base de prueba: el entorno de pruebas ya está preparado por el runner
+@mock.patch('core.management.commands.auditar_consultas.teardown_test_environment')
+@mock.patch('core.management.commands.auditar_consultas.setup_test_environment')
+class AuditarConsultasTests(TransactionTestCase):
+
+    def auditar(self, **opciones):
+        salida = io.StringIO()
+        call_command('auditar_consultas', articulos=100, stdout=salida, **opciones)
+        return salida.getvalue()
+
+    def test_las_consultas_criticas_usan_indices(self, *_):
+        salida = self.auditar()
+        for nombre in auditoria.CONSULTAS:
+            self.assertIn(f'{nombre:32} OK', salida)
+        self.assertIn('Todas las consultas críticas usan índices', salida)
+
+    def test_falla_si_una_consulta_recorre_la_tabla(self, *_):
+        # Sin filtro ninguna consulta puede usar un índice
+        sin_indice = {'todos_los_articulos': (lambda datos: Articulo.objects.all(), ['articulos'])}
+        with mock.patch.dict(auditoria.CONSULTAS, sin_indice):
+            with self.assertRaisesMessage(CommandError, '1 consultas críticas sin índice utilizable'):
+                self.auditar(consultas='todos_los_articulos')
+
+    def test_consulta_desconocida(self, *_):
+        with self.assertRaisesMessage(CommandError, 'Consultas desconocidas: no_existe'):
+            self.auditar(consultas='no_existe')
+
+
+@override_settings(PROXIES_CONFIABLES=['10.0.0.1'], METRICAS_IPS_PERMITIDAS=['127.0.0.1'], METRICAS_TOKEN='secreto')
+class MetricasAccesoTests(SimpleTestCase):
+
+    def estado(self, remote_addr, forwarded=None, autorizacion=None):
+        extra = {}
+        if forwarded:
+            extra['HTTP_X_FORWARDED_FOR'] = forwarded
+        if autorizacion:
+            extra['HTTP_AUTHORIZATION'] = autorizacion
+        return metricas_prometheus(RequestFactory().get('/metrics', REMOTE_ADDR=remote_addr, **extra)).status_code
+
+    def test_detras_del_proxy_se_usa_la_ip_del_cliente(self):
+        self.assertEqual(self.estado('10.0.0.1', '203.0.113.7'), 403)
+        self.assertEqual(self.estado('10.0.0.1', '127.0.0.1'), 200)
+        self.assertEqual(self.estado('127.0.0.1'), 200)
+
+    def test_token(self):
+        self.assertEqual(self.estado('10.0.0.1', '203.0.113.7', 'Bearer secreto'), 200)
+        self.assertEqual(self.estado('10.0.0.1', '203.0.113.7', 'Bearer otro'), 403)
+
+
+class MetricasVolcadoTests(SimpleTestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+        ajuste = override_settings(METRICAS_DIRECTORIO=self.directorio)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def escribir(self, nombre, pid, inicio, valores):
+        with open(os.path.join(self.directorio, nombre), 'w') as archivo:
+            json.dump({'pid': pid, 'inicio': inicio, 'valores': valores}, archivo)
+
+    def test_los_archivos_de_otro_arranque_se_borran_sin_sumarse(self):
+        self.escribir('metricas_arranque-anterior_123-456.json', 123, 456,
+                      [['throttle_rechazos_total', [['scope', 'arranque_anterior']], 7]])
+        texto = metricas.texto_metricas()
+        self.assertNotIn('arranque_anterior', texto)
+        self.assertFalse(os.path.exists(os.path.join(self.directorio, 'metricas_arranque-anterior_123-456.json')))
+
+    def test_un_pid_reciclado_no_pisa_ni_suma_medidores(self):
+        # Un worker terminado que tenía el mismo pid que este proceso
+        pid, inicio = os.getpid(), 1
+        self.escribir(f'metricas_{metricas.arranque()}_{pid}-{inicio}.json', pid, inicio, [
+            ['throttle_rechazos_total', [['scope', 'worker_terminado']], 3],
+            ['correo_bandeja_salida', [['prueba', 'worker_terminado']], 5],
+        ])
+        texto = metricas.texto_metricas()
+        self.assertIn('throttle_rechazos_total{scope="worker_terminado"} 3', texto)
+        self.assertNotIn('correo_bandeja_salida{prueba="worker_terminado"}', texto)
+        self.assertEqual(len(os.listdir(self.directorio)), 2)
+
+
+class SumideroRoto:
+    def registrar(self, medicion):
+        raise RuntimeError('sumidero caído')
+
+
+class MetricasSumiderosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = crear_datos()
+        crear_regla(cls.datos)
+
+    def configurar(self, *sumideros):
+        ajuste = override_settings(PRECIOS_METRICAS_SUMIDEROS=list(sumideros))
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        return metricas.sumideros()
+
+    def calcular(self, articulo=0, empresa_id=None, **parametros):
+        return PrecioService.calcular_precio(
+            empresa_id or self.datos['empresa'].empresa_id, None, self.datos['articulos'][articulo].articulo_id,
+            **parametros
+        )
+
+    def test_sin_sumideros_no_mide(self):
+        self.configurar()
+        self.assertIsNone(metricas.nueva_medicion('calcular_precio'))
+        with mock.patch.object(metricas, 'MedicionPrecio') as medicion, \
+                mock.patch.object(metricas, 'registrar') as registrar:
+            resultado = self.calcular()
+        self.assertNotIn('error', resultado)
+        medicion.assert_not_called()
+        registrar.assert_not_called()
+
+    def test_contadores_tras_calcular_precio(self):
+        memoria, prometheus = self.configurar('core.metricas.SumideroMemoria', 'core.metricas.SumideroPrometheus')
+        prometheus.registro = metricas.registro.vacio()
+
+        self.calcular(canal=CanalVenta.MAYORISTA)
+        self.calcular(articulo=1)
+        self.calcular(empresa_id=uuid.uuid4())
+
+        valores = prometheus.registro.valores()
+        calculos = {
+            dict(etiquetas)['resultado']: valor
+            for (nombre, etiquetas), valor in valores.items() if nombre == 'precios_calculos_total'
+        }
+        self.assertEqual(calculos, {'ok': 2, 'sin_lista': 1})
+        self.assertEqual(valores[('precios_reglas_aplicadas_total', ())], 1)
+        self.assertEqual(valores[('precios_llamada_segundos', (('operacion', 'calcular_precio'),))][-1], 3)
+
+        primera, segunda, sin_lista = memoria.mediciones
+        self.assertEqual(primera.lista_precio_id, self.datos['lista'].lista_precio_id)
+        self.assertEqual((primera.reglas_aplicadas, segunda.reglas_aplicadas), (1, 0))
+        self.assertTrue(segunda.plan_en_cache)
+        self.assertEqual(sin_lista.resultados, {'sin_lista': 1})
+        self.assertTrue(all(medicion.segundos is not None for medicion in memoria.mediciones))
+
+    def test_sumidero_log(self):
+        self.configurar('core.metricas.SumideroLog')
+        with self.assertLogs('metricas', 'INFO') as registros:
+            self.calcular()
+        self.assertEqual(json.loads(registros.records[0].getMessage())['resultados'], {'ok': 1})
+
+    def test_un_sumidero_con_error_no_afecta_el_calculo(self):
+        _, memoria = self.configurar('core.tests.SumideroRoto', 'core.metricas.SumideroMemoria')
+        with self.assertLogs('metricas', 'ERROR') as registros:
+            resultado = self.calcular(canal=CanalVenta.MAYORISTA)
+        self.assertNotIn('error', resultado)
+        self.assertEqual(len(resultado['reglas_aplicadas']), 1)
+        self.assertIn('SumideroRoto', registros.output[0])
+        self.assertEqual(len(memoria.mediciones), 1)
@@ -2,7 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.contrib.auth.models import User
 from django.views.decorators.http import require_POST
 from pos_project_acosta.choices import EstadoOrden, EstadoEntidades
@@ -10,11 +10,14 @@ import uuid
 
 from .forms import ArticuloForm, PrecioArticuloAntiguoForm
 from .cart import Cart
+from . import metricas
+from .red import ip_cliente
 
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
+from django.utils.crypto import constant_time_compare
 
 
 # ------------------------------------------------------------
@@ -39,7 +42,8 @@ def send_order_confirmation_email(orden):
         [to_email]
     )
     email.attach_alternative(html_content, "text/html")
-    email.send()
+    with metricas.envio_correo():
+        email.send()
 
 
 # ------------------------------------------------------------
@@ -281,27 +285,28 @@ def checkout(request):
 
     if request.method == 'POST':
         try:
-            orden = OrdenCompraCliente.objects.create(
-                pedido_id=uuid.uuid4(),
-                cliente=cliente,
-                vendedor=vendedor,
-                estado=EstadoOrden.PENDIENTE,
-                notas=request.POST.get('notas', ''),
-                creado_por=request.user
-            )
-            for item in cart:
-                articulo = item['articulo']
-                ItemOrdenCompraCliente.objects.create(
-                    item_id=uuid.uuid4(),
-                    pedido=orden,
-                    nro_item=1,
-                    articulo=articulo,
-                    cantidad=item['cantidad'],
-                    precio_unitario=item['precio'],
+            with metricas.duracion('checkout_segundos'):
+                orden = OrdenCompraCliente.objects.create(
+                    pedido_id=uuid.uuid4(),
+                    cliente=cliente,
+                    vendedor=vendedor,
+                    estado=EstadoOrden.PENDIENTE,
+                    notas=request.POST.get('notas', ''),
                     creado_por=request.user
                 )
-            cart.clear()
-            send_order_confirmation_email(orden)
+                for item in cart:
+                    articulo = item['articulo']
+                    ItemOrdenCompraCliente.objects.create(
+                        item_id=uuid.uuid4(),
+                        pedido=orden,
+                        nro_item=1,
+                        articulo=articulo,
+                        cantidad=item['cantidad'],
+                        precio_unitario=item['precio'],
+                        creado_por=request.user
+                    )
+                cart.clear()
+                send_order_confirmation_email(orden)
             messages.success(request, f'¡Orden creada exitosamente! Nº {orden.nro_pedido}')
             return redirect('order_detail', pedido_id=orden.pedido_id)
         except Exception as e:
@@ -363,3 +368,29 @@ def generate_pdf_order(request, pedido_id):
 
     messages.info(request, 'Generación de PDF pendiente de implementación.')
     return redirect('order_detail', pedido_id=pedido_id)
+
+
+# ------------------------------------------------------------
+# MÉTRICAS (Prometheus)
+# ------------------------------------------------------------
+def _acceso_metricas(request):
+    """Con METRICAS_TOKEN como Bearer, o desde una IP de METRICAS_IPS_PERMITIDAS (la del cliente, core/red.py)"""
+    token = settings.METRICAS_TOKEN
+    if token:
+        autorizacion = request.META.get('HTTP_AUTHORIZATION', '')
+        if constant_time_compare(autorizacion, f'Bearer {token}'):
+            return True
+    permitidas = settings.METRICAS_IPS_PERMITIDAS
+    return permitidas is None or ip_cliente(request) in permitidas
+
+
+def metricas_prometheus(request):
+    """GET /metrics: métricas de todos los procesos en formato de texto de Prometheus"""
+    if not _acceso_metricas(request):
+        return HttpResponseForbidden()
+
+    from django.core import mail
+    if hasattr(mail, 'outbox'):     # backend locmem (tests)
+        metricas.registro.fijar('correo_bandeja_salida', len(mail.outbox))
+
+    return HttpResponse(metricas.texto_metricas(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -4,6 +4,7 @@ Django settings for pos_project_acosta project.
 Generated by 'django-admin startproject' using Django 5.2.6.
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -52,11 +53,22 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.autenticacion.JWTAutenticacion',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ),
 
+    # JSON con orjson si está instalado (misma salida que el renderer de DRF)
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.JSONRendererRapido',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.JSONParserRapido',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+
     'DEFAULT_THROTTLE_CLASSES': (
         'rest_framework.throttling.AnonRateThrottle',
         'rest_framework.throttling.UserRateThrottle',
@@ -83,10 +95,13 @@ REST_FRAMEWORK = {
 # ---------------------------------------------------
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.perfilado.PerfiladoMiddleware',
+    'core.enrutador.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.autenticacion.AlcanceMiddleware',          # Empresa/sucursal de la petición (core/alcance.py)
     'allauth.account.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -116,16 +131,54 @@ WSGI_APPLICATION = 'pos_project_acosta.wsgi.application'
 # ---------------------------------------------------
 # DATABASE
 # ---------------------------------------------------
+# Conexiones (por entorno):
+# - DB_CONN_MAX_AGE: segundos que se reutiliza una conexión entre peticiones
+#   (0 = una conexión por petición, 'none' = sin límite).
+# - DB_CONN_HEALTH_CHECKS: verificar una conexión reutilizada antes de usarla.
+# - DB_POOL=1: pool nativo de Django con psycopg 3 (DB_POOL_MIN, DB_POOL_MAX,
+#   DB_POOL_TIMEOUT). Excluye CONN_MAX_AGE y es lo recomendado con ASGI, donde
+#   las conexiones persistentes quedan atadas a cada hilo.
+_DB_POOL = os.environ.get('DB_POOL', '').lower() in ('1', 'true', 'si')
+_DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '60')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'dbpedidoss',
-        'USER': 'admin_pedidos',
-        'PASSWORD': 'admin123',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'dbpedidoss'),
+        'USER': os.environ.get('DB_USER', 'admin_pedidos'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'admin123'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if _DB_POOL else (None if _DB_CONN_MAX_AGE.lower() == 'none' else int(_DB_CONN_MAX_AGE)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1').lower() in ('1', 'true', 'si'),
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5')),
+        },
     }
 }
+if _DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX', '10')),
+        'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+    }
+
+# Réplicas de lectura: DB_REPLICAS="host1,host2:5433" (mismas credenciales que default)
+REPLICAS_BD = []
+for _numero, _servidor in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    _host, _, _puerto = _servidor.strip().partition(':')
+    DATABASES[f'replica_{_numero}'] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'PORT': _puerto or DATABASES['default']['PORT'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICAS_BD.append(f'replica_{_numero}')
+
+DATABASE_ROUTERS = ['core.enrutador.EnrutadorReplicas']
+REPLICA_APPS = ['core']            # Apps cuyos modelos se pueden leer de una réplica
+REPLICA_VENTANA_SEGUNDOS = 5       # Tras escribir, el cliente lee de la primaria durante este tiempo
 
 # ---------------------------------------------------
 # PASSWORD VALIDATION
@@ -167,10 +220,24 @@ SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 # AUTHENTICATION
 # ---------------------------------------------------
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
+    # Usuario o email en una consulta; decide solo cuando recibe credenciales (accounts/backends.py)
+    'accounts.backends.UsuarioOEmailBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
 ]
 
+# Intentos fallidos de login (en la caché, con la IP del cliente; accounts/backends.py)
+LOGIN_INTENTOS_MAXIMOS = 5          # Por login desde una IP: bloquea ese login en esa IP
+LOGIN_INTENTOS_POR_IP = 50          # Todas las cajas de una tienda suelen compartir IP
+LOGIN_INTENTOS_POR_LOGIN = 20       # Por login desde cualquier IP: no bloquea, admite un intento por turno
+LOGIN_DEMORA_SEGUNDOS = 1           # Duración del turno; los demás intentos se rechazan al momento
+LOGIN_BLOQUEO_SEGUNDOS = 300
+
+# Proxies inversos (IPs o redes) cuyo X-Forwarded-For da la IP del cliente (core/red.py)
+# PROXIES_CONFIABLES="10.0.0.0/8,127.0.0.1" en el entorno
+PROXIES_CONFIABLES = [
+    _proxy.strip() for _proxy in os.environ.get('PROXIES_CONFIABLES', '127.0.0.1,::1').split(',') if _proxy.strip()
+]
+
 SITE_ID = 1
 AUTH_USER_MODEL = 'accounts.Usuario'
 LOGIN_REDIRECT_URL = 'home'
@@ -237,6 +304,78 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # Claims del usuario en el token y verificación de su versión (api/autenticacion.py)
+    'TOKEN_OBTAIN_SERIALIZER': 'api.autenticacion.TokenUsuarioSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.autenticacion.TokenRefreshUsuarioSerializer',
+}
+JWT_USUARIO_DESDE_TOKEN = True      # request.user desde los claims, sin consultar Usuario
+JWT_USUARIO_CACHE_SEGUNDOS = 30     # Caché del proceso para usuarios cargados completos (tokens sin claims)
+JWT_VERSION_CACHE_SEGUNDOS = 60     # Caché de la versión de tokens (revocación) en la caché de Django
+
+# ---------------------------------------------------
+# SINCRONIZACIÓN DE TERMINALES (/api/sync/)
+# ---------------------------------------------------
+SYNC_TAMANO_PAGINA = 1000          # Cambios por respuesta (máximo con ?tamano=)
+SYNC_MARGEN_SEGUNDOS = 5           # Margen para transacciones aún no confirmadas
+SYNC_RETENCION_DIAS = 90           # Antigüedad máxima de un cursor (y de los registros de bajas)
+
+# Paquetes de precios offline (manage.py generar_paquetes_offline)
+PAQUETES_OFFLINE_DIR = BASE_DIR / 'paquetes_offline'
+
+# ---------------------------------------------------
+# UBICACIONES GPS
+# ---------------------------------------------------
+UBICACIONES_MAXIMO_POR_LOTE = 1000       # Fixes por petición
+UBICACIONES_BUFFER_MAXIMO = 50000        # Fixes en memoria por proceso antes de responder 503
+UBICACIONES_LOTE = 5000                  # Filas por escritura (COPY / bulk_create)
+UBICACIONES_INTERVALO_SEGUNDOS = 2       # Intervalo del hilo de escritura
+UBICACIONES_CACHE_DISPOSITIVOS_SEGUNDOS = 60  # Vigencia de la caché IMEI -> dispositivo de cada proceso
+UBICACIONES_RETENCION_DIAS = 90          # Fixes crudos; los anteriores se resumen por hora (mantener_ubicaciones)
+UBICACIONES_PARTICIONES_ADELANTE = 3     # Meses con partición creada por adelantado (PostgreSQL)
+UBICACIONES_INDICE_REFRESCO_SEGUNDOS = 5 # Frecuencia máxima de lectura de UltimaUbicacion por el índice de proximidad
+UBICACIONES_INDICE_MARGEN_SEGUNDOS = 30  # Relectura hacia atrás del índice para filas que confirmaron tarde
+UBICACIONES_RECORRIDO_MAXIMO_HORAS = 48  # Ventana máxima de GET /api/ubicaciones/dispositivos/<id>/recorrido/
+
+# ---------------------------------------------------
+# PERFILADO DE PETICIONES (core.perfilado.PerfiladoMiddleware)
+# ---------------------------------------------------
+PERFILADO_SERVER_TIMING = DEBUG     # Encabezado Server-Timing (expone tiempos internos)
+PERFILADO_PRESUPUESTO_CONSULTAS = 30  # Consultas por petición; None = sin límite
+PERFILADO_PRESUPUESTOS = {}         # Presupuestos por nombre de ruta: {'url_name': consultas}
+PERFILADO_ESTRICTO = False          # True en tests: exceder el presupuesto lanza una excepción
+
+# ---------------------------------------------------
+# MÉTRICAS (GET /metrics, core/metricas.py)
+# ---------------------------------------------------
+# Con varios procesos (gunicorn) cada uno vuelca sus métricas en este directorio
+# compartido y /metrics suma las del arranque actual del servidor. Sin él, cada
+# proceso expone solo las propias.
+METRICAS_DIRECTORIO = os.environ.get('METRICAS_DIRECTORIO') or None
+METRICAS_VOLCADO_SEGUNDOS = 5        # Frecuencia máxima de volcado de cada proceso
+# Arranque del servidor (default: el proceso padre de los workers); fijarlo si los
+# workers no comparten padre, por ejemplo METRICAS_ARRANQUE="$(date +%s)" al desplegar
+METRICAS_ARRANQUE = os.environ.get('METRICAS_ARRANQUE') or None
+# Token para leer /metrics desde cualquier IP (Authorization: Bearer <token>)
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN') or None
+# IPs de cliente (detrás de PROXIES_CONFIABLES) que pueden leer /metrics sin token;
+# METRICAS_IPS_PERMITIDAS="*" en el entorno = cualquiera (None)
+_IPS_METRICAS = os.environ.get('METRICAS_IPS_PERMITIDAS', '127.0.0.1,::1')
+METRICAS_IPS_PERMITIDAS = None if _IPS_METRICAS == '*' else [
+    _ip.strip() for _ip in _IPS_METRICAS.split(',') if _ip.strip()
+]
+
+# Métricas del servicio de precios
+# Sumideros de cada llamada de PrecioService; vacío = sin medición. Disponibles:
+# core.metricas.SumideroMemoria, core.metricas.SumideroLog, core.metricas.SumideroPrometheus
+# PRECIOS_METRICAS="prometheus,log" en el entorno
+_SUMIDEROS_METRICAS = {
+    'memoria': 'core.metricas.SumideroMemoria',
+    'log': 'core.metricas.SumideroLog',
+    'prometheus': 'core.metricas.SumideroPrometheus',
 }
+PRECIOS_METRICAS_SUMIDEROS = [
+    _SUMIDEROS_METRICAS.get(_nombre.strip(), _nombre.strip())
+    for _nombre in os.environ.get('PRECIOS_METRICAS', '').split(',') if _nombre.strip()
+]
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -4,9 +4,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metricas_prometheus
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
+    # Métricas para Prometheus (core/metricas.py)
+    path('metrics', metricas_prometheus, name='metricas'),
+
     # Módulos de tu proyecto (URLs personalizadas primero para tener prioridad)
     path('accounts/', include('accounts.urls')),
     